@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Bulk Snippet Tool Benchmark
+
+Fetches and saves the same snippets against a local fake-backend server
+with injected storage latency, three ways: one get_snippet/save_snippet
+call at a time, the individual calls all in flight at once, and a single
+get_snippets/save_snippets call.
+
+Usage:
+    python benchmarks/bench_bulk_snippets.py [--items 100] [--rounds 10] [--storage-latency-ms 5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadgen import LatencyHistogram, start_fake_server  # noqa: E402
+
+from mcp_client import MCPClient, MCPTransport  # noqa: E402
+
+
+async def timed(histogram: LatencyHistogram, coroutine) -> None:
+    started = time.perf_counter()
+    await coroutine
+    histogram.record(time.perf_counter() - started)
+
+
+async def measure(base_url: str, args) -> dict:
+    names = [f"snippet-{i}" for i in range(args.items)]
+    items = [{"snippetname": f"bulk-{i}", "snippet": "x" * args.snippet_bytes} for i in range(args.items)]
+    modes = {
+        "get_snippet, one at a time": lambda c: sequential(c, "get_snippet", [{"snippetname": n} for n in names]),
+        "get_snippet, all in flight": lambda c: concurrent(c, "get_snippet", [{"snippetname": n} for n in names]),
+        "get_snippets, one call": lambda c: c.call_tool("get_snippets", {"snippetnames": names}),
+        "save_snippet, one at a time": lambda c: sequential(c, "save_snippet", items),
+        "save_snippet, all in flight": lambda c: concurrent(c, "save_snippet", items),
+        "save_snippets, one call": lambda c: c.call_tool("save_snippets", {"snippets": items}),
+    }
+    results = {}
+    async with MCPTransport(limit=args.items) as transport:
+        async with MCPClient(base_url, transport, request_timeout=300) as client:
+            for label, run in modes.items():
+                histogram = LatencyHistogram()
+                for _ in range(args.rounds):
+                    await timed(histogram, run(client))
+                results[label] = histogram
+    return results
+
+
+async def sequential(client: MCPClient, tool: str, calls: list) -> None:
+    for arguments in calls:
+        await client.call_tool(tool, arguments)
+
+
+async def concurrent(client: MCPClient, tool: str, calls: list) -> None:
+    await asyncio.gather(*(client.call_tool(tool, arguments) for arguments in calls))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100, help="Snippets fetched and saved per round")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--snippet-bytes", type=int, default=2048)
+    parser.add_argument("--storage-latency-ms", type=float, default=5.0)
+    parser.add_argument("--snippets", type=int, default=1000, help="Seeded snippets on the fake server")
+    parser.add_argument("--server-log-level", default="warning")
+    parser.add_argument("--server-arg", action="append", default=[])
+    args = parser.parse_args()
+
+    process, url = start_fake_server(args)
+    try:
+        results = asyncio.run(measure(f"{url}/runtime/webhooks/mcp", args))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    print(f"{args.items} snippets per round, {args.rounds} rounds, {args.storage_latency_ms}ms storage latency\n")
+    for label, histogram in results.items():
+        print(f"{label:<32} p50 {histogram.percentile(0.5):8.1f}ms   p99 {histogram.percentile(0.99):8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
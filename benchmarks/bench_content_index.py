@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Snippet Content Index Benchmark
+
+Measures index build time, memory per document, snapshot size and load time,
+and BM25 query latency over a synthetic corpus of code-like snippets.
+
+Usage:
+    python benchmarks/bench_content_index.py [--docs 100000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from content_index import SnippetContentIndex  # noqa: E402
+
+KEYWORDS = ["def", "return", "import", "class", "async", "await", "kubectl", "apply", "resource", "param"]
+
+
+def synthetic_vocabulary(size: int, rng: random.Random) -> list:
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def synthetic_snippet(vocabulary: list, rng: random.Random) -> str:
+    # Zipf-like term distribution: a few very common words, a long tail
+    words = []
+    for _ in range(rng.randint(20, 200)):
+        if rng.random() < 0.3:
+            words.append(rng.choice(KEYWORDS))
+        else:
+            words.append(vocabulary[min(len(vocabulary) - 1, int(rng.paretovariate(1.1)) - 1)])
+    return " ".join(words)
+
+
+def percentiles(samples: list) -> str:
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    return f"p50={at(0.50):7.2f}ms  p99={at(0.99):7.2f}ms  p999={at(0.999):7.2f}ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = synthetic_vocabulary(args.vocabulary, rng)
+    corpus = [synthetic_snippet(vocabulary, rng) for _ in range(args.docs)]
+    corpus_bytes = sum(len(text) for text in corpus)
+    print(f"corpus: {args.docs:,} snippets, {corpus_bytes / 2**20:.1f} MiB of text")
+
+    started = time.perf_counter()
+    index = SnippetContentIndex()
+    for i, text in enumerate(corpus):
+        index.add(f"snippet-{i}", text)
+    build_seconds = time.perf_counter() - started
+    print(f"build: {build_seconds:.2f}s ({args.docs / build_seconds:,.0f} docs/s), {len(index.postings):,} terms")
+
+    started = time.perf_counter()
+    snapshot = index.to_snapshot()
+    save_seconds = time.perf_counter() - started
+    del index
+
+    # Loading a snapshot yields the same steady-state structure as a build, so
+    # trace it to measure resident index memory without slowing the build down.
+    tracemalloc.start()
+    started = time.perf_counter()
+    restored = SnippetContentIndex.from_snapshot(snapshot)
+    load_seconds = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"snapshot: {len(snapshot) / 2**20:.1f} MiB ({len(snapshot) / args.docs:.0f} bytes/doc), "
+          f"write {save_seconds:.2f}s, load {load_seconds:.2f}s (traced)")
+    print(f"memory: {current / 2**20:.1f} MiB resident, {current / args.docs:,.0f} bytes/doc")
+
+    # Incremental updates after the bulk build
+    samples = []
+    for i in range(1000):
+        text = synthetic_snippet(vocabulary, rng)
+        started = time.perf_counter()
+        restored.add(f"snippet-{rng.randrange(args.docs)}", text)
+        samples.append(time.perf_counter() - started)
+    print(f"re-save update          {percentiles(samples)}")
+
+    for label, pool in (("rare terms", vocabulary[1000:]), ("common terms", vocabulary[:50] + KEYWORDS)):
+        samples = []
+        for _ in range(args.queries):
+            query = " ".join(rng.choice(pool) for _ in range(rng.randint(1, 3)))
+            started = time.perf_counter()
+            restored.search(query, limit=10)
+            samples.append(time.perf_counter() - started)
+        print(f"query {label:<17} {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+HTTP/1.1 Versus HTTP/2 SSE Session Benchmark
+
+Holds thousands of SSE sessions open against a local fake-backend server
+and measures what they cost the server: sockets and resident memory, the
+time to open them all, and tools/call latency on the message endpoint
+while they are open. Runs uvicorn over HTTP/1.1 (one connection per
+session), hypercorn over HTTP/1.1 (to separate server from protocol) and
+hypercorn over h2c, where sessions multiplex --streams-per-connection to a
+connection (httpx opens at most 100 streams on one connection).
+
+Usage:
+    python benchmarks/bench_http2.py [--sessions 5000] [--calls 1000] [--streams-per-connection 100]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadgen import MESSAGE_PATH, SSE_PATH, LatencyHistogram, start_fake_server  # noqa: E402
+
+MODES = {
+    "uvicorn, HTTP/1.1": ("uvicorn", False),
+    "hypercorn, HTTP/1.1": ("hypercorn", False),
+    "hypercorn, HTTP/2 (h2c)": ("hypercorn", True),
+}
+
+
+def server_usage(pid: int) -> dict:
+    """Open sockets and resident memory of a process, from /proc"""
+    fd_dir = f"/proc/{pid}/fd"
+    sockets = 0
+    for fd in os.listdir(fd_dir):
+        try:
+            sockets += os.readlink(os.path.join(fd_dir, fd)).startswith("socket:")
+        except OSError:
+            pass
+    with open(f"/proc/{pid}/status") as f:
+        rss_kib = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    return {"sockets": sockets, "rss_mib": rss_kib / 1024}
+
+
+def make_client(base_url: str, http2: bool, connections: int) -> httpx.AsyncClient:
+    """Over HTTP/1.1 a connection per request in flight; over HTTP/2 requests share the connections"""
+    transport = httpx.AsyncHTTPTransport(http1=not http2, http2=http2, limits=httpx.Limits(
+        max_connections=connections, max_keepalive_connections=connections
+    ))
+    return httpx.AsyncClient(base_url=base_url, transport=transport, timeout=120)
+
+
+async def hold_session(client: httpx.AsyncClient, opened: asyncio.Queue, stop: asyncio.Event,
+                       histogram: LatencyHistogram) -> None:
+    started = time.perf_counter()
+    try:
+        # Uncompressed, so memory is the sessions' and connections' and not each stream's compressor
+        headers = {"Accept": "text/event-stream", "Accept-Encoding": "identity"}
+        async with client.stream("GET", SSE_PATH, headers=headers) as response:
+            # Breaking out of aiter_lines would close the stream once the generator is collected
+            lines = response.aiter_lines()
+            line = await anext(lines)
+            while not line.startswith("data:"):
+                line = await anext(lines)
+            histogram.record(time.perf_counter() - started)
+            await opened.put(line[len("data:"):].strip())
+            await stop.wait()
+    except httpx.HTTPError as e:
+        await opened.put(e)
+
+
+async def measure(base_url: str, pid: int, http2: bool, args) -> dict:
+    # SSE sessions are spread over clients of one HTTP/2 connection each; tools/call has a client of its own
+    if http2:
+        connections = math.ceil(args.sessions / args.streams_per_connection)
+        holding = [make_client(base_url, True, 1) for _ in range(connections)]
+    else:
+        holding = [make_client(base_url, False, args.sessions)]
+    caller = make_client(base_url, http2, 1 if http2 else args.concurrency)
+    opened: asyncio.Queue = asyncio.Queue()
+    stop = asyncio.Event()
+    connect = LatencyHistogram()
+    idle = server_usage(pid)
+    started = time.perf_counter()
+    holders = [
+        asyncio.create_task(hold_session(holding[i * len(holding) // args.sessions], opened, stop, connect))
+        for i in range(args.sessions)
+    ]
+    endpoints, failures = [], 0
+    for _ in range(args.sessions):
+        endpoint = await opened.get()
+        if isinstance(endpoint, Exception):
+            failures += 1
+        else:
+            endpoints.append(endpoint)
+    open_seconds = time.perf_counter() - started
+    await asyncio.sleep(1)
+    held = server_usage(pid)
+
+    calls = LatencyHistogram()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def call(i: int) -> None:
+        endpoint = endpoints[i % len(endpoints)]
+        body = {"jsonrpc": "2.0", "id": i, "method": "tools/call",
+                "params": {"name": "get_snippet", "arguments": {"snippetname": f"snippet-{i % args.snippets}"}}}
+        async with semaphore:
+            began = time.perf_counter()
+            response = await caller.post(f"{MESSAGE_PATH}?{endpoint.split('?', 1)[1]}", json=body)
+            response.raise_for_status()
+            calls.record(time.perf_counter() - began)
+
+    if endpoints:
+        await asyncio.gather(*(call(i) for i in range(args.calls)))
+    stop.set()
+    await asyncio.gather(*holders, return_exceptions=True)
+    for client in holding + [caller]:
+        await client.aclose()
+    return {
+        "failures": failures,
+        "open_seconds": open_seconds,
+        "connect": connect,
+        "calls": calls,
+        "sockets": held["sockets"] - idle["sockets"],
+        "rss_mib": held["rss_mib"] - idle["rss_mib"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=1000, help="tools/call requests made while the sessions are open")
+    parser.add_argument("--concurrency", type=int, default=32, help="tools/call requests in flight")
+    parser.add_argument("--streams-per-connection", type=int, default=100, help="SSE sessions per HTTP/2 connection")
+    parser.add_argument("--storage-latency-ms", type=float, default=5.0)
+    parser.add_argument("--snippets", type=int, default=1000, help="Seeded snippets on the fake server")
+    parser.add_argument("--server-log-level", default="warning")
+    parser.add_argument("--server-arg", action="append", default=[])
+    args = parser.parse_args()
+
+    results = {}
+    for label, (server, http2) in MODES.items():
+        run_args = argparse.Namespace(**{**vars(args), "server_arg": args.server_arg + ["--http-server", server]})
+        process, url = start_fake_server(run_args)
+        try:
+            results[label] = asyncio.run(measure(url, process.pid, http2, args))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(f"{args.sessions} SSE sessions, {args.calls} tools/call (get_snippet) while open, "
+          f"{args.storage_latency_ms}ms storage latency\n")
+    print(f"{'':<26}{'sockets':>9}{'RSS MiB':>10}{'open all':>10}{'connect p99':>13}"
+          f"{'call p50':>10}{'call p99':>10}{'failed':>8}")
+    for label, r in results.items():
+        print(f"{label:<26}{r['sockets']:>9}{r['rss_mib']:>10.1f}{r['open_seconds']:>9.1f}s"
+              f"{r['connect'].percentile(0.99):>11.0f}ms{r['calls'].percentile(0.5):>8.1f}ms"
+              f"{r['calls'].percentile(0.99):>8.1f}ms{r['failures']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Logging Overhead Benchmark
+
+Measures server request throughput against a local fake-backend server with
+logging disabled (WARNING), at INFO through the queued JSON pipeline, and at
+INFO with records written synchronously on the event loop as before. Server
+logs go to a temporary file so the terminal is not the bottleneck.
+
+Usage:
+    python benchmarks/bench_logging.py [--requests 5000] [--sessions 20] [--in-flight 4]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_mcp_client import report, run_concurrent  # noqa: E402
+from loadgen import start_fake_server  # noqa: E402
+
+MODES = {
+    "logging disabled (WARNING)": ("warning", []),
+    "INFO, queued JSON": ("info", []),
+    "INFO, synchronous JSON": ("info", ["--sync-logging"]),
+}
+
+
+def run_mode(args, label: str, log_level: str, server_args: list) -> None:
+    args.server_log_level = log_level
+    args.server_arg = server_args
+    with tempfile.TemporaryFile() as log_file:
+        process, url = start_fake_server(args, stderr=log_file)
+        try:
+            base_url = f"{url}/runtime/webhooks/mcp"
+            # Warm up connections and code paths before measuring
+            asyncio.run(run_concurrent(base_url, args.requests // 10, args.sessions, args.in_flight, args.pool))
+            started = time.perf_counter()
+            histogram = asyncio.run(run_concurrent(base_url, args.requests, args.sessions, args.in_flight, args.pool))
+            report(label, histogram, time.perf_counter() - started)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+        print(f"{'':<44}{log_file.tell() / 1024:>10.0f} KiB of logs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--in-flight", type=int, default=4, help="Concurrent requests per session")
+    parser.add_argument("--pool", type=int, default=32, help="Shared connection pool size")
+    parser.add_argument("--storage-latency-ms", type=float, default=1.0)
+    parser.add_argument("--snippets", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.requests} get_snippet calls per mode\n")
+    for label, (log_level, server_args) in MODES.items():
+        run_mode(args, label, log_level, server_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+MCP Client Throughput Benchmark
+
+Measures requests per second and latency of src/mcp_client.py against a
+local fake-backend server for one-at-a-time requests, many logical sessions
+sharing one pooled transport with concurrent in-flight requests, and JSON-RPC
+batches.
+
+Usage:
+    python benchmarks/bench_mcp_client.py [--requests 5000] [--sessions 50] [--in-flight 4]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadgen import LatencyHistogram, start_fake_server  # noqa: E402
+
+from mcp_client import MCPClient, MCPTransport  # noqa: E402
+
+CALL = ("tools/call", {"name": "get_snippet", "arguments": {"snippetname": "snippet-1"}})
+
+
+async def timed(histogram: LatencyHistogram, coroutine) -> None:
+    started = time.perf_counter()
+    await coroutine
+    histogram.record(time.perf_counter() - started)
+
+
+async def run_sequential(base_url: str, requests: int) -> LatencyHistogram:
+    histogram = LatencyHistogram()
+    async with MCPClient(base_url) as client:
+        for _ in range(requests):
+            await timed(histogram, client.request(*CALL))
+    return histogram
+
+
+async def run_concurrent(base_url: str, requests: int, sessions: int, in_flight: int, pool: int) -> LatencyHistogram:
+    histogram = LatencyHistogram()
+    per_worker = max(1, requests // (sessions * in_flight))
+
+    async def worker(client: MCPClient) -> None:
+        for _ in range(per_worker):
+            await timed(histogram, client.request(*CALL))
+
+    async with MCPTransport(limit=pool) as transport:
+        clients = [MCPClient(base_url, transport) for _ in range(sessions)]
+        await asyncio.gather(*(client.connect() for client in clients))
+        await asyncio.gather(*(worker(client) for client in clients for _ in range(in_flight)))
+        await asyncio.gather(*(client.close() for client in clients))
+    return histogram
+
+
+async def run_batched(base_url: str, requests: int, batch_size: int, in_flight: int) -> LatencyHistogram:
+    histogram = LatencyHistogram()
+    batches = max(1, requests // (batch_size * in_flight))
+
+    async def worker(client: MCPClient) -> None:
+        for _ in range(batches):
+            await timed(histogram, client.batch([CALL] * batch_size))
+
+    async with MCPClient(base_url) as client:
+        await asyncio.gather(*(worker(client) for _ in range(in_flight)))
+    return histogram
+
+
+def report(label: str, histogram: LatencyHistogram, elapsed: float, per_sample: int = 1) -> None:
+    rate = histogram.total * per_sample / elapsed
+    print(f"{label:<44}{rate:>10.0f} req/s   p50 {histogram.percentile(0.5):7.2f}ms   "
+          f"p99 {histogram.percentile(0.99):7.2f}ms")
+
+
+async def run(args, base_url: str) -> None:
+    print(f"{args.requests} get_snippet calls against {base_url}\n")
+
+    started = time.perf_counter()
+    histogram = await run_sequential(base_url, min(args.requests, 1000))
+    report("sequential, 1 session", histogram, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    histogram = await run_concurrent(base_url, args.requests, args.sessions, args.in_flight, args.pool)
+    report(f"{args.sessions} sessions x {args.in_flight} in flight, pool {args.pool}", histogram,
+           time.perf_counter() - started)
+
+    started = time.perf_counter()
+    histogram = await run_batched(base_url, args.requests, args.batch_size, args.in_flight)
+    report(f"batches of {args.batch_size}, {args.in_flight} in flight", histogram, time.perf_counter() - started,
+           per_sample=args.batch_size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Server base URL; a local fake-backend server is started when omitted")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--in-flight", type=int, default=4, help="Concurrent requests per session")
+    parser.add_argument("--pool", type=int, default=32, help="Shared connection pool size")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--storage-latency-ms", type=float, default=5.0)
+    parser.add_argument("--snippets", type=int, default=100)
+    parser.add_argument("--server-log-level", default="warning")
+    parser.add_argument("--server-arg", action="append", default=[])
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_fake_server(args)
+    try:
+        asyncio.run(run(args, f"{url.rstrip('/')}/runtime/webhooks/mcp"))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
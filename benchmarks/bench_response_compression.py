@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Response Compression Benchmark
+
+Reports bytes on the wire and CPU time per response for each encoding and
+level, for a tools/list payload, a large get_snippet result and an SSE
+stream flushed after every event.
+
+Usage:
+    python benchmarks/bench_response_compression.py [--iterations 200]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from compression import StreamCompressor, available_encodings, compress_body  # noqa: E402
+
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 9, 11], "zstd": [1, 3, 9, 19]}
+
+
+def tools_list_payload() -> bytes:
+    import mcp_server
+
+    tools = [{"name": t.name, "description": t.description, "inputSchema": t.inputSchema} for t in mcp_server.TOOLS]
+    return json.dumps({"jsonrpc": "2.0", "result": {"tools": tools}, "id": 1}).encode()
+
+
+def snippet_payload(size: int) -> bytes:
+    rng = random.Random(42)
+    words = ["resource", "storage", "param", "kubectl", "apply", "def", "return", "await", "name", "location"]
+    lines, total = [], 0
+    while total < size:
+        lines.append(" ".join(f"{rng.choice(words)}{rng.randrange(1000)}" for _ in range(rng.randint(3, 12))))
+        total += len(lines[-1]) + 1
+    text = "\n".join(lines)[:size]
+    result = {"content": [{"type": "text", "text": text}], "isError": False}
+    return json.dumps({"jsonrpc": "2.0", "result": result, "id": 1}).encode()
+
+
+def sse_events(count: int) -> list:
+    return [
+        f'data: {{"jsonrpc": "2.0", "result": {{"content": [{{"type": "text", "text": "event {i}"}}]}}, "id": {i}}}\n\n'
+        .encode()
+        for i in range(count)
+    ]
+
+
+def time_per_call(func, iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - started) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--snippet-bytes", type=int, default=256 * 1024)
+    args = parser.parse_args()
+
+    payloads = {
+        "tools/list": tools_list_payload(),
+        f"get_snippet {args.snippet_bytes // 1024}KiB": snippet_payload(args.snippet_bytes),
+    }
+    for label, body in payloads.items():
+        print(f"\n{label}: {len(body):,} bytes uncompressed")
+        for encoding in available_encodings():
+            for level in LEVELS[encoding]:
+                compressed = compress_body(body, encoding, level)
+                cpu = time_per_call(lambda: compress_body(body, encoding, level), args.iterations)
+                print(f"  {encoding:<4} level {level:>2}: {len(compressed):>9,} bytes "
+                      f"({len(compressed) / len(body):6.1%})  cpu {cpu * 1e6:9.1f}us/response")
+
+    events = sse_events(100)
+    raw_total = sum(map(len, events))
+    print(f"\nSSE stream, 100 events flushed individually: {raw_total:,} bytes uncompressed")
+    for encoding in available_encodings():
+        level = LEVELS[encoding][1]
+
+        def stream():
+            compressor = StreamCompressor(encoding, level)
+            return sum(len(compressor.compress(event, flush=True)) for event in events) + len(compressor.finish())
+
+        wire = stream()
+        cpu = time_per_call(stream, max(1, args.iterations // 10))
+        print(f"  {encoding:<4} level {level:>2}: {wire:>9,} bytes ({wire / raw_total:6.1%})  "
+              f"cpu {cpu / len(events) * 1e6:7.1f}us/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Idle SSE Session Memory Benchmark
+
+Measures what an idle SSE session costs, two ways:
+
+- app: Python heap (tracemalloc) per session created with create_session,
+  alone and with a stream waiting in session_events, in-process
+- server: resident memory of a local fake-backend server per idle SSE
+  session held open, over HTTP/2 (hypercorn, h2c) or HTTP/1.1 (uvicorn,
+  a connection per session), including the HTTP server's own state
+
+and projects how many idle sessions fit in the Deployment's memory limit.
+
+Usage:
+    python benchmarks/bench_session_memory.py [--sessions 50000] [--mode app|server|both] [--http-server hypercorn]
+"""
+
+import argparse
+import asyncio
+import gc
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_http2 import hold_session, make_client, server_usage  # noqa: E402
+from loadgen import LatencyHistogram, start_fake_server  # noqa: E402
+
+
+async def app_footprint(sessions: int) -> dict:
+    import mcp_server
+
+    mcp_server.sessions.clear()
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    session_ids = [mcp_server.create_session("sse") for _ in range(sessions)]
+    gc.collect()
+    created = tracemalloc.get_traced_memory()[0]
+    # The server holds a task per open response; here it runs the stream up to its first wait for events
+    streams = [mcp_server.session_events(session_id, 0) for session_id in session_ids]
+    waiting = [asyncio.ensure_future(anext(stream)) for stream in streams]
+    await asyncio.sleep(0.5)
+    gc.collect()
+    streaming = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for task in waiting:
+        task.cancel()
+    await asyncio.gather(*waiting, return_exceptions=True)
+    for stream in streams:
+        await stream.aclose()
+    mcp_server.sessions.clear()
+    return {"session": (created - start) / sessions, "streaming": (streaming - start) / sessions}
+
+
+async def server_footprint(url: str, pid: int, sessions: int, http2: bool, streams_per_connection: int) -> dict:
+    if http2:
+        holding = [make_client(url, True, 1) for _ in range(math.ceil(sessions / streams_per_connection))]
+    else:
+        holding = [make_client(url, False, sessions)]
+    opened: asyncio.Queue = asyncio.Queue()
+    stop = asyncio.Event()
+    idle = server_usage(pid)
+    started = time.perf_counter()
+    holders = [
+        asyncio.create_task(hold_session(holding[i * len(holding) // sessions], opened, stop, LatencyHistogram()))
+        for i in range(sessions)
+    ]
+    failures = 0
+    for _ in range(sessions):
+        failures += isinstance(await opened.get(), Exception)
+    open_seconds = time.perf_counter() - started
+    await asyncio.sleep(2)
+    held = server_usage(pid)
+    stop.set()
+    await asyncio.gather(*holders, return_exceptions=True)
+    for client in holding:
+        await client.aclose()
+    return {
+        "idle_mib": idle["rss_mib"],
+        "held_mib": held["rss_mib"],
+        "per_session": (held["rss_mib"] - idle["rss_mib"]) * 1024 * 1024 / (sessions - failures),
+        "open_seconds": open_seconds,
+        "failures": failures,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50000)
+    parser.add_argument("--mode", choices=["app", "server", "both"], default="both")
+    parser.add_argument("--limit-mib", type=float, default=512, help="Container memory limit to project against")
+    parser.add_argument("--http-server", choices=["hypercorn", "uvicorn"], default="hypercorn",
+                        help="uvicorn holds a connection per session, so --sessions is bound by the open file limit")
+    parser.add_argument("--streams-per-connection", type=int, default=100, help="SSE sessions per HTTP/2 connection")
+    parser.add_argument("--storage-latency-ms", type=float, default=5.0)
+    parser.add_argument("--snippets", type=int, default=1000, help="Seeded snippets on the fake server")
+    parser.add_argument("--server-log-level", default="warning")
+    parser.add_argument("--server-arg", action="append", default=[])
+    args = parser.parse_args()
+
+    print(f"{args.sessions} idle SSE sessions\n")
+    if args.mode in ("app", "both"):
+        app = asyncio.run(app_footprint(args.sessions))
+        print(f"app heap per session          {app['session']:8.0f} bytes")
+        print(f"app heap per streaming session {app['streaming']:7.0f} bytes")
+    if args.mode in ("server", "both"):
+        http2 = args.http_server == "hypercorn"
+        args.server_arg = args.server_arg + ["--http-server", args.http_server]
+        process, url = start_fake_server(args)
+        try:
+            server = asyncio.run(server_footprint(url, process.pid, args.sessions, http2, args.streams_per_connection))
+        finally:
+            process.terminate()
+            process.wait(timeout=60)
+        fits = int((args.limit_mib - server["idle_mib"]) * 1024 * 1024 / server["per_session"])
+        print(f"server RSS per session ({'h2c' if http2 else 'h1'})  {server['per_session']:8.0f} bytes "
+              f"({server['idle_mib']:.0f} MiB idle, {server['held_mib']:.0f} MiB held, "
+              f"opened in {server['open_seconds']:.0f}s, {server['failures']} failed)")
+        print(f"idle sessions in {args.limit_mib:.0f} MiB       {fits:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Snippet Name Index Benchmark
+
+Measures bootstrap (bulk load), incremental insert and prefix query latency
+of the in-memory snippet name index over a large synthetic corpus.
+
+Usage:
+    python benchmarks/bench_snippet_index.py [--names 1000000] [--queries 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from snippet_index import SnippetNameIndex  # noqa: E402
+
+TEAMS = ["aks", "apim", "kaito", "infra", "agents", "docs", "ops", "data"]
+KINDS = ["deploy", "policy", "prompt", "query", "script", "template"]
+
+
+def synthetic_names(count: int, rng: random.Random) -> list:
+    return [
+        f"{rng.choice(TEAMS)}/{rng.choice(KINDS)}-{rng.randrange(10**9):09d}"
+        for _ in range(count)
+    ]
+
+
+def percentiles(samples: list) -> str:
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6
+
+    return f"p50={at(0.50):8.1f}us  p99={at(0.99):8.1f}us  p999={at(0.999):8.1f}us"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--inserts", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = synthetic_names(args.names, rng)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = SnippetNameIndex()
+    index.finish_reconcile(names)
+    load_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"bootstrap: {len(index):,} names in {load_seconds:.2f}s (peak {peak / 2**20:.0f} MiB incl. set + list)")
+
+    insert_samples = []
+    for name in synthetic_names(args.inserts, rng):
+        started = time.perf_counter()
+        index.add(name)
+        insert_samples.append(time.perf_counter() - started)
+    print(f"insert            {percentiles(insert_samples)}")
+
+    prefixes = {
+        "broad (team/)": [f"{team}/" for team in TEAMS],
+        "medium (team/kind-)": [f"{team}/{kind}-" for team in TEAMS for kind in KINDS],
+        "narrow (+3 digits)": [
+            f"{team}/{kind}-{rng.randrange(1000):03d}" for team in TEAMS for kind in KINDS for _ in range(20)
+        ],
+    }
+    for label, candidates in prefixes.items():
+        samples = []
+        for _ in range(args.queries):
+            prefix = rng.choice(candidates)
+            started = time.perf_counter()
+            index.prefix(prefix, limit=50)
+            samples.append(time.perf_counter() - started)
+        print(f"prefix {label:<20} {percentiles(samples)}")
+
+    # Walk one broad prefix page by page to show cursor cost stays flat
+    samples, cursor, pages = [], None, 0
+    while pages < 200:
+        started = time.perf_counter()
+        _, cursor = index.prefix("aks/", cursor=cursor, limit=50)
+        samples.append(time.perf_counter() - started)
+        pages += 1
+        if cursor is None:
+            break
+    print(f"paginate {pages} pages        {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
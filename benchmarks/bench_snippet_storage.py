@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Snippet Storage Format Benchmark
+
+Compares the raw, compressed and dedup snippet storage formats on bytes
+stored, bytes uploaded/downloaded and read latency, using the in-memory
+backend with injected per-call latency and bandwidth.
+
+Usage:
+    python benchmarks/bench_snippet_storage.py [--snippets 2000] [--duplicate-ratio 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from snippet_format import FORMATS, SnippetCodec  # noqa: E402
+from storage import FaultInjectingBackend, MemoryStorageBackend  # noqa: E402
+
+CODE_LINES = [
+    "resource storage 'Microsoft.Storage/storageAccounts@2023-01-01' = {",
+    "  name: storageAccountName",
+    "kubectl apply -f k8s/mcp-server-deployment.yaml",
+    "async def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> MCPToolResult:",
+    "    return MCPToolResult(content=[{'type': 'text', 'text': result}])",
+    "<validate-jwt header-name=\"Authorization\" failed-validation-httpcode=\"401\">",
+]
+
+
+def synthetic_corpus(count: int, duplicate_ratio: float, rng: random.Random) -> list:
+    unique = []
+    corpus = []
+    for i in range(count):
+        if unique and rng.random() < duplicate_ratio:
+            corpus.append(rng.choice(unique))
+            continue
+        # Log-uniform sizes from ~100 bytes to ~200 KB
+        lines = int(10 ** rng.uniform(0.5, 3.5))
+        text = "\n".join(f"{rng.choice(CODE_LINES)}  # {i}-{n}" for n in range(lines)).encode()
+        unique.append(text)
+        corpus.append(text)
+    return corpus
+
+
+def percentiles(samples: list) -> str:
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    return f"p50={at(0.50):6.2f}ms p99={at(0.99):6.2f}ms"
+
+
+async def run_format(storage_format: str, compression: str, corpus: list, args) -> None:
+    memory = MemoryStorageBackend()
+    backend = FaultInjectingBackend(memory, latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mbps * 125_000)
+    codec = SnippetCodec(storage_format, compression=compression, min_size=args.min_size)
+
+    started = time.perf_counter()
+    for i, text in enumerate(corpus):
+        await codec.write(backend, f"snippet-{i}.json", text)
+    write_seconds = time.perf_counter() - started
+    uploaded = backend.bytes_sent
+
+    rng = random.Random(args.seed)
+    fresh = SnippetCodec(storage_format, compression=compression, min_size=args.min_size)
+    samples = []
+    for _ in range(args.reads):
+        i = rng.randrange(len(corpus))
+        started = time.perf_counter()
+        data = await fresh.read(backend, f"snippet-{i}.json")
+        samples.append(time.perf_counter() - started)
+        assert data == corpus[i]
+
+    stored = sum(len(blob) for blob in memory.blobs.values())
+    label = storage_format if storage_format == "raw" else f"{storage_format}/{compression}"
+    print(f"{label:<16} stored={stored / 2**20:7.2f} MiB  uploaded={uploaded / 2**20:7.2f} MiB  "
+          f"downloaded={backend.bytes_received / 2**20:6.2f} MiB  blobs={len(memory.blobs):5d}  "
+          f"write={write_seconds:5.1f}s  read {percentiles(samples)}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snippets", type=int, default=2000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.5)
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--min-size", type=int, default=1024)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--bandwidth-mbps", type=float, default=200.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.snippets, args.duplicate_ratio, random.Random(args.seed))
+    print(f"corpus: {len(corpus)} snippets, {sum(map(len, corpus)) / 2**20:.1f} MiB logical, "
+          f"{len(set(corpus))} unique; {args.latency_ms}ms/call, {args.bandwidth_mbps} Mbit/s")
+    for storage_format in FORMATS:
+        for compression in (["zstd"] if storage_format == "raw" else ["gzip", "zstd"]):
+            await run_format(storage_format, compression, corpus, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tool Execution Pool Benchmark
+
+Measures hello_mcp latency on a local fake-backend server while concurrent
+diff_snippets calls keep the CPU busy, once with diff_snippets running
+inline on the event loop and once on the tool process pool. With the pool,
+hello_mcp latency should stay flat while the diff workers are saturated.
+
+Usage:
+    python benchmarks/bench_tool_pools.py [--duration 10] [--diff-clients 4] [--diff-lines 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_mcp_client import report  # noqa: E402
+from loadgen import LatencyHistogram, start_fake_server  # noqa: E402
+
+from mcp_client import MCPClient, MCPTransport  # noqa: E402
+
+
+def diff_arguments(lines: int) -> dict:
+    original = "".join(f"line {i}\n" for i in range(lines))
+    modified = "".join(f"line {i}\n" if i % 7 else f"changed {i}\n" for i in range(lines))
+    return {"original": original, "modified": modified}
+
+
+async def measure(base_url: str, args) -> tuple:
+    hello, diffs = LatencyHistogram(), LatencyHistogram()
+    arguments = diff_arguments(args.diff_lines)
+    deadline = time.perf_counter() + args.duration
+
+    async def diff_client(client: MCPClient) -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await client.call_tool("diff_snippets", arguments)
+            diffs.record(time.perf_counter() - started)
+
+    async def hello_client(client: MCPClient) -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await client.call_tool("hello_mcp")
+            hello.record(time.perf_counter() - started)
+            await asyncio.sleep(1 / args.hello_rate)
+
+    async with MCPTransport(limit=args.diff_clients + 2) as transport:
+        clients = [MCPClient(base_url, transport, request_timeout=300) for _ in range(args.diff_clients + 1)]
+        await asyncio.gather(*(client.connect() for client in clients))
+        started = time.perf_counter()
+        await asyncio.gather(hello_client(clients[0]), *(diff_client(client) for client in clients[1:]))
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(client.close() for client in clients))
+    return hello, diffs, elapsed
+
+
+def run_mode(args, label: str, execution: str) -> None:
+    os.environ["TOOL_EXECUTION_CLASSES"] = f"diff_snippets={execution}"
+    if args.workers:
+        os.environ["TOOL_PROCESS_WORKERS"] = str(args.workers)
+    process, url = start_fake_server(args)
+    try:
+        hello, diffs, elapsed = asyncio.run(measure(f"{url}/runtime/webhooks/mcp", args))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    print(label)
+    report("  hello_mcp", hello, elapsed)
+    report("  diff_snippets", diffs, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--diff-clients", type=int, default=4, help="Concurrent diff_snippets callers")
+    parser.add_argument("--diff-lines", type=int, default=2000, help="Lines per diffed text")
+    parser.add_argument("--hello-rate", type=float, default=20.0, help="hello_mcp calls per second")
+    parser.add_argument("--workers", type=int, default=0, help="Process pool size (default: CPU quota)")
+    parser.add_argument("--storage-latency-ms", type=float, default=1.0)
+    parser.add_argument("--snippets", type=int, default=10)
+    parser.add_argument("--server-log-level", default="warning")
+    parser.add_argument("--server-arg", action="append", default=[])
+    args = parser.parse_args()
+
+    run_mode(args, "diff_snippets inline on the event loop", "inline")
+    run_mode(args, "diff_snippets on the process pool", "process")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Vector Index Benchmark
+
+Measures memory and top-k query latency of the float16 vector index at
+several corpus sizes: exact search one query at a time and in batches, then
+IVF search after partitioning, with its recall against the exact results.
+
+Usage:
+    python benchmarks/bench_vector_index.py [--sizes 100000,1000000] [--dimensions 256] [--directory /tmp]
+"""
+
+import argparse
+import math
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from vector_index import VectorIndex, normalize  # noqa: E402
+
+
+def synthetic_vectors(count: int, dimensions: int, rng: np.random.Generator, clusters: int = 1000) -> np.ndarray:
+    # Embeddings of real snippets cluster by topic, which is what IVF exploits
+    centers = normalize(rng.standard_normal((clusters, dimensions)))
+    vectors = np.empty((count, dimensions), dtype=np.float32)
+    for start in range(0, count, 100_000):
+        end = min(count, start + 100_000)
+        noise = 0.6 / math.sqrt(dimensions) * rng.standard_normal((end - start, dimensions), dtype=np.float32)
+        vectors[start:end] = normalize(centers[rng.integers(0, clusters, end - start)] + noise)
+    return vectors
+
+
+def percentiles(samples: list) -> str:
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    return f"p50={at(0.50):8.2f}ms  p99={at(0.99):8.2f}ms"
+
+
+def timed(search, queries, batch: int) -> tuple:
+    samples, results = [], []
+    for start in range(0, len(queries), batch):
+        started = time.perf_counter()
+        results.extend(search(queries[start:start + batch]))
+        samples.append(time.perf_counter() - started)
+    return samples, results
+
+
+def recall(approximate: list, exact: list) -> float:
+    hits = [len({n for n, _ in a} & {n for n, _ in e}) / max(1, len(e)) for a, e in zip(approximate, exact)]
+    return sum(hits) / len(hits)
+
+
+def run(size: int, args, rng: np.random.Generator) -> None:
+    print(f"\n{size:,} vectors x {args.dimensions} dims")
+    vectors = synthetic_vectors(size, args.dimensions, rng)
+    query_noise = 0.3 / math.sqrt(args.dimensions)
+    queries = normalize(vectors[rng.integers(0, size, args.queries)] + query_noise * rng.standard_normal(
+        (args.queries, args.dimensions), dtype=np.float32))
+
+    started = time.perf_counter()
+    index = VectorIndex(args.dimensions, args.directory)
+    for start in range(0, size, 10_000):
+        index.add_many([f"snippet-{i}" for i in range(start, min(size, start + 10_000))], vectors[start:start + 10_000])
+    build = time.perf_counter() - started
+    del vectors
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"  build: {build:.2f}s; matrix {index.vectors[:size].nbytes / 2**20:,.1f} MiB "
+          f"({index.nbytes / 2**20:,.1f} MiB with capacity), peak RSS {rss:,.0f} MiB")
+
+    samples, exact = timed(lambda q: index.search(q, args.k), queries, 1)
+    print(f"  exact, 1 query:        {percentiles(samples)}")
+    samples, _ = timed(lambda q: index.search(q, args.k), queries, args.batch)
+    per_query = sum(samples) / len(queries) * 1e3
+    print(f"  exact, {args.batch} per batch:   {percentiles(samples)}  ({per_query:.2f}ms per query)")
+
+    lists = args.lists or max(16, int(math.sqrt(size)))
+    started = time.perf_counter()
+    index.train(lists)
+    print(f"  IVF: {lists} partitions trained in {time.perf_counter() - started:.2f}s")
+    for probes in args.probes:
+        samples, approximate = timed(lambda q: index.search(q, args.k, probes), queries, 1)
+        found = recall(approximate, exact)
+        print(f"  IVF, {probes:3d} probes:        {percentiles(samples)}  recall@{args.k}={found:.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000", help="Comma-separated corpus sizes")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=0, help="IVF partitions (default sqrt(size))")
+    parser.add_argument("--probes", default="8,32", help="Comma-separated IVF probe counts")
+    parser.add_argument("--directory", default=None, help="Memory-map the matrix in this directory")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    args.probes = [int(p) for p in args.probes.split(",")]
+
+    rng = np.random.default_rng(args.seed)
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args, rng)
+
+
+if __name__ == "__main__":
+    main()
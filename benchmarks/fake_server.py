@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+MCP Server With Fake Backends
+
+Runs mcp_server:app on localhost with the in-memory storage stand-in (with
+optional injected latency) instead of Azure Blob Storage, so load tests and
+benchmarks need no cloud resources.
+
+Usage:
+    python benchmarks/fake_server.py [--port 8000] [--storage-latency-ms 5] [--snippets 1000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def configure_fake_backends(storage_latency_ms: float, storage_jitter_ms: float, snippets: int, snippet_bytes: int):
+    """Point mcp_server at a seeded in-memory storage backend"""
+    import mcp_server
+    from storage import FaultInjectingBackend, MemoryStorageBackend
+
+    memory = MemoryStorageBackend()
+    body = ("x" * snippet_bytes).encode()
+    for i in range(snippets):
+        memory.blobs[mcp_server.snippet_blob_name(f"snippet-{i}")] = body
+    faulty = FaultInjectingBackend(memory, latency=storage_latency_ms / 1000, jitter=storage_jitter_ms / 1000)
+    mcp_server.storage_backend = mcp_server.build_storage_backend(faulty)
+    return mcp_server.app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--storage-latency-ms", type=float, default=5.0)
+    parser.add_argument("--storage-jitter-ms", type=float, default=2.0)
+    parser.add_argument("--snippets", type=int, default=1000)
+    parser.add_argument("--snippet-bytes", type=int, default=2048)
+    parser.add_argument("--log-level", default="info", help="Application log level")
+    parser.add_argument("--sync-logging", action="store_true",
+                        help="Write log records on the event loop thread instead of through the queue")
+    parser.add_argument("--http-server", choices=["uvicorn", "hypercorn"], default="uvicorn",
+                        help="hypercorn also serves HTTP/2 (h2c with prior knowledge)")
+    args = parser.parse_args()
+
+    from serve import run
+
+    app = configure_fake_backends(args.storage_latency_ms, args.storage_jitter_ms, args.snippets, args.snippet_bytes)
+    logging.getLogger().setLevel(args.log_level.upper())
+    if args.sync_logging:
+        from structured_logging import ContextFilter, JsonFormatter
+
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(ContextFilter())
+        logging.getLogger().handlers[:] = [handler]
+    run(app, args.http_server, args.host, args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
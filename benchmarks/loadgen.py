@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+MCP Server Load Generator
+
+Drives an MCP server with an open-loop mix of SSE sessions and JSON-RPC
+traffic (initialize, tools/list, tools/call) at a fixed request rate and
+reports throughput and p50/p99/p999 latency histograms. Latency is measured
+from each request's scheduled start, so a slow server cannot hide queueing
+by slowing the generator down (no coordinated omission).
+
+Without --url a local server with fake backends (benchmarks/fake_server.py)
+is started on a free port for the duration of the run.
+
+Usage:
+    python benchmarks/loadgen.py --rate 200 --duration 30
+    python benchmarks/loadgen.py --mix "tools/list=1,call:get_snippet=4" --save-baseline main
+    python benchmarks/loadgen.py --compare main --tolerance 0.15
+
+Baselines are stored as JSON in benchmarks/baselines/.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+MESSAGE_PATH = "/runtime/webhooks/mcp/message"
+SSE_PATH = "/runtime/webhooks/mcp/sse"
+
+DEFAULT_MIX = "initialize=1,tools/list=2,call:hello_mcp=3,call:get_snippet=3,call:save_snippet=1"
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram with bounded relative error
+
+    Values are bucketed in microseconds with ``SUB_BUCKETS`` linear buckets
+    per power of two (about 3% relative error), so memory stays constant no
+    matter how many samples are recorded and histograms can be merged and
+    saved as baselines.
+    """
+
+    SUB_BUCKETS = 32
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.max_us = 0
+
+    def _index(self, micros: int) -> int:
+        if micros < self.SUB_BUCKETS:
+            return micros
+        exponent = micros.bit_length() - 6  # keep 5 bits of mantissa below the leading one
+        return (exponent + 1) * self.SUB_BUCKETS + ((micros >> exponent) - self.SUB_BUCKETS)
+
+    def _value(self, index: int) -> int:
+        if index < self.SUB_BUCKETS:
+            return index
+        exponent = index // self.SUB_BUCKETS - 1
+        mantissa = index % self.SUB_BUCKETS + self.SUB_BUCKETS
+        # Report the bucket midpoint
+        return (mantissa << exponent) + (1 << exponent) // 2
+
+    def record(self, seconds: float) -> None:
+        micros = max(0, int(seconds * 1e6))
+        index = self._index(micros)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.max_us = max(self.max_us, micros)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, q: float) -> float:
+        """Latency in milliseconds at quantile ``q``"""
+        if not self.total:
+            return 0.0
+        target = max(1, math.ceil(q * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def to_dict(self) -> dict:
+        return {"counts": {str(k): v for k, v in sorted(self.counts.items())}, "max_us": self.max_us}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = {int(k): v for k, v in data["counts"].items()}
+        histogram.total = sum(histogram.counts.values())
+        histogram.max_us = data["max_us"]
+        return histogram
+
+    def render(self, width: int = 40) -> List[str]:
+        """ASCII histogram grouped by power-of-two millisecond ranges"""
+        groups: Dict[int, int] = {}
+        for index, count in self.counts.items():
+            micros = max(1, self._value(index))
+            groups[int(math.log2(micros))] = groups.get(int(math.log2(micros)), 0) + count
+        if not groups:
+            return []
+        peak = max(groups.values())
+        lines = []
+        for power in range(min(groups), max(groups) + 1):
+            count = groups.get(power, 0)
+            bar = "#" * max(1 if count else 0, round(width * count / peak))
+            lines.append(f"  {2 ** power / 1000:>9.3f}ms+ {count:>8} {bar}")
+        return lines
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition("=")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def rpc_body(operation: str, request_id: int, rng: random.Random, snippets: int) -> dict:
+    if operation == "initialize":
+        return {"jsonrpc": "2.0", "id": request_id, "method": "initialize",
+                "params": {"protocolVersion": "2024-11-05", "capabilities": {},
+                           "clientInfo": {"name": "loadgen", "version": "1.0.0"}}}
+    if operation == "tools/list":
+        return {"jsonrpc": "2.0", "id": request_id, "method": "tools/list", "params": {}}
+    if operation.startswith("call:"):
+        tool = operation[len("call:"):]
+        arguments: dict = {}
+        if tool == "get_snippet":
+            arguments = {"snippetname": f"snippet-{rng.randrange(max(1, snippets))}"}
+        elif tool == "save_snippet":
+            arguments = {"snippetname": f"loadgen-{rng.randrange(1000)}", "snippet": "x" * 512}
+        elif tool in ("search_snippets", "list_snippets"):
+            arguments = {"prefix": "snippet-1", "limit": 20}
+        elif tool == "find_snippets":
+            arguments = {"query": "kubectl storage"}
+        return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+                "params": {"name": tool, "arguments": arguments}}
+    raise ValueError(f"Unknown operation: {operation}")
+
+
+class LoadGenerator:
+    def __init__(self, url: str, args):
+        self.url = url.rstrip("/")
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.session_ids: List[str] = []
+        self.sse_connect = LatencyHistogram()
+        self.sse_events = 0
+        self.sse_failures = 0
+
+    def _record(self, operation: str, latency: float, ok: bool) -> None:
+        self.histograms.setdefault(operation, LatencyHistogram()).record(latency)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    async def _hold_sse_session(self, http: aiohttp.ClientSession, stop: asyncio.Event) -> None:
+        started = time.perf_counter()
+        try:
+            async with http.get(self.url + SSE_PATH, headers={"Accept": "text/event-stream"}) as response:
+                first = True
+                async for line in response.content:
+                    if first and line.startswith(b"data:"):
+                        self.sse_connect.record(time.perf_counter() - started)
+                        endpoint = line[len(b"data:"):].strip().decode()
+                        if "sessionId=" in endpoint:
+                            self.session_ids.append(endpoint.split("sessionId=", 1)[1])
+                        first = False
+                    elif line.strip():
+                        self.sse_events += 1
+                    if stop.is_set():
+                        break
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.sse_failures += 1
+        except asyncio.CancelledError:
+            pass
+
+    async def _issue(self, http: aiohttp.ClientSession, operation: str, request_id: int,
+                     scheduled: float, measure: bool) -> None:
+        body = rpc_body(operation, request_id, self.rng, self.args.snippets)
+        url = self.url + MESSAGE_PATH
+        if self.session_ids:
+            url += f"?sessionId={self.rng.choice(self.session_ids)}"
+        ok = False
+        try:
+            async with http.post(url, json=body) as response:
+                payload = await response.read()
+                ok = response.status == 200 and b'"error"' not in payload[:200] and b'"isError":true' not in payload
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        if measure:
+            self._record(operation, time.perf_counter() - scheduled, ok)
+
+    async def run(self) -> dict:
+        args = self.args
+        mix = parse_mix(args.mix)
+        operations = [name for name, _ in mix]
+        weights = [weight for _, weight in mix]
+        connector = aiohttp.TCPConnector(limit=args.connections)
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+        stop = asyncio.Event()
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+            sse_connector = aiohttp.TCPConnector(limit=0)
+            async with aiohttp.ClientSession(connector=sse_connector, timeout=timeout) as sse_http:
+                holders = [
+                    asyncio.create_task(self._hold_sse_session(sse_http, stop)) for _ in range(args.sse_sessions)
+                ]
+                deadline = time.perf_counter() + 10
+                while len(self.session_ids) + self.sse_failures < args.sse_sessions and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.01)
+
+                total = int(args.rate * (args.warmup + args.duration))
+                warmup_requests = int(args.rate * args.warmup)
+                interval = 1.0 / args.rate
+                in_flight = set()
+                started = time.perf_counter()
+                for i in range(total):
+                    scheduled = started + i * interval
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    operation = self.rng.choices(operations, weights)[0]
+                    task = asyncio.create_task(self._issue(http, operation, i, scheduled, i >= warmup_requests))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                if in_flight:
+                    await asyncio.wait(in_flight, timeout=args.drain_timeout)
+                measured_seconds = time.perf_counter() - started - args.warmup
+
+                stop.set()
+                for holder in holders:
+                    holder.cancel()
+                await asyncio.gather(*holders, return_exceptions=True)
+
+        return self.summary(measured_seconds)
+
+    def summary(self, measured_seconds: float) -> dict:
+        overall = LatencyHistogram()
+        operations = {}
+        for operation, histogram in sorted(self.histograms.items()):
+            overall.merge(histogram)
+            operations[operation] = {
+                "count": histogram.total,
+                "errors": self.errors.get(operation, 0),
+                "p50_ms": histogram.percentile(0.50),
+                "p99_ms": histogram.percentile(0.99),
+                "p999_ms": histogram.percentile(0.999),
+                "histogram": histogram.to_dict(),
+            }
+        return {
+            "config": {k: v for k, v in vars(self.args).items() if k not in ("save_baseline", "compare", "url")},
+            "throughput_rps": overall.total / measured_seconds if measured_seconds > 0 else 0.0,
+            "errors": sum(self.errors.values()),
+            "overall": {
+                "count": overall.total,
+                "p50_ms": overall.percentile(0.50),
+                "p99_ms": overall.percentile(0.99),
+                "p999_ms": overall.percentile(0.999),
+                "histogram": overall.to_dict(),
+            },
+            "operations": operations,
+            "sse": {
+                "sessions": len(self.session_ids),
+                "failures": self.sse_failures,
+                "events": self.sse_events,
+                "connect_p50_ms": self.sse_connect.percentile(0.50),
+                "connect_p99_ms": self.sse_connect.percentile(0.99),
+            },
+        }
+
+
+def print_report(result: dict) -> None:
+    print(f"\nthroughput: {result['throughput_rps']:.1f} req/s   errors: {result['errors']}")
+    print(f"{'operation':<24}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'p999 ms':>10}")
+    rows = list(result["operations"].items()) + [("overall", result["overall"])]
+    for name, stats in rows:
+        print(f"{name:<24}{stats['count']:>8}{stats.get('errors', result['errors']):>8}"
+              f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['p999_ms']:>10.2f}")
+    sse = result["sse"]
+    if sse["sessions"] or sse["failures"]:
+        print(f"sse: {sse['sessions']} sessions ({sse['failures']} failed), connect p50 {sse['connect_p50_ms']:.2f}ms "
+              f"p99 {sse['connect_p99_ms']:.2f}ms, {sse['events']} events")
+    print("\noverall latency histogram:")
+    for line in LatencyHistogram.from_dict(result["overall"]["histogram"]).render():
+        print(line)
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Print deltas against a baseline and return the regressions found"""
+    regressions = []
+    print(f"\n{'metric':<36}{'baseline':>12}{'current':>12}{'delta':>10}")
+
+    def row(label: str, old: float, new: float, higher_is_worse: bool = True) -> None:
+        delta = (new - old) / old if old else 0.0
+        worse = delta > tolerance if higher_is_worse else delta < -tolerance
+        flag = "  REGRESSION" if worse else ""
+        print(f"{label:<36}{old:>12.2f}{new:>12.2f}{delta:>+10.1%}{flag}")
+        if worse:
+            regressions.append(label)
+
+    row("throughput_rps", baseline["throughput_rps"], result["throughput_rps"], higher_is_worse=False)
+    for name in sorted(set(baseline["operations"]) & set(result["operations"])) + ["overall"]:
+        old = baseline["overall"] if name == "overall" else baseline["operations"][name]
+        new = result["overall"] if name == "overall" else result["operations"][name]
+        for metric in ("p50_ms", "p99_ms", "p999_ms"):
+            row(f"{name} {metric}", old[metric], new[metric])
+    return regressions
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_server(args, stderr=None) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    command = [
+        sys.executable, os.path.join(BENCHMARKS_DIR, "fake_server.py"),
+        "--port", str(port),
+        "--storage-latency-ms", str(args.storage_latency_ms),
+        "--snippets", str(args.snippets),
+        "--log-level", args.server_log_level,
+    ] + args.server_arg
+    process = subprocess.Popen(command, stderr=stderr)
+    url = f"http://127.0.0.1:{port}"
+    wait_for_server(url, process)
+    return process, url
+
+
+def wait_for_server(url: str, process: Optional[subprocess.Popen] = None, timeout: float = 20.0) -> None:
+    import urllib.request
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("Fake server exited during startup")
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not become healthy")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target server; a local fake-backend server is started when omitted")
+    parser.add_argument("--rate", type=float, default=100.0, help="Requests per second (open loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted operations, e.g. tools/list=1,call:hello_mcp=3")
+    parser.add_argument("--sse-sessions", type=int, default=10, help="Concurrent SSE sessions held open")
+    parser.add_argument("--connections", type=int, default=100, help="Client connection pool size")
+    parser.add_argument("--snippets", type=int, default=1000, help="Seeded snippet count for get_snippet")
+    parser.add_argument("--storage-latency-ms", type=float, default=5.0, help="Fake storage latency")
+    parser.add_argument("--server-log-level", default="info")
+    parser.add_argument("--server-arg", action="append", default=[], help="Extra fake_server.py argument")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the full JSON result to this path")
+    parser.add_argument("--save-baseline", metavar="NAME", help="Save the result as a named baseline")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against a named baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    return parser
+
+
+async def run_load(args) -> dict:
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_fake_server(args)
+    try:
+        return await LoadGenerator(url, args).run()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    result = asyncio.run(run_load(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved baseline to {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
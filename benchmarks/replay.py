@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Captured Traffic Replay
+
+Drives an MCP server with traffic recorded by TRAFFIC_CAPTURE_PATH (see
+src/traffic_capture.py): every captured SSE session is opened, resumed and
+closed at its recorded time, and every message endpoint request is sent at
+its recorded arrival time on its session, at --speed times the original
+pace. Arrivals are open loop and latency is measured from each request's
+scheduled time, so inter-arrival times and session concurrency follow the
+capture however the server copes. Reports latency per operation next to
+what was captured, or against an earlier replay with --compare.
+
+Snippets the capture reads before saving are saved first, so redacted
+names hit the same way they did in production.
+
+Without --url a local server with fake backends (benchmarks/fake_server.py)
+is started on a free port for the duration of the run.
+
+Usage:
+    python benchmarks/replay.py capture.ndjson.gz [--speed 4] [--output before.json]
+    python benchmarks/replay.py capture.ndjson.gz --speed 4 --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadgen import MESSAGE_PATH, SSE_PATH, LatencyHistogram, compare, start_fake_server  # noqa: E402
+
+from traffic_capture import read_capture  # noqa: E402
+
+# Seeding goes through save_snippets, which takes at most this many items per call (BULK_SNIPPET_MAX_ITEMS)
+SEED_BATCH = 100
+
+
+def operation_name(body: Any) -> str:
+    """Operation names as loadgen.py uses them: the method, or call:<tool> for tools/call"""
+    if isinstance(body, list):
+        return "batch"
+    if not isinstance(body, dict):
+        return "invalid"
+    method = str(body.get("method"))
+    if method == "tools/call" and isinstance(body.get("params"), dict):
+        return f"call:{body['params'].get('name')}"
+    return method
+
+
+def snippet_reads_and_saves(body: Any):
+    """Snippet names a message reads and saves"""
+    reads, saves = [], []
+    for message in body if isinstance(body, list) else [body]:
+        params = message.get("params") if isinstance(message, dict) else None
+        if not isinstance(params, dict):
+            continue
+        arguments = params.get("arguments") if isinstance(params.get("arguments"), dict) else {}
+        tool = params.get("name") if message.get("method") == "tools/call" else None
+        if tool in ("get_snippet", "similar_snippets") and arguments.get("snippetname"):
+            reads.append(arguments["snippetname"])
+        elif tool == "get_snippets":
+            reads.extend(name for name in arguments.get("snippetnames") or [] if isinstance(name, str))
+        elif tool == "save_snippet" and arguments.get("snippetname"):
+            saves.append(arguments["snippetname"])
+        elif tool == "save_snippets":
+            saves.extend(item.get("snippetname") for item in arguments.get("snippets") or [] if isinstance(item, dict))
+        elif message.get("method") == "resources/read" and str(params.get("uri", "")).startswith("snippet://"):
+            reads.append(params["uri"][len("snippet://"):])
+    return reads, saves
+
+
+def names_to_seed(records: List[Dict[str, Any]]) -> List[str]:
+    """Snippets read before the capture saves them, which must have existed already"""
+    saved, seed = set(), {}
+    for record in records:
+        if record["e"] != "rpc":
+            continue
+        reads, saves = snippet_reads_and_saves(record["b"])
+        for name in reads:
+            if name not in saved:
+                seed.setdefault(name, None)
+        saved.update(saves)
+    return list(seed)
+
+
+def peak_concurrency(records: List[Dict[str, Any]]) -> int:
+    """Most SSE streams open at once in the capture"""
+    open_streams, peak = 0, 0
+    for record in records:
+        if record.get("x", "sse") != "sse":
+            continue
+        if record["e"] == "open":
+            open_streams += 1
+            peak = max(peak, open_streams)
+        elif record["e"] == "close":
+            open_streams = max(0, open_streams - 1)
+    return peak
+
+
+class Replayer:
+    def __init__(self, url: str, records: List[Dict[str, Any]], speed: float):
+        self.url = url.rstrip("/")
+        self.records = sorted(records, key=lambda record: record["t"])
+        first = self.records[0]["t"] if self.records else 0
+        for record in self.records:
+            record["t"] -= first
+        self.speed = speed
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.open_streams = 0
+        self.peak_streams = 0
+        self.stream_failures = 0
+
+    async def open_stream(self, http: aiohttp.ClientSession, state: dict, opened: asyncio.Future) -> None:
+        headers = {"Accept": "text/event-stream"}
+        if state.get("last_event_id"):
+            headers["Last-Event-ID"] = state["last_event_id"]
+        counted = False
+        try:
+            async with http.get(self.url + SSE_PATH, headers=headers) as response:
+                if response.status != 200:
+                    raise aiohttp.ClientResponseError(response.request_info, (), status=response.status)
+                self.open_streams += 1
+                self.peak_streams = max(self.peak_streams, self.open_streams)
+                counted = True
+                async for line in response.content:
+                    if line.startswith(b"id:"):
+                        state["last_event_id"] = line[len(b"id:"):].strip().decode()
+                    elif line.startswith(b"data:") and b"sessionId=" in line and not opened.done():
+                        state["endpoint"] = line[len(b"data:"):].strip().decode().split("?", 1)[1]
+                        opened.set_result(True)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stream_failures += 1
+            if not opened.done():
+                opened.set_exception(e)
+        finally:
+            if counted:
+                self.open_streams -= 1
+            if not opened.done():
+                opened.set_exception(ConnectionError("SSE stream ended before its endpoint event"))
+
+    async def issue(self, http: aiohttp.ClientSession, record: dict, scheduled: float, state: dict) -> None:
+        operation = operation_name(record["b"])
+        ok = False
+        try:
+            await state["opened"]
+            async with http.post(f"{self.url}{MESSAGE_PATH}?{state['endpoint']}", json=record["b"]) as response:
+                await response.read()
+                ok = response.status < 400 or record.get("st", 200) >= 400
+        except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError):
+            pass
+        self.histograms.setdefault(operation, LatencyHistogram()).record(time.perf_counter() - scheduled)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    async def replay_session(self, http: aiohttp.ClientSession, records: List[dict], origin: float) -> None:
+        state: dict = {}
+        stream: Optional[asyncio.Task] = None
+        calls = []
+
+        def start_stream() -> asyncio.Task:
+            state["opened"] = asyncio.get_running_loop().create_future()
+            # Requests to a session whose stream failed to open are counted as errors, not left waiting
+            state["opened"].add_done_callback(lambda future: future.exception())
+            return asyncio.create_task(self.open_stream(http, state, state["opened"]))
+
+        try:
+            for record in records:
+                scheduled = origin + record["t"] / 1e6 / self.speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if record["e"] == "open":
+                    if stream is not None and not stream.done():
+                        continue
+                    stream = start_stream()
+                elif record["e"] == "close":
+                    if stream is not None:
+                        stream.cancel()
+                        await asyncio.gather(stream, return_exceptions=True)
+                elif record["e"] == "rpc":
+                    # Sessions already open when the capture started get a stream at their first request
+                    if stream is None:
+                        stream = start_stream()
+                    calls.append(asyncio.create_task(self.issue(http, record, scheduled, state)))
+            await asyncio.gather(*calls)
+        finally:
+            if stream is not None:
+                stream.cancel()
+                await asyncio.gather(stream, return_exceptions=True)
+
+    async def seed(self, http: aiohttp.ClientSession, names: List[str], snippet_bytes: int) -> None:
+        state: dict = {}
+        opened = asyncio.get_running_loop().create_future()
+        stream = asyncio.create_task(self.open_stream(http, state, opened))
+        try:
+            await opened
+            for start in range(0, len(names), SEED_BATCH):
+                batch = names[start:start + SEED_BATCH]
+                items = [{"snippetname": name, "snippet": "x" * snippet_bytes} for name in batch]
+                body = {"jsonrpc": "2.0", "id": start, "method": "tools/call",
+                        "params": {"name": "save_snippets", "arguments": {"snippets": items}}}
+                async with http.post(f"{self.url}{MESSAGE_PATH}?{state['endpoint']}", json=body) as response:
+                    response.raise_for_status()
+        finally:
+            stream.cancel()
+            await asyncio.gather(stream, return_exceptions=True)
+
+    async def run(self, seed_bytes: int = 2048, lead_in: float = 0.5) -> float:
+        sessions: Dict[str, List[dict]] = {}
+        for record in self.records:
+            if record["e"] in ("open", "close") and record.get("x", "sse") != "sse":
+                continue
+            sessions.setdefault(record.get("s", ""), []).append(record)
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=None)
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), timeout=timeout) as http:
+            names = names_to_seed(self.records) if seed_bytes else []
+            if names:
+                await self.seed(http, names, seed_bytes)
+            origin = time.perf_counter() + lead_in
+            await asyncio.gather(*(self.replay_session(http, records, origin) for records in sessions.values()))
+            return time.perf_counter() - origin
+
+    def summary(self, seconds: float) -> dict:
+        captured: Dict[str, LatencyHistogram] = {}
+        for record in self.records:
+            if record["e"] == "rpc":
+                captured.setdefault(operation_name(record["b"]), LatencyHistogram()).record(record["us"] / 1e6)
+        overall, captured_overall = LatencyHistogram(), LatencyHistogram()
+        operations = {}
+        for operation, histogram in sorted(self.histograms.items()):
+            overall.merge(histogram)
+            original = captured.get(operation, LatencyHistogram())
+            captured_overall.merge(original)
+            operations[operation] = {
+                **stats(histogram),
+                "errors": self.errors.get(operation, 0),
+                "captured": stats(original),
+            }
+        captured_seconds = self.records[-1]["t"] / 1e6 if self.records else 0.0
+        return {
+            "speed": self.speed,
+            "seconds": seconds,
+            "captured_seconds": captured_seconds,
+            "throughput_rps": overall.total / seconds if seconds > 0 else 0.0,
+            "errors": sum(self.errors.values()),
+            "overall": {**stats(overall), "captured": stats(captured_overall)},
+            "operations": operations,
+            "sessions": {
+                "captured_peak": peak_concurrency(self.records),
+                "replayed_peak": self.peak_streams,
+                "failures": self.stream_failures,
+            },
+        }
+
+
+def stats(histogram: LatencyHistogram) -> dict:
+    return {
+        "count": histogram.total,
+        "p50_ms": histogram.percentile(0.50),
+        "p99_ms": histogram.percentile(0.99),
+        "p999_ms": histogram.percentile(0.999),
+        "histogram": histogram.to_dict(),
+    }
+
+
+def print_report(result: dict) -> None:
+    sessions = result["sessions"]
+    print(f"\nreplayed {result['captured_seconds']:.1f}s of capture at {result['speed']:g}x "
+          f"in {result['seconds']:.1f}s, {result['throughput_rps']:.1f} req/s, {result['errors']} errors")
+    print(f"peak SSE sessions: {sessions['captured_peak']} captured, {sessions['replayed_peak']} replayed "
+          f"({sessions['failures']} failed)")
+    print("\nlatency (captured: server time to respond; replay: client time from scheduled send)")
+    print(f"{'operation':<24}{'count':>7}{'errors':>7}{'p50 cap':>10}{'p50 now':>10}{'delta':>9}"
+          f"{'p99 cap':>10}{'p99 now':>10}{'delta':>9}")
+    rows = list(result["operations"].items()) + [("overall", {**result["overall"], "errors": result["errors"]})]
+    for name, row in rows:
+        was = row["captured"]
+        print(f"{name:<24}{row['count']:>7}{row['errors']:>7}"
+              f"{was['p50_ms']:>10.2f}{row['p50_ms']:>10.2f}{row['p50_ms'] - was['p50_ms']:>+9.2f}"
+              f"{was['p99_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['p99_ms'] - was['p99_ms']:>+9.2f}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="Capture file written by TRAFFIC_CAPTURE_PATH (.gz is decompressed)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay this many times faster than captured")
+    parser.add_argument("--url", help="Target server; a local fake-backend server is started when omitted")
+    parser.add_argument("--seed-bytes", type=int, default=2048,
+                        help="Size of snippets saved for reads the capture makes before any save; 0 skips seeding")
+    parser.add_argument("--snippets", type=int, default=0, help="Seeded snippet count on the fake server")
+    parser.add_argument("--storage-latency-ms", type=float, default=5.0, help="Fake storage latency")
+    parser.add_argument("--server-log-level", default="warning")
+    parser.add_argument("--server-arg", action="append", default=[], help="Extra fake_server.py argument")
+    parser.add_argument("--output", help="Write the full JSON result to this path")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against the --output of an earlier replay")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    return parser
+
+
+async def run_replay(args) -> dict:
+    _, records = read_capture(args.capture)
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_fake_server(args)
+    try:
+        replayer = Replayer(url, records, args.speed)
+        seconds = await replayer.run(args.seed_bytes)
+        return replayer.summary(seconds)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    result = asyncio.run(run_replay(args))
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
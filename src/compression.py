@@ -0,0 +1,217 @@
+"""
+HTTP response compression
+ASGI middleware negotiating zstd/br/gzip with per-event flushing for SSE
+"""
+
+import asyncio
+import logging
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # br is offered only when the brotli package is installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is offered only when the zstandard package is installed
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+# Complete bodies above this size are compressed in a worker thread
+OFFLOAD_BYTES = 64 * 1024
+
+
+def available_encodings() -> List[str]:
+    """Supported encodings in server preference order"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """Pick the preferred supported encoding the client accepts (q > 0)"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    best = None
+    for encoding in supported:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+class StreamCompressor:
+    """Incremental compressor that can flush after every chunk"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        if self.encoding == "gzip":
+            out = self._compressor.compress(data)
+            return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._compressor.flush(zlib.Z_FINISH)
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def compress_body(data: bytes, encoding: str, level: int) -> bytes:
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data, flush=False) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compress responses according to the request's Accept-Encoding
+
+    Complete bodies are compressed when at least ``minimum_size`` bytes.
+    Streaming responses (SSE) are compressed incrementally and flushed after
+    every chunk so each event reaches the client immediately; set
+    ``compress_streams=False`` for intermediaries that mishandle that.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        compress_streams: bool = True,
+        levels: Optional[Dict[str, int]] = None,
+        encodings: Optional[List[str]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compress_streams = compress_streams
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.encodings = encodings or available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept, self.encodings) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(self, encoding, send))
+
+
+class _CompressingSend:
+    """Per-response send wrapper deciding whether and how to compress"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    @staticmethod
+    def _eligible(start: dict) -> bool:
+        status = start["status"]
+        if status < 200 or status in (204, 304):
+            return False
+        content_type = ""
+        for name, value in start["headers"]:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES) or "event-stream" in content_type
+
+    def _compressed_headers(self, start: dict, content_length: Optional[int]) -> list:
+        headers = [(name, value) for name, value in start["headers"] if name not in (b"content-length", b"vary")]
+        vary = [value for name, value in start["headers"] if name == b"vary"]
+        vary.append(b"Accept-Encoding")
+        headers.append((b"vary", b", ".join(vary)))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return headers
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        level = self.middleware.levels[self.encoding]
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not self._eligible(start):
+                self.passthrough = True
+            elif not more_body:
+                if len(body) < self.middleware.minimum_size:
+                    self.passthrough = True
+                else:
+                    if len(body) > OFFLOAD_BYTES:
+                        compressed = await asyncio.to_thread(compress_body, body, self.encoding, level)
+                    else:
+                        compressed = compress_body(body, self.encoding, level)
+                    await self.send({**start, "headers": self._compressed_headers(start, len(compressed))})
+                    await self.send({"type": "http.response.body", "body": compressed, "more_body": False})
+                    return
+            elif not self.middleware.compress_streams:
+                self.passthrough = True
+            else:
+                self.compressor = StreamCompressor(self.encoding, level)
+                await self.send({**start, "headers": self._compressed_headers(start, None)})
+            if self.passthrough:
+                await self.send(start)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        data = self.compressor.compress(body, flush=True) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -0,0 +1,270 @@
+"""
+Full-text snippet content index
+Inverted index with BM25 ranking, compact posting lists and binary snapshots
+"""
+
+import json
+import logging
+import math
+import re
+import struct
+import sys
+import zlib
+from array import array
+from collections import Counter
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"MCPFTS1\n"
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]{2,64}")
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens, breaking camelCase identifiers"""
+    return TOKEN_PATTERN.findall(CAMEL_BOUNDARY.sub(" ", text).lower())
+
+
+class Postings:
+    """Posting list for one term: ascending doc ids with term frequencies"""
+
+    __slots__ = ("doc_ids", "freqs")
+
+    def __init__(self):
+        self.doc_ids = array("I")
+        self.freqs = array("I")
+
+
+class SnippetContentIndex:
+    """Inverted index over snippet contents
+
+    Doc ids only ever grow, so appending keeps every posting list sorted.
+    Re-saving a snippet tombstones its previous doc id instead of rewriting
+    the posting lists; tombstones are dropped by ``compact()``, which runs
+    automatically once they make up a quarter of all doc ids.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Postings] = {}
+        self.doc_names: List[Optional[str]] = []
+        self.doc_lengths = array("I")
+        self.doc_ids: Dict[str, int] = {}
+        self.total_length = 0
+        self.dead = array("I")
+        self.loaded = False
+        self.dirty = False
+        # When the snapshot this index was loaded from (or last written to) was taken
+        self.written_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.doc_ids
+
+    def _tombstone(self, name: str) -> None:
+        doc_id = self.doc_ids.pop(name, None)
+        if doc_id is None:
+            return
+        self.doc_names[doc_id] = None
+        self.total_length -= self.doc_lengths[doc_id]
+        self.dead.append(doc_id)
+
+    @property
+    def tombstones(self) -> int:
+        return len(self.dead)
+
+    def add(self, name: str, text: str) -> None:
+        """Index (or re-index) a snippet's content"""
+        self._tombstone(name)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+
+        doc_id = len(self.doc_names)
+        self.doc_names.append(name)
+        self.doc_lengths.append(len(tokens))
+        self.doc_ids[name] = doc_id
+        self.total_length += len(tokens)
+        for token, count in counts.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = Postings()
+            postings.doc_ids.append(doc_id)
+            postings.freqs.append(count)
+        self.dirty = True
+
+        if self.tombstones > 1024 and self.tombstones * 4 > len(self.doc_names):
+            self.compact()
+
+    def remove(self, name: str) -> None:
+        if name in self.doc_ids:
+            self._tombstone(name)
+            self.dirty = True
+
+    def compact(self) -> None:
+        """Drop tombstoned doc ids and renumber the live documents densely"""
+        remap = array("i", [-1]) * len(self.doc_names)
+        names: List[Optional[str]] = []
+        lengths = array("I")
+        for old_id, name in enumerate(self.doc_names):
+            if name is not None:
+                remap[old_id] = len(names)
+                names.append(name)
+                lengths.append(self.doc_lengths[old_id])
+
+        postings: Dict[str, Postings] = {}
+        for term, old in self.postings.items():
+            new = Postings()
+            for doc_id, freq in zip(old.doc_ids, old.freqs):
+                mapped = remap[doc_id]
+                if mapped >= 0:
+                    new.doc_ids.append(mapped)
+                    new.freqs.append(freq)
+            if new.doc_ids:
+                postings[term] = new
+
+        self.postings = postings
+        self.doc_names = names
+        self.doc_lengths = lengths
+        self.doc_ids = {name: doc_id for doc_id, name in enumerate(names)}
+        self.dead = array("I")
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Return the top ``limit`` (name, BM25 score) pairs for a query
+
+        Posting lists are scored as NumPy views over the compact arrays, so a
+        term that appears in every snippet costs one vectorized pass.
+        """
+        live = len(self.doc_ids)
+        if not live:
+            return []
+        avg_length = self.total_length / live or 1.0
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+        scores = np.zeros(len(self.doc_names), dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            doc_ids = np.frombuffer(postings.doc_ids, dtype=np.uint32)
+            freqs = np.frombuffer(postings.freqs, dtype=np.uint32).astype(np.float32)
+            # Tombstones inflate document frequency slightly until the next compaction
+            df = min(len(doc_ids), live)
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[doc_ids] / avg_length)
+            # A document occurs at most once per posting list, so fancy-index add is safe
+            scores[doc_ids] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+        if self.dead:
+            scores[np.frombuffer(self.dead, dtype=np.uint32)] = 0.0
+
+        candidates = int(np.count_nonzero(scores))
+        if not candidates:
+            return []
+        k = min(limit, candidates)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.doc_names[doc_id], float(scores[doc_id])) for doc_id in top.tolist()]
+
+    def snapshot_body(self) -> bytes:
+        """Serialize the index uncompressed; pair with ``compress_snapshot``
+
+        Posting doc ids are delta-encoded per term so the compressor sees
+        mostly tiny integers.
+        """
+        if self.tombstones:
+            self.compact()
+        terms = list(self.postings)
+        offsets = array("I", [0])
+        doc_ids = array("I")
+        freqs = array("I")
+        for term in terms:
+            postings = self.postings[term]
+            doc_ids.extend(postings.doc_ids)
+            freqs.extend(postings.freqs)
+            offsets.append(len(doc_ids))
+
+        # Compaction leaves no empty posting lists, so every term start is in range
+        absolute = np.frombuffer(doc_ids, dtype=np.uint32)
+        deltas = absolute.copy()
+        deltas[1:] -= absolute[:-1]
+        starts = np.frombuffer(offsets, dtype=np.uint32)[:-1]
+        deltas[starts] = absolute[starts]
+
+        header = json.dumps({
+            "byteorder": sys.byteorder,
+            "k1": self.k1,
+            "b": self.b,
+            "names": self.doc_names,
+            "terms": terms,
+            "written_at": self.written_at,
+        }).encode("utf-8")
+        sections = [header, self.doc_lengths.tobytes(), offsets.tobytes(), deltas.tobytes(), freqs.tobytes()]
+        return b"".join(struct.pack("<Q", len(section)) + section for section in sections)
+
+    def to_snapshot(self) -> bytes:
+        """Serialize the index into a compressed binary snapshot"""
+        return compress_snapshot(self.snapshot_body())
+
+    @classmethod
+    def from_snapshot(cls, data: bytes) -> "SnippetContentIndex":
+        """Rebuild an index from ``to_snapshot`` output"""
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise ValueError("Not a content index snapshot")
+        body = memoryview(zlib.decompress(data[len(SNAPSHOT_MAGIC):]))
+        sections = []
+        position = 0
+        while position < len(body):
+            (length,) = struct.unpack_from("<Q", body, position)
+            position += 8
+            sections.append(body[position:position + length])
+            position += length
+        header_bytes, length_bytes, offset_bytes, doc_id_bytes, freq_bytes = sections
+        header = json.loads(bytes(header_bytes))
+
+        def load(raw) -> array:
+            values = array("I")
+            values.frombytes(raw)
+            if header["byteorder"] != sys.byteorder:
+                values.byteswap()
+            return values
+
+        index = cls(k1=header["k1"], b=header["b"])
+        index.doc_names = header["names"]
+        index.written_at = header.get("written_at")
+        index.doc_lengths = load(length_bytes)
+        index.doc_ids = {name: doc_id for doc_id, name in enumerate(index.doc_names) if name is not None}
+        index.dead = array("I", (doc_id for doc_id, name in enumerate(index.doc_names) if name is None))
+        index.total_length = sum(index.doc_lengths)
+        offsets, doc_ids, freqs = load(offset_bytes), load(doc_id_bytes), load(freq_bytes)
+        if doc_ids:
+            # Undo the per-term delta encoding: a running sum restarted at each term
+            running = np.cumsum(np.frombuffer(doc_ids, dtype=np.uint32), dtype=np.int64)
+            bounds = np.frombuffer(offsets, dtype=np.uint32).astype(np.int64)
+            before = np.concatenate(([0], running))[bounds[:-1]]
+            running -= np.repeat(before, np.diff(bounds))
+            doc_ids = array("I", running.astype(np.uint32).tobytes())
+        for position, term in enumerate(header["terms"]):
+            postings = Postings()
+            start, end = offsets[position], offsets[position + 1]
+            postings.doc_ids = doc_ids[start:end]
+            postings.freqs = freqs[start:end]
+            index.postings[term] = postings
+        index.loaded = True
+        return index
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        """Names that are not yet indexed"""
+        return [name for name in names if name not in self.doc_ids]
+
+    def absent(self, names: Container[str]) -> List[str]:
+        """Indexed names that are not in ``names``, i.e. snippets deleted since they were indexed"""
+        return [name for name in self.doc_ids if name not in names]
+
+
+def compress_snapshot(body: bytes) -> bytes:
+    """Compress a ``snapshot_body``; safe to run in a worker thread"""
+    return SNAPSHOT_MAGIC + zlib.compress(body, 6)
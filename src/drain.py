@@ -0,0 +1,79 @@
+"""
+Graceful drain
+Tracks in-flight work and coordinates taking a replica out of rotation
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DrainController:
+    """Drain state plus a count of in-flight calls
+
+    Once draining, the replica reports not ready, refuses new sessions and
+    waits for ``in_flight`` to reach zero (bounded by a deadline) before
+    closing streams. Retry hints are jittered so that disconnected clients
+    do not all reconnect to the surviving replicas at the same moment.
+    """
+
+    def __init__(
+        self,
+        retry_min_seconds: float = 1.0,
+        retry_max_seconds: float = 5.0,
+        rng: Optional[random.Random] = None,
+    ):
+        self.retry_min_seconds = retry_min_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.rng = rng or random.Random()
+        self.draining = False
+        self.drained = False
+        self.started_at: Optional[float] = None
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def begin(self) -> bool:
+        """Enter drain mode; False if already draining"""
+        if self.draining:
+            return False
+        self.draining = True
+        self.started_at = time.monotonic()
+        return True
+
+    @contextmanager
+    def track(self):
+        """Count a call as in flight for its duration"""
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Wait for in-flight calls to finish; False if the deadline passed first"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def retry_after(self) -> float:
+        """Jittered reconnect delay in seconds"""
+        return self.rng.uniform(self.retry_min_seconds, self.retry_max_seconds)
+
+    def status(self) -> dict:
+        return {
+            "draining": self.draining,
+            "drained": self.drained,
+            "in_flight": self.in_flight,
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 3) if self.started_at else None,
+        }
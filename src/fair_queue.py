@@ -0,0 +1,260 @@
+"""
+Weighted fair queueing
+Admits tool calls to a fixed number of slots in weighted fair order across clients, with per-client rate limits
+"""
+
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loop_monitor import LagHistogram
+
+ANONYMOUS = "anonymous"
+
+# Client identities end up in metric labels and logs, so they are restricted to a safe alphabet
+UNSAFE_IDENTITY_CHARS = re.compile(r"[^A-Za-z0-9_.:@/-]")
+
+# Identity bound by the HTTP endpoint (token claim or forwarded header) for the request being dispatched
+request_client: ContextVar[Optional[str]] = ContextVar("request_client", default=None)
+
+
+class RateLimitedError(Exception):
+    """A call refused because its client is over its rate limit or has too many calls queued"""
+
+    def __init__(self, client: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for client {client!r}, retry after {retry_after:.1f}s")
+        self.client = client
+        self.retry_after = retry_after
+
+
+def parse_client_values(spec: str) -> Dict[str, float]:
+    """Parse 'batch-agents=0.25,portal=4' into client -> number (weights or rates)"""
+    values = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        try:
+            values[name.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid client value: {part!r}") from None
+        if values[name.strip()] <= 0:
+            raise ValueError(f"Client values must be positive: {part!r}")
+    return values
+
+
+def safe_identity(value: Any) -> str:
+    """``value`` made safe to use as a metrics label"""
+    return UNSAFE_IDENTITY_CHARS.sub("_", str(value))[:64]
+
+
+def client_identity(claims: Optional[Dict[str, Any]], claim: str, forwarded: Optional[str]) -> Optional[str]:
+    """The caller's identity: a validated token claim, else the gateway-forwarded header"""
+    for candidate in ((claims or {}).get(claim), forwarded):
+        if candidate:
+            return safe_identity(candidate)
+    return None
+
+
+class TokenBucket:
+    """``rate`` calls per second on average, with up to ``burst`` at once"""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float]):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def take(self) -> float:
+        """Take a token; returns 0, or the seconds until one is available (nothing taken)"""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class ClientState:
+    """Scheduling state and counters of one client"""
+
+    def __init__(self, weight: float, bucket: Optional[TokenBucket]):
+        self.weight = weight
+        self.bucket = bucket
+        # Virtual finish tag of the client's most recent call
+        self.finish = 0.0
+        self.queued = 0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queue_seconds = 0.0
+        self.latency = LagHistogram()
+        self.last_seen = 0.0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "queued": self.queued,
+            "running": self.running,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_seconds": round(self.queue_seconds, 6),
+            "latency_p99_ms": round(self.latency.percentile(0.99) * 1000, 3),
+        }
+
+
+class FairQueue:
+    """Start-time fair queueing of tool calls across clients
+
+    At most ``concurrency`` calls run at once. Beyond that, calls wait and a
+    freed slot goes to the waiting call with the smallest virtual start tag.
+    Each call advances its client's tag by 1/weight, so under contention a
+    client with weight 2 is admitted twice as often as one with weight 1 no
+    matter how many calls either has queued, and a client that was idle
+    starts at the current virtual time rather than with banked credit. Calls
+    beyond a client's token bucket or its ``max_queued`` waiting calls are
+    refused with RateLimitedError rather than queued.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 64,
+        weights: Optional[Dict[str, float]] = None,
+        default_weight: float = 1.0,
+        rates: Optional[Dict[str, float]] = None,
+        default_rate: float = 0.0,
+        burst: float = 0.0,
+        max_queued: int = 1000,
+        idle_seconds: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.concurrency = concurrency
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.rates = rates or {}
+        self.default_rate = default_rate
+        self.burst = burst
+        self.max_queued = max_queued
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self.clients: Dict[str, ClientState] = {}
+        self.running = 0
+        self.queued = 0
+        self.virtual_time = 0.0
+        self._waiting: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pruned = clock()
+
+    def _client(self, name: str) -> ClientState:
+        now = self.clock()
+        state = self.clients.get(name)
+        if state is None:
+            if now - self._pruned >= self.idle_seconds:
+                self._prune(now)
+            rate = self.rates.get(name, self.default_rate)
+            bucket = TokenBucket(rate, self.burst or rate, self.clock) if rate > 0 else None
+            state = self.clients[name] = ClientState(self.weights.get(name, self.default_weight), bucket)
+        state.last_seen = now
+        return state
+
+    def _prune(self, now: float) -> None:
+        """Forget idle clients; they would restart at the current virtual time with a full bucket anyway"""
+        self._pruned = now
+        for name in [name for name, state in self.clients.items()
+                     if not state.queued and not state.running and now - state.last_seen >= self.idle_seconds]:
+            del self.clients[name]
+
+    def _dispatch(self) -> None:
+        while self.running < self.concurrency and self._waiting:
+            start, _, future = heapq.heappop(self._waiting)
+            # Calls cancelled while waiting are left in the heap and skipped here
+            if future.done():
+                continue
+            self.running += 1
+            self.virtual_time = max(self.virtual_time, start)
+            future.set_result(None)
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client: str):
+        """Hold one of the slots for the duration of a tool call"""
+        state = self._client(client)
+        if state.queued >= self.max_queued:
+            state.rejected += 1
+            raise RateLimitedError(client, 1.0 / state.bucket.rate if state.bucket else 1.0)
+        if state.bucket is not None:
+            retry_after = state.bucket.take()
+            if retry_after:
+                state.rejected += 1
+                raise RateLimitedError(client, retry_after)
+
+        start = max(self.virtual_time, state.finish)
+        state.finish = start + 1.0 / state.weight
+        arrived = self.clock()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (start, next(self._sequence), future))
+        self._dispatch()
+        if not future.done():
+            state.queued += 1
+            self.queued += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                # Granted just as the caller went away: hand the slot on
+                if future.done() and not future.cancelled():
+                    self._release()
+                future.cancel()
+                raise
+            finally:
+                state.queued -= 1
+                self.queued -= 1
+
+        state.queue_seconds += self.clock() - arrived
+        state.admitted += 1
+        state.running += 1
+        try:
+            yield
+        finally:
+            state.running -= 1
+            state.latency.record(self.clock() - arrived)
+            self._release()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "queued": self.queued,
+            "clients": {name: state.status() for name, state in self.clients.items()},
+        }
+
+    def prometheus(self, prefix: str = "mcp_fair_queue") -> str:
+        """Per-client metrics in Prometheus text exposition format"""
+        series = [
+            ("queued", "gauge", "Calls waiting for a slot", lambda s: s.queued),
+            ("running", "gauge", "Calls holding a slot", lambda s: s.running),
+            ("admitted_total", "counter", "Calls admitted", lambda s: s.admitted),
+            ("rejected_total", "counter", "Calls refused by the rate limit", lambda s: s.rejected),
+            ("queue_seconds_total", "counter", "Time calls spent waiting for a slot", lambda s: s.queue_seconds),
+        ]
+        lines = []
+        for name, kind, help_text, value in series:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f'{prefix}_{name}{{client="{client}"}} {value(s):g}' for client, s in self.clients.items())
+        lines.append(f"# HELP {prefix}_latency_seconds Queue wait plus run time of admitted calls")
+        lines.append(f"# TYPE {prefix}_latency_seconds histogram")
+        for client, state in self.clients.items():
+            histogram = state.latency
+            lines.extend(f'{prefix}_latency_seconds_bucket{{client="{client}",le="{bound}"}} {count}'
+                         for bound, count in histogram.cumulative())
+            lines.append(f'{prefix}_latency_seconds_sum{{client="{client}"}} {histogram.sum:g}')
+            lines.append(f'{prefix}_latency_seconds_count{{client="{client}"}} {histogram.total}')
+        return "\n".join(lines) + "\n"
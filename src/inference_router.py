@@ -0,0 +1,340 @@
+"""
+Inference routing
+Spreads OpenAI-compatible calls over KAITO model replicas by least outstanding requests, with prompt-prefix affinity
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import ssl
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+SERVICE_ACCOUNT_DIR = "/var/run/secrets/kubernetes.io/serviceaccount"
+
+
+class InferenceError(Exception):
+    """No backend could answer, or the model refused the request"""
+
+
+class BackendError(Exception):
+    """A backend failed in a way that counts against its health (connection failure, timeout or 5xx)"""
+
+
+def static_endpoints(spec: str) -> Callable[[], Awaitable[List[str]]]:
+    """Discovery from a comma-separated list of base URLs, e.g. ``http://10.0.0.4:5000,http://10.0.0.5:5000``"""
+    urls = [url.strip().rstrip("/") for url in spec.split(",") if url.strip()]
+
+    async def discover() -> List[str]:
+        return urls
+
+    return discover
+
+
+def endpoint_slice_urls(slices: Dict[str, Any], scheme: str = "http") -> List[str]:
+    """Base URLs of the ready endpoints in an EndpointSliceList, on each slice's first port"""
+    urls = []
+    for item in slices.get("items", []):
+        ports = item.get("ports") or []
+        if not ports or ports[0].get("port") is None:
+            continue
+        for endpoint in item.get("endpoints") or []:
+            if (endpoint.get("conditions") or {}).get("ready") is False:
+                continue
+            urls.extend(f"{scheme}://{address}:{ports[0]['port']}" for address in endpoint.get("addresses", []))
+    return sorted(set(urls))
+
+
+class KubernetesEndpoints:
+    """Discovery from the EndpointSlices of a Service, e.g. the one KAITO creates for a Workspace
+
+    Reads the in-cluster API with the pod's service account, which needs
+    ``list`` on ``endpointslices`` in the Service's namespace. Only endpoints
+    Kubernetes considers ready are returned; the router's own health checks
+    still apply on top.
+    """
+
+    def __init__(self, service: str, session: Optional[aiohttp.ClientSession] = None,
+                 api_url: Optional[str] = None, account_dir: str = SERVICE_ACCOUNT_DIR):
+        namespace, _, name = service.rpartition("/")
+        self.namespace = namespace or "default"
+        self.name = name
+        self.api_url = api_url or (
+            f"https://{os.getenv('KUBERNETES_SERVICE_HOST', 'kubernetes.default.svc')}"
+            f":{os.getenv('KUBERNETES_SERVICE_PORT', '443')}"
+        )
+        self.account_dir = account_dir
+        self.session = session
+
+    async def __call__(self) -> List[str]:
+        headers = {}
+        token_file = os.path.join(self.account_dir, "token")
+        if os.path.exists(token_file):
+            # Projected tokens are rotated, so read it on every call
+            with open(token_file) as f:
+                headers["Authorization"] = f"Bearer {f.read().strip()}"
+        ca_file = os.path.join(self.account_dir, "ca.crt")
+        ssl_context = ssl.create_default_context(cafile=ca_file) if os.path.exists(ca_file) else None
+        url = (f"{self.api_url}/apis/discovery.k8s.io/v1/namespaces/{self.namespace}/endpointslices"
+               f"?labelSelector=kubernetes.io/service-name={self.name}")
+        session = self.session or aiohttp.ClientSession()
+        try:
+            async with session.get(url, headers=headers, ssl=ssl_context,
+                                   timeout=aiohttp.ClientTimeout(total=10)) as response:
+                response.raise_for_status()
+                return endpoint_slice_urls(await response.json())
+        finally:
+            if self.session is None:
+                await session.close()
+
+
+def affinity_key(body: Dict[str, Any], prefix_chars: int) -> Optional[str]:
+    """The start of a chat's system messages, which calls sharing a replica's prefix cache have in common"""
+    messages = body.get("messages")
+    if not isinstance(messages, list):
+        return None
+    system = "\n".join(
+        str(message.get("content", "")) for message in messages
+        if isinstance(message, dict) and message.get("role") == "system"
+    )
+    return system[:prefix_chars] or None
+
+
+class Backend:
+    """One model replica and what the router knows about it"""
+
+    __slots__ = ("url", "outstanding", "healthy", "consecutive_failures", "ejected_until", "requests", "failures",
+                 "ejections", "latency_ewma")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.latency_ewma = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+
+def _weight(key_digest: bytes, url: str) -> bytes:
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8, key=key_digest).digest()
+
+
+class InferenceRouter:
+    """Least-outstanding-requests load balancer over model replicas
+
+    Each call goes to the available replica with the fewest calls in flight
+    (ties broken at random). Calls with an affinity key (a shared system
+    prompt) prefer the replica rendezvous hashing picks for that key, so they
+    hit its prefix cache, as long as it has at most ``affinity_slack`` more
+    calls in flight than the least loaded one. Replicas are ejected for
+    ``eject_seconds`` after ``eject_after`` consecutive failures, and marked
+    down while their health endpoint fails. If none is available, all are
+    tried rather than none.
+    """
+
+    def __init__(
+        self,
+        discover: Callable[[], Awaitable[List[str]]],
+        health_path: str = "/health",
+        health_interval: float = 5.0,
+        discovery_interval: float = 15.0,
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        affinity_slack: int = 4,
+        affinity_prefix_chars: int = 4096,
+        timeout: float = 120.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.discover = discover
+        self.health_path = health_path
+        self.health_interval = health_interval
+        self.discovery_interval = discovery_interval
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.affinity_slack = affinity_slack
+        self.affinity_prefix_chars = affinity_prefix_chars
+        self.timeout = timeout
+        self.clock = clock
+        self.backends: Dict[str, Backend] = {}
+        self.affinity_hits = 0
+        self.affinity_misses = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # aiohttp's default of 100 pooled connections in total would cap calls in flight across all replicas
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0, limit_per_host=256))
+        return self._session
+
+    def set_endpoints(self, urls: Iterable[str]) -> None:
+        """Track exactly these replicas, keeping the state of those already known"""
+        urls = list(dict.fromkeys(urls))
+        if not urls and self.backends:
+            # An empty discovery result is more likely an API hiccup than every replica gone
+            logger.warning("Inference discovery returned no endpoints, keeping the previous ones")
+            return
+        added = [url for url in urls if url not in self.backends]
+        removed = [url for url in self.backends if url not in urls]
+        self.backends = {url: self.backends.get(url) or Backend(url) for url in urls}
+        if added or removed:
+            logger.info(f"Inference backends: {len(urls)} ({len(added)} added, {len(removed)} removed)")
+
+    async def refresh(self) -> None:
+        self.set_endpoints(await self.discover())
+
+    def pick(self, key: Optional[str] = None, exclude: Iterable[Backend] = ()) -> Backend:
+        now = self.clock()
+        candidates = [b for b in self.backends.values() if b not in exclude]
+        available = [b for b in candidates if b.available(now)] or candidates
+        if not available:
+            raise InferenceError("No inference backends")
+        least = min(b.outstanding for b in available)
+        if key is not None:
+            digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+            preferred = max(available, key=lambda b: _weight(digest, b.url))
+            if preferred.outstanding <= least + self.affinity_slack:
+                self.affinity_hits += 1
+                return preferred
+            self.affinity_misses += 1
+        return random.choice([b for b in available if b.outstanding == least])
+
+    def _succeeded(self, backend: Backend, seconds: float) -> None:
+        backend.consecutive_failures = 0
+        backend.latency_ewma = seconds if backend.latency_ewma == 0 else 0.8 * backend.latency_ewma + 0.2 * seconds
+
+    def _failed(self, backend: Backend, error: Exception) -> None:
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.eject_after and backend.ejected_until <= self.clock():
+            backend.ejected_until = self.clock() + self.eject_seconds
+            backend.ejections += 1
+            logger.warning(f"Ejecting inference backend {backend.url} for {self.eject_seconds:g}s: {error}")
+
+    async def _post(self, backend: Backend, path: str, body: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        try:
+            async with self.session.post(backend.url + path, json=body,
+                                         timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                text = await response.text()
+                if response.status >= 500:
+                    raise BackendError(f"HTTP {response.status}: {text[:200]}")
+                if response.status >= 400:
+                    raise InferenceError(f"Model refused the request (HTTP {response.status}): {text[:200]}")
+                return json.loads(text)
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+            raise BackendError(str(e) or type(e).__name__) from e
+
+    async def post(self, path: str, body: Dict[str, Any], key: Optional[str] = None,
+                   timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        POST ``body`` to ``path`` on the chosen replica and return its JSON
+        A replica that fails before answering is retried once on another; timeouts are not retried
+        """
+        if key is None:
+            key = affinity_key(body, self.affinity_prefix_chars)
+        tried: List[Backend] = []
+        while True:
+            backend = self.pick(key, exclude=tried)
+            tried.append(backend)
+            backend.outstanding += 1
+            backend.requests += 1
+            started = self.clock()
+            try:
+                result = await self._post(backend, path, body, timeout or self.timeout)
+            except BackendError as e:
+                self._failed(backend, e)
+                retryable = not isinstance(e.__cause__, asyncio.TimeoutError)
+                if not retryable or len(tried) >= 2 or len(tried) >= len(self.backends):
+                    raise InferenceError(f"Inference backend {backend.url} failed: {e}") from e
+                logger.info(f"Retrying inference call elsewhere after {backend.url} failed: {e}")
+                continue
+            finally:
+                backend.outstanding -= 1
+            self._succeeded(backend, self.clock() - started)
+            return result
+
+    async def check(self, backend: Backend) -> None:
+        timeout = aiohttp.ClientTimeout(total=min(self.health_interval, 5.0))
+        try:
+            async with self.session.get(backend.url + self.health_path, timeout=timeout) as response:
+                healthy = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            healthy = False
+        if healthy != backend.healthy:
+            logger.warning(f"Inference backend {backend.url} is {'healthy' if healthy else 'unhealthy'}")
+        backend.healthy = healthy
+
+    async def check_health(self) -> None:
+        await asyncio.gather(*(self.check(backend) for backend in list(self.backends.values())))
+
+    async def run(self) -> None:
+        """Rediscover replicas every ``discovery_interval`` and health-check them every ``health_interval``"""
+        discovered_at = None
+        while True:
+            if discovered_at is None or self.clock() - discovered_at >= self.discovery_interval:
+                try:
+                    await self.refresh()
+                    discovered_at = self.clock()
+                except Exception as e:
+                    logger.warning(f"Inference backend discovery failed: {e}")
+            await self.check_health()
+            await asyncio.sleep(self.health_interval)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    def status(self) -> Dict[str, Any]:
+        now = self.clock()
+        return {
+            "backends": {
+                backend.url: {
+                    "available": backend.available(now),
+                    "healthy": backend.healthy,
+                    "ejected": backend.ejected_until > now,
+                    "outstanding": backend.outstanding,
+                    "requests": backend.requests,
+                    "failures": backend.failures,
+                    "ejections": backend.ejections,
+                    "latency_ewma_ms": round(backend.latency_ewma * 1000, 1),
+                }
+                for backend in self.backends.values()
+            },
+            "affinity_hits": self.affinity_hits,
+            "affinity_misses": self.affinity_misses,
+        }
+
+    def prometheus(self, prefix: str = "mcp_inference") -> str:
+        """Per-replica metrics in Prometheus text exposition format"""
+        now = self.clock()
+        series = [
+            ("backend_available", "gauge", "1 if the replica is healthy and not ejected",
+             lambda b: int(b.available(now))),
+            ("backend_outstanding", "gauge", "Calls in flight", lambda b: b.outstanding),
+            ("backend_requests_total", "counter", "Calls sent", lambda b: b.requests),
+            ("backend_failures_total", "counter", "Calls failed by the replica", lambda b: b.failures),
+            ("backend_ejections_total", "counter", "Times the replica was ejected", lambda b: b.ejections),
+        ]
+        lines = []
+        for name, kind, help_text, value in series:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f'{prefix}_{name}{{backend="{b.url}"}} {value(b):g}' for b in self.backends.values())
+        lines.append(f"# HELP {prefix}_affinity_total Calls routed by prefix affinity, by outcome")
+        lines.append(f"# TYPE {prefix}_affinity_total counter")
+        lines.append(f'{prefix}_affinity_total{{outcome="hit"}} {self.affinity_hits}')
+        lines.append(f'{prefix}_affinity_total{{outcome="miss"}} {self.affinity_misses}')
+        return "\n".join(lines) + "\n"
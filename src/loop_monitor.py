@@ -0,0 +1,171 @@
+"""
+Event loop health monitor
+Continuous scheduling-lag histogram plus a watchdog that captures whatever is blocking the loop
+"""
+
+import asyncio
+import bisect
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the lag histogram buckets, in seconds
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LagHistogram:
+    """Cumulative-bucket histogram of lag samples in seconds (Prometheus layout)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LAG_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, samples at or below it) pairs ending with +Inf"""
+        running, result = 0, []
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            running += count
+            result.append(("+Inf" if bound == float("inf") else f"{bound:g}", running))
+        return result
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th sample (an over-estimate by design)"""
+        if not self.total:
+            return 0.0
+        rank, running = q * self.total, 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= rank:
+                return bound
+        return self.max
+
+
+class LoopMonitor:
+    """Measures event loop scheduling lag and reports callbacks that block it
+
+    A monitor task sleeps for ``interval`` and records how late it wakes up.
+    A watchdog thread checks that the task keeps waking up; once the loop has
+    been stuck for longer than ``slow_threshold`` it captures the loop thread's
+    stack while the offending code is still running, together with the
+    JSON-RPC method and tool of the task that was running (see ``label``).
+    """
+
+    def __init__(self, interval: float = 0.25, slow_threshold: float = 0.1, keep_stalls: int = 20):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.histogram = LagHistogram()
+        self.stalls: deque = deque(maxlen=keep_stalls)
+        self.stall_count = 0
+        self.labels: weakref.WeakKeyDictionary[asyncio.Task, Dict[str, Any]] = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._beat = 0.0
+
+    @contextmanager
+    def label(self, **fields: Any):
+        """Attribute stalls in the current task to e.g. a method and tool"""
+        task = asyncio.current_task()
+        if task is None:
+            yield
+            return
+        previous = self.labels.get(task)
+        self.labels[task] = fields
+        try:
+            yield
+        finally:
+            if previous is None:
+                self.labels.pop(task, None)
+            else:
+                self.labels[task] = previous
+
+    async def run(self) -> None:
+        """Sample lag until cancelled, with the watchdog running alongside"""
+        loop = asyncio.get_running_loop()
+        self._loop, self._thread_id = loop, threading.get_ident()
+        self._beat = time.monotonic()
+        stopped = threading.Event()
+        watchdog = threading.Thread(target=self._watch, args=(stopped,), name="loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                started = loop.time()
+                await asyncio.sleep(self.interval)
+                self._beat = time.monotonic()
+                lag = max(0.0, loop.time() - started - self.interval)
+                self.histogram.record(lag)
+        finally:
+            stopped.set()
+
+    def _watch(self, stopped: threading.Event) -> None:
+        reported = None
+        while not stopped.wait(self.slow_threshold / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled > self.slow_threshold and reported != beat:
+                reported = beat
+                self._report_stall(stalled)
+
+    def _report_stall(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        del frame
+        task = asyncio.current_task(self._loop)
+        labels = self.labels.get(task, {}) if task is not None else {}
+        coro = task.get_coro() if task is not None else None
+        stall = {
+            "detected_at": time.time(),
+            "blocked_ms": round(stalled * 1000, 3),
+            "task": task.get_name() if task is not None else None,
+            "coroutine": getattr(coro, "__qualname__", None),
+            **labels,
+            "stack": stack,
+        }
+        self.stalls.append(stall)
+        self.stall_count += 1
+        logger.warning(
+            "Event loop blocked for over %.0fms in %s (method=%s tool=%s)\n%s",
+            stalled * 1000, stall["coroutine"] or "a callback", labels.get("method"), labels.get("tool"), stack,
+            extra={"method": labels.get("method"), "tool": labels.get("tool"), "latency_ms": stall["blocked_ms"]}
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "samples": self.histogram.total,
+            "p50_ms": self.histogram.percentile(0.5) * 1000,
+            "p99_ms": self.histogram.percentile(0.99) * 1000,
+            "max_ms": round(self.histogram.max * 1000, 3),
+            "stalls": self.stall_count,
+            "last_stall": {k: v for k, v in self.stalls[-1].items() if k != "stack"} if self.stalls else None,
+        }
+
+    def prometheus(self, prefix: str = "mcp_event_loop") -> str:
+        """Metrics in Prometheus text exposition format"""
+        lines = [
+            f"# HELP {prefix}_lag_seconds Event loop scheduling lag",
+            f"# TYPE {prefix}_lag_seconds histogram",
+        ]
+        lines.extend(f'{prefix}_lag_seconds_bucket{{le="{bound}"}} {count}' for bound, count in
+                     self.histogram.cumulative())
+        lines.append(f"{prefix}_lag_seconds_sum {self.histogram.sum:.6f}")
+        lines.append(f"{prefix}_lag_seconds_count {self.histogram.total}")
+        lines.append(f"# HELP {prefix}_stalls_total Times the loop was blocked longer than the slow threshold")
+        lines.append(f"# TYPE {prefix}_stalls_total counter")
+        lines.append(f"{prefix}_stalls_total {self.stall_count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,463 @@
+"""
+Async MCP client
+Pooled HTTP transport, incremental SSE parsing and concurrent JSON-RPC requests
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import random
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import urljoin
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2024-11-05"
+STREAMABLE_PROTOCOL_VERSION = "2025-03-26"
+SESSION_HEADER = "Mcp-Session-Id"
+
+_LINE_END = re.compile(rb"\r\n|\r|\n")
+_BOM = b"\xef\xbb\xbf"
+
+
+class MCPError(Exception):
+    """JSON-RPC error returned by the server"""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class MCPConnectionError(Exception):
+    """The server could not be reached or returned no usable response"""
+
+
+@dataclass
+class SSEEvent:
+    """A dispatched server-sent event"""
+    event: str
+    data: str
+    id: Optional[str] = None
+
+
+class SSEParser:
+    """Incremental text/event-stream parser
+
+    Follows the WHATWG rules: any of CRLF, CR or LF end a line (including a
+    CRLF split across chunks), multi-line data is joined with newlines,
+    comment lines are ignored and the last event id persists across events.
+    """
+
+    def __init__(self, last_event_id: Optional[str] = None):
+        self.last_event_id = last_event_id
+        self.retry: Optional[int] = None
+        self._buffer = b""
+        self._started = False
+        self._data: List[str] = []
+        self._event = ""
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        buffer = self._buffer + chunk
+        if not self._started:
+            if len(buffer) < len(_BOM) and _BOM.startswith(buffer):
+                self._buffer = buffer
+                return []
+            self._started = True
+            if buffer.startswith(_BOM):
+                buffer = buffer[len(_BOM):]
+
+        events = []
+        start = 0
+        for match in _LINE_END.finditer(buffer):
+            # A trailing CR may be the first half of a CRLF
+            if match.group() == b"\r" and match.end() == len(buffer):
+                break
+            event = self._process_line(buffer[start:match.start()])
+            if event is not None:
+                events.append(event)
+            start = match.end()
+        self._buffer = buffer[start:]
+        return events
+
+    def _process_line(self, line: bytes) -> Optional[SSEEvent]:
+        if not line:
+            if not self._data:
+                self._event = ""
+                return None
+            event = SSEEvent(self._event or "message", "\n".join(self._data), self.last_event_id)
+            self._data = []
+            self._event = ""
+            return event
+        if line.startswith(b":"):
+            return None
+        field, colon, value = line.partition(b":")
+        if colon and value.startswith(b" "):
+            value = value[1:]
+        text = value.decode("utf-8", errors="replace")
+        if field == b"data":
+            self._data.append(text)
+        elif field == b"event":
+            self._event = text
+        elif field == b"id":
+            if "\x00" not in text:
+                self.last_event_id = text
+        elif field == b"retry":
+            if text.isdigit():
+                self.retry = int(text)
+        return None
+
+
+class MCPTransport:
+    """Pooled HTTP transport shared by many MCP client sessions
+
+    Keeps one aiohttp connection pool so that thousands of logical sessions
+    reuse a bounded set of keep-alive connections. Long-lived SSE streams use
+    a separate unbounded connector so they never starve request traffic.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 30.0,
+        request_timeout: float = 30.0,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.headers = headers or {}
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._streams: Optional[aiohttp.ClientSession] = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self._http is None or self._http.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._http = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                json_serialize=lambda obj: json.dumps(obj, separators=(",", ":")),
+            )
+        return self._http
+
+    async def post(
+        self, url: str, payload: Any, headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, Any, Mapping[str, str]]:
+        """POST a JSON-RPC payload; returns the status, decoded body (None if empty) and headers
+
+        An SSE response body (Streamable HTTP) is read to the end and its
+        messages returned as a list.
+        """
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        try:
+            async with self._session().post(url, json=payload, headers=headers, timeout=timeout) as response:
+                raw = await response.read()
+                status = response.status
+                reply_headers = response.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise MCPConnectionError(f"POST {url} failed: {e}") from e
+        if not raw.strip():
+            return status, None, reply_headers
+        try:
+            if reply_headers.get("Content-Type", "").startswith("text/event-stream"):
+                return status, [json.loads(event.data) for event in SSEParser().feed(raw) if event.data], reply_headers
+            return status, json.loads(raw), reply_headers
+        except ValueError:
+            raise MCPConnectionError(f"POST {url} returned HTTP {status} with a non-JSON body")
+
+    async def delete(self, url: str, headers: Optional[Dict[str, str]] = None) -> int:
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        try:
+            async with self._session().delete(url, headers=headers, timeout=timeout) as response:
+                return response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise MCPConnectionError(f"DELETE {url} failed: {e}") from e
+
+    def stream(self, url: str, headers: Optional[Dict[str, str]] = None, idle_timeout: Optional[float] = None):
+        """Open a long-lived GET; use as an async context manager
+
+        ``idle_timeout`` bounds the silence between chunks so a dead connection
+        is detected even when no FIN/RST ever arrives.
+        """
+        if self._streams is None or self._streams.closed:
+            self._streams = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), headers=self.headers)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.request_timeout, sock_read=idle_timeout)
+        return self._streams.get(url, headers=headers, timeout=timeout)
+
+    async def close(self) -> None:
+        for http in (self._http, self._streams):
+            if http is not None:
+                await http.close()
+        self._http = self._streams = None
+
+    async def __aenter__(self) -> "MCPTransport":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+
+class MCPClient:
+    """One logical MCP session over a (possibly shared) transport
+
+    Requests get auto-generated ids and may be issued concurrently; each
+    response is matched to its caller by id, whether it comes back in the POST
+    body or on the SSE stream. The SSE stream is re-established with
+    exponential backoff (resuming from the last event id) when it drops or
+    stays silent longer than ``stream_idle_timeout``; the server sends
+    keepalives every 30 seconds.
+
+    With ``streamable=True`` ``base_url`` is a Streamable HTTP endpoint: every
+    message is a POST to it, the server's Mcp-Session-Id (if any) is echoed
+    back, and no long-lived stream is held.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        transport: Optional[MCPTransport] = None,
+        headers: Optional[Dict[str, str]] = None,
+        use_sse: bool = True,
+        streamable: bool = False,
+        request_timeout: float = 30.0,
+        stream_idle_timeout: float = 90.0,
+        reconnect_delay: float = 0.5,
+        max_reconnect_delay: float = 10.0,
+        on_notification: Optional[Callable[[Dict[str, Any]], None]] = None,
+        client_name: str = "mcp-client",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.sse_url = f"{self.base_url}/sse"
+        self.transport = transport or MCPTransport()
+        self._owns_transport = transport is None
+        self.headers = headers or {}
+        self.streamable = streamable
+        self.use_sse = use_sse and not streamable
+        self.session_id: Optional[str] = None
+        self.request_timeout = request_timeout
+        self.stream_idle_timeout = stream_idle_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.on_notification = on_notification
+        self.client_name = client_name
+        self.server_info: Optional[Dict[str, Any]] = None
+        self.reconnects = 0
+
+        self._ids = itertools.count(1)
+        self._pending: Dict[Any, asyncio.Future] = {}
+        self._message_url = self.base_url if streamable else f"{self.base_url}/message"
+        self._endpoint_ready = asyncio.Event()
+        self._reader: Optional[asyncio.Task] = None
+        self._last_event_id: Optional[str] = None
+        self._closed = False
+
+    async def connect(self, initialize: bool = True) -> "MCPClient":
+        """Open the SSE stream (if enabled) and perform the initialize handshake"""
+        if self.use_sse and self._reader is None:
+            self._reader = asyncio.create_task(self._read_stream())
+            await self._wait_for_endpoint()
+        if initialize:
+            await self.initialize()
+        return self
+
+    async def close(self) -> None:
+        self._closed = True
+        if self.session_id is not None:
+            try:
+                await self.transport.delete(self._message_url, {**self.headers, SESSION_HEADER: self.session_id})
+            except MCPConnectionError as e:
+                logger.warning(f"Could not terminate session {self.session_id}: {e}")
+            self.session_id = None
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(MCPConnectionError("Client closed"))
+        self._pending.clear()
+        if self._owns_transport:
+            await self.transport.close()
+
+    async def __aenter__(self) -> "MCPClient":
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def _wait_for_endpoint(self) -> None:
+        try:
+            await asyncio.wait_for(self._endpoint_ready.wait(), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise MCPConnectionError(f"No endpoint event from {self.sse_url}")
+
+    async def _read_stream(self) -> None:
+        delay = self.reconnect_delay
+        while not self._closed:
+            headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache", **self.headers}
+            if self._last_event_id is not None:
+                headers["Last-Event-ID"] = self._last_event_id
+            parser = SSEParser(self._last_event_id)
+            try:
+                async with self.transport.stream(self.sse_url, headers, self.stream_idle_timeout) as response:
+                    if response.status != 200:
+                        raise MCPConnectionError(f"SSE connect to {self.sse_url} returned HTTP {response.status}")
+                    async for chunk in response.content.iter_any():
+                        for event in parser.feed(chunk):
+                            self._handle_event(event)
+                        delay = self.reconnect_delay
+            except (aiohttp.ClientError, asyncio.TimeoutError, MCPConnectionError) as e:
+                logger.warning(f"SSE stream error: {e}")
+            self._endpoint_ready.clear()
+            if self._closed:
+                break
+            self.reconnects += 1
+            wait = parser.retry / 1000 if parser.retry is not None else delay
+            await asyncio.sleep(wait * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _handle_event(self, event: SSEEvent) -> None:
+        if event.id is not None:
+            self._last_event_id = event.id
+        data = event.data.strip()
+        if event.event == "endpoint" or not data.startswith(("{", "[")):
+            self._message_url = urljoin(self.sse_url, data)
+            self._endpoint_ready.set()
+            return
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning(f"Ignoring malformed SSE message: {data[:200]}")
+            return
+        for item in message if isinstance(message, list) else [message]:
+            self._dispatch(item)
+
+    def _dispatch(self, message: Any) -> None:
+        if not isinstance(message, dict):
+            return
+        if "id" in message and ("result" in message or "error" in message):
+            future = self._pending.get(message["id"])
+            if future is not None and not future.done():
+                future.set_result(message)
+        elif self.on_notification is not None:
+            self.on_notification(message)
+
+    async def _post(self, payload: Any) -> Tuple[int, Any]:
+        if self.use_sse and not self._endpoint_ready.is_set():
+            await self._wait_for_endpoint()
+        headers = self.headers
+        if self.streamable:
+            headers = {**headers, "Accept": "application/json, text/event-stream"}
+            if self.session_id is not None:
+                headers[SESSION_HEADER] = self.session_id
+        status, body, reply_headers = await self.transport.post(self._message_url, payload, headers)
+        if self.streamable and SESSION_HEADER in reply_headers:
+            self.session_id = reply_headers[SESSION_HEADER]
+        return status, body
+
+    async def _exchange(self, payload: Any, ids: List[int]) -> List[Dict[str, Any]]:
+        """POST a message or batch and wait for the responses to the given ids"""
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in ids]
+        self._pending.update(zip(ids, futures))
+        try:
+            status, body = await self._post(payload)
+            if body is not None:
+                for item in body if isinstance(body, list) else [body]:
+                    self._dispatch(item)
+            if not all(future.done() for future in futures):
+                if status >= 400:
+                    raise MCPConnectionError(f"POST {self._message_url} returned HTTP {status}")
+                if not self.use_sse:
+                    raise MCPConnectionError("Response missing and no SSE stream to deliver it")
+            try:
+                return list(await asyncio.wait_for(asyncio.gather(*futures), self.request_timeout))
+            except asyncio.TimeoutError:
+                raise MCPConnectionError(f"Timed out waiting for responses to {ids}")
+        finally:
+            for request_id in ids:
+                self._pending.pop(request_id, None)
+
+    @staticmethod
+    def _result(response: Dict[str, Any]) -> Any:
+        error = response.get("error")
+        if error is not None:
+            raise MCPError(error.get("code", -32603), error.get("message", ""), error.get("data"))
+        return response.get("result")
+
+    def _message(self, method: str, params: Optional[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        request_id = next(self._ids)
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        return request_id, message
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Send a request and return its result, raising MCPError on a JSON-RPC error"""
+        request_id, message = self._message(method, params)
+        (response,) = await self._exchange(message, [request_id])
+        return self._result(response)
+
+    async def batch(
+        self, calls: Sequence[Tuple[str, Optional[Dict[str, Any]]]], return_exceptions: bool = False
+    ) -> List[Any]:
+        """Send several requests in one JSON-RPC batch; results keep call order"""
+        ids, messages = zip(*(self._message(method, params) for method, params in calls))
+        responses = await self._exchange(list(messages), list(ids))
+        results = []
+        for response in responses:
+            try:
+                results.append(self._result(response))
+            except MCPError as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        status, _ = await self._post(message)
+        if status >= 400:
+            raise MCPConnectionError(f"Notification {method} returned HTTP {status}")
+
+    async def initialize(self) -> Dict[str, Any]:
+        self.server_info = await self.request("initialize", {
+            "protocolVersion": STREAMABLE_PROTOCOL_VERSION if self.streamable else PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": self.client_name, "version": "1.0.0"},
+        })
+        await self.notify("notifications/initialized")
+        return self.server_info
+
+    async def list_tools(self) -> List[Dict[str, Any]]:
+        return (await self.request("tools/list"))["tools"]
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.request("tools/call", {"name": name, "arguments": arguments or {}})
+
+    async def list_resources(self, cursor: Optional[str] = None) -> Dict[str, Any]:
+        return await self.request("resources/list", {"cursor": cursor} if cursor else {})
+
+    async def read_resource(self, uri: str) -> List[Dict[str, Any]]:
+        return (await self.request("resources/read", {"uri": uri}))["contents"]
+
+    async def subscribe_resource(self, uri: str) -> None:
+        """Ask for notifications/resources/updated (delivered to ``on_notification``) when ``uri`` changes"""
+        await self.request("resources/subscribe", {"uri": uri})
+
+    async def unsubscribe_resource(self, uri: str) -> None:
+        await self.request("resources/unsubscribe", {"uri": uri})
@@ -6,8 +6,15 @@ Implements Model Context Protocol (MCP) with SSE support
 import json
 import logging
 import asyncio
+import hashlib
+import hmac
+import signal
+import socket
+import threading
+import time
 import uuid
-from typing import Dict, Any, Optional
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
@@ -17,15 +24,68 @@ from azure.storage.blob import BlobServiceClient
 from azure.identity import DefaultAzureCredential
 import os
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from storage import BlobStorageBackend, CircuitOpenError, SnippetNotFoundError, StorageBackend, StorageError
+from resilience import CircuitBreaker, ResilientBackend, RetryPolicy
+from snippet_index import SnippetNameIndex
+from content_index import SnippetContentIndex, compress_snapshot
+from vector_index import HashingEmbedder, HttpEmbedder, SearchBatcher, VectorIndex, VectorIndexer
+from snippet_cache import SnippetCache, compress_hot_set, prewarm, read_hot_set
+from snippet_format import SnippetCodec
+from compression import CompressionMiddleware
+from session_events import Session, format_event_id, parse_event_id
+from resource_subscriptions import ChangeFeed, SubscriptionRegistry, fan_out, snippet_name_from_uri, snippet_uri
+from drain import DrainController
+from fair_queue import (
+    ANONYMOUS, FairQueue, RateLimitedError, client_identity, parse_client_values, request_client, safe_identity,
+)
+from loop_monitor import LoopMonitor
+from tool_executor import INLINE, PROCESS, THREAD, ToolExecutor, parse_execution_classes
+import scaling
+import snippet_tools
+from profiling import TaskAges, allocation_diff, cpu_profile, dump_tasks, measure_loop_lag
+from structured_logging import bind_log_context, configure_logging, parse_sample_rates
+from token_auth import JwksCache, JwksUnavailableError, TokenError, TokenValidator, bearer_token, request_claims
+from inference_router import InferenceError, InferenceRouter, KubernetesEndpoints, static_endpoints
+from traffic_capture import TrafficRecorder
+
+# Logging configuration: records are queued and written by a background thread
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+log_listener = configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATES, LOG_QUEUE_SIZE)
 logger = logging.getLogger(__name__)
+# Per-request records; high volume, so sample them with LOG_SAMPLE_RATES=mcp_server.requests=0.1
+request_logger = logging.getLogger(f"{__name__}.requests")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background maintenance tasks for the lifetime of the app"""
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="MCP Server",
     description="Model Context Protocol Server for AI Agents",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Response compression configuration
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_COMPRESSION_SSE = os.getenv("RESPONSE_COMPRESSION_SSE", "true").lower() == "true"
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=RESPONSE_COMPRESSION_MIN_BYTES,
+    compress_streams=RESPONSE_COMPRESSION_SSE
 )
 
 # Azure Storage configuration
@@ -44,74 +104,1187 @@ else:
 
 SNIPPETS_CONTAINER = "snippets"
 
+# Storage resilience configuration
+STORAGE_MAX_ATTEMPTS = int(os.getenv("STORAGE_MAX_ATTEMPTS", "4"))
+STORAGE_RETRY_BASE_DELAY = float(os.getenv("STORAGE_RETRY_BASE_DELAY", "0.1"))
+STORAGE_RETRY_MAX_DELAY = float(os.getenv("STORAGE_RETRY_MAX_DELAY", "5.0"))
+STORAGE_BREAKER_THRESHOLD = int(os.getenv("STORAGE_BREAKER_THRESHOLD", "5"))
+STORAGE_BREAKER_RESET_SECONDS = float(os.getenv("STORAGE_BREAKER_RESET_SECONDS", "30"))
+STORAGE_HEDGED_READS = os.getenv("STORAGE_HEDGED_READS", "false").lower() == "true"
+
+
+def build_storage_backend(inner: StorageBackend) -> ResilientBackend:
+    """Wrap a raw storage backend with the configured resilience policies"""
+    return ResilientBackend(
+        inner,
+        retry=RetryPolicy(
+            max_attempts=STORAGE_MAX_ATTEMPTS,
+            base_delay=STORAGE_RETRY_BASE_DELAY,
+            max_delay=STORAGE_RETRY_MAX_DELAY,
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=STORAGE_BREAKER_THRESHOLD,
+            reset_timeout=STORAGE_BREAKER_RESET_SECONDS,
+        ),
+        hedged_reads=STORAGE_HEDGED_READS,
+    )
+
+
+storage_backend: Optional[ResilientBackend] = None
+if blob_service_client:
+    storage_backend = build_storage_backend(BlobStorageBackend(blob_service_client, SNIPPETS_CONTAINER))
+
+# Snippet storage format: raw (legacy), compressed, or dedup (content-addressed)
+SNIPPET_STORAGE_FORMAT = os.getenv("SNIPPET_STORAGE_FORMAT", "raw")
+SNIPPET_COMPRESSION = os.getenv("SNIPPET_COMPRESSION", "zstd")
+SNIPPET_COMPRESSION_MIN_BYTES = int(os.getenv("SNIPPET_COMPRESSION_MIN_BYTES", "1024"))
+
+snippet_codec = SnippetCodec(
+    storage_format=SNIPPET_STORAGE_FORMAT,
+    compression=SNIPPET_COMPRESSION,
+    min_size=SNIPPET_COMPRESSION_MIN_BYTES,
+)
+
+# Snippet name index configuration
+SNIPPET_INDEX_RECONCILE_SECONDS = float(os.getenv("SNIPPET_INDEX_RECONCILE_SECONDS", "300"))
+SNIPPET_PAGE_SIZE = 50
+SNIPPET_MAX_PAGE_SIZE = 500
+SNIPPET_BLOB_SUFFIX = ".json"
+
+snippet_index = SnippetNameIndex()
+background_tasks: list = []
+
+# Full-text content index configuration
+CONTENT_INDEX_SNAPSHOT_KEY = "_index/content-index.bin"
+CONTENT_INDEX_FETCH_CONCURRENCY = int(os.getenv("CONTENT_INDEX_FETCH_CONCURRENCY", "8"))
+SNIPPET_SEARCH_LIMIT = 10
+
+# Bulk get_snippets/save_snippets: items per call, and storage operations run at once per call
+BULK_SNIPPET_MAX_ITEMS = int(os.getenv("BULK_SNIPPET_MAX_ITEMS", "100"))
+BULK_SNIPPET_CONCURRENCY = int(os.getenv("BULK_SNIPPET_CONCURRENCY", "16"))
+
+content_index = SnippetContentIndex()
+
+# Vector similarity index: "hashing" embeds locally, "http" calls an OpenAI-compatible
+# /v1/embeddings endpoint such as a KAITO workspace serving an embedding model
+EMBEDDER = os.getenv("EMBEDDER", "hashing")
+EMBEDDING_URL = os.getenv("EMBEDDING_URL", "")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "256"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR") or None
+VECTOR_IVF_LISTS = int(os.getenv("VECTOR_IVF_LISTS", "0"))
+VECTOR_IVF_PROBES = int(os.getenv("VECTOR_IVF_PROBES", "8"))
+VECTOR_INDEX_SNAPSHOT_KEY = "_index/vector-index.bin"
+
+if EMBEDDER == "http":
+    if not EMBEDDING_URL:
+        raise RuntimeError("EMBEDDER=http requires EMBEDDING_URL")
+    embedder = HttpEmbedder(EMBEDDING_URL, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, batch_size=EMBEDDING_BATCH_SIZE)
+else:
+    embedder = HashingEmbedder(EMBEDDING_DIMENSIONS)
+vector_index = VectorIndex(EMBEDDING_DIMENSIONS, VECTOR_INDEX_DIR)
+vector_indexer = VectorIndexer(embedder, vector_index, EMBEDDING_BATCH_SIZE)
+vector_search = SearchBatcher(lambda queries, k: vector_index.search(queries, k, VECTOR_IVF_PROBES))
+
+# Snippet content cache; each replica persists its hot set so new pods can pre-warm before reporting ready
+SNIPPET_CACHE_MAX_BYTES = int(os.getenv("SNIPPET_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SNIPPET_CACHE_TTL_SECONDS = float(os.getenv("SNIPPET_CACHE_TTL_SECONDS", "300"))
+HOT_SET_SIZE = int(os.getenv("HOT_SET_SIZE", "1000"))
+HOT_SET_CONTENT_MAX_BYTES = int(os.getenv("HOT_SET_CONTENT_MAX_BYTES", str(4 * 1024 * 1024)))
+HOT_SET_PERSIST_SECONDS = float(os.getenv("HOT_SET_PERSIST_SECONDS", "300"))
+PREWARM_TIMEOUT_SECONDS = float(os.getenv("PREWARM_TIMEOUT_SECONDS", "20"))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "16"))
+HOT_SET_SNAPSHOT_KEY = "_index/hot-set.bin"
+
+snippet_cache = SnippetCache(SNIPPET_CACHE_MAX_BYTES, SNIPPET_CACHE_TTL_SECONDS)
+cache_prewarmed = True
+
+
+def snippet_blob_name(snippet_name: str) -> str:
+    """Blob key for a snippet name"""
+    return f"{snippet_name}{SNIPPET_BLOB_SUFFIX}"
+
+
+async def read_snippet(snippet_name: str) -> str:
+    """Read a snippet in any storage format, bypassing the cache"""
+    data = await snippet_codec.read(storage_backend, snippet_blob_name(snippet_name))
+    return data.decode("utf-8")
+
+
+async def load_snippet(snippet_name: str) -> str:
+    """Read a snippet for a caller, through the content cache"""
+    return await snippet_cache.load(snippet_name, read_snippet)
+
+
+async def store_snippet(snippet_name: str, snippet_content: str) -> None:
+    """Write a snippet in the configured storage format and update the indexes"""
+    await snippet_codec.write(storage_backend, snippet_blob_name(snippet_name), snippet_content.encode("utf-8"))
+    snippet_cache.invalidate(snippet_name)
+    snippet_index.add(snippet_name)
+    content_index.add(snippet_name, snippet_content)
+    vector_indexer.submit(snippet_name, snippet_content)
+    resource_changes.changed(snippet_uri(snippet_name))
+
+
+def snippet_names_from_keys(keys) -> list:
+    """Snippet names for the snippet blobs in a container listing"""
+    return [key[:-len(SNIPPET_BLOB_SUFFIX)] for key in keys if key.endswith(SNIPPET_BLOB_SUFFIX)]
+
+
+async def reconcile_snippet_index() -> None:
+    """Rebuild the name index from one full container listing"""
+    snippet_index.begin_reconcile()
+    try:
+        keys = await storage_backend.list_keys()
+    except Exception:
+        snippet_index.abort_reconcile()
+        raise
+    added, removed = snippet_index.finish_reconcile(snippet_names_from_keys(keys))
+    logger.info(f"Snippet index reconciled: {len(snippet_index)} names (+{added}/-{removed})")
+
+
+async def index_snippet_contents(
+    names: list,
+    index: Optional[Callable[[str, str], None]] = None,
+    missing: Optional[Callable[[str], None]] = None,
+) -> None:
+    """
+    Download and index (by default into the content index) the given snippets with bounded concurrency
+    Snippets that no longer exist are passed to ``missing``
+    """
+    semaphore = asyncio.Semaphore(CONTENT_INDEX_FETCH_CONCURRENCY)
+
+    async def index_one(name: str) -> None:
+        async with semaphore:
+            try:
+                # Indexing reads every snippet, so it must neither fill the cache nor count as heat
+                text = await read_snippet(name)
+            except SnippetNotFoundError:
+                if missing is not None:
+                    missing(name)
+                return
+            except Exception as e:
+                logger.warning(f"Could not index snippet {name}: {e}")
+                return
+        (index or content_index.add)(name, text)
+
+    await asyncio.gather(*(index_one(name) for name in names))
+
+
+def unindex_snippet(snippet_name: str) -> None:
+    """Drop a snippet that no longer exists from the search indexes"""
+    content_index.remove(snippet_name)
+    vector_indexer.remove(snippet_name)
+
+
+def index_remote_snippet(snippet_name: str, snippet_content: str) -> None:
+    snippet_index.add(snippet_name)
+    content_index.add(snippet_name, snippet_content)
+    vector_indexer.submit(snippet_name, snippet_content)
+
+
+# Snippets other replicas saved, waiting to be re-read into this replica's indexes
+remote_snippet_changes: set = set()
+remote_reindex_task: Optional[asyncio.Task] = None
+
+
+def reindex_remote_changes(uris) -> None:
+    """Change feed callback for saves on other replicas; local saves update the indexes in store_snippet"""
+    global remote_reindex_task
+    remote_snippet_changes.update(name for name in map(snippet_name_from_uri, uris) if name is not None)
+    if remote_snippet_changes and (remote_reindex_task is None or remote_reindex_task.done()):
+        remote_reindex_task = asyncio.create_task(reindex_snippets())
+
+
+async def reindex_snippets() -> None:
+    while remote_snippet_changes:
+        names = sorted(remote_snippet_changes)
+        remote_snippet_changes.clear()
+        await index_snippet_contents(names, index_remote_snippet, unindex_snippet)
+
+
+async def snippets_changed_since(written_at: Optional[float]) -> list:
+    """Snippets any replica saved after a shared snapshot was written, as far back as the change feed reaches"""
+    if resource_changes.storage is None:
+        return []
+    # Changes other replicas made just before the snapshot may not have reached its writer yet.
+    # Pruned ones are older than the retention, and reached a snapshot at their writer's next sync.
+    lag = RESOURCE_CHANGE_POLL_SECONDS + RESOURCE_CHANGE_COALESCE_SECONDS
+    oldest = resource_changes.clock() - resource_changes.retention_seconds + 1
+    changed = await resource_changes.changed_since(max((written_at or 0) - lag, oldest))
+    return sorted({name for name in map(snippet_name_from_uri, changed or ()) if name is not None})
+
+
+async def load_content_index() -> None:
+    """Load the shared content index snapshot instead of rebuilding from scratch"""
+    global content_index
+    try:
+        snapshot = await storage_backend.get(CONTENT_INDEX_SNAPSHOT_KEY)
+        loaded = await asyncio.to_thread(SnippetContentIndex.from_snapshot, snapshot)
+        changed = [name for name in await snippets_changed_since(loaded.written_at) if name in loaded]
+        logger.info(f"Loaded content index snapshot with {len(loaded)} snippets, {len(changed)} changed since")
+    except SnippetNotFoundError:
+        loaded = SnippetContentIndex()
+        loaded.loaded = True
+        changed = []
+    # Snippets saved while the snapshot was loading, or by other replicas after it was written, may be stale in it
+    saved_meanwhile = list(content_index.doc_ids)
+    content_index = loaded
+    await index_snippet_contents(sorted(set(saved_meanwhile) | set(changed)), missing=unindex_snippet)
+
+
+async def persist_content_index() -> None:
+    """Write the content index snapshot if it changed since the last write"""
+    if not content_index.loaded or not content_index.dirty:
+        return
+    content_index.dirty = False
+    # Loaders re-index whatever the change feed recorded after this, so the last writer need not be the freshest
+    content_index.written_at = time.time()
+    try:
+        # Compression dominates snapshot cost and releases the GIL, so run it off the loop
+        snapshot = await asyncio.to_thread(compress_snapshot, content_index.snapshot_body())
+        await storage_backend.put(CONTENT_INDEX_SNAPSHOT_KEY, snapshot)
+    except Exception:
+        content_index.dirty = True
+        raise
+
+
+async def sync_content_index() -> None:
+    """Load the snapshot once, drop deleted snippets, index unseen ones and persist changes"""
+    if not content_index.loaded:
+        await load_content_index()
+    if snippet_index.loaded:
+        for name in content_index.absent(snippet_index):
+            content_index.remove(name)
+    missing = content_index.missing(snippet_index)
+    if missing:
+        logger.info(f"Indexing contents of {len(missing)} snippets")
+        await index_snippet_contents(missing)
+    await persist_content_index()
+
+
+async def load_vector_index() -> None:
+    """Load the shared vector snapshot if it was built with the same embedder"""
+    global vector_index
+    try:
+        snapshot = await storage_backend.get(VECTOR_INDEX_SNAPSHOT_KEY)
+        loaded = await asyncio.to_thread(VectorIndex.from_snapshot, snapshot, VECTOR_INDEX_DIR)
+        if loaded.dimensions != embedder.dimensions:
+            raise ValueError(f"snapshot has {loaded.dimensions} dimensions, embedder {embedder.dimensions}")
+        changed = [name for name in await snippets_changed_since(loaded.written_at) if name in loaded]
+        logger.info(f"Loaded vector index snapshot with {len(loaded)} snippets, {len(changed)} changed since")
+    except (SnippetNotFoundError, ValueError) as e:
+        if not isinstance(e, SnippetNotFoundError):
+            logger.warning(f"Ignoring vector index snapshot: {e}")
+        loaded = VectorIndex(embedder.dimensions, VECTOR_INDEX_DIR)
+        loaded.loaded = True
+        changed = []
+    # Snippets saved while the snapshot was loading, or by other replicas after it was written, may be stale in it
+    saved_meanwhile = list(vector_index.ids)
+    vector_index = vector_indexer.index = loaded
+    stale = sorted(set(saved_meanwhile) | set(changed))
+    await index_snippet_contents(stale, vector_indexer.submit, vector_indexer.remove)
+
+
+async def persist_hot_set() -> None:
+    """Write this replica's hottest snippet names (and contents up to a cap) for new replicas to pre-warm from"""
+    if not snippet_cache.heat:
+        return
+    hot_set = snippet_cache.hot_set(HOT_SET_SIZE, HOT_SET_CONTENT_MAX_BYTES)
+    await storage_backend.put(HOT_SET_SNAPSHOT_KEY, await asyncio.to_thread(compress_hot_set, hot_set))
+    snippet_cache.decay(keep=4 * HOT_SET_SIZE)
+
+
+async def hot_set_persister() -> None:
+    while True:
+        await asyncio.sleep(HOT_SET_PERSIST_SECONDS)
+        try:
+            await persist_hot_set()
+        except Exception as e:
+            logger.warning(f"Could not persist the snippet hot set: {e}")
+
+
+async def prewarm_snippet_cache() -> None:
+    """Fill the snippet cache from the shared hot set within PREWARM_TIMEOUT_SECONDS; /ready fails until done"""
+    global cache_prewarmed
+    started = time.monotonic()
+    try:
+        hot_set = read_hot_set(await storage_backend.get(HOT_SET_SNAPSHOT_KEY))
+        # Changes other replicas made just before the snapshot may not have reached its writer yet
+        lag = RESOURCE_CHANGE_POLL_SECONDS + RESOURCE_CHANGE_COALESCE_SECONDS
+        changed = await resource_changes.changed_since(hot_set.get("written_at", 0) - lag)
+        changed_names = None if changed is None else {snippet_name_from_uri(uri) for uri in changed}
+        budget = max(0.0, PREWARM_TIMEOUT_SECONDS - (time.monotonic() - started))
+        restored, fetched = await prewarm(
+            snippet_cache, hot_set, read_snippet, changed_names, PREWARM_CONCURRENCY, budget
+        )
+        logger.info(f"Snippet cache pre-warmed in {time.monotonic() - started:.1f}s: "
+                    f"{restored} from the hot set snapshot, {fetched} fetched")
+    except SnippetNotFoundError:
+        logger.info("No snippet hot set to pre-warm from")
+    except Exception as e:
+        logger.warning(f"Snippet cache pre-warming failed: {e}")
+    finally:
+        cache_prewarmed = True
+
+
+async def persist_vector_index() -> None:
+    """Write the vector index snapshot if it changed since the last write"""
+    if not vector_index.loaded or not vector_index.dirty:
+        return
+    vector_index.dirty = False
+    # As with the content index, loaders catch up on changes recorded after this
+    vector_index.written_at = time.time()
+    try:
+        await storage_backend.put(VECTOR_INDEX_SNAPSHOT_KEY, await asyncio.to_thread(vector_index.snapshot_body))
+    except Exception:
+        vector_index.dirty = True
+        raise
+
+
+async def sync_vector_index() -> None:
+    """Load the snapshot once, drop deleted snippets, embed unseen ones, (re)train IVF partitions and persist changes"""
+    if not vector_index.loaded:
+        await load_vector_index()
+    if snippet_index.loaded:
+        for name in vector_index.absent(snippet_index):
+            vector_indexer.remove(name)
+    missing = vector_index.missing(snippet_index)
+    if missing:
+        logger.info(f"Embedding {len(missing)} snippets")
+        await index_snippet_contents(missing, vector_indexer.submit)
+        await vector_indexer.flush()
+    # Partition once the corpus is large enough, and again whenever it has doubled since
+    if VECTOR_IVF_LISTS and len(vector_index) >= VECTOR_IVF_LISTS * 39 and \
+            len(vector_index) >= 2 * vector_index.trained_size:
+        index = vector_index
+        partitions = await asyncio.to_thread(index.fit_partitions, VECTOR_IVF_LISTS)
+        index.use_partitions(*partitions)
+        logger.info(f"Trained {VECTOR_IVF_LISTS} vector partitions over {len(index)} snippets")
+    await persist_vector_index()
+
+
+async def snippet_index_maintainer() -> None:
+    """Bootstrap the name and content indexes, then reconcile them periodically"""
+    while True:
+        try:
+            await reconcile_snippet_index()
+            await sync_content_index()
+            await sync_vector_index()
+        except Exception as e:
+            logger.warning(f"Snippet index reconciliation failed: {e}")
+        await asyncio.sleep(SNIPPET_INDEX_RECONCILE_SECONDS if snippet_index.loaded else 5.0)
+
+
+def expire_sessions(now: float) -> int:
+    """Drop sessions without an open stream that are idle past their retention"""
+    expired = []
+    for session_id, session in sessions.items():
+        retention = SSE_RESUME_GRACE_SECONDS if session.transport == "sse" else STREAMABLE_HTTP_SESSION_TTL_SECONDS
+        if session.streams == 0 and now - session.last_seen > retention:
+            expired.append(session_id)
+    for session_id in expired:
+        del sessions[session_id]
+        subscriptions.drop_session(session_id)
+    return len(expired)
+
+
+async def session_reaper() -> None:
+    while True:
+        await asyncio.sleep(SESSION_REAPER_INTERVAL_SECONDS)
+        expired = expire_sessions(time.monotonic())
+        if expired:
+            logger.info(f"Expired {expired} idle sessions")
+
+
+# Drain configuration
+DRAIN_ON_SIGTERM = os.getenv("DRAIN_ON_SIGTERM", "true").lower() == "true"
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("DRAIN_TIMEOUT_SECONDS", "25"))
+DRAIN_RETRY_MIN_SECONDS = float(os.getenv("DRAIN_RETRY_MIN_SECONDS", "1"))
+DRAIN_RETRY_MAX_SECONDS = float(os.getenv("DRAIN_RETRY_MAX_SECONDS", "5"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Profiling endpoints (/admin/profile/*): off unless enabled, and only with ADMIN_TOKEN set
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+
+task_ages = TaskAges()
+profiling_active = False
+
+# In-process bearer token validation, for agents calling the server directly instead of through APIM
+JWT_AUTH_ENABLED = os.getenv("JWT_AUTH_ENABLED", "false").lower() == "true"
+JWT_JWKS_URL = os.getenv("JWT_JWKS_URL", "")
+JWT_ISSUER = os.getenv("JWT_ISSUER") or None
+JWT_AUDIENCE = os.getenv("JWT_AUDIENCE") or None
+JWT_ALGORITHMS = [a.strip() for a in os.getenv("JWT_ALGORITHMS", "RS256").split(",") if a.strip()]
+JWT_LEEWAY_SECONDS = float(os.getenv("JWT_LEEWAY_SECONDS", "60"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "3600"))
+JWKS_MIN_REFETCH_SECONDS = float(os.getenv("JWKS_MIN_REFETCH_SECONDS", "30"))
+
+if JWT_AUTH_ENABLED:
+    if not JWT_JWKS_URL:
+        raise RuntimeError("JWT_AUTH_ENABLED requires JWT_JWKS_URL")
+    token_validator: Optional[TokenValidator] = TokenValidator(
+        JwksCache(JWT_JWKS_URL, JWKS_REFRESH_SECONDS, JWKS_MIN_REFETCH_SECONDS),
+        issuer=JWT_ISSUER,
+        audience=JWT_AUDIENCE,
+        algorithms=JWT_ALGORITHMS,
+        leeway=JWT_LEEWAY_SECONDS,
+        cache_size=JWT_CACHE_SIZE,
+    )
+else:
+    token_validator = None
+
+# Inference routing over KAITO model replicas: a static list of base URLs, or a Service's
+# EndpointSlices ("namespace/name"), balanced by least outstanding requests with prompt-prefix affinity
+INFERENCE_ENDPOINTS = os.getenv("INFERENCE_ENDPOINTS", "")
+INFERENCE_SERVICE = os.getenv("INFERENCE_SERVICE", "")
+INFERENCE_MODEL = os.getenv("INFERENCE_MODEL", "")
+INFERENCE_HEALTH_PATH = os.getenv("INFERENCE_HEALTH_PATH", "/health")
+INFERENCE_HEALTH_INTERVAL_SECONDS = float(os.getenv("INFERENCE_HEALTH_INTERVAL_SECONDS", "5"))
+INFERENCE_DISCOVERY_INTERVAL_SECONDS = float(os.getenv("INFERENCE_DISCOVERY_INTERVAL_SECONDS", "15"))
+INFERENCE_EJECT_FAILURES = int(os.getenv("INFERENCE_EJECT_FAILURES", "3"))
+INFERENCE_EJECT_SECONDS = float(os.getenv("INFERENCE_EJECT_SECONDS", "30"))
+INFERENCE_AFFINITY_SLACK = int(os.getenv("INFERENCE_AFFINITY_SLACK", "4"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "120"))
+INFERENCE_MAX_TOKENS = int(os.getenv("INFERENCE_MAX_TOKENS", "512"))
+
+if INFERENCE_ENDPOINTS or INFERENCE_SERVICE:
+    inference_router: Optional[InferenceRouter] = InferenceRouter(
+        static_endpoints(INFERENCE_ENDPOINTS) if INFERENCE_ENDPOINTS else KubernetesEndpoints(INFERENCE_SERVICE),
+        health_path=INFERENCE_HEALTH_PATH,
+        health_interval=INFERENCE_HEALTH_INTERVAL_SECONDS,
+        discovery_interval=INFERENCE_DISCOVERY_INTERVAL_SECONDS,
+        eject_after=INFERENCE_EJECT_FAILURES,
+        eject_seconds=INFERENCE_EJECT_SECONDS,
+        affinity_slack=INFERENCE_AFFINITY_SLACK,
+        timeout=INFERENCE_TIMEOUT_SECONDS,
+    )
+else:
+    inference_router = None
+
+# Opt-in capture of message endpoint traffic and SSE stream lifecycle for benchmarks/replay.py;
+# "{hostname}" in the path is replaced so each replica writes its own file
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "")
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))
+TRAFFIC_CAPTURE_REDACT = os.getenv("TRAFFIC_CAPTURE_REDACT", "hash")
+TRAFFIC_CAPTURE_SALT = os.getenv("TRAFFIC_CAPTURE_SALT") or None
+TRAFFIC_CAPTURE_MAX_BYTES = int(os.getenv("TRAFFIC_CAPTURE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+if TRAFFIC_CAPTURE_PATH:
+    traffic_recorder: Optional[TrafficRecorder] = TrafficRecorder(
+        TRAFFIC_CAPTURE_PATH,
+        sample_rate=TRAFFIC_CAPTURE_SAMPLE_RATE,
+        redact=TRAFFIC_CAPTURE_REDACT,
+        max_bytes=TRAFFIC_CAPTURE_MAX_BYTES,
+        salt=TRAFFIC_CAPTURE_SALT,
+    )
+else:
+    traffic_recorder = None
+
+# Event loop monitor: lag histogram plus a watchdog that logs the stack of anything blocking the loop
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.25"))
+LOOP_SLOW_CALLBACK_SECONDS = float(os.getenv("LOOP_SLOW_CALLBACK_SECONDS", "0.1"))
+
+loop_monitor = LoopMonitor(LOOP_MONITOR_INTERVAL_SECONDS, LOOP_SLOW_CALLBACK_SECONDS)
+
+# Tool execution pools: the process pool defaults to the container's CPU quota
+TOOL_PROCESS_WORKERS = int(os.getenv("TOOL_PROCESS_WORKERS", "0")) or None
+TOOL_THREAD_WORKERS = int(os.getenv("TOOL_THREAD_WORKERS", "0")) or None
+TOOL_SHARED_MEMORY_MIN_BYTES = int(os.getenv("TOOL_SHARED_MEMORY_MIN_BYTES", "65536"))
+TOOL_EXECUTION_CLASSES = parse_execution_classes(os.getenv("TOOL_EXECUTION_CLASSES", ""))
+
+tool_executor = ToolExecutor(TOOL_PROCESS_WORKERS, TOOL_THREAD_WORKERS, TOOL_SHARED_MEMORY_MIN_BYTES)
+
+# Autoscaling signals (/scaling for KEDA's metrics-api scaler, mcp_scaling_* on /metrics)
+SCALING_WINDOW_SECONDS = float(os.getenv("SCALING_WINDOW_SECONDS", "60"))
+
+tool_calls_in_flight = scaling.InFlightGauge(INLINE, THREAD, PROCESS)
+scaling_window = scaling.CounterWindow(SCALING_WINDOW_SECONDS)
+requests_shed = 0
+
+# Weighted fair queueing of tool calls across clients (token claim, else gateway header, else session)
+FAIR_QUEUE_CONCURRENCY = int(os.getenv("FAIR_QUEUE_CONCURRENCY", "64"))
+FAIR_QUEUE_CLIENT_HEADER = os.getenv("FAIR_QUEUE_CLIENT_HEADER", "x-mcp-client-id")
+FAIR_QUEUE_CLIENT_CLAIM = os.getenv("FAIR_QUEUE_CLIENT_CLAIM", "sub")
+FAIR_QUEUE_WEIGHTS = parse_client_values(os.getenv("FAIR_QUEUE_WEIGHTS", ""))
+FAIR_QUEUE_RATE_PER_SECOND = float(os.getenv("FAIR_QUEUE_RATE_PER_SECOND", "0"))
+FAIR_QUEUE_RATES = parse_client_values(os.getenv("FAIR_QUEUE_RATES", ""))
+FAIR_QUEUE_BURST = float(os.getenv("FAIR_QUEUE_BURST", "0"))
+FAIR_QUEUE_MAX_QUEUED_PER_CLIENT = int(os.getenv("FAIR_QUEUE_MAX_QUEUED_PER_CLIENT", "1000"))
+
+fair_queue = FairQueue(
+    concurrency=FAIR_QUEUE_CONCURRENCY,
+    weights=FAIR_QUEUE_WEIGHTS,
+    rates=FAIR_QUEUE_RATES,
+    default_rate=FAIR_QUEUE_RATE_PER_SECOND,
+    burst=FAIR_QUEUE_BURST,
+    max_queued=FAIR_QUEUE_MAX_QUEUED_PER_CLIENT,
+)
+
+drain = DrainController(DRAIN_RETRY_MIN_SECONDS, DRAIN_RETRY_MAX_SECONDS)
+drain_task: Optional[asyncio.Task] = None
+
+
+async def drain_server() -> None:
+    """Take this replica out of rotation without dropping in-flight calls"""
+    logger.info(f"Drain started: readiness failing, new sessions refused, {drain.in_flight} calls in flight")
+    if not await drain.wait_idle(DRAIN_TIMEOUT_SECONDS):
+        logger.warning(f"Drain deadline reached with {drain.in_flight} calls still in flight")
+    # End every SSE stream with a jittered retry hint so clients reconnect elsewhere
+    for session in list(sessions.values()):
+        session.events.close()
+    if storage_backend:
+        try:
+            await persist_content_index()
+            await persist_vector_index()
+            await persist_hot_set()
+        except Exception as e:
+            logger.warning(f"Could not persist snippet indexes during drain: {e}")
+    drain.drained = True
+    logger.info("Drain complete")
+
+
+def start_drain() -> asyncio.Task:
+    global drain_task
+    if drain.begin():
+        drain_task = asyncio.create_task(drain_server())
+    return drain_task
+
+
+def install_sigterm_drain() -> None:
+    """
+    Drain on SIGTERM, then pass the signal on to the previous handler
+    (the HTTP server's graceful shutdown); a second SIGTERM skips the wait
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def hand_over(*_) -> None:
+        signal.signal(signal.SIGTERM, previous)
+        if callable(previous):
+            previous(signal.SIGTERM, None)
+        elif previous == signal.SIG_DFL:
+            signal.raise_signal(signal.SIGTERM)
+
+    def on_sigterm() -> None:
+        if drain.draining:
+            hand_over()
+        else:
+            logger.info("SIGTERM received, draining before shutdown")
+            start_drain().add_done_callback(hand_over)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: loop.call_soon_threadsafe(on_sigterm))
+
+
+async def startup() -> None:
+    global cache_prewarmed
+    if DRAIN_ON_SIGTERM:
+        install_sigterm_drain()
+    if PROFILING_ENABLED:
+        # Record task creation times so task dumps can show ages
+        task_ages.install(asyncio.get_running_loop())
+    if storage_backend:
+        background_tasks.append(asyncio.create_task(snippet_index_maintainer()))
+        # Share resource changes with the other replicas through storage
+        resource_changes.storage = storage_backend
+        background_tasks.append(asyncio.create_task(resource_changes.run()))
+        if SNIPPET_CACHE_MAX_BYTES > 0:
+            cache_prewarmed = False
+            background_tasks.append(asyncio.create_task(prewarm_snippet_cache()))
+            background_tasks.append(asyncio.create_task(hot_set_persister()))
+    background_tasks.append(asyncio.create_task(session_reaper()))
+    if token_validator is not None:
+        background_tasks.append(asyncio.create_task(token_validator.jwks.run()))
+    if inference_router is not None:
+        background_tasks.append(asyncio.create_task(inference_router.run()))
+    if traffic_recorder is not None:
+        background_tasks.append(asyncio.create_task(traffic_recorder.run()))
+    if LOOP_MONITOR_ENABLED:
+        background_tasks.append(asyncio.create_task(loop_monitor.run()))
+
+
+async def shutdown() -> None:
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await resource_changes.flush()
+    tool_executor.shutdown()
+    if inference_router is not None:
+        await inference_router.close()
+    if traffic_recorder is not None:
+        await traffic_recorder.close()
+    if storage_backend:
+        try:
+            await persist_content_index()
+            await vector_indexer.flush()
+            await persist_vector_index()
+            await persist_hot_set()
+        except Exception as e:
+            logger.warning(f"Could not persist snippet indexes on shutdown: {e}")
+
 # In-memory session storage (replace with Redis for production)
-sessions: Dict[str, Dict[str, Any]] = {}
+sessions: Dict[str, Session] = {}
+
+# Protocol versions: the legacy SSE transport default and the Streamable HTTP revision
+PROTOCOL_VERSION = "2024-11-05"
+SUPPORTED_PROTOCOL_VERSIONS = ("2024-11-05", "2025-03-26")
+
+# Streamable HTTP transport configuration
+STREAMABLE_HTTP_STATELESS = os.getenv("STREAMABLE_HTTP_STATELESS", "false").lower() == "true"
+STREAMABLE_HTTP_JSON_WAIT_SECONDS = float(os.getenv("STREAMABLE_HTTP_JSON_WAIT_SECONDS", "1.0"))
+STREAMABLE_HTTP_SESSION_TTL_SECONDS = float(os.getenv("STREAMABLE_HTTP_SESSION_TTL_SECONDS", "3600"))
+SSE_KEEPALIVE_SECONDS = 30.0
+MCP_SESSION_HEADER = "Mcp-Session-Id"
+
+# SSE resumability: events are kept in a per-session ring and replayed after Last-Event-ID
+SSE_REPLAY_BUFFER_EVENTS = int(os.getenv("SSE_REPLAY_BUFFER_EVENTS", "256"))
+SSE_RESUME_GRACE_SECONDS = float(os.getenv("SSE_RESUME_GRACE_SECONDS", "60"))
+SSE_RESPONSES_ON_STREAM = os.getenv("SSE_RESPONSES_ON_STREAM", "false").lower() == "true"
+SESSION_REAPER_INTERVAL_SECONDS = 10.0
+
+
+# Snippet resources: change notifications are coalesced and shared across replicas
+RESOURCE_CHANGE_COALESCE_SECONDS = float(os.getenv("RESOURCE_CHANGE_COALESCE_SECONDS", "0.5"))
+RESOURCE_CHANGE_POLL_SECONDS = float(os.getenv("RESOURCE_CHANGE_POLL_SECONDS", "2"))
+RESOURCE_CHANGE_RETENTION_SECONDS = float(os.getenv("RESOURCE_CHANGE_RETENTION_SECONDS", "600"))
+RESOURCE_NOT_FOUND = -32002
+
+subscriptions = SubscriptionRegistry()
+
+
+def publish_to_session(session_id: str, message: Dict[str, Any]) -> bool:
+    """Queue a server-to-client message on a session's stream; False if the session is gone"""
+    session = sessions.get(session_id)
+    if session is None:
+        return False
+    session.events.publish(message)
+    return True
+
+
+def notify_resources_updated(uris) -> None:
+    # Also how saves on other replicas reach this replica's snippet cache
+    for uri in uris:
+        snippet_name = snippet_name_from_uri(uri)
+        if snippet_name is not None:
+            snippet_cache.invalidate(snippet_name)
+    fan_out(uris, subscriptions, publish_to_session)
+
+
+resource_changes = ChangeFeed(
+    notify_resources_updated,
+    coalesce_seconds=RESOURCE_CHANGE_COALESCE_SECONDS,
+    poll_seconds=RESOURCE_CHANGE_POLL_SECONDS,
+    retention_seconds=RESOURCE_CHANGE_RETENTION_SECONDS,
+    replica_id=f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}",
+    remote=reindex_remote_changes,
+)
+
+
+def create_session(transport: str) -> str:
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = Session(transport, SSE_REPLAY_BUFFER_EVENTS)
+    return session_id
 
 
 @dataclass
 class MCPTool:
-    """MCP Tool definition"""
+    """MCP Tool definition
+
+    Tools with a ``handler`` run it on their execution class: ``inline`` on
+    the event loop, ``thread`` on the tool thread pool or ``process`` on the
+    tool process pool (CPU-bound work; the handler must be importable).
+    """
     name: str
     description: str
     inputSchema: Dict[str, Any]
+    execution: str = INLINE
+    handler: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+
+
+@dataclass
+class MCPToolResult:
+    """MCP Tool execution result"""
+    content: list
+    isError: bool = False
+
+
+# Define MCP tools
+TOOLS = [
+    MCPTool(
+        name="hello_mcp",
+        description="Hello world MCP tool.",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    ),
+    MCPTool(
+        name="get_snippet",
+        description="Retrieve a snippet by name from Azure Blob Storage.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "snippetname": {
+                    "type": "string",
+                    "description": "The name of the snippet to retrieve"
+                }
+            },
+            "required": ["snippetname"]
+        }
+    ),
+    MCPTool(
+        name="save_snippet",
+        description="Save a snippet with a name to Azure Blob Storage.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "snippetname": {
+                    "type": "string",
+                    "description": "The name of the snippet"
+                },
+                "snippet": {
+                    "type": "string",
+                    "description": "The content of the snippet"
+                }
+            },
+            "required": ["snippetname", "snippet"]
+        }
+    ),
+    MCPTool(
+        name="get_snippets",
+        description="Retrieve several snippets in one call; each name gets its own result or error.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "snippetnames": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": f"Names of the snippets to retrieve (at most {BULK_SNIPPET_MAX_ITEMS})"
+                }
+            },
+            "required": ["snippetnames"]
+        }
+    ),
+    MCPTool(
+        name="save_snippets",
+        description="Save several snippets in one call; each item gets its own result or error.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "snippets": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "snippetname": {"type": "string"},
+                            "snippet": {"type": "string"}
+                        },
+                        "required": ["snippetname", "snippet"]
+                    },
+                    "description": f"Snippets to save (at most {BULK_SNIPPET_MAX_ITEMS})"
+                }
+            },
+            "required": ["snippets"]
+        }
+    ),
+    MCPTool(
+        name="list_snippets",
+        description="List saved snippet names in alphabetical order, one page at a time.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "limit": {
+                    "type": "integer",
+                    "description": f"Maximum number of names to return (default {SNIPPET_PAGE_SIZE})"
+                },
+                "cursor": {
+                    "type": "string",
+                    "description": "The nextCursor value from a previous page"
+                }
+            },
+            "required": []
+        }
+    ),
+    MCPTool(
+        name="search_snippets",
+        description="Find saved snippet names starting with a prefix.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "prefix": {
+                    "type": "string",
+                    "description": "The snippet name prefix to match"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": f"Maximum number of names to return (default {SNIPPET_PAGE_SIZE})"
+                },
+                "cursor": {
+                    "type": "string",
+                    "description": "The nextCursor value from a previous page"
+                }
+            },
+            "required": ["prefix"]
+        }
+    ),
+    MCPTool(
+        name="find_snippets",
+        description="Full-text search over saved snippet contents, ranked by relevance.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Words or identifiers to search for"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": f"Maximum number of results (default {SNIPPET_SEARCH_LIMIT})"
+                }
+            },
+            "required": ["query"]
+        }
+    ),
+    MCPTool(
+        name="similar_snippets",
+        description="Find saved snippets similar to some code or text, or to another saved snippet.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "Code or text to compare against saved snippets"
+                },
+                "snippetname": {
+                    "type": "string",
+                    "description": "Find snippets similar to this saved snippet instead"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": f"Maximum number of results (default {SNIPPET_SEARCH_LIMIT})"
+                }
+            }
+        }
+    ),
+    MCPTool(
+        name="diff_snippets",
+        description="Unified diff between two snippet texts.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "original": {
+                    "type": "string",
+                    "description": "The original snippet content"
+                },
+                "modified": {
+                    "type": "string",
+                    "description": "The modified snippet content"
+                },
+                "context": {
+                    "type": "integer",
+                    "description": "Unchanged lines shown around each change (default 3)"
+                }
+            },
+            "required": ["original", "modified"]
+        },
+        execution=PROCESS,
+        handler=snippet_tools.diff_snippets
+    )
+]
+
+if inference_router is not None:
+    TOOLS.append(MCPTool(
+        name="ask_model",
+        description="Ask the model served by the cluster's KAITO workspace.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "prompt": {
+                    "type": "string",
+                    "description": "The question or instruction"
+                },
+                "system": {
+                    "type": "string",
+                    "description": "System prompt; calls sharing one are routed to the same replica where possible"
+                },
+                "max_tokens": {
+                    "type": "integer",
+                    "description": f"Maximum tokens to generate (default {INFERENCE_MAX_TOKENS})"
+                }
+            },
+            "required": ["prompt"]
+        }
+    ))
+
+# Operators can move a tool to another execution class, e.g. TOOL_EXECUTION_CLASSES=diff_snippets=thread
+for tool in TOOLS:
+    tool.execution = TOOL_EXECUTION_CLASSES.get(tool.name, tool.execution)
+TOOLS_BY_NAME = {tool.name: tool for tool in TOOLS}
+
+
+def list_snippet_names(arguments: Dict[str, Any], prefix: str) -> MCPToolResult:
+    """Page through the snippet name index"""
+    if not storage_backend:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Storage not configured"}],
+            isError=True
+        )
+    if not snippet_index.loaded:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Snippet index is still loading, retry shortly"}],
+            isError=True
+        )
+    try:
+        limit = int(arguments.get("limit") or SNIPPET_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return MCPToolResult(
+            content=[{"type": "text", "text": "limit must be an integer"}],
+            isError=True
+        )
+    limit = max(1, min(limit, SNIPPET_MAX_PAGE_SIZE))
+    names, next_cursor = snippet_index.prefix(str(prefix), cursor=arguments.get("cursor"), limit=limit)
+    return MCPToolResult(
+        content=[{
+            "type": "text",
+            "text": json.dumps({"snippets": names, "nextCursor": next_cursor})
+        }]
+    )
+
+
+def find_snippets(arguments: Dict[str, Any]) -> MCPToolResult:
+    """Rank snippets by BM25 relevance to a full-text query"""
+    query = arguments.get("query")
+    if not query:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "No query provided"}],
+            isError=True
+        )
+    if not storage_backend:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Storage not configured"}],
+            isError=True
+        )
+    if not content_index.loaded:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Content index is still loading, retry shortly"}],
+            isError=True
+        )
+    try:
+        limit = max(1, min(int(arguments.get("limit") or SNIPPET_SEARCH_LIMIT), SNIPPET_MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return MCPToolResult(
+            content=[{"type": "text", "text": "limit must be an integer"}],
+            isError=True
+        )
+    results = [
+        {"snippetname": name, "score": round(score, 4)}
+        for name, score in content_index.search(str(query), limit=limit)
+    ]
+    return MCPToolResult(
+        content=[{
+            "type": "text",
+            "text": json.dumps({"results": results})
+        }]
+    )
+
+
+async def similar_snippets(arguments: Dict[str, Any]) -> MCPToolResult:
+    """Rank snippets by embedding similarity to a text or to another snippet"""
+    text, snippet_name = arguments.get("text"), arguments.get("snippetname")
+    if not text and not snippet_name:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Provide text or snippetname"}],
+            isError=True
+        )
+    if not storage_backend:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Storage not configured"}],
+            isError=True
+        )
+    if not vector_index.loaded:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Vector index is still loading, retry shortly"}],
+            isError=True
+        )
+    try:
+        limit = max(1, min(int(arguments.get("limit") or SNIPPET_SEARCH_LIMIT), SNIPPET_MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return MCPToolResult(
+            content=[{"type": "text", "text": "limit must be an integer"}],
+            isError=True
+        )
+    if text:
+        query = (await embedder.embed([str(text)]))[0]
+    else:
+        # Reuse the stored vector rather than fetching and re-embedding the snippet
+        query = vector_index.vector(snippet_name)
+        if query is None:
+            return MCPToolResult(
+                content=[{"type": "text", "text": f"Snippet '{snippet_name}' is not indexed"}],
+                isError=True
+            )
+    # Runs in a worker thread, sharing one pass over the matrix with concurrent searches
+    matches = await vector_search.search(query, limit + 1)
+    results = [
+        {"snippetname": name, "score": round(score, 4)}
+        for name, score in matches if name != snippet_name
+    ][:limit]
+    return MCPToolResult(
+        content=[{
+            "type": "text",
+            "text": json.dumps({"results": results})
+        }]
+    )
+
+
+def storage_error_message(error: Exception, snippet_name: str) -> str:
+    """What get_snippet/save_snippet report for a failed storage operation"""
+    if isinstance(error, SnippetNotFoundError):
+        return f"Snippet '{snippet_name}' not found"
+    if isinstance(error, CircuitOpenError):
+        return "Storage temporarily unavailable, retry later"
+    return f"Storage error: {error}"
+
+
+async def run_bulk(items: list, operation: Callable[[Any], Any]) -> MCPToolResult:
+    """
+    Run ``operation`` on every item with bounded concurrency and report each outcome
+    Results keep the order of ``items``; the call is only an error as a whole if every item failed
+    """
+    if not storage_backend:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Storage not configured"}],
+            isError=True
+        )
+    if not isinstance(items, list) or not items:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Provide a non-empty list"}],
+            isError=True
+        )
+    if len(items) > BULK_SNIPPET_MAX_ITEMS:
+        return MCPToolResult(
+            content=[{"type": "text", "text": f"At most {BULK_SNIPPET_MAX_ITEMS} items per call"}],
+            isError=True
+        )
+    semaphore = asyncio.Semaphore(BULK_SNIPPET_CONCURRENCY)
+
+    async def run_one(item: Any) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await operation(item)
+            except ValueError as e:
+                return {"error": str(e)}
+            except Exception as e:
+                logger.error(f"Error in bulk snippet operation: {e}")
+                return {"error": str(e)}
+
+    results = await asyncio.gather(*(run_one(item) for item in items))
+    failed = sum(1 for result in results if "error" in result)
+    return MCPToolResult(
+        content=[{
+            "type": "text",
+            "text": json.dumps({"results": results, "succeeded": len(results) - failed, "failed": failed})
+        }],
+        isError=failed == len(results)
+    )
+
+
+async def get_snippets(arguments: Dict[str, Any]) -> MCPToolResult:
+    """Read many snippets concurrently; a repeated name is read once"""
+    reads: Dict[str, asyncio.Task] = {}
+
+    async def get_one(snippet_name: Any) -> Dict[str, Any]:
+        if not isinstance(snippet_name, str) or not snippet_name:
+            raise ValueError("Snippet names must be non-empty strings")
+        if snippet_name not in reads:
+            reads[snippet_name] = asyncio.ensure_future(load_snippet(snippet_name))
+        try:
+            return {"snippetname": snippet_name, "snippet": await asyncio.shield(reads[snippet_name])}
+        except StorageError as e:
+            return {"snippetname": snippet_name, "error": storage_error_message(e, snippet_name)}
 
+    return await run_bulk(arguments.get("snippetnames"), get_one)
 
-@dataclass
-class MCPToolResult:
-    """MCP Tool execution result"""
-    content: list
-    isError: bool = False
 
+async def save_snippets(arguments: Dict[str, Any]) -> MCPToolResult:
+    """Write many snippets concurrently; a name repeated in the same call is refused after its first use"""
+    claimed = set()
 
-# Define MCP tools
-TOOLS = [
-    MCPTool(
-        name="hello_mcp",
-        description="Hello world MCP tool.",
-        inputSchema={
-            "type": "object",
-            "properties": {},
-            "required": []
-        }
-    ),
-    MCPTool(
-        name="get_snippet",
-        description="Retrieve a snippet by name from Azure Blob Storage.",
-        inputSchema={
-            "type": "object",
-            "properties": {
-                "snippetname": {
-                    "type": "string",
-                    "description": "The name of the snippet to retrieve"
-                }
-            },
-            "required": ["snippetname"]
-        }
-    ),
-    MCPTool(
-        name="save_snippet",
-        description="Save a snippet with a name to Azure Blob Storage.",
-        inputSchema={
-            "type": "object",
-            "properties": {
-                "snippetname": {
-                    "type": "string",
-                    "description": "The name of the snippet"
-                },
-                "snippet": {
-                    "type": "string",
-                    "description": "The content of the snippet"
-                }
-            },
-            "required": ["snippetname", "snippet"]
-        }
-    )
-]
+    async def save_one(item: Any) -> Dict[str, Any]:
+        if not isinstance(item, dict) or not item.get("snippetname") or not item.get("snippet"):
+            raise ValueError("Each item needs a snippetname and a snippet")
+        snippet_name = item["snippetname"]
+        # Concurrent writes of one name would race, leaving whichever finished last
+        if snippet_name in claimed:
+            return {"snippetname": snippet_name, "error": "Snippet name repeated in this call"}
+        claimed.add(snippet_name)
+        try:
+            await store_snippet(snippet_name, item["snippet"])
+        except StorageError as e:
+            return {"snippetname": snippet_name, "error": storage_error_message(e, snippet_name)}
+        return {"snippetname": snippet_name, "saved": True}
+
+    return await run_bulk(arguments.get("snippets"), save_one)
+
+
+async def ask_model(arguments: Dict[str, Any]) -> MCPToolResult:
+    """Chat completion on the least loaded model replica, preferring the one holding the system prompt's cache"""
+    prompt = arguments.get("prompt")
+    if not prompt:
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Missing prompt"}],
+            isError=True
+        )
+    try:
+        max_tokens = int(arguments.get("max_tokens") or INFERENCE_MAX_TOKENS)
+    except (TypeError, ValueError):
+        return MCPToolResult(
+            content=[{"type": "text", "text": "max_tokens must be an integer"}],
+            isError=True
+        )
+    messages = [{"role": "user", "content": str(prompt)}]
+    if arguments.get("system"):
+        messages.insert(0, {"role": "system", "content": str(arguments["system"])})
+    body = {"messages": messages, "max_tokens": max_tokens}
+    if INFERENCE_MODEL:
+        body["model"] = INFERENCE_MODEL
+    try:
+        completion = await inference_router.post("/v1/chat/completions", body)
+        text = completion["choices"][0]["message"]["content"]
+    except InferenceError as e:
+        return MCPToolResult(
+            content=[{"type": "text", "text": str(e)}],
+            isError=True
+        )
+    except (KeyError, IndexError, TypeError):
+        return MCPToolResult(
+            content=[{"type": "text", "text": "Unexpected response from the model"}],
+            isError=True
+        )
+    return MCPToolResult(content=[{"type": "text", "text": text}])
 
 
 async def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> MCPToolResult:
-    """Execute an MCP tool"""
+    """Execute an MCP tool, counted as in flight for its execution class"""
+    tool = TOOLS_BY_NAME.get(tool_name)
+    with tool_calls_in_flight.track(tool.execution if tool is not None else INLINE):
+        return await run_tool(tool, tool_name, arguments)
+
+
+async def run_tool(tool: Optional[MCPTool], tool_name: str, arguments: Dict[str, Any]) -> MCPToolResult:
     try:
+        if tool is not None and tool.handler is not None:
+            result = await tool_executor.run(tool.execution, tool.handler, arguments)
+            return MCPToolResult(content=result["content"], isError=result.get("isError", False))
+
         if tool_name == "hello_mcp":
             return MCPToolResult(
                 content=[{
@@ -128,19 +1301,14 @@ async def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> MCPToolResu
                     isError=True
                 )
             
-            if not blob_service_client:
+            if not storage_backend:
                 return MCPToolResult(
                     content=[{"type": "text", "text": "Storage not configured"}],
                     isError=True
                 )
             
             try:
-                blob_client = blob_service_client.get_blob_client(
-                    container=SNIPPETS_CONTAINER,
-                    blob=f"{snippet_name}.json"
-                )
-                blob_data = blob_client.download_blob().readall()
-                snippet_content = blob_data.decode('utf-8')
+                snippet_content = await load_snippet(snippet_name)
                 
                 return MCPToolResult(
                     content=[{
@@ -148,6 +1316,16 @@ async def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> MCPToolResu
                         "text": snippet_content
                     }]
                 )
+            except SnippetNotFoundError:
+                return MCPToolResult(
+                    content=[{"type": "text", "text": f"Snippet '{snippet_name}' not found"}],
+                    isError=True
+                )
+            except CircuitOpenError:
+                return MCPToolResult(
+                    content=[{"type": "text", "text": "Storage temporarily unavailable, retry later"}],
+                    isError=True
+                )
             except Exception as e:
                 logger.error(f"Error retrieving snippet: {e}")
                 return MCPToolResult(
@@ -171,18 +1349,14 @@ async def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> MCPToolResu
                     isError=True
                 )
             
-            if not blob_service_client:
+            if not storage_backend:
                 return MCPToolResult(
                     content=[{"type": "text", "text": "Storage not configured"}],
                     isError=True
                 )
             
             try:
-                blob_client = blob_service_client.get_blob_client(
-                    container=SNIPPETS_CONTAINER,
-                    blob=f"{snippet_name}.json"
-                )
-                blob_client.upload_blob(snippet_content.encode('utf-8'), overwrite=True)
+                await store_snippet(snippet_name, snippet_content)
                 
                 return MCPToolResult(
                     content=[{
@@ -190,6 +1364,11 @@ async def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> MCPToolResu
                         "text": f"Snippet '{snippet_name}' saved successfully"
                     }]
                 )
+            except CircuitOpenError:
+                return MCPToolResult(
+                    content=[{"type": "text", "text": "Storage temporarily unavailable, retry later"}],
+                    isError=True
+                )
             except Exception as e:
                 logger.error(f"Error saving snippet: {e}")
                 return MCPToolResult(
@@ -197,6 +1376,24 @@ async def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> MCPToolResu
                     isError=True
                 )
         
+        elif tool_name == "get_snippets":
+            return await get_snippets(arguments)
+
+        elif tool_name == "save_snippets":
+            return await save_snippets(arguments)
+
+        elif tool_name in ("list_snippets", "search_snippets"):
+            return list_snippet_names(arguments, arguments.get("prefix", "") if tool_name == "search_snippets" else "")
+        
+        elif tool_name == "find_snippets":
+            return find_snippets(arguments)
+
+        elif tool_name == "similar_snippets":
+            return await similar_snippets(arguments)
+
+        elif tool_name == "ask_model" and inference_router is not None:
+            return await ask_model(arguments)
+
         else:
             return MCPToolResult(
                 content=[{"type": "text", "text": f"Unknown tool: {tool_name}"}],
@@ -211,10 +1408,337 @@ async def execute_tool(tool_name: str, arguments: Dict[str, Any]) -> MCPToolResu
         )
 
 
+# Methods whose results depend only on server configuration
+CACHEABLE_METHODS = ("initialize", "tools/list")
+
+
+def cacheable_response(request: Request, request_id: Any, result: Dict[str, Any]) -> Response:
+    """JSON-RPC response with a weak ETag over the result, honoring If-None-Match
+
+    Only the result is hashed so the tag is stable across request ids and
+    content encodings.
+    """
+    digest = hashlib.sha256(json.dumps(result, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+    etag = f'W/"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content={"jsonrpc": "2.0", "result": result, "id": request_id}, headers=headers)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    health = {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    if LOOP_MONITOR_ENABLED:
+        health["event_loop"] = loop_monitor.status()
+    health["tool_pools"] = tool_executor.status()
+    health["fair_queue"] = fair_queue.status()
+    health["snippet_cache"] = snippet_cache.status()
+    if token_validator is not None:
+        health["auth"] = token_validator.status()
+    if inference_router is not None:
+        health["inference"] = inference_router.status()
+    if traffic_recorder is not None:
+        health["traffic_capture"] = traffic_recorder.status()
+    return health
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return Response(
+        content=loop_monitor.prometheus() + tool_executor.prometheus() + fair_queue.prometheus()
+        + scaling.prometheus(current_scaling_signals())
+        + (inference_router.prometheus() if inference_router is not None else ""),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+def current_scaling_signals() -> Dict[str, Any]:
+    pools = tool_executor.metrics.values()
+    return scaling.scaling_signals(
+        sessions,
+        tool_calls_in_flight.counts,
+        sum(pool.queued for pool in pools) + fair_queue.queued,
+        {
+            "shed": requests_shed,
+            "queue_seconds": sum(pool.queue_seconds for pool in pools),
+            "pool_calls": sum(pool.completed for pool in pools),
+        },
+        scaling_window,
+    )
+
+
+@app.get("/scaling")
+async def scaling_status():
+    """Load signals of this replica for KEDA's metrics-api scaler (see k8s/mcp-server-scaledobject.yaml)"""
+    return current_scaling_signals()
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint - fails while draining, pre-warming the cache or while the storage circuit is open"""
+    checks = {"drain": "draining" if drain.draining else "serving"}
+    if storage_backend:
+        checks["storage"] = storage_backend.breaker.state
+        checks["cache"] = "warm" if cache_prewarmed else "warming"
+    ready = not drain.draining and cache_prewarmed and all(state != CircuitBreaker.OPEN for state in checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    )
+
+
+def admin_authorized(request: Request) -> bool:
+    """Whether the caller holds ADMIN_TOKEN; with no token configured the admin endpoints are closed"""
+    if ADMIN_TOKEN is None:
+        return False
+    presented = request.headers.get("authorization", "").encode()
+    return hmac.compare_digest(presented, f"Bearer {ADMIN_TOKEN}".encode())
+
+
+async def authentication_refusal(request: Request) -> Optional[JSONResponse]:
+    """
+    Error response unless the request carries a valid bearer token (when JWT auth is enabled)
+    On success the token's claims and the caller's fair-queue identity are bound to the request
+    """
+    claims = None
+    if token_validator is not None:
+        authorization = request.headers.get("authorization")
+        try:
+            claims = await token_validator.validate(bearer_token(authorization))
+        except TokenError as e:
+            challenge = 'Bearer error="invalid_token"' if authorization else "Bearer"
+            return JSONResponse(
+                status_code=401,
+                content={"error": "invalid_token", "error_description": str(e)},
+                headers={"WWW-Authenticate": challenge}
+            )
+        except JwksUnavailableError:
+            return JSONResponse(
+                status_code=503, content={"error": "signing keys unavailable"}, headers={"Retry-After": "5"}
+            )
+        request_claims.set(claims)
+    request_client.set(client_identity(claims, FAIR_QUEUE_CLIENT_CLAIM, request.headers.get(FAIR_QUEUE_CLIENT_HEADER)))
+    return None
+
+
+@app.post("/admin/drain")
+async def admin_drain(request: Request):
+    """Start draining this replica, e.g. before a rollout or node maintenance"""
+    if not admin_authorized(request):
+        return JSONResponse(status_code=401, content={"error": "unauthorized"})
+    start_drain()
+    return JSONResponse(status_code=202, content=drain.status())
+
+
+@app.get("/admin/drain")
+async def admin_drain_status(request: Request):
+    """Drain progress"""
+    if not admin_authorized(request):
+        return JSONResponse(status_code=401, content={"error": "unauthorized"})
+    return drain.status()
+
+
+def profiling_refusal(request: Request) -> Optional[JSONResponse]:
+    """Error response unless profiling is enabled and the caller holds the admin token"""
+    if not PROFILING_ENABLED:
+        return JSONResponse(status_code=404, content={"error": "profiling is disabled"})
+    if not admin_authorized(request):
+        return JSONResponse(status_code=401, content={"error": "unauthorized"})
+    return None
+
+
+def profile_artifact(content: str, kind: str, extension: str, media_type: str = "text/plain") -> Response:
+    """Profile as a download named after the pod and capture time"""
+    filename = f"{kind}-{socket.gethostname()}-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.{extension}"
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
+
+
+async def run_exclusive_profile(work) -> Any:
+    """Run one time-bounded profile at a time; None if another one is running"""
+    global profiling_active
+    if profiling_active:
+        work.close()
+        return None
+    profiling_active = True
+    try:
+        return await work
+    finally:
+        profiling_active = False
+
+
+@app.get("/admin/profile/cpu")
+async def admin_profile_cpu(request: Request, seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sampling CPU profile of the event loop thread in flamegraph folded format"""
+    refusal = profiling_refusal(request)
+    if refusal:
+        return refusal
+    seconds = min(max(seconds, 0.1), PROFILING_MAX_SECONDS)
+    folded = await run_exclusive_profile(cpu_profile(seconds, max(interval_ms, 1.0) / 1000))
+    if folded is None:
+        return JSONResponse(status_code=409, content={"error": "a profile is already running"})
+    return profile_artifact(folded, "cpu", "folded")
+
+
+@app.get("/admin/profile/memory")
+async def admin_profile_memory(request: Request, seconds: float = 10.0, top: int = 50):
+    """tracemalloc snapshot diff over a time window, largest changes first"""
+    refusal = profiling_refusal(request)
+    if refusal:
+        return refusal
+    seconds = min(max(seconds, 0.1), PROFILING_MAX_SECONDS)
+    diff = await run_exclusive_profile(allocation_diff(seconds, top))
+    if diff is None:
+        return JSONResponse(status_code=409, content={"error": "a profile is already running"})
+    return profile_artifact(diff, "memory", "txt")
+
+
+@app.get("/admin/profile/tasks")
+async def admin_profile_tasks(request: Request):
+    """Stacks and ages of every asyncio task"""
+    refusal = profiling_refusal(request)
+    if refusal:
+        return refusal
+    return profile_artifact(dump_tasks(task_ages), "tasks", "txt")
+
+
+@app.get("/admin/profile/loop-lag")
+async def admin_profile_loop_lag(request: Request, seconds: float = 1.0):
+    """Event loop scheduling lag measured over a short window"""
+    refusal = profiling_refusal(request)
+    if refusal:
+        return refusal
+    lag = await measure_loop_lag(min(max(seconds, 0.1), PROFILING_MAX_SECONDS))
+    return profile_artifact(json.dumps(lag, indent=2), "loop-lag", "json", "application/json")
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+# Shared by every idle stream rather than encoded per keepalive
+KEEPALIVE_EVENT = b": keepalive\n\n"
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    StreamingResponse for long-lived SSE streams
+    Streams on the request's own task and cancels it on disconnect from a watcher task, instead of
+    holding a task group with its cancel scopes for every open stream
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        streaming = asyncio.current_task()
+        disconnected = False
+
+        async def watch_for_disconnect() -> None:
+            nonlocal disconnected
+            await self.listen_for_disconnect(receive)
+            disconnected = True
+            streaming.cancel()
+
+        watcher = asyncio.create_task(watch_for_disconnect())
+        try:
+            await self.stream_response(send)
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+            streaming.uncancel()
+        finally:
+            watcher.cancel()
+
+
+async def session_events(session_id: str, after: int, opening: Optional[str] = None):
+    """
+    Yield a session's events after sequence ``after`` as SSE events with ids, after ``opening`` if given
+    Sends keepalives while idle; ends if the client fell behind the replay buffer
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        return
+    events = session.events
+    session.streams += 1
+    if traffic_recorder is not None:
+        traffic_recorder.session_opened(session_id, session.transport, resumed=after > 0)
+    try:
+        if opening is not None:
+            yield opening
+        while sessions.get(session_id) is session:
+            session.last_seen = time.monotonic()
+            missed = events.since(after)
+            if missed is None:
+                logger.warning("SSE client of session %s fell behind the replay buffer", session_id,
+                               extra={"session_id": session_id})
+                break
+            for seq, data in missed:
+                yield f"id: {format_event_id(session_id, seq)}\ndata: {data}\n\n"
+                after = seq
+                session.delivered = max(session.delivered, seq)
+            # Wait for messages with timeout, sending a keepalive when idle
+            if events.closed:
+                # Ask the client to reconnect (to another replica) after a jittered delay
+                yield f"retry: {int(drain.retry_after() * 1000)}\n\n"
+                break
+            if not missed and not await events.wait(after, SSE_KEEPALIVE_SECONDS):
+                yield KEEPALIVE_EVENT
+    finally:
+        session.streams -= 1
+        session.last_seen = time.monotonic()
+        if traffic_recorder is not None:
+            traffic_recorder.session_closed(session_id)
+        logger.info("SSE stream closed for session %s", session_id, extra={"session_id": session_id})
+
+
+def fair_queue_client(session_id: Optional[str]) -> str:
+    """Fair-queue identity of a call: the caller's, else its session's if that session exists here"""
+    identity = request_client.get()
+    if identity:
+        return identity
+    # Any string can be sent as a session id, so only live ones may name a client
+    if session_id and session_id in sessions:
+        return safe_identity(session_id)
+    return ANONYMOUS
+
+
+def rate_limited_error(request_id: Any, error: RateLimitedError) -> Dict[str, Any]:
+    """JSON-RPC error for a call the fair queue refused; counted as shed load, like calls refused while draining"""
+    global requests_shed
+    requests_shed += 1
+    response = jsonrpc_error(request_id, -32000, str(error))
+    response["error"]["data"] = {"retryAfter": round(error.retry_after, 3)}
+    return response
+
+
+def draining_response() -> JSONResponse:
+    """503 telling the client to retry (against another replica) after a jittered delay"""
+    global requests_shed
+    requests_shed += 1
+    return JSONResponse(
+        status_code=503,
+        content=jsonrpc_error(None, -32000, "Server is draining, reconnect to another replica"),
+        headers={"Retry-After": str(max(1, round(drain.retry_after())))}
+    )
+
+
+def resumable_position(request: Request, session_id: Optional[str] = None) -> Optional[Tuple[str, int]]:
+    """Session and sequence to resume from per Last-Event-ID, if still replayable"""
+    resume = parse_event_id(request.headers.get("last-event-id"))
+    if resume is None or resume[0] not in sessions or (session_id is not None and resume[0] != session_id):
+        return None
+    if sessions[resume[0]].events.since(resume[1]) is None:
+        return None
+    return resume
 
 
 @app.get("/runtime/webhooks/mcp/sse")
@@ -223,154 +1747,325 @@ async def mcp_sse_endpoint(request: Request):
     SSE endpoint for MCP protocol
     Establishes a long-lived connection for server-sent events
     """
-    session_id = str(uuid.uuid4())
-    logger.info(f"New SSE session established: {session_id}")
+    refusal = await authentication_refusal(request)
+    if refusal is not None:
+        return refusal
+    if drain.draining:
+        return draining_response()
+    resume = resumable_position(request)
+    if resume is not None:
+        session_id, after = resume
+        logger.info("Resuming SSE session %s after event %d", session_id, after, extra={"session_id": session_id})
+    else:
+        # Store session
+        session_id, after = create_session("sse"), 0
+        logger.info("New SSE session established: %s", session_id, extra={"session_id": session_id})
     
-    # Store session
-    sessions[session_id] = {
-        "created_at": datetime.utcnow().isoformat(),
-        "message_queue": asyncio.Queue()
-    }
-    
-    async def event_generator():
+    # Connection event with the message endpoint, then missed and new events with keepalives; its id lets
+    # clients resume from the start. The session outlives the stream by SSE_RESUME_GRACE_SECONDS
+    opening = f"id: {format_event_id(session_id, after)}\ndata: message?sessionId={session_id}\n\n"
+    return EventStreamResponse(
+        session_events(session_id, after, opening), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+def jsonrpc_error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "error": {"code": code, "message": message}, "id": request_id}
+
+
+async def handle_jsonrpc(body: Any, session_id: Optional[str] = None) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Dispatch a single JSON-RPC 2.0 message, on behalf of ``session_id`` if it has one
+    Returns the HTTP status and response; notifications produce no response
+    """
+    request_id = body.get("id") if isinstance(body, dict) else None
+    try:
+        if not isinstance(body, dict) or body.get("jsonrpc") != "2.0":
+            return 400, jsonrpc_error(request_id, -32600, "Invalid Request")
+
+        method = body.get("method")
+        params = body.get("params") or {}
+
+        # Notifications (e.g. notifications/initialized) are acknowledged without a response
+        if isinstance(method, str) and method.startswith("notifications/"):
+            return 202, None
+
+        tool = params.get("name") if method == "tools/call" and isinstance(params, dict) else None
+        started = time.perf_counter()
+        with drain.track(), loop_monitor.label(method=method, tool=tool):
+            status, response = await dispatch_method(method, params, request_id, session_id)
+        if request_logger.isEnabledFor(logging.INFO):
+            latency_ms = round((time.perf_counter() - started) * 1000, 3)
+            request_logger.info(
+                "%s completed with %d in %.1fms", method, status, latency_ms,
+                extra={"request_id": request_id, "method": method, "tool": tool, "status": status,
+                       "latency_ms": latency_ms}
+            )
+        return status, response
+
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+        return 500, jsonrpc_error(request_id, -32603, f"Internal error: {str(e)}")
+
+
+async def dispatch_method(
+    method: Any, params: Dict[str, Any], request_id: Any, session_id: Optional[str] = None
+) -> Tuple[int, Dict[str, Any]]:
+    """Run a JSON-RPC method and build its response"""
+    # Handle initialize
+    if method == "initialize":
+        requested = params.get("protocolVersion")
+        result = {
+            "protocolVersion": requested if requested in SUPPORTED_PROTOCOL_VERSIONS else PROTOCOL_VERSION,
+            "capabilities": {
+                "tools": {},
+                "resources": {"subscribe": True, "listChanged": False}
+            },
+            "serverInfo": {
+                "name": "mcp-server",
+                "version": "1.0.0"
+            }
+        }
+        return 200, {"jsonrpc": "2.0", "result": result, "id": request_id}
+
+    # Handle tools/list
+    elif method == "tools/list":
+        tools_list = [
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "inputSchema": tool.inputSchema
+            }
+            for tool in TOOLS
+        ]
+        return 200, {"jsonrpc": "2.0", "result": {"tools": tools_list}, "id": request_id}
+
+    # Handle tools/call
+    elif method == "tools/call":
+        tool_name = params.get("name")
+        arguments = params.get("arguments", {})
+
+        # Execute the tool once the fair queue admits this client's call
         try:
-            # Send initial connection event with message endpoint
-            message_url = f"message?sessionId={session_id}"
-            yield f"data: {message_url}\n\n"
-            
-            # Keep connection alive and send any queued messages
-            while True:
-                if session_id not in sessions:
-                    break
-                
-                try:
-                    # Wait for messages with timeout
-                    message = await asyncio.wait_for(
-                        sessions[session_id]["message_queue"].get(),
-                        timeout=30.0
-                    )
-                    yield f"data: {json.dumps(message)}\n\n"
-                except asyncio.TimeoutError:
-                    # Send keepalive
-                    yield ": keepalive\n\n"
-                    
-        except asyncio.CancelledError:
-            logger.info(f"SSE connection cancelled for session {session_id}")
-        finally:
-            # Cleanup session
-            if session_id in sessions:
-                del sessions[session_id]
-            logger.info(f"SSE session closed: {session_id}")
-    
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
+            async with fair_queue.slot(fair_queue_client(session_id)):
+                result = await execute_tool(tool_name, arguments)
+        except RateLimitedError as e:
+            return 429, rate_limited_error(request_id, e)
+        return 200, {"jsonrpc": "2.0", "result": asdict(result), "id": request_id}
+
+    elif method in ("resources/list", "resources/read", "resources/subscribe", "resources/unsubscribe"):
+        return await dispatch_resource_method(method, params, request_id, session_id)
+
+    else:
+        return 400, jsonrpc_error(request_id, -32601, f"Method not found: {method}")
+
+
+async def dispatch_resource_method(
+    method: str, params: Dict[str, Any], request_id: Any, session_id: Optional[str]
+) -> Tuple[int, Dict[str, Any]]:
+    """Snippets as MCP resources (snippet://<name>), with update subscriptions"""
+    if method == "resources/list":
+        if not storage_backend:
+            return 200, {"jsonrpc": "2.0", "result": {"resources": []}, "id": request_id}
+        if not snippet_index.loaded:
+            return 503, jsonrpc_error(request_id, -32000, "Snippet index is still loading, retry shortly")
+        names, next_cursor = snippet_index.prefix("", cursor=params.get("cursor"), limit=SNIPPET_PAGE_SIZE)
+        result = {
+            "resources": [{"uri": snippet_uri(name), "name": name, "mimeType": "text/plain"} for name in names]
         }
-    )
+        if next_cursor:
+            result["nextCursor"] = next_cursor
+        return 200, {"jsonrpc": "2.0", "result": result, "id": request_id}
+
+    uri = params.get("uri")
+    snippet_name = snippet_name_from_uri(uri)
+    if snippet_name is None:
+        return 400, jsonrpc_error(request_id, -32602, f"Invalid snippet resource URI: {uri}")
+
+    if method == "resources/read":
+        if not storage_backend:
+            return 503, jsonrpc_error(request_id, -32000, "Storage not configured")
+        try:
+            text = await load_snippet(snippet_name)
+        except SnippetNotFoundError:
+            return 404, jsonrpc_error(request_id, RESOURCE_NOT_FOUND, f"Resource not found: {uri}")
+        except CircuitOpenError:
+            return 503, jsonrpc_error(request_id, -32000, "Storage temporarily unavailable, retry later")
+        contents = [{"uri": uri, "mimeType": "text/plain", "text": text}]
+        return 200, {"jsonrpc": "2.0", "result": {"contents": contents}, "id": request_id}
+
+    # Updates are pushed over the session's stream, so subscribing needs a session
+    if session_id not in sessions:
+        return 400, jsonrpc_error(request_id, -32600, f"{method} requires a session")
+    if method == "resources/subscribe":
+        subscriptions.subscribe(session_id, uri)
+    else:
+        subscriptions.unsubscribe(session_id, uri)
+    return 200, {"jsonrpc": "2.0", "result": {}, "id": request_id}
 
 
 @app.post("/runtime/webhooks/mcp/message")
 async def mcp_message_endpoint(request: Request):
     """
     Message endpoint for MCP protocol
-    Handles JSON-RPC 2.0 requests
+    Handles JSON-RPC 2.0 requests, notifications and batches; with
+    SSE_RESPONSES_ON_STREAM responses go to the session's resumable SSE stream
     """
+    arrived = time.monotonic()
+    refusal = await authentication_refusal(request)
+    if refusal is not None:
+        return refusal
     try:
         body = await request.json()
-        logger.info(f"Received MCP message: {json.dumps(body)[:200]}")
-        
-        jsonrpc_version = body.get("jsonrpc")
-        method = body.get("method")
-        params = body.get("params", {})
-        request_id = body.get("id")
-        
-        if jsonrpc_version != "2.0":
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32600, "message": "Invalid Request"},
-                    "id": request_id
-                }
-            )
-        
-        # Handle initialize
-        if method == "initialize":
-            response = {
-                "jsonrpc": "2.0",
-                "result": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {
-                        "tools": {}
-                    },
-                    "serverInfo": {
-                        "name": "mcp-server",
-                        "version": "1.0.0"
-                    }
-                },
-                "id": request_id
-            }
-            return JSONResponse(content=response)
-        
-        # Handle tools/list
-        elif method == "tools/list":
-            tools_list = [
-                {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "inputSchema": tool.inputSchema
-                }
-                for tool in TOOLS
-            ]
-            
-            response = {
-                "jsonrpc": "2.0",
-                "result": {
-                    "tools": tools_list
-                },
-                "id": request_id
-            }
-            return JSONResponse(content=response)
-        
-        # Handle tools/call
-        elif method == "tools/call":
-            tool_name = params.get("name")
-            arguments = params.get("arguments", {})
-            
-            # Execute the tool
-            result = await execute_tool(tool_name, arguments)
-            
-            response = {
-                "jsonrpc": "2.0",
-                "result": asdict(result),
-                "id": request_id
-            }
-            return JSONResponse(content=response)
-        
-        else:
-            return JSONResponse(
-                status_code=400,
-                content={
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32601, "message": f"Method not found: {method}"},
-                    "id": request_id
-                }
-            )
-    
     except Exception as e:
         logger.error(f"Error processing message: {e}")
-        return JSONResponse(
-            status_code=500,
-            content={
-                "jsonrpc": "2.0",
-                "error": {"code": -32603, "message": f"Internal error: {str(e)}"},
-                "id": body.get("id") if 'body' in locals() else None
-            }
-        )
+        return JSONResponse(status_code=500, content=jsonrpc_error(None, -32603, f"Internal error: {str(e)}"))
+    session_id = request.query_params.get("sessionId")
+    bind_log_context(session_id=session_id)
+    if request_logger.isEnabledFor(logging.DEBUG):
+        request_logger.debug("Received MCP message: %s", json.dumps(body)[:200])
+
+    response = await message_response(request, body, session_id)
+    if traffic_recorder is not None:
+        traffic_recorder.request(session_id, body, arrived, response.status_code)
+    return response
+
+
+async def message_response(request: Request, body: Any, session_id: Optional[str]) -> Response:
+    """Dispatch a message endpoint request, answering directly or on the session's stream"""
+    stream_session = sessions.get(session_id or "") if SSE_RESPONSES_ON_STREAM else None
+
+    # Batches are dispatched concurrently; responses keep request order
+    if isinstance(body, list):
+        if not body:
+            return JSONResponse(status_code=400, content=jsonrpc_error(None, -32600, "Invalid Request"))
+        results = await asyncio.gather(*(handle_jsonrpc(message, session_id) for message in body))
+        responses = [response for _, response in results if response is not None]
+        if stream_session is not None and responses:
+            stream_session.events.publish(responses)
+            return Response(status_code=202)
+        return JSONResponse(content=responses) if responses else Response(status_code=202)
+
+    status, response = await handle_jsonrpc(body, session_id)
+    if stream_session is not None and response is not None:
+        stream_session.events.publish(response)
+        return Response(status_code=202)
+    if response is None:
+        return Response(status_code=status)
+    if status == 200 and body.get("method") in CACHEABLE_METHODS:
+        return cacheable_response(request, response["id"], response["result"])
+    return JSONResponse(status_code=status, content=response)
+
+
+def streamable_session_error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content=jsonrpc_error(None, -32000, message))
+
+
+async def stream_responses(work: asyncio.Future):
+    """SSE stream that keeps the connection alive until the responses are ready"""
+    while True:
+        done, _ = await asyncio.wait({work}, timeout=SSE_KEEPALIVE_SECONDS)
+        if done:
+            break
+        yield KEEPALIVE_EVENT
+    for _, response in work.result():
+        if response is not None:
+            yield f"data: {json.dumps(response)}\n\n"
+
+
+@app.post("/runtime/webhooks/mcp")
+@app.post("/runtime/webhooks/mcp/")
+async def mcp_streamable_post(request: Request):
+    """
+    Streamable HTTP endpoint for MCP protocol
+    Answers with JSON when results are ready within STREAMABLE_HTTP_JSON_WAIT_SECONDS,
+    otherwise upgrades to an SSE stream if the client accepts one
+    """
+    refusal = await authentication_refusal(request)
+    if refusal is not None:
+        return refusal
+    try:
+        body = await request.json()
+    except Exception:
+        return JSONResponse(status_code=400, content=jsonrpc_error(None, -32700, "Parse error"))
+    messages = body if isinstance(body, list) else [body]
+    if not messages:
+        return JSONResponse(status_code=400, content=jsonrpc_error(None, -32600, "Invalid Request"))
+
+    headers, session_id = {}, None
+    if not STREAMABLE_HTTP_STATELESS:
+        session_id = request.headers.get(MCP_SESSION_HEADER)
+        if any(isinstance(m, dict) and m.get("method") == "initialize" for m in messages):
+            if drain.draining:
+                return draining_response()
+            session_id = create_session("streamable-http")
+            logger.info("New Streamable HTTP session: %s", session_id, extra={"session_id": session_id})
+        elif session_id is None:
+            return streamable_session_error(400, f"Missing {MCP_SESSION_HEADER} header")
+        elif session_id not in sessions:
+            return streamable_session_error(404, "Session not found")
+        else:
+            sessions[session_id].last_seen = time.monotonic()
+        headers[MCP_SESSION_HEADER] = session_id
+        bind_log_context(session_id=session_id)
+
+    work = asyncio.ensure_future(asyncio.gather(*(handle_jsonrpc(message, session_id) for message in messages)))
+    if "text/event-stream" in request.headers.get("accept", ""):
+        done, _ = await asyncio.wait({work}, timeout=STREAMABLE_HTTP_JSON_WAIT_SECONDS)
+        if not done:
+            return StreamingResponse(
+                stream_responses(work), media_type="text/event-stream", headers={**SSE_HEADERS, **headers}
+            )
+    results = await work
+
+    responses = [response for _, response in results if response is not None]
+    if not responses:
+        return Response(status_code=202, headers=headers)
+    if isinstance(body, list):
+        return JSONResponse(content=responses, headers=headers)
+    status, response = results[0]
+    if status == 200 and body.get("method") in CACHEABLE_METHODS:
+        cached = cacheable_response(request, response["id"], response["result"])
+        cached.headers.update(headers)
+        return cached
+    return JSONResponse(status_code=status, content=response, headers=headers)
+
+
+@app.get("/runtime/webhooks/mcp")
+@app.get("/runtime/webhooks/mcp/")
+async def mcp_streamable_get(request: Request):
+    """Streamable HTTP server-to-client stream for a session"""
+    if STREAMABLE_HTTP_STATELESS:
+        return Response(status_code=405, headers={"Allow": "POST"})
+    refusal = await authentication_refusal(request)
+    if refusal is not None:
+        return refusal
+    session_id = request.headers.get(MCP_SESSION_HEADER)
+    if session_id is None:
+        return streamable_session_error(400, f"Missing {MCP_SESSION_HEADER} header")
+    if session_id not in sessions:
+        return streamable_session_error(404, "Session not found")
+    if drain.draining:
+        return draining_response()
+    resume = resumable_position(request, session_id)
+    after = resume[1] if resume is not None else sessions[session_id].delivered
+    return EventStreamResponse(session_events(session_id, after), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.delete("/runtime/webhooks/mcp")
+@app.delete("/runtime/webhooks/mcp/")
+async def mcp_streamable_delete(request: Request):
+    """Terminate a Streamable HTTP session"""
+    if STREAMABLE_HTTP_STATELESS:
+        return Response(status_code=405, headers={"Allow": "POST"})
+    refusal = await authentication_refusal(request)
+    if refusal is not None:
+        return refusal
+    session_id = request.headers.get(MCP_SESSION_HEADER, "")
+    if sessions.pop(session_id, None) is None:
+        return streamable_session_error(404, "Session not found")
+    subscriptions.drop_session(session_id)
+    return Response(status_code=204)
 
 
 @app.get("/")
@@ -382,7 +2077,11 @@ async def root():
         "endpoints": {
             "sse": "/runtime/webhooks/mcp/sse",
             "message": "/runtime/webhooks/mcp/message",
-            "health": "/health"
+            "streamable_http": "/runtime/webhooks/mcp",
+            "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
+            "scaling": "/scaling"
         }
     }
 
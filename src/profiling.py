@@ -0,0 +1,144 @@
+"""
+On-demand profiling
+Sampling CPU profiles, allocation diffs, asyncio task dumps and loop lag for a live process
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+import weakref
+from collections import Counter
+from typing import Dict, Optional
+
+
+def fold_stack(frame) -> str:
+    """Collapse a frame and its callers into 'outer;...;inner' (flamegraph folded format)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float) -> Counter:
+    """
+    Sample another thread's Python stack every ``interval`` seconds
+    Blocks the calling thread, so run it off the thread being profiled. Each
+    sample is weighted by the microseconds since the previous one: a thread
+    holding the GIL delays the sampler, and counting samples alone would
+    under-report exactly the code that blocks the loop.
+    """
+    stacks: Counter = Counter()
+    previous = time.perf_counter()
+    deadline = previous + seconds
+    while previous < deadline:
+        time.sleep(interval)
+        frame = sys._current_frames().get(thread_id)
+        now = time.perf_counter()
+        if frame is not None:
+            stacks[fold_stack(frame)] += int((now - previous) * 1_000_000)
+        del frame
+        previous = now
+    return stacks
+
+
+def render_folded(stacks: Counter) -> str:
+    """Folded stacks, one 'stack weight' line each, heaviest first"""
+    return "".join(f"{stack} {weight}\n" for stack, weight in stacks.most_common())
+
+
+async def cpu_profile(seconds: float, interval: float) -> str:
+    """Folded stacks of the calling event loop's thread, sampled from a helper thread"""
+    stacks = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds, interval)
+    return render_folded(stacks)
+
+
+async def allocation_diff(seconds: float, top: int = 50, frames: int = 1) -> str:
+    """
+    Largest changes in traced allocations over ``seconds``, per source line
+    Tracing is only switched on for the duration unless it was already running
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")[:top]
+    lines = [f"Allocation changes over {seconds:g}s, top {len(stats)} lines by size delta"]
+    lines.extend(str(stat) for stat in stats)
+    return "\n".join(lines) + "\n"
+
+
+class TaskAges:
+    """Creation times of asyncio tasks, recorded by a loop task factory
+
+    Installed only when profiling is enabled; tasks created before that show
+    an unknown age.
+    """
+
+    def __init__(self):
+        self.created: weakref.WeakKeyDictionary[asyncio.Task, float] = weakref.WeakKeyDictionary()
+
+    def install(self, loop: asyncio.AbstractEventLoop) -> None:
+        previous = loop.get_task_factory()
+
+        def factory(loop, coro, **kwargs):
+            task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+            self.created[task] = time.monotonic()
+            return task
+
+        loop.set_task_factory(factory)
+
+    def age(self, task: asyncio.Task, now: float) -> Optional[float]:
+        created = self.created.get(task)
+        return None if created is None else now - created
+
+
+def dump_tasks(ages: TaskAges) -> str:
+    """Every task of the running loop with its age and current stack, oldest first"""
+    now = time.monotonic()
+    tasks = sorted(asyncio.all_tasks(), key=lambda task: -(ages.age(task, now) or 0.0))
+    lines = [f"{len(tasks)} tasks"]
+    for task in tasks:
+        age = ages.age(task, now)
+        coro = task.get_coro()
+        lines.append("")
+        lines.append(
+            f"Task {task.get_name()}  age={'unknown' if age is None else f'{age:.3f}s'}  "
+            f"coro={getattr(coro, '__qualname__', repr(coro))}"
+        )
+        stack = traceback.StackSummary.extract((frame, frame.f_lineno) for frame in task.get_stack())
+        lines.extend(line.rstrip("\n") for line in stack.format())
+    return "\n".join(lines) + "\n"
+
+
+async def measure_loop_lag(seconds: float, interval: float = 0.01) -> Dict[str, float]:
+    """Scheduling delay of short sleeps on the running loop, in milliseconds"""
+    loop = asyncio.get_running_loop()
+    lags = []
+    deadline = loop.time() + seconds
+    while not lags or loop.time() < deadline:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - started - interval) * 1000)
+    lags.sort()
+    return {
+        "samples": len(lags),
+        "interval_ms": interval * 1000,
+        "mean_ms": round(statistics.fmean(lags), 3),
+        "p50_ms": round(lags[len(lags) // 2], 3),
+        "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 3),
+        "max_ms": round(lags[-1], 3),
+    }
@@ -0,0 +1,235 @@
+"""
+Resilience layer for storage calls
+Bounded retries with jittered backoff, hedged reads and a circuit breaker
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from storage import (
+    CircuitOpenError,
+    StorageBackend,
+    StorageError,
+    TransientStorageError,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by attempts and delay"""
+    max_attempts: int = 4
+    base_delay: float = 0.1
+    max_delay: float = 5.0
+
+    def delay_for(self, attempt: int, error: TransientStorageError, rng: random.Random) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up"""
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if error.retry_after is not None:
+            # The service told us when to come back; waiting longer than our
+            # budget would just hold the caller hostage, so give up instead.
+            if error.retry_after > self.max_delay:
+                return None
+            return error.retry_after + rng.uniform(0, self.base_delay)
+        return rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Storage circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Give up a half-open probe without recording an outcome"""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        was_probe = self._probe_in_flight
+        self._probe_in_flight = False
+        if was_probe or self.failures >= self.failure_threshold:
+            if self.opened_at is None or was_probe:
+                logger.warning(f"Storage circuit opened after {self.failures} consecutive failures")
+            self.opened_at = self.clock()
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies for percentile estimates"""
+
+    def __init__(self, window: int = 256, min_samples: int = 20):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientBackend(StorageBackend):
+    """Storage backend wrapper applying retries, hedging and circuit breaking"""
+
+    def __init__(
+        self,
+        inner: StorageBackend,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        hedged_reads: bool = False,
+        hedge_delay: float = 0.05,
+        rng: Optional[random.Random] = None,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.inner = inner
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedged_reads = hedged_reads
+        self.hedge_delay = hedge_delay
+        self.read_latency = LatencyTracker()
+        self.rng = rng or random.Random()
+        self.sleep = sleep
+        self.hedges_launched = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    async def _attempt(self, operation: Callable[[], Awaitable[T]]) -> T:
+        probing = self.breaker.state == CircuitBreaker.HALF_OPEN
+        if not self.breaker.allow():
+            raise CircuitOpenError("Storage circuit is open; failing fast")
+        try:
+            result = await operation()
+        except TransientStorageError:
+            self.breaker.record_failure()
+            raise
+        except StorageError:
+            # The service answered (e.g. not found), so it is healthy even if the call failed.
+            self.breaker.record_success()
+            raise
+        except BaseException:
+            # A cancelled hedge must not leave the half-open probe dangling.
+            if probing:
+                self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _with_retries(self, operation: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(operation)
+            except TransientStorageError as e:
+                delay = self.retry.delay_for(attempt, e, self.rng)
+                if delay is None:
+                    raise
+                logger.warning(f"Transient storage error (attempt {attempt + 1}), retrying in {delay:.2f}s: {e}")
+                await self.sleep(delay)
+                attempt += 1
+
+    def _current_hedge_delay(self) -> float:
+        p95 = self.read_latency.percentile(0.95)
+        return p95 if p95 is not None else self.hedge_delay
+
+    async def _timed_read(self, key: str) -> bytes:
+        started = time.perf_counter()
+        data = await self._with_retries(lambda: self.inner.get(key))
+        self.read_latency.record(time.perf_counter() - started)
+        return data
+
+    async def _hedged_read(self, key: str) -> bytes:
+        primary = asyncio.ensure_future(self._timed_read(key))
+        pending = {primary}
+        error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self._current_hedge_delay())
+            if done:
+                pending = set()
+                return primary.result()
+
+            self.hedges_launched += 1
+            pending.add(asyncio.ensure_future(self._timed_read(key)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    # Prefer reporting the real failure over a fail-fast refusal
+                    if error is None or isinstance(error, CircuitOpenError):
+                        error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get(self, key: str) -> bytes:
+        if self.hedged_reads:
+            return await self._hedged_read(key)
+        return await self._timed_read(key)
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self._with_retries(lambda: self.inner.put(key, data))
+
+    async def exists(self, key: str) -> bool:
+        return await self._with_retries(lambda: self.inner.exists(key))
+
+    async def delete(self, key: str) -> None:
+        await self._with_retries(lambda: self.inner.delete(key))
+
+    async def list_keys(self, prefix: str = "") -> List[str]:
+        return await self._with_retries(lambda: self.inner.list_keys(prefix))
+
+    async def check(self) -> None:
+        await self._attempt(self.inner.check)
@@ -0,0 +1,218 @@
+"""
+Snippet resource subscriptions
+Per-session subscriptions plus a coalescing change feed shared by all replicas through storage
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from urllib.parse import quote, unquote
+
+from storage import SnippetNotFoundError, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_URI_SCHEME = "snippet://"
+CHANGE_FEED_PREFIX = "_changes/"
+
+
+def snippet_uri(snippet_name: str) -> str:
+    return f"{SNIPPET_URI_SCHEME}{quote(snippet_name, safe='')}"
+
+
+def snippet_name_from_uri(uri: str) -> Optional[str]:
+    if not isinstance(uri, str) or not uri.startswith(SNIPPET_URI_SCHEME):
+        return None
+    return unquote(uri[len(SNIPPET_URI_SCHEME):]) or None
+
+
+class SubscriptionRegistry:
+    """Which sessions are subscribed to which resource URIs"""
+
+    def __init__(self):
+        self.by_uri: Dict[str, Set[str]] = {}
+        self.by_session: Dict[str, Set[str]] = {}
+
+    def subscribe(self, session_id: str, uri: str) -> None:
+        self.by_uri.setdefault(uri, set()).add(session_id)
+        self.by_session.setdefault(session_id, set()).add(uri)
+
+    def unsubscribe(self, session_id: str, uri: str) -> None:
+        self._discard(self.by_uri, uri, session_id)
+        self._discard(self.by_session, session_id, uri)
+
+    def drop_session(self, session_id: str) -> None:
+        for uri in self.by_session.pop(session_id, set()):
+            self._discard(self.by_uri, uri, session_id)
+
+    def subscribers(self, uri: str) -> Set[str]:
+        return set(self.by_uri.get(uri, ()))
+
+    @staticmethod
+    def _discard(mapping: Dict[str, Set[str]], key: str, value: str) -> None:
+        members = mapping.get(key)
+        if members is not None:
+            members.discard(value)
+            if not members:
+                del mapping[key]
+
+
+class ChangeFeed:
+    """Coalesced resource change notifications, shared across replicas
+
+    Local changes are collected for ``coalesce_seconds`` and delivered once
+    per URI, however often the resource changed in that window. Each flush is
+    also written as one small record under ``_changes/<minute>/`` in storage;
+    every replica lists the current and previous minute every
+    ``poll_seconds``, delivers URIs from records it has not seen (skipping
+    its own), and deletes minutes older than ``retention_seconds``. The cost is
+    one listing per replica per poll, independent of how many agents are
+    subscribed. URIs that came from other replicas are also passed to
+    ``remote``, for state that local changes already keep up to date.
+    """
+
+    BUCKET_SECONDS = 60
+
+    def __init__(
+        self,
+        deliver: Callable[[Set[str]], None],
+        storage: Optional[StorageBackend] = None,
+        coalesce_seconds: float = 0.5,
+        poll_seconds: float = 2.0,
+        retention_seconds: float = 600.0,
+        replica_id: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+        remote: Optional[Callable[[Set[str]], None]] = None,
+    ):
+        self.deliver = deliver
+        self.remote = remote
+        self.storage = storage
+        self.coalesce_seconds = coalesce_seconds
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.replica_id = replica_id or uuid.uuid4().hex[:12]
+        self.clock = clock
+        self.pending: Set[str] = set()
+        self.delivered = 0
+        self._sequence = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._seen: Optional[Set[str]] = None
+        self._pruned_bucket: Optional[int] = None
+
+    def _bucket(self, now: float) -> int:
+        return int(now // self.BUCKET_SECONDS)
+
+    def _bucket_prefix(self, bucket: int) -> str:
+        return f"{CHANGE_FEED_PREFIX}{bucket:012d}/"
+
+    def changed(self, uri: str) -> None:
+        """Record a local change; delivery happens after the coalescing window"""
+        self.pending.add(uri)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self) -> None:
+        # Changes made while a record is being written wait for the next window of this same task
+        while True:
+            await asyncio.sleep(self.coalesce_seconds)
+            uris, self.pending = self.pending, set()
+            if not uris:
+                return
+            self._deliver(uris)
+            if self.storage is None:
+                continue
+            now = self.clock()
+            self._sequence += 1
+            record = f"{int(now * 1e9):020d}-{self._sequence:08d}-{self.replica_id}.change"
+            key = f"{self._bucket_prefix(self._bucket(now))}{record}"
+            try:
+                await self.storage.put(key, json.dumps({"uris": sorted(uris)}).encode("utf-8"))
+            except Exception as e:
+                logger.warning(f"Could not publish resource changes to other replicas: {e}")
+
+    async def flush(self) -> None:
+        """Wait until every pending change is delivered and recorded (used at shutdown and in tests)"""
+        if self._flush_task is not None and not self._flush_task.done():
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+
+    def _deliver(self, uris: Set[str]) -> None:
+        self.delivered += len(uris)
+        self.deliver(uris)
+
+    async def poll(self) -> None:
+        """Deliver changes other replicas recorded since the previous poll"""
+        bucket = self._bucket(self.clock())
+        keys: List[str] = []
+        for recent in (bucket - 1, bucket):
+            keys.extend(await self.storage.list_keys(self._bucket_prefix(recent)))
+        if self._seen is None:
+            # First poll: start from now rather than replaying history
+            self._seen = set(keys)
+            return
+        own_suffix = f"-{self.replica_id}.change"
+        new_keys = sorted(key for key in keys if key not in self._seen and not key.endswith(own_suffix))
+        self._seen = set(keys)
+        uris: Set[str] = set()
+        for key in new_keys:
+            try:
+                uris.update(json.loads(await self.storage.get(key))["uris"])
+            except SnippetNotFoundError:
+                continue
+        if uris:
+            self._deliver(uris)
+            if self.remote is not None:
+                self.remote(uris)
+        await self._prune(bucket)
+
+    async def changed_since(self, since: float) -> Optional[Set[str]]:
+        """URIs recorded as changed (by any replica) at or after ``since``; None if such records may be pruned"""
+        now = self.clock()
+        if now - since > self.retention_seconds:
+            return None
+        uris: Set[str] = set()
+        for bucket in range(self._bucket(since), self._bucket(now) + 1):
+            for key in await self.storage.list_keys(self._bucket_prefix(bucket)):
+                if int(key.rsplit("/", 1)[-1].split("-", 1)[0]) < since * 1e9:
+                    continue
+                try:
+                    uris.update(json.loads(await self.storage.get(key))["uris"])
+                except SnippetNotFoundError:
+                    continue
+        return uris
+
+    async def _prune(self, bucket: int) -> None:
+        expired = bucket - max(2, int(self.retention_seconds // self.BUCKET_SECONDS) + 1)
+        # Catch up on every bucket that expired since the last prune (polls can be sparse)
+        first = expired if self._pruned_bucket is None else self._pruned_bucket + 1
+        for old_bucket in range(first, expired + 1):
+            for key in await self.storage.list_keys(self._bucket_prefix(old_bucket)):
+                await self.storage.delete(key)
+        self._pruned_bucket = max(expired, self._pruned_bucket or expired)
+
+    async def run(self) -> None:
+        """Tail the shared change feed until cancelled"""
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"Resource change feed poll failed: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+
+def notification_for(uri: str) -> Dict[str, object]:
+    return {"jsonrpc": "2.0", "method": "notifications/resources/updated", "params": {"uri": uri}}
+
+
+def fan_out(uris: Iterable[str], registry: SubscriptionRegistry, publish: Callable[[str, Dict], bool]) -> int:
+    """Publish an update notification to every subscribed session; returns notifications sent"""
+    sent = 0
+    for uri in uris:
+        for session_id in registry.subscribers(uri):
+            if publish(session_id, notification_for(uri)):
+                sent += 1
+            else:
+                registry.drop_session(session_id)
+    return sent
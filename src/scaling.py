@@ -0,0 +1,96 @@
+"""
+Autoscaling signals
+Per-replica load figures (sessions, in-flight tool calls, queue wait, shed rate) for KEDA and Prometheus
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Tuple
+
+from session_events import Session
+
+
+class InFlightGauge:
+    """Calls currently running, by key (e.g. tool execution class)"""
+
+    def __init__(self, *keys: str):
+        self.counts: Dict[str, int] = {key: 0 for key in keys}
+
+    @contextmanager
+    def track(self, key: str):
+        self.counts[key] = self.counts.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            self.counts[key] -= 1
+
+
+class CounterWindow:
+    """Changes of cumulative counters over a trailing window
+
+    Snapshots are taken whenever the signals are read (KEDA polls and
+    Prometheus scrapes), and the baseline is the newest snapshot at least
+    ``window_seconds`` old. The first read has no baseline and reports no
+    change, rather than a rate averaged over the whole process lifetime.
+    """
+
+    def __init__(self, window_seconds: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.snapshots: deque = deque()
+
+    def deltas(self, counters: Dict[str, float]) -> Tuple[Dict[str, float], float]:
+        """(counter increase per name, seconds covered) since the window's baseline"""
+        now = self.clock()
+        self.snapshots.append((now, dict(counters)))
+        while len(self.snapshots) > 2 and now - self.snapshots[1][0] >= self.window_seconds:
+            self.snapshots.popleft()
+        started, baseline = self.snapshots[0]
+        return {name: value - baseline.get(name, 0.0) for name, value in counters.items()}, now - started
+
+
+def scaling_signals(
+    sessions: Dict[str, Session],
+    tool_calls: Dict[str, int],
+    queued_tool_calls: int,
+    counters: Dict[str, float],
+    window: CounterWindow,
+) -> Dict[str, Any]:
+    """
+    Signals of one replica, as served to KEDA's metrics-api scaler
+    ``counters`` are cumulative: ``shed`` requests, pool ``queue_seconds`` and ``pool_calls`` completed
+    """
+    deltas, elapsed = window.deltas(counters)
+    return {
+        "active_sessions": len(sessions),
+        "open_streams": sum(session.streams for session in sessions.values()),
+        "in_flight_tool_calls": {**tool_calls, "total": sum(tool_calls.values())},
+        "queued_tool_calls": queued_tool_calls,
+        "queue_wait_ms": round(deltas["queue_seconds"] / deltas["pool_calls"] * 1000, 3)
+        if deltas["pool_calls"] else 0.0,
+        "shed_per_second": round(deltas["shed"] / elapsed, 3) if elapsed > 0 else 0.0,
+        "window_seconds": round(elapsed, 3),
+    }
+
+
+def prometheus(signals: Dict[str, Any], prefix: str = "mcp_scaling") -> str:
+    """The same signals as Prometheus gauges, for a Prometheus trigger summing across replicas"""
+    series = [
+        ("active_sessions", "Sessions held by this replica", signals["active_sessions"], None),
+        ("open_streams", "Open SSE streams", signals["open_streams"], None),
+        ("queued_tool_calls", "Tool calls waiting for a pool worker", signals["queued_tool_calls"], None),
+        ("queue_wait_ms", "Mean pool queue wait over the window", signals["queue_wait_ms"], None),
+        ("shed_per_second", "Requests refused per second over the window", signals["shed_per_second"], None),
+        ("in_flight_tool_calls", "Tool calls running, by execution class", None,
+         {k: v for k, v in signals["in_flight_tool_calls"].items() if k != "total"}),
+    ]
+    lines = []
+    for name, help_text, value, labelled in series:
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        if labelled is None:
+            lines.append(f"{prefix}_{name} {value:g}")
+        else:
+            lines.extend(f'{prefix}_{name}{{execution="{key}"}} {count:g}' for key, count in labelled.items())
+    return "\n".join(lines) + "\n"
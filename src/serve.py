@@ -0,0 +1,70 @@
+"""
+Server launcher
+Runs mcp_server:app on uvicorn (HTTP/1.1) or hypercorn (HTTP/2 as h2 over TLS or h2c in cleartext, plus HTTP/1.1)
+"""
+
+import asyncio
+import os
+import signal
+
+HTTP_SERVER = os.getenv("HTTP_SERVER", "uvicorn")
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+TLS_CERT_FILE = os.getenv("TLS_CERT_FILE") or None
+TLS_KEY_FILE = os.getenv("TLS_KEY_FILE") or None
+# Each SSE session holds a stream for its lifetime, so allow far more than hypercorn's default of 100
+HTTP2_MAX_CONCURRENT_STREAMS = int(os.getenv("HTTP2_MAX_CONCURRENT_STREAMS", "1000"))
+# Longer than the ingress' upstream keep-alive (60s), so the proxy never reuses a connection as it is being closed
+HTTP_KEEP_ALIVE_SECONDS = float(os.getenv("HTTP_KEEP_ALIVE_SECONDS", "75"))
+
+SERVERS = ("uvicorn", "hypercorn")
+
+
+def hypercorn_config(host: str, port: int, max_concurrent_streams: int = HTTP2_MAX_CONCURRENT_STREAMS,
+                     certfile: str = None, keyfile: str = None, access_log: bool = True):
+    """Hypercorn settings: h2 is negotiated by ALPN with TLS, h2c by prior knowledge or Upgrade without"""
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"{host}:{port}"]
+    config.h2_max_concurrent_streams = max_concurrent_streams
+    # uvicorn's default; hypercorn's 100 drops connections when many HTTP/1.1 clients reconnect at once
+    config.backlog = 2048
+    # Also the time a new connection has to send its first request, which a busy replica may take seconds to read
+    config.keep_alive_timeout = HTTP_KEEP_ALIVE_SECONDS
+    config.certfile = certfile
+    config.keyfile = keyfile
+    config.accesslog = "-" if access_log else None
+    return config
+
+
+async def serve_hypercorn(app, config) -> None:
+    from hypercorn.asyncio import serve
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    # mcp_server's startup wraps the SIGTERM handler: it drains first and then calls this one
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: loop.call_soon_threadsafe(stop.set))
+    await serve(app, config, shutdown_trigger=stop.wait)
+
+
+def run(app, server: str = HTTP_SERVER, host: str = HOST, port: int = PORT, log_level: str = "info",
+        access_log: bool = True) -> None:
+    if server == "hypercorn":
+        config = hypercorn_config(host, port, certfile=TLS_CERT_FILE, keyfile=TLS_KEY_FILE, access_log=access_log)
+        config.loglevel = log_level.upper()
+        asyncio.run(serve_hypercorn(app, config))
+    elif server == "uvicorn":
+        import uvicorn
+
+        uvicorn.run(app, host=host, port=port, ssl_certfile=TLS_CERT_FILE, ssl_keyfile=TLS_KEY_FILE,
+                    log_level=log_level, access_log=access_log, timeout_keep_alive=int(HTTP_KEEP_ALIVE_SECONDS))
+    else:
+        raise SystemExit(f"Unknown HTTP_SERVER {server!r}; expected one of {', '.join(SERVERS)}")
+
+
+if __name__ == "__main__":
+    from mcp_server import app
+
+    run(app)
@@ -0,0 +1,118 @@
+"""
+Session state and resumable SSE event log
+Compact per-session state with a bounded replay buffer keyed by monotonically increasing event ids
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, List, Optional, Tuple
+
+
+def format_event_id(session_id: str, seq: int) -> str:
+    return f"{session_id}:{seq}"
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Split a Last-Event-ID value into (session id, sequence), or None if malformed"""
+    if not event_id:
+        return None
+    session_id, _, seq = event_id.strip().rpartition(":")
+    if not session_id or not seq.isdigit():
+        return None
+    return session_id, int(seq)
+
+
+class SessionEventLog:
+    """Outgoing events of one session, kept in a bounded ring for replay
+
+    Events are numbered from 1. Readers track their own position, so a
+    reconnecting client resumes from its Last-Event-ID and any number of
+    streams can follow the same session. Closing the log wakes every reader
+    so streams can be ended (e.g. while draining). The ring and the waiter
+    list are only created once needed, as most sessions sit idle.
+    """
+
+    __slots__ = ("max_events", "_events", "last_seq", "closed", "_waiters")
+
+    def __init__(self, max_events: int):
+        self.max_events = max_events
+        self._events: Optional[deque] = None
+        self.last_seq = 0
+        self.closed = False
+        self._waiters: Optional[List[asyncio.Future]] = None
+
+    @property
+    def events(self) -> deque:
+        if self._events is None:
+            self._events = deque(maxlen=self.max_events)
+        return self._events
+
+    def _wake(self) -> None:
+        waiters, self._waiters = self._waiters, None
+        for waiter in waiters or ():
+            if not waiter.done():
+                waiter.set_result(True)
+
+    def publish(self, message: Any) -> int:
+        self.last_seq += 1
+        self.events.append((self.last_seq, json.dumps(message)))
+        self._wake()
+        return self.last_seq
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake()
+
+    def since(self, seq: int) -> Optional[List[Tuple[int, str]]]:
+        """Events after ``seq``; None if some of them have already been evicted"""
+        if seq > self.last_seq:
+            return None
+        events = self._events or ()
+        first = events[0][0] if events else self.last_seq + 1
+        if seq < first - 1:
+            return None
+        return [event for event in events if event[0] > seq]
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """Wait until an event after ``seq`` exists or the log closes; False on timeout"""
+        if self.last_seq > seq or self.closed:
+            return True
+        # A bare future and timer rather than wait_for, which would run a task per idle stream
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        if self._waiters is None:
+            self._waiters = []
+        self._waiters.append(waiter)
+        timer = loop.call_later(timeout, _expire, waiter)
+        try:
+            return await waiter
+        finally:
+            timer.cancel()
+            if self._waiters is not None and waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+
+def _expire(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(False)
+
+
+class Session:
+    """State of one MCP session (legacy SSE or Streamable HTTP)
+
+    Slotted, with times as floats, so that tens of thousands of idle
+    sessions stay small: ``created_at`` is wall-clock, ``last_seen`` monotonic.
+    """
+
+    __slots__ = ("transport", "events", "delivered", "streams", "created_at", "last_seen")
+
+    def __init__(self, transport: str, max_events: int):
+        self.transport = transport
+        self.events = SessionEventLog(max_events)
+        # Highest sequence delivered on any stream, where a new stream without Last-Event-ID resumes
+        self.delivered = 0
+        self.streams = 0
+        self.created_at = time.time()
+        self.last_seen = time.monotonic()
@@ -0,0 +1,184 @@
+"""
+Snippet content cache
+Byte-bounded LRU of snippet contents, plus the hot-set snapshot new replicas pre-warm from
+"""
+
+import asyncio
+import json
+import logging
+import time
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+HOT_SET_MAGIC = b"MCPHOT1\n"
+
+
+class SnippetCache:
+    """LRU of snippet contents bounded by total bytes
+
+    Entries are filled by reads only. Saves and change notifications (from
+    this replica or, through the change feed, from others) invalidate them,
+    and ``ttl_seconds`` bounds staleness should a notification be lost. A
+    read racing an invalidation of the same name is not cached. Every lookup
+    also counts towards the name's heat, which picks the hot set.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float = 300.0, max_entry_fraction: float = 1 / 16,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # One huge snippet must not flush everything else
+        self.max_entry_bytes = int(max_bytes * max_entry_fraction)
+        self.clock = clock
+        self.entries: OrderedDict[str, Tuple[str, int, float]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.heat: Counter = Counter()
+        self.generation = 0
+        self.invalidated: Dict[str, int] = {}
+        self.loading = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, name: str) -> Optional[str]:
+        self.heat[name] += 1
+        entry = self.entries.get(name)
+        if entry is None or entry[2] <= self.clock():
+            if entry is not None:
+                self._discard(name)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(name)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, name: str, text: str, expires: Optional[float] = None) -> None:
+        size = len(text.encode("utf-8"))
+        self._discard(name)
+        if size > self.max_entry_bytes:
+            return
+        self.entries[name] = (text, size, expires if expires is not None else self.clock() + self.ttl_seconds)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._discard(next(iter(self.entries)))
+
+    def _discard(self, name: str) -> None:
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def invalidate(self, name: str) -> None:
+        self._discard(name)
+        if self.loading:
+            self.generation += 1
+            self.invalidated[name] = self.generation
+
+    async def load(self, name: str, fetch: Callable[[str], Awaitable[str]]) -> str:
+        """The cached contents, else ``fetch(name)`` (cached unless invalidated meanwhile)"""
+        text = self.get(name)
+        if text is not None:
+            return text
+        started = self.generation
+        self.loading += 1
+        try:
+            text = await fetch(name)
+        finally:
+            self.loading -= 1
+        if self.invalidated.get(name, started) <= started:
+            self.put(name, text)
+        if not self.loading:
+            self.invalidated.clear()
+        return text
+
+    def hottest(self, limit: int) -> List[str]:
+        return [name for name, _ in self.heat.most_common(limit)]
+
+    def decay(self, keep: int) -> None:
+        """Halve every name's heat so the hot set follows current traffic, keeping the ``keep`` hottest"""
+        self.heat = Counter({name: count // 2 for name, count in self.heat.most_common(keep) if count > 1})
+
+    def status(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def hot_set(self, limit: int, content_max_bytes: int) -> Dict[str, Any]:
+        """The ``limit`` hottest names, with contents of the cached ones up to ``content_max_bytes``"""
+        names = self.hottest(limit)
+        contents, budget = {}, content_max_bytes
+        for name in names:
+            entry = self.entries.get(name)
+            if entry is not None and entry[1] <= budget:
+                contents[name] = entry[0]
+                budget -= entry[1]
+        return {"written_at": time.time(), "names": names, "contents": contents}
+
+
+def compress_hot_set(hot_set: Dict[str, Any]) -> bytes:
+    """Snapshot bytes of a ``SnippetCache.hot_set``; safe to run in a worker thread"""
+    return HOT_SET_MAGIC + zlib.compress(json.dumps(hot_set).encode("utf-8"), 6)
+
+
+def read_hot_set(snapshot: bytes) -> Dict[str, Any]:
+    """Inverse of ``compress_hot_set``"""
+    if not snapshot.startswith(HOT_SET_MAGIC):
+        raise ValueError("Not a hot set snapshot")
+    return json.loads(zlib.decompress(snapshot[len(HOT_SET_MAGIC):]))
+
+
+async def prewarm(
+    cache: SnippetCache,
+    hot_set: Dict[str, Any],
+    fetch: Callable[[str], Awaitable[str]],
+    changed_since: Optional[Set[str]],
+    concurrency: int = 16,
+    timeout: float = 20.0,
+) -> Tuple[int, int]:
+    """
+    Fill ``cache`` from a hot set, fetching names without usable contents in parallel within ``timeout``
+    ``changed_since`` holds names changed after the snapshot was written, or None if that is unknown
+    (then stored contents are not trusted). Returns (entries from the snapshot, entries fetched)
+    """
+    # Snapshot contents expire as if they had been read when the snapshot was written
+    expires = cache.clock() + cache.ttl_seconds - max(0.0, time.time() - hot_set.get("written_at", 0))
+    usable = changed_since is not None and expires > cache.clock()
+    contents = hot_set.get("contents", {}) if usable else {}
+    restored = 0
+    for name, text in contents.items():
+        if name not in changed_since:
+            cache.put(name, text, expires)
+            restored += 1
+    semaphore = asyncio.Semaphore(concurrency)
+    fetched = 0
+
+    async def fetch_one(name: str) -> None:
+        nonlocal fetched
+        async with semaphore:
+            try:
+                await cache.load(name, fetch)
+                fetched += 1
+            except Exception as e:
+                logger.debug(f"Could not pre-warm snippet {name}: {e}")
+
+    missing = [name for name in hot_set.get("names", []) if name not in cache.entries]
+    tasks = [asyncio.create_task(fetch_one(name)) for name in missing]
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    # Pre-warming reads are not traffic
+    cache.heat.clear()
+    cache.hits = cache.misses = 0
+    return restored, fetched
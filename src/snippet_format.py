@@ -0,0 +1,162 @@
+"""
+Snippet storage formats
+Optional compression and content-addressed deduplication for snippet blobs
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from storage import SnippetNotFoundError, StorageBackend, StorageError
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Storage formats written by save_snippet; every format is always readable
+FORMAT_RAW = "raw"                # legacy: UTF-8 bytes in {name}.json
+FORMAT_COMPRESSED = "compressed"  # compressed frame in {name}.json
+FORMAT_DEDUP = "dedup"            # {name}.json references a shared content blob
+FORMATS = (FORMAT_RAW, FORMAT_COMPRESSED, FORMAT_DEDUP)
+
+# Markers start with a NUL byte. Snippet text can too (JSON allows \u0000), so
+# every format frames such payloads instead of storing them bare.
+FRAME_MAGIC = b"\x00MCPZ"
+REFERENCE_MAGIC = b"\x00MCPREF:"
+CONTENT_PREFIX = "_content/"
+
+CODEC_NONE = 0
+CODEC_GZIP = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {"none": CODEC_NONE, "gzip": CODEC_GZIP, "zstd": CODEC_ZSTD}
+
+# Payloads above this size are (de)compressed in a worker thread
+OFFLOAD_BYTES = 256 * 1024
+
+
+def compress(data: bytes, codec: int, level: Optional[int] = None) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=level or 3).compress(data)
+    if codec == CODEC_GZIP:
+        return gzip.compress(data, compresslevel=level or 6, mtime=0)
+    return data
+
+
+def decompress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Snippet is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_GZIP:
+        return gzip.decompress(data)
+    if codec == CODEC_NONE:
+        return data
+    raise ValueError(f"Unknown snippet codec: {codec}")
+
+
+class SnippetCodec:
+    """Reads and writes snippet blobs in the configured storage format
+
+    Payloads smaller than ``min_size`` are stored raw in every format: they
+    gain little from compression and a reference would be as large as the
+    content itself. A raw payload that starts with a NUL byte is wrapped in an
+    uncompressed frame, so it cannot be mistaken for a frame or a reference.
+    A reference must name a content blob whose hash matches its name; a
+    missing content blob raises SnippetNotFoundError and any other mismatch
+    StorageError, rather than returning the reference itself.
+    """
+
+    def __init__(
+        self,
+        storage_format: str = FORMAT_RAW,
+        compression: str = "zstd",
+        level: Optional[int] = None,
+        min_size: int = 1024,
+        known_content_limit: int = 65536,
+    ):
+        if storage_format not in FORMATS:
+            raise ValueError(f"Unknown snippet storage format: {storage_format}")
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed; falling back to gzip snippet compression")
+            compression = "gzip"
+        self.storage_format = storage_format
+        self.codec = CODEC_NAMES[compression]
+        self.level = level
+        self.min_size = min_size
+        self.known_content: OrderedDict = OrderedDict()
+        self.known_content_limit = known_content_limit
+        self.uploads_skipped = 0
+
+    def encode_frame(self, data: bytes) -> bytes:
+        packed = compress(data, self.codec, self.level)
+        if len(packed) >= len(data):
+            # Incompressible content is framed without a codec rather than grown
+            return FRAME_MAGIC + bytes([CODEC_NONE]) + data
+        return FRAME_MAGIC + bytes([self.codec]) + packed
+
+    @staticmethod
+    def encode_raw(data: bytes) -> bytes:
+        if data.startswith(b"\x00"):
+            return FRAME_MAGIC + bytes([CODEC_NONE]) + data
+        return data
+
+    @staticmethod
+    def decode_frame(blob: bytes) -> bytes:
+        if not blob.startswith(FRAME_MAGIC):
+            return blob
+        return decompress(blob[len(FRAME_MAGIC) + 1:], blob[len(FRAME_MAGIC)])
+
+    async def _encode(self, data: bytes) -> bytes:
+        if len(data) > OFFLOAD_BYTES:
+            return await asyncio.to_thread(self.encode_frame, data)
+        return self.encode_frame(data)
+
+    async def _decode(self, blob: bytes) -> bytes:
+        if len(blob) > OFFLOAD_BYTES and blob.startswith(FRAME_MAGIC):
+            return await asyncio.to_thread(self.decode_frame, blob)
+        return self.decode_frame(blob)
+
+    def _remember(self, content_key: str) -> None:
+        self.known_content[content_key] = None
+        self.known_content.move_to_end(content_key)
+        if len(self.known_content) > self.known_content_limit:
+            self.known_content.popitem(last=False)
+
+    async def write(self, backend: StorageBackend, key: str, data: bytes) -> None:
+        if self.storage_format == FORMAT_RAW or len(data) < self.min_size:
+            await backend.put(key, self.encode_raw(data))
+            return
+        if self.storage_format == FORMAT_COMPRESSED:
+            await backend.put(key, await self._encode(data))
+            return
+
+        content_key = CONTENT_PREFIX + hashlib.sha256(data).hexdigest()
+        if content_key in self.known_content or await backend.exists(content_key):
+            self.uploads_skipped += 1
+        else:
+            await backend.put(content_key, await self._encode(data))
+        self._remember(content_key)
+        await backend.put(key, REFERENCE_MAGIC + content_key.encode("ascii"))
+
+    async def read(self, backend: StorageBackend, key: str) -> bytes:
+        blob = await backend.get(key)
+        if not blob.startswith(REFERENCE_MAGIC):
+            return await self._decode(blob)
+        content_key = blob[len(REFERENCE_MAGIC):].decode("ascii", errors="replace")
+        digest = content_key[len(CONTENT_PREFIX):]
+        if not content_key.startswith(CONTENT_PREFIX) or len(digest) != 64 or digest.strip("0123456789abcdef"):
+            raise StorageError(f"Snippet {key} holds a malformed content reference")
+        try:
+            data = await self._decode(await backend.get(content_key))
+        except SnippetNotFoundError:
+            raise SnippetNotFoundError(f"Content {content_key} of snippet {key} is missing") from None
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise StorageError(f"Content {content_key} of snippet {key} does not match its hash")
+        self._remember(content_key)
+        return data
@@ -0,0 +1,82 @@
+"""
+In-memory snippet name index
+Sorted name list supporting prefix queries with cursor pagination
+"""
+
+import bisect
+import logging
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SnippetNameIndex:
+    """Sorted index of snippet names
+
+    Names are kept in a sorted list so a prefix query is two binary searches
+    followed by a slice. Pagination cursors are the last name returned, which
+    stays valid while other names are inserted concurrently.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._names: List[str] = sorted(set(names))
+        self._members: Set[str] = set(self._names)
+        self._recent: Optional[Set[str]] = None
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._members
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._names))
+
+    def add(self, name: str) -> None:
+        if self._recent is not None:
+            self._recent.add(name)
+        if name in self._members:
+            return
+        self._members.add(name)
+        bisect.insort(self._names, name)
+
+    def begin_reconcile(self) -> None:
+        """Start tracking names added while a container listing is running"""
+        self._recent = set()
+
+    def finish_reconcile(self, names: Iterable[str]) -> Tuple[int, int]:
+        """Replace the index with a fresh listing, keeping concurrent additions
+
+        Returns the number of names added and removed by the reconciliation.
+        """
+        fresh = set(names)
+        if self._recent:
+            fresh |= self._recent
+        self._recent = None
+        added = len(fresh - self._members)
+        removed = len(self._members - fresh)
+        self._members = fresh
+        self._names = sorted(fresh)
+        self.loaded = True
+        return added, removed
+
+    def abort_reconcile(self) -> None:
+        self._recent = None
+
+    def prefix(
+        self, prefix: str = "", cursor: Optional[str] = None, limit: int = 50
+    ) -> Tuple[List[str], Optional[str]]:
+        """Return up to ``limit`` names starting with ``prefix`` after ``cursor``
+
+        The second element is the cursor for the next page, or None when the
+        results are exhausted.
+        """
+        start = bisect.bisect_left(self._names, prefix)
+        if cursor is not None:
+            start = max(start, bisect.bisect_right(self._names, cursor))
+        # Every name with the prefix sorts before prefix + the highest code point
+        end = bisect.bisect_left(self._names, prefix + "\U0010ffff", start) if prefix else len(self._names)
+        page = self._names[start:min(end, start + limit)]
+        next_cursor = page[-1] if page and start + limit < end else None
+        return page, next_cursor
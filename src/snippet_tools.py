@@ -0,0 +1,31 @@
+"""
+CPU-bound snippet tools
+Pure functions of their arguments, so they can run on a worker thread or process
+"""
+
+import difflib
+from typing import Any, Dict
+
+
+def error_result(message: str) -> Dict[str, Any]:
+    return {"content": [{"type": "text", "text": message}], "isError": True}
+
+
+def diff_snippets(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Unified diff between two snippet texts"""
+    original = arguments.get("original")
+    modified = arguments.get("modified")
+    if not isinstance(original, str) or not isinstance(modified, str):
+        return error_result("original and modified must both be provided as text")
+    try:
+        context = max(0, int(arguments.get("context", 3)))
+    except (TypeError, ValueError):
+        return error_result("context must be an integer")
+    diff = difflib.unified_diff(
+        original.splitlines(keepends=True),
+        modified.splitlines(keepends=True),
+        fromfile=str(arguments.get("original_name") or "original"),
+        tofile=str(arguments.get("modified_name") or "modified"),
+        n=context,
+    )
+    return {"content": [{"type": "text", "text": "".join(diff)}], "isError": False}
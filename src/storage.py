@@ -0,0 +1,234 @@
+"""
+Snippet storage backends
+Async key/value interface over Azure Blob Storage plus local stand-ins
+"""
+
+import asyncio
+import logging
+import random
+from typing import Callable, Dict, List, Optional
+
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying (throttling and transient server errors)
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class StorageError(Exception):
+    """Base class for storage failures"""
+
+
+class SnippetNotFoundError(StorageError):
+    """The requested blob does not exist"""
+
+
+class TransientStorageError(StorageError):
+    """A failure that may succeed when retried (throttling, timeouts, 5xx)"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(StorageError):
+    """Storage is considered unhealthy and calls are failing fast"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class StorageBackend:
+    """Async blob storage interface used by the MCP tools"""
+
+    async def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    async def put(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Remove a key; deleting a missing key is not an error"""
+        raise NotImplementedError
+
+    async def list_keys(self, prefix: str = "") -> List[str]:
+        """List every key starting with ``prefix`` (follows all result pages)"""
+        raise NotImplementedError
+
+    async def check(self) -> None:
+        """Raise if the backend cannot be reached"""
+        raise NotImplementedError
+
+
+class BlobStorageBackend(StorageBackend):
+    """Azure Blob Storage container backend
+
+    The Azure SDK client is synchronous, so every call is moved to a worker
+    thread to keep the event loop free while waiting on the network.
+    """
+
+    def __init__(self, blob_service_client, container: str):
+        self.container_client = blob_service_client.get_container_client(container)
+
+    @staticmethod
+    def _translate(error: Exception) -> StorageError:
+        if isinstance(error, ResourceNotFoundError):
+            return SnippetNotFoundError(str(error))
+        if isinstance(error, HttpResponseError):
+            status = error.status_code or 0
+            if status in TRANSIENT_STATUS_CODES:
+                headers = error.response.headers if error.response is not None else {}
+                return TransientStorageError(str(error), parse_retry_after(headers.get("Retry-After")))
+            return StorageError(str(error))
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            return TransientStorageError(str(error))
+        return StorageError(str(error))
+
+    async def _call(self, func: Callable, *args, **kwargs):
+        try:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        except StorageError:
+            raise
+        except Exception as e:
+            raise self._translate(e) from e
+
+    async def get(self, key: str) -> bytes:
+        blob_client = self.container_client.get_blob_client(key)
+        return await self._call(lambda: blob_client.download_blob().readall())
+
+    async def put(self, key: str, data: bytes) -> None:
+        blob_client = self.container_client.get_blob_client(key)
+        await self._call(blob_client.upload_blob, data, overwrite=True)
+
+    async def exists(self, key: str) -> bool:
+        blob_client = self.container_client.get_blob_client(key)
+        return await self._call(blob_client.exists)
+
+    async def delete(self, key: str) -> None:
+        blob_client = self.container_client.get_blob_client(key)
+        try:
+            await self._call(blob_client.delete_blob)
+        except SnippetNotFoundError:
+            pass
+
+    async def list_keys(self, prefix: str = "") -> List[str]:
+        # The SDK pager fetches continuation pages lazily; drain it in the worker thread
+        return await self._call(lambda: list(self.container_client.list_blob_names(name_starts_with=prefix or None)))
+
+    async def check(self) -> None:
+        await self._call(self.container_client.get_container_properties)
+
+
+class MemoryStorageBackend(StorageBackend):
+    """In-process backend for local development, tests and benchmarks"""
+
+    def __init__(self):
+        self.blobs: Dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes:
+        try:
+            return self.blobs[key]
+        except KeyError:
+            raise SnippetNotFoundError(f"Blob not found: {key}") from None
+
+    async def put(self, key: str, data: bytes) -> None:
+        self.blobs[key] = bytes(data)
+
+    async def exists(self, key: str) -> bool:
+        return key in self.blobs
+
+    async def delete(self, key: str) -> None:
+        self.blobs.pop(key, None)
+
+    async def list_keys(self, prefix: str = "") -> List[str]:
+        return [key for key in self.blobs if key.startswith(prefix)]
+
+    async def check(self) -> None:
+        return None
+
+
+class FaultInjectingBackend(StorageBackend):
+    """Wraps a backend and injects latency and transient failures
+
+    Failures can be scripted with ``fail_next`` (consumed in order) or drawn at
+    random with ``failure_rate``. An optional ``bandwidth`` (bytes/second) adds
+    transfer time proportional to payload size. Used to exercise the
+    resilience layer and in benchmarks.
+    """
+
+    def __init__(
+        self,
+        inner: StorageBackend,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        retry_after: Optional[float] = None,
+        bandwidth: Optional[float] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.inner = inner
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.retry_after = retry_after
+        self.rng = rng or random.Random()
+        self.fail_next: List[Exception] = []
+        self.slow_next: List[float] = []
+        self.calls = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    async def _inject(self) -> None:
+        self.calls += 1
+        delay = self.slow_next.pop(0) if self.slow_next else self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.fail_next:
+            raise self.fail_next.pop(0)
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            raise TransientStorageError("Injected 503 Server Busy", self.retry_after)
+
+    async def _transfer(self, size: int) -> None:
+        if self.bandwidth:
+            await asyncio.sleep(size / self.bandwidth)
+
+    async def get(self, key: str) -> bytes:
+        await self._inject()
+        data = await self.inner.get(key)
+        await self._transfer(len(data))
+        self.bytes_received += len(data)
+        return data
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self._inject()
+        await self._transfer(len(data))
+        self.bytes_sent += len(data)
+        await self.inner.put(key, data)
+
+    async def exists(self, key: str) -> bool:
+        await self._inject()
+        return await self.inner.exists(key)
+
+    async def delete(self, key: str) -> None:
+        await self._inject()
+        await self.inner.delete(key)
+
+    async def list_keys(self, prefix: str = "") -> List[str]:
+        await self._inject()
+        return await self.inner.list_keys(prefix)
+
+    async def check(self) -> None:
+        await self._inject()
+        await self.inner.check()
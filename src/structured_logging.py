@@ -0,0 +1,176 @@
+"""
+Structured logging pipeline
+Queue-backed JSON logging with per-logger sampling, written from a background thread
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from contextvars import ContextVar, Token
+from datetime import UTC, datetime
+from typing import Any, Dict, Optional, TextIO
+
+# Extra record attributes emitted as top-level JSON fields
+STRUCTURED_FIELDS = ("request_id", "session_id", "method", "tool", "status", "latency_ms", "sample_rate")
+TEXT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+
+def bind_log_context(**fields: Any) -> Token:
+    """Attach fields (e.g. session_id) to every record logged from the current task"""
+    return log_context.set({**log_context.get(), **fields})
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse 'mcp_server.requests=0.1,storage=0.5' into logger name -> fraction kept"""
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, rate = part.partition("=")
+        value = float(rate)
+        if not name or not 0.0 <= value <= 1.0:
+            raise ValueError(f"Invalid log sample rate: {part!r}")
+        rates[name.strip()] = value
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """Copy the bound log context onto records; runs in the logging task, where the context is current"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every n-th record below WARNING for the configured loggers (and their children)
+
+    A rate of 0.1 keeps one record in ten, deterministically rather than at
+    random, and tags kept records with the rate so totals can be scaled back
+    up. Warnings and errors are never sampled.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._periods: Dict[str, Optional[int]] = {}
+        self._counters: Dict[str, int] = {}
+
+    def _period(self, name: str) -> Optional[int]:
+        if name not in self._periods:
+            probe, rate = name, None
+            while probe and rate is None:
+                rate = self.rates.get(probe)
+                probe = probe.rpartition(".")[0]
+            if rate is None or rate >= 1.0:
+                self._periods[name] = None
+            else:
+                self._periods[name] = 0 if rate <= 0.0 else max(1, round(1 / rate))
+        return self._periods[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        period = self._period(record.name)
+        if period is None:
+            return True
+        if period == 0:
+            return False
+        count = self._counters.get(record.name, 0)
+        self._counters[record.name] = count + 1
+        if count % period:
+            return False
+        record.sample_rate = 1 / period
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message plus structured fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves formatting and I/O to the listener thread
+
+    The caller only interpolates the message arguments (they may change once
+    the call returns) and renders tracebacks; JSON encoding and the blocking
+    stream write happen on the listener. When the queue is full, records are
+    dropped and counted rather than stalling the event loop.
+    """
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "json",
+    sample_rates: Optional[Dict[str, float]] = None,
+    queue_size: int = 10000,
+    stream: Optional[TextIO] = None,
+) -> logging.handlers.QueueListener:
+    """
+    Route the root logger through a bounded queue drained by a background thread
+    Returns the started listener; it is stopped (flushing queued records) at exit
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    handler = DeferredQueueHandler(queue.Queue(maxsize=queue_size))
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    listener = logging.handlers.QueueListener(handler.queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def stop_logging(listener: logging.handlers.QueueListener) -> None:
+    """Flush queued records and stop the listener thread ahead of exit"""
+    atexit.unregister(listener.stop)
+    listener.stop()
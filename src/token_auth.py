@@ -0,0 +1,208 @@
+"""
+Bearer token validation
+JWT signature and claim checks against a cached JWKS, with an LRU of already validated tokens
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import urllib.request
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+# Claims of the token that authenticated the current request (None when auth is off)
+request_claims: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_claims", default=None)
+
+
+def current_claims() -> Optional[Dict[str, Any]]:
+    """Claims of the caller's token, for tool handlers running on the event loop or a thread pool"""
+    return request_claims.get()
+
+
+class TokenError(Exception):
+    """The bearer token is missing, malformed, expired or not signed by a trusted key"""
+
+
+class JwksUnavailableError(Exception):
+    """No signing keys could be loaded, so no token can be checked"""
+
+
+def fetch_jwks(url: str, timeout: float = 10.0) -> Dict[str, Any]:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def bearer_token(authorization: Optional[str]) -> str:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise TokenError("Missing bearer token")
+    return token.strip()
+
+
+class JwksCache:
+    """Signing keys by kid, refreshed in the background and refetched on an unknown kid
+
+    A token signed with a kid we have not seen (usually a key rotation) triggers
+    a refetch, at most once per ``min_refetch_seconds`` however many requests
+    carry it; concurrent misses share that one fetch.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        refresh_seconds: float = 3600.0,
+        min_refetch_seconds: float = 30.0,
+        fetch: Callable[[str], Dict[str, Any]] = fetch_jwks,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.min_refetch_seconds = min_refetch_seconds
+        self.fetch = fetch
+        self.clock = clock
+        self.keys: Dict[str, jwt.PyJWK] = {}
+        self.fetches = 0
+        self.on_keys_removed: Optional[Callable[[], None]] = None
+        self._fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> None:
+        document = await asyncio.to_thread(self.fetch, self.url)
+        self.fetches += 1
+        self._fetched_at = self.clock()
+        keys = {}
+        for entry in document.get("keys", []):
+            if entry.get("use", "sig") != "sig" or "kid" not in entry:
+                continue
+            try:
+                keys[entry["kid"]] = jwt.PyJWK(entry)
+            except jwt.PyJWTError as e:
+                logger.warning(f"Skipping unusable JWKS key {entry.get('kid')}: {e}")
+        removed = self.keys.keys() - keys.keys()
+        self.keys = keys
+        if removed and self.on_keys_removed is not None:
+            self.on_keys_removed()
+        logger.info(f"Loaded {len(keys)} signing keys from {self.url}")
+
+    async def get_key(self, kid: str) -> jwt.PyJWK:
+        key = self.keys.get(kid)
+        if key is not None:
+            return key
+        async with self._lock:
+            key = self.keys.get(kid)
+            if key is not None:
+                return key
+            if self._fetched_at is not None and self.clock() - self._fetched_at < self.min_refetch_seconds:
+                raise TokenError(f"Unknown signing key: {kid}")
+            try:
+                await self.refresh()
+            except Exception as e:
+                self._fetched_at = self.clock()
+                logger.warning(f"Could not fetch JWKS from {self.url}: {e}")
+                if not self.keys:
+                    raise JwksUnavailableError(str(e)) from e
+        key = self.keys.get(kid)
+        if key is None:
+            raise TokenError(f"Unknown signing key: {kid}")
+        return key
+
+    async def run(self) -> None:
+        """Refresh the keys every ``refresh_seconds`` until cancelled"""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"JWKS refresh failed, keeping {len(self.keys)} cached keys: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+
+class TokenValidator:
+    """Validates bearer tokens, remembering valid ones until they expire
+
+    Tokens are keyed by their SHA-256 so the cache holds no credentials. A hit
+    skips the signature check entirely, which is what makes repeat calls from
+    the same agent cheap; it still checks ``nbf`` and ``exp`` (with the same
+    leeway), so the cache accepts exactly the tokens ``jwt.decode`` would.
+    The cache is cleared when a signing key disappears from the JWKS, so
+    tokens signed by a revoked key stop working at the next refresh.
+    """
+
+    def __init__(
+        self,
+        jwks: JwksCache,
+        issuer: Optional[str],
+        audience: Optional[str],
+        algorithms: Sequence[str] = ("RS256",),
+        leeway: float = 60.0,
+        cache_size: int = 10000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.jwks = jwks
+        self.issuer = issuer
+        self.audience = audience
+        self.algorithms = list(algorithms)
+        self.leeway = leeway
+        self.cache_size = cache_size
+        self.clock = clock
+        self.cache: OrderedDict[bytes, Tuple[Dict[str, Any], float, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        jwks.on_keys_removed = self.cache.clear
+
+    async def validate(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims or raise TokenError"""
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        cached = self.cache.get(digest)
+        if cached is not None:
+            claims, not_before, expires_at = cached
+            now = self.clock()
+            if now < not_before:
+                raise TokenError("The token is not yet valid (nbf)")
+            if now < expires_at:
+                self.cache.move_to_end(digest)
+                self.hits += 1
+                return claims
+            del self.cache[digest]
+        self.misses += 1
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise TokenError(f"Malformed token: {e}") from e
+        if header.get("alg") not in self.algorithms:
+            raise TokenError(f"Token algorithm not allowed: {header.get('alg')}")
+        key = await self.jwks.get_key(header.get("kid", ""))
+        try:
+            claims = jwt.decode(
+                token,
+                key.key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+                options={"require": ["exp"], "verify_aud": self.audience is not None},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenError(str(e)) from e
+
+        not_before = claims["nbf"] - self.leeway if "nbf" in claims else float("-inf")
+        self.cache[digest] = (claims, not_before, claims["exp"] + self.leeway)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return claims
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "cached_tokens": len(self.cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "signing_keys": len(self.jwks.keys),
+            "jwks_fetches": self.jwks.fetches,
+        }
@@ -0,0 +1,236 @@
+"""
+Tool execution pools
+Runs tool handlers inline, on a thread pool or on a process pool sized to the container's CPU quota
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Execution classes a tool can declare
+INLINE = "inline"
+THREAD = "thread"
+PROCESS = "process"
+EXECUTION_CLASSES = (INLINE, THREAD, PROCESS)
+
+
+def cpu_quota() -> int:
+    """CPUs this container may use: the cgroup CPU limit, else the CPU affinity mask"""
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+    limit = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            limit = int(quota) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0:
+                limit = quota / period
+        except (OSError, ValueError):
+            pass
+    if limit is None:
+        return available
+    return max(1, min(available, int(limit)))
+
+
+def parse_execution_classes(spec: str) -> Dict[str, str]:
+    """Parse 'diff_snippets=process,get_snippet=inline' into tool name -> execution class"""
+    classes = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, execution = part.partition("=")
+        if execution not in EXECUTION_CLASSES:
+            raise ValueError(f"Invalid tool execution class: {part!r}")
+        classes[name.strip()] = execution
+    return classes
+
+
+@dataclass(frozen=True)
+class SharedValue:
+    """Reference to a large argument placed in shared memory instead of the worker's pipe"""
+    name: str
+    size: int
+    text: bool
+
+
+def share_large_values(arguments: Dict[str, Any], min_bytes: int) -> Tuple[Dict[str, Any], List[Any]]:
+    """
+    Move top-level str/bytes arguments of at least ``min_bytes`` into shared memory
+    Returns the arguments to send and the segments to unlink once the call is done
+    """
+    shared, segments = dict(arguments), []
+    for key, value in arguments.items():
+        if not isinstance(value, (str, bytes)):
+            continue
+        data = value.encode("utf-8") if isinstance(value, str) else value
+        if len(data) < min_bytes:
+            continue
+        segment = shared_memory.SharedMemory(create=True, size=len(data))
+        segment.buf[:len(data)] = data
+        segments.append(segment)
+        shared[key] = SharedValue(segment.name, len(data), isinstance(value, str))
+    return shared, segments
+
+
+def resolve_shared_values(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    resolved = dict(arguments)
+    for key, value in arguments.items():
+        if isinstance(value, SharedValue):
+            segment = shared_memory.SharedMemory(name=value.name)
+            try:
+                data = bytes(segment.buf[:value.size])
+            finally:
+                segment.close()
+            resolved[key] = data.decode("utf-8") if value.text else data
+    return resolved
+
+
+def run_handler(handler: Callable[[Dict[str, Any]], Dict[str, Any]], arguments: Dict[str, Any]):
+    """Worker entry point: returns (started, finished, result) so the caller can split queue and run time"""
+    started = time.time()
+    result = handler(resolve_shared_values(arguments))
+    return started, time.time(), result
+
+
+class PoolMetrics:
+    """Counters of one pool; queued is inferred as in-flight calls beyond the worker count"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_queued = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self.submitted - self.completed - self.failed
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "queue_seconds": round(self.queue_seconds, 6),
+            "run_seconds": round(self.run_seconds, 6),
+        }
+
+
+class ToolExecutor:
+    """Dispatches tool handlers to their execution class
+
+    Pool handlers are plain functions ``handler(arguments) -> result dict``.
+    Process pool handlers must be importable module-level functions; workers
+    are started with forkserver (spawn where unavailable) so they never
+    inherit the event loop or its threads, and only on first use. String and
+    bytes arguments above ``shared_memory_min_bytes`` travel through shared
+    memory rather than being pickled down the worker pipe.
+    """
+
+    def __init__(self, process_workers: Optional[int] = None, thread_workers: Optional[int] = None,
+                 shared_memory_min_bytes: int = 64 * 1024):
+        self.process_workers = process_workers or cpu_quota()
+        self.thread_workers = thread_workers or min(32, self.process_workers + 4)
+        self.shared_memory_min_bytes = shared_memory_min_bytes
+        self.metrics = {
+            THREAD: PoolMetrics(self.thread_workers),
+            PROCESS: PoolMetrics(self.process_workers),
+        }
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self, execution: str):
+        if execution == THREAD:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="tool")
+            return self._threads
+        if self._processes is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._processes = ProcessPoolExecutor(self.process_workers, mp_context=context)
+            logger.info(f"Started tool process pool with {self.process_workers} workers")
+        return self._processes
+
+    async def run(self, execution: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+                  arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if execution == INLINE:
+            return handler(arguments)
+        metrics = self.metrics[execution]
+        segments: List[Any] = []
+        if execution == PROCESS:
+            arguments, segments = share_large_values(arguments, self.shared_memory_min_bytes)
+        metrics.submitted += 1
+        metrics.max_queued = max(metrics.max_queued, metrics.queued)
+        call = functools.partial(run_handler, handler, arguments)
+        if execution == THREAD:
+            # Thread handlers see the caller's context variables, e.g. the request's token claims
+            call = functools.partial(contextvars.copy_context().run, call)
+        submitted = time.time()
+        try:
+            started, finished, result = await asyncio.get_running_loop().run_in_executor(self._pool(execution), call)
+        except BaseException:
+            metrics.failed += 1
+            raise
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+        metrics.completed += 1
+        metrics.queue_seconds += max(0.0, started - submitted)
+        metrics.run_seconds += finished - started
+        return result
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {execution: metrics.status() for execution, metrics in self.metrics.items()}
+
+    def prometheus(self, prefix: str = "mcp_tool_pool") -> str:
+        """Per-pool metrics in Prometheus text exposition format"""
+        series = [
+            ("workers", "gauge", "Workers in the pool", lambda m: m.workers),
+            ("in_flight", "gauge", "Calls submitted and not yet finished", lambda m: m.in_flight),
+            ("queued", "gauge", "Calls waiting for a free worker", lambda m: m.queued),
+            ("completed_total", "counter", "Calls completed", lambda m: m.completed),
+            ("failed_total", "counter", "Calls that raised", lambda m: m.failed),
+            ("queue_seconds_total", "counter", "Time calls spent waiting for a worker", lambda m: m.queue_seconds),
+            ("run_seconds_total", "counter", "Time calls spent running on a worker", lambda m: m.run_seconds),
+        ]
+        lines = []
+        for name, kind, help_text, value in series:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f'{prefix}_{name}{{pool="{pool}"}} {value(m):g}' for pool, m in self.metrics.items())
+        return "\n".join(lines) + "\n"
+
+    def shutdown(self) -> None:
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        self._threads = self._processes = None
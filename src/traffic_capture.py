@@ -0,0 +1,221 @@
+"""
+Traffic capture
+Sampled, redacted NDJSON log of message endpoint requests and SSE stream lifecycle, for benchmarks/replay.py
+"""
+
+import asyncio
+import collections
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import time
+from datetime import UTC, datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+REDACT_MODES = ("hash", "none")
+# Params whose values are protocol vocabulary rather than caller data
+KEPT_PARAMS = ("name", "protocolVersion")
+
+
+def expand_path(path: str) -> str:
+    """``{hostname}`` in the path becomes the pod name, so replicas sharing a volume write separate files"""
+    return path.replace("{hostname}", socket.gethostname())
+
+
+class TrafficRecorder:
+    """Records what a replica is asked to do, with timing, so it can be replayed elsewhere
+
+    Each line is a JSON object with ``t`` (microseconds since the capture
+    started), ``e`` (``open``, ``close`` or ``rpc``) and ``s`` (the session).
+    ``rpc`` lines carry the JSON-RPC body ``b``, the HTTP status ``st`` and
+    the time to respond ``us``. Whole sessions are sampled, so the ones kept
+    are complete. With ``redact="hash"`` session ids and every string the
+    caller supplied are replaced by keyed hashes of the same length: equal
+    values stay equal (cache hits replay as hits) and payload sizes are kept.
+    Paths ending in ``.gz`` are gzip-compressed; an existing file is replaced.
+
+    Recording only appends to an in-memory queue; ``run()`` writes it out from
+    a worker thread. When the queue is full or the file reaches ``max_bytes``
+    records are dropped and counted rather than slowing requests down.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 1.0,
+        redact: str = "hash",
+        max_bytes: int = 256 * 1024 * 1024,
+        max_pending: int = 10000,
+        flush_interval: float = 1.0,
+        salt: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if redact not in REDACT_MODES:
+            raise ValueError(f"Unknown redaction mode {redact!r}; expected one of {', '.join(REDACT_MODES)}")
+        self.path = expand_path(path)
+        self.sample_rate = sample_rate
+        self.redact = redact
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.key = hashlib.blake2b((salt or os.urandom(16).hex()).encode("utf-8"), digest_size=32).digest()
+        self.clock = clock
+        self.started = clock()
+        self.started_at = datetime.now(UTC).isoformat()
+        self.pending: Deque[Tuple] = collections.deque()
+        self.recording = True
+        self.recorded = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self._file = None
+
+    def sampled(self, session_id: Optional[str]) -> bool:
+        if self.sample_rate >= 1.0:
+            return True
+        if not session_id:
+            return random.random() < self.sample_rate
+        digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") < self.sample_rate * 2 ** 64
+
+    def _record(self, *entry) -> None:
+        if not self.recording:
+            return
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.pending.append(entry)
+
+    def session_opened(self, session_id: str, transport: str, resumed: bool) -> None:
+        """A client opened (or resumed) a session's SSE stream"""
+        if self.sampled(session_id):
+            self._record(self.clock(), "open", session_id, transport, resumed)
+
+    def session_closed(self, session_id: str) -> None:
+        if self.sampled(session_id):
+            self._record(self.clock(), "close", session_id)
+
+    def request(self, session_id: Optional[str], body: Any, arrived: float, status: int) -> None:
+        """A JSON-RPC message or batch that arrived at ``arrived`` (on ``clock``) was answered with ``status``"""
+        if self.sampled(session_id):
+            self._record(arrived, "rpc", session_id, body, self.clock() - arrived, status)
+
+    def pseudonym(self, value: str) -> str:
+        """Keyed hash of ``value`` as hex, repeated or cut to the same length"""
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16, key=self.key).hexdigest()
+        return (digest * (len(value) // len(digest) + 1))[:len(value)]
+
+    def _redact_value(self, value: Any) -> Any:
+        if isinstance(value, str):
+            scheme, separator, rest = value.partition("://")
+            return scheme + separator + self.pseudonym(rest) if separator else self.pseudonym(value)
+        if isinstance(value, dict):
+            return {key: self._redact_value(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._redact_value(item) for item in value]
+        return value
+
+    def _redact_message(self, message: Any) -> Any:
+        if not isinstance(message, dict) or not isinstance(message.get("params"), dict):
+            return message
+        params = {
+            key: value if key in KEPT_PARAMS else self._redact_value(value)
+            for key, value in message["params"].items()
+        }
+        return {**message, "params": params}
+
+    def encode(self, entry: Tuple) -> Dict[str, Any]:
+        at, kind, session_id = entry[:3]
+        line: Dict[str, Any] = {"t": round((at - self.started) * 1e6), "e": kind}
+        if session_id:
+            line["s"] = self.pseudonym(session_id) if self.redact == "hash" else session_id
+        if kind == "open":
+            line["x"] = entry[3]
+            if entry[4]:
+                line["r"] = 1
+        elif kind == "rpc":
+            body, latency, status = entry[3:]
+            if self.redact == "hash":
+                body = [self._redact_message(m) for m in body] if isinstance(body, list) else self._redact_message(body)
+            line.update(b=body, st=status, us=round(latency * 1e6))
+        return line
+
+    def _write(self, batch: List[Tuple]) -> None:
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            opener = gzip.open if self.path.endswith(".gz") else open
+            self._file = opener(self.path, "wt", encoding="utf-8")
+            header = {"e": "capture", "v": FORMAT_VERSION, "started": self.started_at,
+                      "host": socket.gethostname(), "sample_rate": self.sample_rate, "redact": self.redact}
+            self._file.write(json.dumps(header, separators=(",", ":")) + "\n")
+        for i, entry in enumerate(batch):
+            text = json.dumps(self.encode(entry), separators=(",", ":"), default=str) + "\n"
+            if self.bytes_written + len(text) > self.max_bytes:
+                self.recording = False
+                self.dropped += len(batch) - i
+                logger.warning(f"Traffic capture reached {self.max_bytes} bytes, recording stopped")
+                break
+            self._file.write(text)
+            self.bytes_written += len(text)
+            self.recorded += 1
+        self._file.flush()
+
+    async def flush(self) -> None:
+        if not self.pending:
+            return
+        batch = list(self.pending)
+        self.pending.clear()
+        await asyncio.to_thread(self._write, batch)
+
+    async def run(self) -> None:
+        logger.info(f"Capturing traffic to {self.path} (sample rate {self.sample_rate:g}, redaction {self.redact})")
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except OSError as e:
+                self.recording = False
+                logger.warning(f"Traffic capture stopped, cannot write {self.path}: {e}")
+
+    async def close(self) -> None:
+        try:
+            await self.flush()
+        finally:
+            if self._file is not None:
+                await asyncio.to_thread(self._file.close)
+                self._file = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "recording": self.recording,
+            "recorded": self.recorded,
+            "pending": len(self.pending),
+            "dropped": self.dropped,
+            "bytes_written": self.bytes_written,
+        }
+
+
+def read_capture(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """The header and records of a capture file"""
+    opener = gzip.open if path.endswith(".gz") else open
+    header: Dict[str, Any] = {}
+    records = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("e") == "capture":
+                header = record
+            else:
+                records.append(record)
+    return header, records
@@ -0,0 +1,435 @@
+"""
+Snippet vector index
+Pluggable embedders and a contiguous float16 vector matrix with batched top-k and optional IVF partitioning
+"""
+
+import asyncio
+import json
+import logging
+import struct
+import sys
+import tempfile
+import urllib.request
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from content_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"MCPVEC1\n"
+
+# Rows scored per block in a brute-force scan; bounds the float32 temporaries
+SEARCH_BLOCK_ROWS = 8192
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length as float32 (all-zero rows stay zero)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of tokens and adjacent token pairs
+
+    Needs no model, so similarity is lexical (shared identifiers and phrases)
+    rather than semantic; use it for local development and air-gapped clusters.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed_one(self, text: str) -> np.ndarray:
+        tokens = tokenize(text)
+        features = Counter(tokens)
+        features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        if not features:
+            return np.zeros(self.dimensions, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+        weights = np.log1p(np.fromiter(features.values(), dtype=np.float32, count=len(features)))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        return np.bincount(hashes % self.dimensions, weights=signs * weights, minlength=self.dimensions)
+
+    def embed_sync(self, texts: Sequence[str]) -> np.ndarray:
+        return normalize(np.stack([self.embed_one(text) for text in texts]))
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return await asyncio.to_thread(self.embed_sync, texts)
+
+
+class HttpEmbedder:
+    """Embeddings from an OpenAI-compatible ``/v1/embeddings`` endpoint, such as a KAITO workspace"""
+
+    def __init__(self, url: str, model: str, dimensions: int, timeout: float = 30.0, batch_size: int = 32,
+                 post: Optional[Callable[[str, Dict[str, Any], float], Dict[str, Any]]] = None):
+        self.url = url
+        self.model = model
+        self.dimensions = dimensions
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.post = post or post_json
+        self.name = f"http-{model}-{dimensions}"
+
+    def embed_sync(self, texts: Sequence[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start:start + self.batch_size])
+            response = self.post(self.url, {"model": self.model, "input": batch}, self.timeout)
+            data = sorted(response["data"], key=lambda item: item["index"])
+            rows.extend(item["embedding"] for item in data)
+        vectors = np.asarray(rows, dtype=np.float32)
+        if vectors.shape != (len(texts), self.dimensions):
+            raise ValueError(f"Embedding endpoint returned shape {vectors.shape}, expected {self.dimensions} dims")
+        return normalize(vectors)
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return await asyncio.to_thread(self.embed_sync, texts)
+
+
+def post_json(url: str, body: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+class VectorIndex:
+    """Unit vectors of snippets, one float16 row per snippet, scored by inner product
+
+    Rows live in one contiguous matrix that doubles when full; with
+    ``directory`` set it is a memory-mapped temporary file, so the page cache
+    rather than the heap holds it. Re-saving a snippet overwrites its row in
+    place. Removed rows are masked out of searches and dropped on compaction.
+
+    Searches score every row, or with ``train()`` only the rows in the
+    ``probes`` partitions (IVF) whose centroids are closest to the query.
+    Rows are appended and never moved except by ``compact()``, which builds
+    new arrays, so a search running in a worker thread sees a consistent view.
+    """
+
+    def __init__(self, dimensions: int, directory: Optional[str] = None, capacity: int = 1024):
+        self.dimensions = dimensions
+        self.directory = directory
+        self.names: List[Optional[str]] = []
+        self.ids: Dict[str, int] = {}
+        self.vectors = self._allocate(capacity)
+        self.live = np.zeros(capacity, dtype=bool)
+        self.assignments = np.full(capacity, -1, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self.loaded = False
+        self.dirty = False
+        # When the snapshot this index was loaded from (or last written to) was taken
+        self.written_at: Optional[float] = None
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        if self.directory is None:
+            return np.zeros((capacity, self.dimensions), dtype=np.float16)
+        # An unlinked file: the mapping lives exactly as long as the array
+        backing = tempfile.TemporaryFile(dir=self.directory)
+        return np.memmap(backing, dtype=np.float16, mode="w+", shape=(capacity, self.dimensions))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    @property
+    def capacity(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.live.nbytes + self.assignments.nbytes
+
+    def _grow(self, needed: int) -> None:
+        capacity = max(needed, self.capacity * 2)
+        vectors = self._allocate(capacity)
+        rows = len(self.names)
+        vectors[:rows] = self.vectors[:rows]
+        live = np.zeros(capacity, dtype=bool)
+        live[:rows] = self.live[:rows]
+        assignments = np.full(capacity, -1, dtype=np.int32)
+        assignments[:rows] = self.assignments[:rows]
+        self.vectors, self.live, self.assignments = vectors, live, assignments
+
+    def add_many(self, names: Sequence[str], vectors: np.ndarray) -> None:
+        """Insert or replace the vectors of ``names`` (rows of ``vectors``)"""
+        vectors = normalize(vectors)
+        rows = np.empty(len(names), dtype=np.int64)
+        appended = sum(1 for name in set(names) if name not in self.ids)
+        if len(self.names) + appended > self.capacity:
+            self._grow(len(self.names) + appended)
+        for position, name in enumerate(names):
+            row = self.ids.get(name)
+            if row is None:
+                row = self.ids[name] = len(self.names)
+                self.names.append(name)
+            rows[position] = row
+        self.vectors[rows] = vectors.astype(np.float16)
+        if self.centroids is not None:
+            self.assignments[rows] = np.argmax(vectors @ self.centroids.T, axis=1)
+        self.live[rows] = True
+        self.dirty = True
+
+    def add(self, name: str, vector: np.ndarray) -> None:
+        self.add_many([name], np.asarray(vector)[None, :])
+
+    def remove(self, name: str) -> None:
+        row = self.ids.pop(name, None)
+        if row is None:
+            return
+        self.names[row] = None
+        self.live[row] = False
+        self.dirty = True
+
+    def vector(self, name: str) -> Optional[np.ndarray]:
+        row = self.ids.get(name)
+        return None if row is None else self.vectors[row].astype(np.float32)
+
+    def missing(self, names) -> List[str]:
+        """Names that are not yet indexed"""
+        return [name for name in names if name not in self.ids]
+
+    def absent(self, names) -> List[str]:
+        """Indexed names that are not in ``names``, i.e. snippets deleted since they were embedded"""
+        return [name for name in self.ids if name not in names]
+
+    @property
+    def tombstones(self) -> int:
+        return len(self.names) - len(self.ids)
+
+    def compact(self) -> None:
+        """Drop removed rows into new, densely packed arrays"""
+        keep = np.flatnonzero(self.live[:len(self.names)])
+        vectors = self._allocate(max(len(keep), 1024))
+        vectors[:len(keep)] = self.vectors[keep]
+        live = np.zeros(len(vectors), dtype=bool)
+        live[:len(keep)] = True
+        assignments = np.full(len(vectors), -1, dtype=np.int32)
+        assignments[:len(keep)] = self.assignments[keep]
+        self.names = [self.names[row] for row in keep.tolist()]
+        self.ids = {name: row for row, name in enumerate(self.names)}
+        self.vectors, self.live, self.assignments = vectors, live, assignments
+
+    def train(self, lists: int, iterations: int = 10, sample_size: Optional[int] = None, seed: int = 0) -> None:
+        """Partition rows into ``lists`` clusters for IVF search"""
+        self.use_partitions(*self.fit_partitions(lists, iterations, sample_size, seed))
+
+    def fit_partitions(self, lists: int, iterations: int = 10, sample_size: Optional[int] = None,
+                       seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Spherical k-means on a sample, then the nearest centroid of every current row
+        Only reads the index, so it can run in a worker thread; install the result with ``use_partitions``
+        """
+        rng = np.random.default_rng(seed)
+        rows = len(self.names)
+        live = np.flatnonzero(self.live[:rows])
+        if len(live) < lists:
+            raise ValueError(f"Need at least {lists} vectors to train {lists} partitions, have {len(live)}")
+        sample = rng.choice(live, min(len(live), sample_size or lists * 64), replace=False)
+        data = self.vectors[np.sort(sample)].astype(np.float32)
+        centroids = data[rng.choice(len(data), lists, replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, data)
+            counts = np.bincount(nearest, minlength=lists)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(counts[:, None] > 0, normalize(sums), centroids)
+        return centroids, self._nearest_partitions(centroids, 0, rows)
+
+    def _nearest_partitions(self, centroids: np.ndarray, start: int, end: int) -> np.ndarray:
+        assignments = np.empty(end - start, dtype=np.int32)
+        for block in range(start, end, SEARCH_BLOCK_ROWS):
+            vectors = self.vectors[block:min(end, block + SEARCH_BLOCK_ROWS)].astype(np.float32)
+            assignments[block - start:block - start + len(vectors)] = np.argmax(vectors @ centroids.T, axis=1)
+        return assignments
+
+    def use_partitions(self, centroids: np.ndarray, assignments: np.ndarray) -> None:
+        """Switch to IVF search; rows added or replaced since ``fit_partitions`` are assigned here"""
+        rows = len(self.names)
+        updated = np.full(self.capacity, -1, dtype=np.int32)
+        updated[:len(assignments)] = assignments
+        updated[len(assignments):rows] = self._nearest_partitions(centroids, len(assignments), rows)
+        self.assignments, self.centroids = updated, centroids
+        self.trained_size = len(self)
+
+    def search(self, queries: np.ndarray, k: int = 10, probes: int = 8) -> List[List[Tuple[str, float]]]:
+        """Top ``k`` (name, cosine similarity) for each row of ``queries``
+
+        NumPy releases the GIL in the matrix products, so call this from a
+        worker thread for large indexes.
+        """
+        queries = normalize(np.atleast_2d(queries))
+        names, rows = self.names, len(self.names)
+        vectors, live, assignments, centroids = self.vectors, self.live, self.assignments, self.centroids
+        if rows == 0 or k <= 0:
+            return [[] for _ in queries]
+        if centroids is not None and probes < len(centroids):
+            return [self._search_partitions(query, k, probes, names, rows, vectors, live, assignments, centroids)
+                    for query in queries]
+
+        best_rows, best_scores = [], []
+        for start in range(0, rows, SEARCH_BLOCK_ROWS):
+            end = min(rows, start + SEARCH_BLOCK_ROWS)
+            scores = vectors[start:end].astype(np.float32) @ queries.T
+            scores[~live[start:end]] = -np.inf
+            top = top_k(scores, k)
+            best_rows.append(top + start)
+            best_scores.append(np.take_along_axis(scores, top, axis=0))
+        candidates, scores = np.concatenate(best_rows), np.concatenate(best_scores)
+        top = top_k(scores, k)
+        candidates = np.take_along_axis(candidates, top, axis=0)
+        scores = np.take_along_axis(scores, top, axis=0)
+        return [
+            [(names[row], float(score)) for row, score in zip(candidates[:, q].tolist(), scores[:, q].tolist())
+             if score != -np.inf]
+            for q in range(len(queries))
+        ]
+
+    @staticmethod
+    def _search_partitions(query, k, probes, names, rows, vectors, live, assignments, centroids):
+        nearest_lists = np.argpartition(-(centroids @ query), probes - 1)[:probes]
+        candidates = np.flatnonzero(np.isin(assignments[:rows], nearest_lists) & live[:rows])
+        if not len(candidates):
+            return []
+        scores = vectors[candidates].astype(np.float32) @ query
+        top = top_k(scores[:, None], k)[:, 0]
+        return [(names[row], float(score)) for row, score in zip(candidates[top].tolist(), scores[top].tolist())]
+
+    def snapshot_body(self) -> bytes:
+        """Serialize names and float16 rows; vectors barely compress, so this is the snapshot as stored"""
+        if self.tombstones:
+            self.compact()
+        header = json.dumps({
+            "byteorder": sys.byteorder,
+            "dimensions": self.dimensions,
+            "names": self.names,
+            "written_at": self.written_at,
+        })
+        header_bytes = header.encode("utf-8")
+        rows = np.ascontiguousarray(self.vectors[:len(self.names)])
+        return SNAPSHOT_MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes + rows.tobytes()
+
+    @classmethod
+    def from_snapshot(cls, data: bytes, directory: Optional[str] = None) -> "VectorIndex":
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise ValueError("Not a vector index snapshot")
+        position = len(SNAPSHOT_MAGIC)
+        (length,) = struct.unpack_from("<Q", data, position)
+        position += 8
+        header = json.loads(data[position:position + length])
+        rows = np.frombuffer(data, dtype=np.float16, offset=position + length).reshape(-1, header["dimensions"])
+        if header["byteorder"] != sys.byteorder:
+            rows = rows.byteswap()
+        index = cls(header["dimensions"], directory, capacity=max(len(rows), 1024))
+        index.names = header["names"]
+        index.written_at = header.get("written_at")
+        index.ids = {name: row for row, name in enumerate(index.names)}
+        index.vectors[:len(rows)] = rows
+        index.live[:len(rows)] = True
+        index.loaded = True
+        return index
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row positions of the ``k`` highest scores in each column, best first"""
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=0), axis=0, kind="stable")
+    return np.take_along_axis(top, order, axis=0)
+
+
+class SearchBatcher:
+    """Coalesces concurrent searches into one pass over the matrix
+
+    Converting the float16 rows dominates a brute-force scan, and one pass can
+    score many queries at once. A search that arrives while another is running
+    waits for the next pass, which takes everything queued (up to
+    ``max_batch``); under light load a query runs immediately on its own.
+    """
+
+    def __init__(self, search: Callable[[np.ndarray, int], List[List[Tuple[str, float]]]], max_batch: int = 64):
+        self.search_fn = search
+        self.max_batch = max_batch
+        self.pending: List[Tuple[np.ndarray, int, asyncio.Future]] = []
+        self.passes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((query, k, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return await future
+
+    async def _run(self) -> None:
+        while self.pending:
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            queries = np.stack([query for query, _, _ in batch])
+            self.passes += 1
+            try:
+                results = await asyncio.to_thread(self.search_fn, queries, max(k for _, k, _ in batch))
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, k, future), found in zip(batch, results):
+                if not future.done():
+                    future.set_result(found[:k])
+
+
+class VectorIndexer:
+    """Embeds saved snippets in batches, off the request path
+
+    ``submit`` only records the text; a background task embeds whatever has
+    accumulated, ``batch_size`` snippets per embedder call, so a burst of
+    saves costs a few model round trips rather than one each. If embedding
+    fails the snippets are skipped; the periodic sync picks them up again.
+    """
+
+    def __init__(self, embedder, index: VectorIndex, batch_size: int = 32):
+        self.embedder = embedder
+        self.index = index
+        self.batch_size = batch_size
+        self.pending: Dict[str, str] = {}
+        self.embedded = 0
+        self.failed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, name: str, text: str) -> None:
+        self.pending[name] = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._embed_pending())
+
+    def remove(self, name: str) -> None:
+        """Forget a deleted snippet, including text still waiting to be embedded"""
+        self.pending.pop(name, None)
+        self.index.remove(name)
+
+    async def _embed_pending(self) -> None:
+        while self.pending:
+            names = list(self.pending)[:self.batch_size]
+            texts = [self.pending.pop(name) for name in names]
+            try:
+                vectors = await self.embedder.embed(texts)
+            except Exception as e:
+                self.failed += len(names)
+                logger.warning(f"Could not embed {len(names)} snippets: {e}")
+                continue
+            self.index.add_many(names, vectors)
+            self.embedded += len(names)
+
+    async def flush(self) -> None:
+        """Wait until every submitted snippet is embedded"""
+        if self._task is not None and not self._task.done():
+            await asyncio.gather(self._task, return_exceptions=True)
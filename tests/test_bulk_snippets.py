@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Bulk Snippet Tool Tests
+
+Covers get_snippets and save_snippets: storage operations run concurrently
+up to the configured limit, results come back per item in request order,
+and failed items are reported without failing the rest of the call.
+
+Usage:
+    python -m pytest tests/test_bulk_snippets.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import mcp_server
+from resilience import ResilientBackend
+from snippet_cache import SnippetCache
+from storage import MemoryStorageBackend, StorageError
+
+
+class SlowBackend(MemoryStorageBackend):
+    """In-memory storage taking 20ms per call, recording peak concurrency and failing 'bad*' writes"""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+        self.gets = 0
+
+    async def _call(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            self.active -= 1
+
+    async def get(self, key):
+        self.gets += 1
+        await self._call()
+        return await super().get(key)
+
+    async def put(self, key, data):
+        await self._call()
+        if key.startswith("bad"):
+            raise StorageError("write refused")
+        await super().put(key, data)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    slow = SlowBackend()
+    monkeypatch.setattr(mcp_server, "storage_backend", ResilientBackend(slow))
+    monkeypatch.setattr(mcp_server, "BULK_SNIPPET_CONCURRENCY", 4)
+    monkeypatch.setattr(mcp_server, "snippet_index", mcp_server.SnippetNameIndex())
+    monkeypatch.setattr(mcp_server, "snippet_cache", SnippetCache(1 << 20))
+    return slow
+
+
+def results_of(result):
+    return json.loads(result.content[0]["text"])
+
+
+def test_get_snippets_reads_concurrently_and_reports_each_item(backend):
+    for i in range(12):
+        backend.blobs[f"s{i}.json"] = f"snippet {i}".encode()
+    names = [f"s{i}" for i in range(12)] + ["missing", "s0", ""]
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        result = await mcp_server.execute_tool("get_snippets", {"snippetnames": names})
+        return result, asyncio.get_running_loop().time() - started
+
+    result, elapsed = asyncio.run(run())
+    body = results_of(result)
+    assert not result.isError
+    assert (body["succeeded"], body["failed"]) == (13, 2)
+    assert [r.get("snippet") for r in body["results"][:12]] == [f"snippet {i}" for i in range(12)]
+    assert body["results"][12] == {"snippetname": "missing", "error": "Snippet 'missing' not found"}
+    assert body["results"][13]["snippet"] == "snippet 0"
+    assert "error" in body["results"][14]
+    # 13 distinct reads, four at a time: four rounds of 20ms rather than thirteen
+    assert backend.peak == 4 and backend.gets == 13
+    assert elapsed < 13 * 0.02
+
+
+def test_save_snippets_reports_partial_failure(backend):
+    items = [{"snippetname": f"ok{i}", "snippet": f"text {i}"} for i in range(5)]
+    items += [{"snippetname": "bad", "snippet": "x"}, {"snippetname": "ok0", "snippet": "again"}, {"snippet": "x"}]
+
+    result = asyncio.run(mcp_server.execute_tool("save_snippets", {"snippets": items}))
+    body = results_of(result)
+    assert not result.isError
+    assert (body["succeeded"], body["failed"]) == (5, 3)
+    assert body["results"][0] == {"snippetname": "ok0", "saved": True}
+    assert body["results"][5]["error"].startswith("Storage error")
+    assert body["results"][6]["error"] == "Snippet name repeated in this call"
+    assert sorted(backend.blobs) == [f"ok{i}.json" for i in range(5)]
+    assert "ok3" in mcp_server.snippet_index.prefix("ok")[0]
+
+
+def test_bulk_calls_are_refused_as_a_whole_only_when_nothing_succeeds(backend, monkeypatch):
+    monkeypatch.setattr(mcp_server, "BULK_SNIPPET_MAX_ITEMS", 3)
+
+    async def run():
+        return (
+            await mcp_server.execute_tool("get_snippets", {"snippetnames": ["a", "b", "c", "d"]}),
+            await mcp_server.execute_tool("get_snippets", {"snippetnames": []}),
+            await mcp_server.execute_tool("save_snippets", {"snippets": [{"snippetname": "bad", "snippet": "x"}]}),
+        )
+
+    too_many, empty, all_failed = asyncio.run(run())
+    assert too_many.isError and empty.isError
+    assert all_failed.isError and results_of(all_failed)["failed"] == 1
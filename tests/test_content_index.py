@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Snippet Content Index Tests
+
+Covers tokenization, BM25 ranking, incremental re-indexing and snapshot
+round trips in src/content_index.py plus the find_snippets tool, and how
+replicas sharing storage pick up each other's saves and deletions.
+
+Usage:
+    python -m pytest tests/test_content_index.py
+"""
+
+import asyncio
+import json
+
+import mcp_server
+from content_index import SnippetContentIndex, tokenize
+from resilience import ResilientBackend
+from resource_subscriptions import ChangeFeed, snippet_uri
+from snippet_index import SnippetNameIndex
+from storage import MemoryStorageBackend
+
+
+def test_tokenize_splits_code_identifiers():
+    assert tokenize("def getBlobClient(container_name): return 42") == [
+        "def", "get", "blob", "client", "container_name", "return", "42",
+    ]
+
+
+def test_bm25_ranks_more_relevant_snippets_first():
+    index = SnippetContentIndex()
+    index.add("kubectl", "kubectl get pods -n mcp-server; kubectl logs mcp-server")
+    index.add("bicep", "resource storage 'Microsoft.Storage/storageAccounts' storage account")
+    index.add("mixed", "deploy storage then run kubectl apply")
+
+    names = [name for name, _ in index.search("kubectl")]
+    assert names == ["kubectl", "mixed"]
+    assert index.search("storage account")[0][0] == "bicep"
+    assert index.search("nonexistent") == []
+
+
+def test_resave_replaces_previous_content():
+    index = SnippetContentIndex()
+    index.add("note", "alpha beta")
+    index.add("note", "gamma delta")
+    assert index.search("alpha") == []
+    assert [name for name, _ in index.search("gamma")] == ["note"]
+    assert len(index) == 1
+    assert index.tombstones == 1
+
+    index.compact()
+    assert index.tombstones == 0
+    assert index.doc_names == ["note"]
+    assert [name for name, _ in index.search("delta")] == ["note"]
+
+
+def test_snapshot_round_trip_preserves_results():
+    index = SnippetContentIndex()
+    for i in range(200):
+        index.add(f"doc-{i}", f"shared token{i % 7} unique{i} " * (1 + i % 3))
+    index.add("doc-5", "rewritten content")
+    snapshot = index.to_snapshot()
+    assert index.tombstones == 0  # snapshots are written compacted
+    expected = index.search("token3 shared", limit=20)
+
+    restored = SnippetContentIndex.from_snapshot(snapshot)
+    assert restored.loaded
+    assert len(restored) == 200
+    assert restored.search("token3 shared", limit=20) == expected
+    assert [name for name, _ in restored.search("rewritten")] == ["doc-5"]
+
+    restored.add("doc-new", "token3 fresh")
+    assert "doc-new" in restored
+
+
+def test_find_snippets_tool_and_snapshot_bootstrap(monkeypatch):
+    memory = MemoryStorageBackend()
+    backend = ResilientBackend(memory)
+    monkeypatch.setattr(mcp_server, "storage_backend", backend)
+    monkeypatch.setattr(mcp_server, "snippet_index", SnippetNameIndex())
+    monkeypatch.setattr(mcp_server, "content_index", SnippetContentIndex())
+
+    async def first_replica():
+        memory.blobs["existing.json"] = b"apim policy validate-jwt"
+        await mcp_server.reconcile_snippet_index()
+        await mcp_server.sync_content_index()
+        await mcp_server.execute_tool("save_snippet", {"snippetname": "kaito", "snippet": "kaito workspace gpu"})
+        await mcp_server.persist_content_index()
+
+    asyncio.run(first_replica())
+    assert mcp_server.CONTENT_INDEX_SNAPSHOT_KEY in memory.blobs
+
+    result = asyncio.run(mcp_server.execute_tool("find_snippets", {"query": "jwt policy"}))
+    assert json.loads(result.content[0]["text"])["results"][0]["snippetname"] == "existing"
+
+    # A new replica loads the snapshot and does not download indexed snippets again
+    monkeypatch.setattr(mcp_server, "snippet_index", SnippetNameIndex())
+    monkeypatch.setattr(mcp_server, "content_index", SnippetContentIndex())
+    downloads = []
+    original_get = memory.get
+
+    async def counting_get(key):
+        downloads.append(key)
+        return await original_get(key)
+
+    monkeypatch.setattr(memory, "get", counting_get)
+
+    async def second_replica():
+        await mcp_server.reconcile_snippet_index()
+        await mcp_server.sync_content_index()
+
+    asyncio.run(second_replica())
+    assert downloads == [mcp_server.CONTENT_INDEX_SNAPSHOT_KEY]
+    result = asyncio.run(mcp_server.execute_tool("find_snippets", {"query": "gpu"}))
+    assert json.loads(result.content[0]["text"])["results"][0]["snippetname"] == "kaito"
+
+
+def replica(monkeypatch, backend, replica_id):
+    """Fresh indexes and change feed for one replica sharing ``backend``"""
+    monkeypatch.setattr(mcp_server, "snippet_index", SnippetNameIndex())
+    monkeypatch.setattr(mcp_server, "content_index", SnippetContentIndex())
+    feed = ChangeFeed(mcp_server.notify_resources_updated, storage=backend, coalesce_seconds=0.01,
+                      replica_id=replica_id, remote=mcp_server.reindex_remote_changes)
+    monkeypatch.setattr(mcp_server, "resource_changes", feed)
+    return feed
+
+
+async def save_elsewhere(backend, *names):
+    other = ChangeFeed(lambda uris: None, storage=backend, coalesce_seconds=0.01, replica_id="elsewhere")
+    for name in names:
+        other.changed(snippet_uri(name))
+    await other.flush()
+
+
+def test_other_replicas_saves_and_deletions_reach_the_index(monkeypatch):
+    memory = MemoryStorageBackend()
+    backend = ResilientBackend(memory)
+    monkeypatch.setattr(mcp_server, "storage_backend", backend)
+    memory.blobs.update({"note.json": b"alpha beta", "gone.json": b"gamma", "brief.json": b"theta"})
+
+    async def run():
+        feed = replica(monkeypatch, backend, "local")
+        await mcp_server.reconcile_snippet_index()
+        await mcp_server.sync_content_index()
+        await feed.poll()
+
+        memory.blobs.update({"note.json": b"delta epsilon", "new.json": b"zeta"})
+        del memory.blobs["brief.json"]
+        await save_elsewhere(backend, "note", "new", "brief")
+        await feed.poll()
+        await mcp_server.remote_reindex_task
+        remote = (mcp_server.content_index.search("alpha"), mcp_server.content_index.search("delta"),
+                  sorted(mcp_server.content_index.doc_ids), list(mcp_server.snippet_index))
+
+        # Deleted without a change record: the next reconciliation drops it
+        del memory.blobs["gone.json"]
+        await mcp_server.reconcile_snippet_index()
+        await mcp_server.sync_content_index()
+        return remote, sorted(mcp_server.content_index.doc_ids)
+
+    (old, new, indexed, names), reconciled = asyncio.run(run())
+    assert old == [] and [name for name, _ in new] == ["note"]
+    assert indexed == ["gone", "new", "note"] and "new" in names
+    assert reconciled == ["new", "note"]
+
+
+def test_snapshot_load_reindexes_snippets_changed_after_it_was_written(monkeypatch):
+    memory = MemoryStorageBackend()
+    backend = ResilientBackend(memory)
+    monkeypatch.setattr(mcp_server, "storage_backend", backend)
+    memory.blobs.update({f"{name}.json": f"{name} original".encode() for name in "abc"})
+    downloads = []
+    original_get = memory.get
+
+    async def counting_get(key):
+        downloads.append(key)
+        return await original_get(key)
+
+    monkeypatch.setattr(memory, "get", counting_get)
+
+    async def run():
+        writer = replica(monkeypatch, backend, "writer")
+        await mcp_server.reconcile_snippet_index()
+        await mcp_server.sync_content_index()
+
+        # Another replica rewrites b; the writer has not seen that yet when it writes the last snapshot
+        memory.blobs["b.json"] = b"b rewritten"
+        await save_elsewhere(backend, "b")
+        await mcp_server.execute_tool("save_snippet", {"snippetname": "d", "snippet": "d fresh"})
+        await writer.flush()
+        await mcp_server.persist_content_index()
+
+        replica(monkeypatch, backend, "reader")
+        downloads.clear()
+        await mcp_server.reconcile_snippet_index()
+        await mcp_server.sync_content_index()
+        return sorted(key for key in downloads if key.endswith(".json"))
+
+    assert asyncio.run(run()) == ["b.json", "d.json"]
+    assert [name for name, _ in mcp_server.content_index.search("rewritten")] == ["b"]
+    assert {name for name, _ in mcp_server.content_index.search("original")} == {"a", "c"}
+    assert len(mcp_server.content_index) == 4
+
+
+def test_find_snippets_requires_query():
+    result = asyncio.run(mcp_server.execute_tool("find_snippets", {}))
+    assert result.isError
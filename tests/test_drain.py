@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Drain Mode Tests
+
+Covers draining a replica via the admin endpoint and SIGTERM: readiness
+fails, new sessions are refused, every in-flight tools/call completes, and
+open SSE streams end with a jittered retry hint.
+
+Usage:
+    python -m pytest tests/test_drain.py
+"""
+
+import asyncio
+import signal
+
+import aiohttp
+import pytest
+from fastapi.testclient import TestClient
+
+import mcp_server
+from drain import DrainController
+from mcp_client import SSEParser
+from mcp_server import MCPToolResult
+
+TOKEN = "drain-test-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture
+def fresh_drain(monkeypatch):
+    async def slow_tool(tool_name, arguments):
+        await asyncio.sleep(0.3)
+        return MCPToolResult(content=[{"type": "text", "text": f"done {arguments['n']}"}])
+
+    controller = DrainController(retry_min_seconds=1.0, retry_max_seconds=5.0)
+    monkeypatch.setattr(mcp_server, "drain", controller)
+    monkeypatch.setattr(mcp_server, "drain_task", None)
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    monkeypatch.setattr(mcp_server, "execute_tool", slow_tool)
+    monkeypatch.setattr(mcp_server, "DRAIN_TIMEOUT_SECONDS", 5.0)
+    monkeypatch.setattr(mcp_server, "ADMIN_TOKEN", TOKEN)
+    return controller
+
+
+async def serve(scenario):
+    import uvicorn
+
+    config = uvicorn.Config(mcp_server.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        return await scenario(f"http://127.0.0.1:{port}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+async def drain_during_calls(base):
+    async with aiohttp.ClientSession() as http:
+        stream = await http.get(f"{base}/runtime/webhooks/mcp/sse")
+        parser = SSEParser()
+        while not parser.feed(await stream.content.readany()):
+            pass
+
+        async def call(n):
+            params = {"name": "slow", "arguments": {"n": n}}
+            body = {"jsonrpc": "2.0", "id": n, "method": "tools/call", "params": params}
+            async with http.post(f"{base}/runtime/webhooks/mcp/message", json=body) as response:
+                return response.status, await response.json()
+
+        calls = [asyncio.create_task(call(n)) for n in range(10)]
+        while mcp_server.drain.in_flight < 10:
+            await asyncio.sleep(0.01)
+
+        started = await http.post(f"{base}/admin/drain", headers=AUTH)
+        ready = await http.get(f"{base}/ready")
+        refused = await http.get(f"{base}/runtime/webhooks/mcp/sse")
+        results = await asyncio.gather(*calls)
+
+        # The stream ends once the calls are done, carrying a retry hint
+        async with asyncio.timeout(5):
+            async for chunk in stream.content.iter_any():
+                parser.feed(chunk)
+        await mcp_server.drain_task
+        return (await started.json(), ready.status, refused.status, refused.headers.get("Retry-After"),
+                results, parser.retry)
+
+
+def test_admin_drain_completes_in_flight_calls(fresh_drain):
+    started, ready, refused, retry_after, results, retry_ms = asyncio.run(serve(drain_during_calls))
+
+    assert started["draining"] is True
+    assert started["in_flight"] == 10
+    assert ready == 503
+    assert refused == 503
+    assert 1 <= int(retry_after) <= 5
+    assert [status for status, _ in results] == [200] * 10
+    assert [body["result"]["content"][0]["text"] for _, body in results] == [f"done {n}" for n in range(10)]
+    assert 1000 <= retry_ms <= 5000
+    assert fresh_drain.drained
+
+
+def test_admin_drain_is_refused_without_a_configured_token(fresh_drain, monkeypatch):
+    client = TestClient(mcp_server.app)
+    assert client.post("/admin/drain", headers={"Authorization": "x"}).status_code == 401
+    monkeypatch.setattr(mcp_server, "ADMIN_TOKEN", None)
+    for headers in ({}, {"Authorization": "Bearer "}, {"Authorization": "Bearer None"}):
+        assert client.post("/admin/drain", headers=headers).status_code == 401
+        assert client.get("/admin/drain", headers=headers).status_code == 401
+    assert not fresh_drain.draining
+    assert client.get("/ready").status_code == 200
+
+
+def test_drain_deadline_bounds_the_wait():
+    async def run():
+        controller = DrainController()
+        with controller.track():
+            return await controller.wait_idle(0.05), controller.in_flight
+
+    assert asyncio.run(run()) == (False, 1)
+
+
+def test_sigterm_drains_before_handing_over(fresh_drain):
+    handed_over = []
+
+    async def run():
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: handed_over.append(fresh_drain.drained))
+        try:
+            mcp_server.install_sigterm_drain()
+            with fresh_drain.track():
+                signal.raise_signal(signal.SIGTERM)
+                await asyncio.sleep(0.1)
+                # Still waiting on the in-flight call
+                assert fresh_drain.draining and not handed_over
+            while not handed_over:
+                await asyncio.sleep(0.01)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+
+    asyncio.run(run())
+    assert handed_over == [True]
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Fair Queueing Tests
+
+Covers src/fair_queue.py and its use in front of tools/call: a noisy client
+cannot push a quiet client's latency up, weights split contended slots,
+token buckets refuse calls over a client's rate, and per-client metrics.
+
+Usage:
+    python -m pytest tests/test_fair_queue.py
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import mcp_server
+from fair_queue import FairQueue, RateLimitedError, client_identity
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+SERVICE_SECONDS = 0.005
+
+
+async def call(queue, client, latencies=None):
+    started = time.perf_counter()
+    async with queue.slot(client):
+        await asyncio.sleep(SERVICE_SECONDS)
+    if latencies is not None:
+        latencies.append(time.perf_counter() - started)
+
+
+def test_noisy_client_cannot_raise_quiet_client_p99():
+    queue = FairQueue(concurrency=4)
+
+    async def run():
+        noisy = [asyncio.create_task(call(queue, "fleet")) for _ in range(400)]
+        await asyncio.sleep(0.02)
+        quiet = []
+        for _ in range(20):
+            await call(queue, "portal", quiet)
+            await asyncio.sleep(0.002)
+        backlog = queue.status()["clients"]["fleet"]["queued"]
+        await asyncio.gather(*noisy)
+        return sorted(quiet), backlog
+
+    quiet, backlog = asyncio.run(run())
+    # FIFO would put each quiet call behind the fleet's backlog: ~100 rounds of 5ms
+    assert backlog > 100
+    # Fairly queued, a quiet call waits for at most one slot to free up
+    assert quiet[int(0.99 * len(quiet))] < 6 * SERVICE_SECONDS
+    assert queue.clients["fleet"].admitted == 400
+    assert queue.running == queue.queued == 0
+
+
+def test_weights_split_contended_slots():
+    queue = FairQueue(concurrency=1, weights={"gold": 3})
+    order = []
+
+    async def tagged(client):
+        async with queue.slot(client):
+            order.append(client)
+            await asyncio.sleep(0)
+
+    async def run():
+        await asyncio.gather(*(tagged(client) for _ in range(40) for client in ("bronze", "gold")))
+
+    asyncio.run(run())
+    assert order[:40].count("gold") == 30
+
+
+def test_token_bucket_refuses_calls_over_rate():
+    clock = FakeClock()
+    queue = FairQueue(default_rate=2, burst=3, clock=clock)
+
+    async def run():
+        for _ in range(3):
+            await call(queue, "agent")
+        with pytest.raises(RateLimitedError) as refused:
+            await call(queue, "agent")
+        clock.now += 0.5
+        await call(queue, "agent")
+        return refused.value
+
+    refused = asyncio.run(run())
+    assert refused.retry_after == pytest.approx(0.5)
+    assert queue.clients["agent"].rejected == 1
+    assert queue.clients["agent"].admitted == 4
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    queue = FairQueue(concurrency=1)
+
+    async def run():
+        holder = asyncio.create_task(call(queue, "a"))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(call(queue, "b")) for _ in range(3)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(holder, *waiters, return_exceptions=True)
+        await asyncio.wait_for(call(queue, "c"), 1)
+
+    asyncio.run(run())
+    assert queue.running == queue.queued == 0
+
+
+def test_identity_prefers_token_claim_and_is_sanitized():
+    assert client_identity({"sub": "app-1"}, "sub", "header") == "app-1"
+    assert client_identity({"tid": "t"}, "sub", 'evil"} 1\nx') == "evil___1_x"
+    assert client_identity(None, "sub", None) is None
+
+
+def test_tools_call_is_rate_limited_per_client(monkeypatch):
+    monkeypatch.setattr(mcp_server, "STREAMABLE_HTTP_STATELESS", True)
+    monkeypatch.setattr(mcp_server, "fair_queue", FairQueue(default_rate=1, burst=1))
+    client = TestClient(mcp_server.app)
+    request = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "hello_mcp", "arguments": {}}}
+
+    def post(client_id):
+        return client.post("/runtime/webhooks/mcp", json=request, headers={"x-mcp-client-id": client_id})
+
+    assert post("team-a").status_code == 200
+    refused = post("team-a")
+    assert refused.status_code == 429
+    assert refused.json()["error"]["data"]["retryAfter"] > 0
+    assert post("team-b").status_code == 200
+
+    assert mcp_server.fair_queue.status()["clients"]["team-a"]["rejected"] == 1
+    metrics = client.get("/metrics").text
+    assert 'mcp_fair_queue_rejected_total{client="team-a"} 1' in metrics
+    assert 'mcp_fair_queue_latency_seconds_count{client="team-b"} 1' in metrics
+
+
+def test_unknown_session_ids_do_not_name_clients(monkeypatch):
+    monkeypatch.setattr(mcp_server, "fair_queue", FairQueue(default_rate=1, burst=1))
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    monkeypatch.setattr(mcp_server, "requests_shed", 0)
+    client = TestClient(mcp_server.app)
+    request = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "hello_mcp", "arguments": {}}}
+
+    def post(session_id):
+        return client.post("/runtime/webhooks/mcp/message", params={"sessionId": session_id}, json=request)
+
+    # Made-up ids share the anonymous budget instead of getting a fresh one each
+    assert post('x"} 1\nfake_metric 999\n#').status_code == 200
+    assert post("made-up-2").status_code == 429
+    live = mcp_server.create_session("sse")
+    assert post(live).status_code == 200
+
+    clients = mcp_server.fair_queue.status()["clients"]
+    assert sorted(clients) == sorted(["anonymous", live])
+    assert "fake_metric" not in client.get("/metrics").text
+    # Fair-queue refusals count as shed load for the autoscaling signal
+    assert mcp_server.requests_shed == 1
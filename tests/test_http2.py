@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+HTTP/2 Serving Tests
+
+Covers the hypercorn serving mode in src/serve.py: many SSE sessions
+multiplex over a single h2c connection, each stream's events are flushed
+as they are written, and the message endpoint answers on the same
+connection while the streams stay open.
+
+Usage:
+    python -m pytest tests/test_http2.py
+"""
+
+import asyncio
+import json
+import signal
+import socket
+
+import httpx
+import pytest
+
+import mcp_server
+from fair_queue import FairQueue
+from serve import hypercorn_config, serve_hypercorn
+
+pytest.importorskip("hypercorn")
+pytest.importorskip("h2")
+
+SSE_URL = "/runtime/webhooks/mcp/sse"
+SESSIONS = 50
+
+
+def without_lifespan(app):
+    """The app with startup and shutdown skipped, as uvicorn's lifespan="off" does in the other tests"""
+
+    async def wrapped(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await receive()
+            await send({"type": "lifespan.startup.complete"})
+            await receive()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        await app(scope, receive, send)
+
+    return wrapped
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def serve(scenario, max_concurrent_streams: int = 100):
+    from hypercorn.asyncio import serve as hypercorn_serve
+
+    port = free_port()
+    config = hypercorn_config("127.0.0.1", port, max_concurrent_streams, access_log=False)
+    stop = asyncio.Event()
+    serving = asyncio.create_task(hypercorn_serve(without_lifespan(mcp_server.app), config, shutdown_trigger=stop.wait))
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                break
+        except OSError:
+            await asyncio.sleep(0.05)
+    try:
+        return await scenario(base)
+    finally:
+        stop.set()
+        await serving
+
+
+async def next_event(lines) -> dict:
+    """The next SSE event as {field: value}"""
+    event = {}
+    async for line in lines:
+        if not line:
+            if event:
+                return event
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        event[field] = value.lstrip(" ")
+    raise AssertionError("SSE stream ended")
+
+
+def test_sse_sessions_multiplex_over_one_connection(monkeypatch):
+    monkeypatch.setattr(mcp_server, "SSE_RESPONSES_ON_STREAM", True)
+    monkeypatch.setattr(mcp_server, "fair_queue", FairQueue(concurrency=64))
+    monkeypatch.setattr(mcp_server, "sessions", {})
+
+    async def scenario(base):
+        transport = httpx.AsyncHTTPTransport(http1=False, http2=True)
+        async with httpx.AsyncClient(base_url=base, transport=transport, timeout=10) as client:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(session(client, i)) for i in range(SESSIONS)]
+            return [task.result() for task in tasks], len(transport._pool.connections)
+
+    async def session(client, i):
+        async with client.stream("GET", SSE_URL) as stream:
+            assert stream.http_version == "HTTP/2"
+            assert "connection" not in stream.headers
+            lines = stream.aiter_lines()
+            endpoint = await next_event(lines)
+            call = {"jsonrpc": "2.0", "id": i, "method": "tools/call", "params": {"name": "hello_mcp"}}
+            posted = await client.post(f"/runtime/webhooks/mcp/{endpoint['data']}", json=call)
+            assert posted.status_code == 202 and posted.http_version == "HTTP/2"
+            # The response is flushed on the still-open stream
+            return json.loads((await next_event(lines))["data"])
+
+    responses, pooled = asyncio.run(serve(scenario))
+    assert sorted(response["id"] for response in responses) == list(range(SESSIONS))
+    assert all("result" in response for response in responses)
+    assert pooled == 1
+
+
+def test_serve_hypercorn_stops_on_sigterm_handler():
+    async def run():
+        port = free_port()
+        config = hypercorn_config("127.0.0.1", port, access_log=False)
+        serving = asyncio.create_task(serve_hypercorn(without_lifespan(mcp_server.app), config))
+        await asyncio.sleep(0.3)
+        # What mcp_server's drain calls once it has finished
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+        await asyncio.wait_for(serving, timeout=10)
+
+    previous = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        asyncio.run(run())
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
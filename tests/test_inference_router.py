@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Inference Routing Tests
+
+Covers src/inference_router.py and the ask_model tool against several local
+fake model servers of differing speed: least-outstanding routing sends more
+calls to faster replicas, calls sharing a system prompt stay on one replica
+until it falls behind, and failing or unhealthy replicas are ejected and
+brought back.
+
+Usage:
+    python -m pytest tests/test_inference_router.py
+"""
+
+import asyncio
+import collections
+
+import pytest
+from aiohttp import web
+
+import mcp_server
+from inference_router import InferenceError, InferenceRouter, endpoint_slice_urls, static_endpoints
+
+
+class FakeModel:
+    """An OpenAI-compatible chat endpoint taking ``delay`` seconds per call"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.systems = collections.Counter()
+        self.status = 200
+        self.healthy = True
+        self.runner = None
+        self.url = None
+
+    async def chat(self, request):
+        body = await request.json()
+        self.calls += 1
+        self.systems.update(m["content"] for m in body["messages"] if m["role"] == "system")
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status, text="model crashed")
+        reply = f"answer to {body['messages'][-1]['content']}"
+        return web.json_response({"choices": [{"message": {"role": "assistant", "content": reply}}]})
+
+    async def health(self, request):
+        return web.Response(status=200 if self.healthy else 503)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.chat)
+        app.router.add_get("/health", self.health)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def models(*delays):
+    servers = [FakeModel(delay) for delay in delays]
+    for server in servers:
+        await server.start()
+    return servers
+
+
+def chat(prompt, system=None):
+    messages = [{"role": "user", "content": prompt}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    return {"messages": messages}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_outstanding_favors_faster_replicas():
+    async def run():
+        servers = await models(0.005, 0.02, 0.1)
+        router = InferenceRouter(static_endpoints(",".join(s.url for s in servers)))
+        await router.refresh()
+        semaphore = asyncio.Semaphore(6)
+
+        async def call(i):
+            async with semaphore:
+                return await router.post("/v1/chat/completions", chat(f"q{i}"))
+
+        try:
+            results = await asyncio.gather(*(call(i) for i in range(150)))
+        finally:
+            await router.close()
+            for server in servers:
+                await server.stop()
+        return servers, results
+
+    (fast, medium, slow), results = asyncio.run(run())
+    assert len(results) == 150
+    assert fast.calls > medium.calls > slow.calls
+    assert slow.calls < 150 / 6
+
+
+def test_shared_system_prompt_stays_on_one_replica():
+    async def run():
+        servers = await models(0.005, 0.005, 0.005)
+        router = InferenceRouter(static_endpoints(",".join(s.url for s in servers)), affinity_slack=2)
+        await router.refresh()
+        try:
+            for i in range(30):
+                await router.post("/v1/chat/completions", chat(f"q{i}", system=f"You review {['go', 'rust'][i % 2]}"))
+            sequential = [dict(server.systems) for server in servers]
+            # Far more concurrent calls than the slack spill over to the other replicas
+            await asyncio.gather(*(
+                router.post("/v1/chat/completions", chat(f"burst{i}", system="You review go")) for i in range(30)
+            ))
+            return sequential, [server.calls for server in servers], router.status()
+        finally:
+            await router.close()
+            for server in servers:
+                await server.stop()
+
+    sequential, calls, status = asyncio.run(run())
+    for system in ("You review go", "You review rust"):
+        holders = [systems[system] for systems in sequential if system in systems]
+        assert holders == [15]
+    assert sum(calls) == 60 and min(calls) > 0
+    assert status["affinity_misses"] > 0
+
+
+def test_failing_replica_is_ejected_and_restored():
+    clock = Clock()
+
+    async def run():
+        good, bad = await models(0.001, 0.001)
+        bad.status = 500
+        router = InferenceRouter(static_endpoints(f"{good.url},{bad.url}"), eject_after=2, eject_seconds=30,
+                                 clock=clock)
+        await router.refresh()
+        try:
+            # Calls the bad replica fails are retried on the good one
+            for i in range(20):
+                completion = await router.post("/v1/chat/completions", chat(f"q{i}"))
+                assert completion["choices"][0]["message"]["content"] == f"answer to q{i}"
+            failed_before = bad.calls
+            for i in range(20):
+                await router.post("/v1/chat/completions", chat(f"again{i}"))
+            ejected = router.status()["backends"][bad.url]
+            assert bad.calls == failed_before
+            clock.now += 31
+            bad.status = 200
+            for i in range(20):
+                await router.post("/v1/chat/completions", chat(f"later{i}"))
+            return failed_before, ejected, bad.calls, router.prometheus()
+        finally:
+            await router.close()
+            await good.stop()
+            await bad.stop()
+
+    failed_before, ejected, bad_calls, metrics = asyncio.run(run())
+    assert failed_before == 2
+    assert ejected["ejected"] and ejected["ejections"] == 1 and ejected["failures"] == 2
+    assert bad_calls > failed_before
+    assert 'mcp_inference_backend_ejections_total{backend="' in metrics
+
+
+def test_unhealthy_replica_is_skipped_until_it_recovers():
+    async def run():
+        up, down = await models(0.001, 0.001)
+        down.healthy = False
+        router = InferenceRouter(static_endpoints(f"{up.url},{down.url}"))
+        await router.refresh()
+        try:
+            await router.check_health()
+            for i in range(10):
+                await router.post("/v1/chat/completions", chat(f"q{i}"))
+            skipped = down.calls
+            down.healthy = True
+            await router.check_health()
+            for i in range(40):
+                await router.post("/v1/chat/completions", chat(f"later{i}"))
+            return skipped, down.calls
+        finally:
+            await router.close()
+            await up.stop()
+            await down.stop()
+
+    skipped, later = asyncio.run(run())
+    assert skipped == 0
+    assert later > 0
+
+
+def test_no_replica_left_raises():
+    async def run():
+        (server,) = await models(0.001)
+        server.status = 503
+        router = InferenceRouter(static_endpoints(server.url))
+        await router.refresh()
+        try:
+            with pytest.raises(InferenceError):
+                await router.post("/v1/chat/completions", chat("q"))
+        finally:
+            await router.close()
+            await server.stop()
+        empty = InferenceRouter(static_endpoints(""))
+        await empty.refresh()
+        with pytest.raises(InferenceError):
+            empty.pick()
+
+    asyncio.run(run())
+
+
+def test_endpoint_slices_and_rediscovery_keep_state():
+    slices = {"items": [
+        {"ports": [{"port": 5000}], "endpoints": [
+            {"addresses": ["10.0.0.4"], "conditions": {"ready": True}},
+            {"addresses": ["10.0.0.5"], "conditions": {"ready": False}},
+        ]},
+        {"ports": [{"port": 5000}], "endpoints": [{"addresses": ["10.0.0.6"]}]},
+    ]}
+    assert endpoint_slice_urls(slices) == ["http://10.0.0.4:5000", "http://10.0.0.6:5000"]
+
+    router = InferenceRouter(static_endpoints(""))
+    router.set_endpoints(["http://10.0.0.4:5000", "http://10.0.0.6:5000"])
+    router.backends["http://10.0.0.4:5000"].requests = 7
+    router.set_endpoints(["http://10.0.0.4:5000", "http://10.0.0.7:5000"])
+    assert list(router.backends) == ["http://10.0.0.4:5000", "http://10.0.0.7:5000"]
+    assert router.backends["http://10.0.0.4:5000"].requests == 7
+    # An empty answer keeps the last known replicas
+    router.set_endpoints([])
+    assert len(router.backends) == 2
+
+
+def test_ask_model_tool_routes_through_the_router(monkeypatch):
+    async def run():
+        servers = await models(0.001, 0.001)
+        router = InferenceRouter(static_endpoints(",".join(s.url for s in servers)))
+        await router.refresh()
+        monkeypatch.setattr(mcp_server, "inference_router", router)
+        try:
+            answer = await mcp_server.execute_tool("ask_model", {"prompt": "hi", "system": "Be brief"})
+            missing = await mcp_server.execute_tool("ask_model", {})
+            return answer, missing, mcp_server.inference_router.status()
+        finally:
+            await router.close()
+            for server in servers:
+                await server.stop()
+
+    answer, missing, status = asyncio.run(run())
+    assert not answer.isError and answer.content[0]["text"] == "answer to hi"
+    assert missing.isError
+    assert status["affinity_hits"] == 1
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Load Generator Tests
+
+Covers the latency histogram and baseline comparison in benchmarks/loadgen.py
+and a short open-loop run against the fake-backend server.
+
+Usage:
+    python -m pytest tests/test_loadgen.py
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+import loadgen  # noqa: E402
+
+
+def test_histogram_percentiles_within_bucket_error():
+    histogram = loadgen.LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert abs(histogram.percentile(0.50) - 500) / 500 < 0.04
+    assert abs(histogram.percentile(0.99) - 990) / 990 < 0.04
+    assert histogram.percentile(1.0) <= 1000
+
+    restored = loadgen.LatencyHistogram.from_dict(histogram.to_dict())
+    restored.merge(histogram)
+    assert restored.total == 2000
+    assert restored.percentile(0.50) == histogram.percentile(0.50)
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    def result(rps, p99):
+        stats = {"count": 1, "errors": 0, "p50_ms": 1.0, "p99_ms": p99, "p999_ms": p99}
+        return {"throughput_rps": rps, "overall": stats, "operations": {"tools/list": stats}}
+
+    assert loadgen.compare(result(100, 10.0), result(100, 10.5), 0.10) == []
+    regressions = loadgen.compare(result(80, 12.0), result(100, 10.0), 0.10)
+    assert "throughput_rps" in regressions
+    assert "overall p99_ms" in regressions
+
+
+def test_short_run_against_fake_server():
+    args = loadgen.build_parser().parse_args([
+        "--rate", "50", "--duration", "1", "--warmup", "0.2",
+        "--sse-sessions", "2", "--snippets", "10", "--server-log-level", "warning",
+    ])
+    result = asyncio.run(loadgen.run_load(args))
+
+    assert result["errors"] == 0
+    assert result["overall"]["count"] == 50
+    assert result["sse"]["sessions"] == 2
+    assert result["overall"]["p50_ms"] > 0
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Event Loop Monitor Tests
+
+Covers src/loop_monitor.py: a tool that blocks the loop with a synchronous
+call is caught while it runs, with its stack and the JSON-RPC method and tool
+name, and the lag histogram is exported through /health and /metrics.
+
+Usage:
+    python -m pytest tests/test_loop_monitor.py
+"""
+
+import asyncio
+import logging
+import time
+
+from fastapi.testclient import TestClient
+
+import mcp_server
+from loop_monitor import LagHistogram, LoopMonitor
+from mcp_server import MCPToolResult
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = LagHistogram(buckets=(0.01, 0.1))
+    for seconds in (0.001, 0.005, 0.05, 0.5):
+        histogram.record(seconds)
+    assert histogram.cumulative() == [("0.01", 2), ("0.1", 3), ("+Inf", 4)]
+    assert histogram.percentile(0.5) == 0.01
+    assert histogram.percentile(1.0) == 0.5
+
+
+def test_blocking_tool_is_detected_with_its_stack(monkeypatch, caplog):
+    async def blocking_tool(tool_name, arguments):
+        # A synchronous storage call made from async code
+        time.sleep(0.3)
+        return MCPToolResult(content=[{"type": "text", "text": "done"}])
+
+    monitor = LoopMonitor(interval=0.02, slow_threshold=0.1)
+    monkeypatch.setattr(mcp_server, "loop_monitor", monitor)
+    monkeypatch.setattr(mcp_server, "execute_tool", blocking_tool)
+
+    async def run():
+        watching = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.1)
+        body = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "slow_blob_read"}}
+        status, _ = await mcp_server.handle_jsonrpc(body)
+        await asyncio.sleep(0.1)
+        watching.cancel()
+        return status
+
+    with caplog.at_level(logging.WARNING, logger="loop_monitor"):
+        assert asyncio.run(run()) == 200
+
+    (stall,) = monitor.stalls
+    assert stall["method"] == "tools/call"
+    assert stall["tool"] == "slow_blob_read"
+    assert stall["coroutine"] is not None
+    assert "blocking_tool" in stall["stack"] and "time.sleep(0.3)" in stall["stack"]
+    assert monitor.histogram.max >= 0.25
+    (record,) = caplog.records
+    assert record.tool == "slow_blob_read"
+    assert "blocking_tool" in record.getMessage()
+
+
+def test_an_idle_loop_reports_no_stalls():
+    monitor = LoopMonitor(interval=0.01, slow_threshold=0.1)
+
+    async def run():
+        watching = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.3)
+        watching.cancel()
+
+    asyncio.run(run())
+    assert monitor.stall_count == 0
+    assert monitor.histogram.total >= 10
+
+
+def test_lag_is_exported_through_health_and_metrics(monkeypatch):
+    monitor = LoopMonitor()
+    monitor.histogram.record(0.003)
+    monitor.stall_count = 2
+    monkeypatch.setattr(mcp_server, "loop_monitor", monitor)
+    client = TestClient(mcp_server.app)
+
+    assert client.get("/health").json()["event_loop"]["stalls"] == 2
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'mcp_event_loop_lag_seconds_bucket{le="0.005"} 1' in metrics.text
+    assert "mcp_event_loop_lag_seconds_count 1" in metrics.text
+    assert "mcp_event_loop_stalls_total 2" in metrics.text
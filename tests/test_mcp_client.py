@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+MCP Client Tests
+
+Covers the incremental SSE parser in src/mcp_client.py, id correlation of
+concurrent requests delivered over SSE, stream reconnection, and batches and
+notifications against the real server app.
+
+Usage:
+    python -m pytest tests/test_mcp_client.py
+"""
+
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from fastapi.testclient import TestClient
+
+import mcp_server
+from mcp_client import MCPClient, MCPConnectionError, MCPError, MCPTransport, SSEParser
+
+
+def feed_all(parser, chunks):
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events
+
+
+def test_sse_parser_handles_split_chunks_and_line_endings():
+    stream = b'\xef\xbb\xbfdata: message?sessionId=abc\r\n\r\n: keepalive\n\nevent: note\nid: 7\ndata: a\ndata: b\r\r\n'
+    # Feed one byte at a time so every boundary (including a split CRLF) is exercised
+    events = feed_all(SSEParser(), [stream[i:i + 1] for i in range(len(stream))])
+
+    assert [(e.event, e.data, e.id) for e in events] == [
+        ("message", "message?sessionId=abc", None),
+        ("note", "a\nb", "7"),
+    ]
+
+
+def test_sse_parser_tracks_retry_and_ignores_empty_events():
+    parser = SSEParser()
+    events = feed_all(parser, [b"retry: 1500\n\nevent: ping\n\nid: 3\ndata:{}\n", b"\n"])
+    assert parser.retry == 1500
+    assert [(e.event, e.data, e.id) for e in events] == [("message", "{}", "3")]
+    assert parser.last_event_id == "3"
+
+
+class DeferredServer:
+    """Legacy-style MCP server that answers every request on the SSE stream
+
+    The first stream is dropped right after the endpoint event so the client
+    has to reconnect before its requests can be answered.
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.queues = {}
+
+    async def sse(self, request):
+        self.connections += 1
+        session = f"s{self.connections}"
+        self.queues[session] = asyncio.Queue()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(f"data: message?sessionId={session}\n\n".encode())
+        if self.connections == 1:
+            return response
+        while True:
+            message = await self.queues[session].get()
+            await response.write(f"data: {json.dumps(message)}\r\n\r\n".encode())
+
+    async def message(self, request):
+        body = await request.json()
+        if "id" in body:
+            await asyncio.sleep(0.01 * (body["id"] % 3))
+            result = {"echo": body["params"]["value"]} if body["method"] == "echo" else {}
+            self.queues[request.query["sessionId"]].put_nowait({"jsonrpc": "2.0", "id": body["id"], "result": result})
+        return web.Response(status=202)
+
+
+async def run_against_deferred_server():
+    server = DeferredServer()
+    app = web.Application()
+    app.router.add_get("/mcp/sse", server.sse)
+    app.router.add_post("/mcp/message", server.message)
+    runner = web.AppRunner(app, shutdown_timeout=0.1)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        async with MCPTransport(limit=4) as transport:
+            client = MCPClient(f"http://127.0.0.1:{port}/mcp", transport, reconnect_delay=0.01, request_timeout=5)
+            await client.connect(initialize=False)
+            # Wait for the forced reconnect to hand out the second session
+            while client.reconnects == 0 or not client._endpoint_ready.is_set():
+                await asyncio.sleep(0.01)
+            results = await asyncio.gather(*(client.request("echo", {"value": i}) for i in range(20)))
+            await client.close()
+            return results, client.reconnects, server.connections
+    finally:
+        await runner.cleanup()
+
+
+def test_concurrent_requests_are_correlated_over_sse_after_reconnect():
+    results, reconnects, connections = asyncio.run(run_against_deferred_server())
+    assert [r["echo"] for r in results] == list(range(20))
+    assert reconnects == 1
+    assert connections == 2
+
+
+def test_server_handles_batches_and_notifications():
+    client = TestClient(mcp_server.app)
+    url = "/runtime/webhooks/mcp/message"
+
+    notification = client.post(url, json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+    assert notification.status_code == 202
+    assert notification.content == b""
+
+    batch = client.post(url, json=[
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "hello_mcp"}},
+        {"jsonrpc": "2.0", "id": 3, "method": "no/such"},
+    ])
+    assert batch.status_code == 200
+    responses = batch.json()
+    assert [r["id"] for r in responses] == [1, 2, 3]
+    assert len(responses[0]["result"]["tools"]) == len(mcp_server.TOOLS)
+    assert responses[2]["error"]["code"] == -32601
+
+    assert client.post(url, json=[]).status_code == 400
+
+
+async def run_batch_against_app():
+    """Drive the client against the real app through an in-process ASGI server"""
+    import uvicorn
+
+    config = uvicorn.Config(mcp_server.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        async with MCPClient(f"http://127.0.0.1:{port}/runtime/webhooks/mcp", use_sse=False) as client:
+            tools = await client.list_tools()
+            results = await client.batch([
+                ("tools/call", {"name": "hello_mcp", "arguments": {}}),
+                ("no/such", None),
+            ], return_exceptions=True)
+            with pytest.raises(MCPError):
+                await client.request("no/such")
+            return client.server_info, tools, results
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def test_client_batches_against_server():
+    server_info, tools, results = asyncio.run(run_batch_against_app())
+    assert server_info["serverInfo"]["name"] == "mcp-server"
+    assert {t["name"] for t in tools} == {t.name for t in mcp_server.TOOLS}
+    assert results[0]["content"][0]["text"].startswith("Hello")
+    assert isinstance(results[1], MCPError) and results[1].code == -32601
+
+
+def test_request_fails_fast_without_server():
+    async def run():
+        client = MCPClient("http://127.0.0.1:9/mcp", use_sse=False, request_timeout=2)
+        try:
+            await client.request("tools/list")
+        finally:
+            await client.close()
+
+    with pytest.raises(MCPConnectionError):
+        asyncio.run(run())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Profiling Endpoint Tests
+
+Covers the /admin/profile/* endpoints: disabled by default and token guarded,
+a sampling CPU profile that sees a function blocking the event loop, a
+tracemalloc diff that points at the allocating line, task dumps with ages,
+and loop lag measurement.
+
+Usage:
+    python -m pytest tests/test_profiling.py
+"""
+
+import asyncio
+import json
+import time
+
+import aiohttp
+import pytest
+
+import mcp_server
+
+TOKEN = "profile-secret"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(mcp_server, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(mcp_server, "ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(mcp_server, "profiling_active", False)
+
+
+async def serve(scenario):
+    import uvicorn
+
+    config = uvicorn.Config(mcp_server.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        return await scenario(f"http://127.0.0.1:{port}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def block_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def while_profiling(base, path, action):
+    """Start a profile request, run ``action`` on the server's loop meanwhile, return the response"""
+    async with aiohttp.ClientSession() as http:
+        pending = asyncio.create_task(http.get(base + path, headers=AUTH))
+        await asyncio.sleep(0.1)
+        action()
+        response = await pending
+        return response.status, response.headers.get("Content-Disposition", ""), await response.text()
+
+
+def test_profiling_is_disabled_by_default_and_token_guarded(monkeypatch):
+    async def probe(base):
+        async with aiohttp.ClientSession() as http:
+            statuses = [(await http.get(f"{base}/admin/profile/tasks", headers=AUTH)).status]
+            monkeypatch.setattr(mcp_server, "PROFILING_ENABLED", True)
+            monkeypatch.setattr(mcp_server, "ADMIN_TOKEN", None)
+            statuses.append((await http.get(f"{base}/admin/profile/tasks")).status)
+            monkeypatch.setattr(mcp_server, "ADMIN_TOKEN", TOKEN)
+            statuses.append((await http.get(f"{base}/admin/profile/tasks", headers={"Authorization": "x"})).status)
+            statuses.append((await http.get(f"{base}/admin/profile/tasks", headers=AUTH)).status)
+            return statuses
+
+    monkeypatch.setattr(mcp_server, "PROFILING_ENABLED", False)
+    assert asyncio.run(serve(probe)) == [404, 401, 401, 200]
+
+
+def test_cpu_profile_sees_the_blocking_function(profiling):
+    status, disposition, folded = asyncio.run(serve(
+        lambda base: while_profiling(base, "/admin/profile/cpu?seconds=0.5&interval_ms=2", lambda: block_loop(0.3))
+    ))
+    assert status == 200
+    assert disposition.startswith("attachment;") and ".folded" in disposition
+    samples = {}
+    for line in folded.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        samples[stack] = int(count)
+    blocking = sum(count for stack, count in samples.items() if "block_loop" in stack.split(";")[-1])
+    assert blocking >= 0.5 * sum(samples.values())
+
+
+def test_memory_diff_points_at_the_allocating_line(profiling):
+    hoard = []
+
+    def allocate():
+        hoard.extend(bytearray(4096) for _ in range(1000))
+
+    status, disposition, diff = asyncio.run(serve(
+        lambda base: while_profiling(base, "/admin/profile/memory?seconds=0.3&top=5", allocate)
+    ))
+    assert status == 200 and ".txt" in disposition
+    assert "test_profiling.py" in diff.splitlines()[1]
+
+
+def test_task_dump_lists_tasks_with_ages(profiling):
+    async def scenario(base):
+        mcp_server.task_ages.install(asyncio.get_running_loop())
+        sleeper = asyncio.create_task(asyncio.sleep(5), name="idle-sleeper")
+        await asyncio.sleep(0.2)
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f"{base}/admin/profile/tasks", headers=AUTH) as response:
+                dump = await response.text()
+        sleeper.cancel()
+        return dump
+
+    dump = asyncio.run(serve(scenario))
+    (header,) = [line for line in dump.splitlines() if "idle-sleeper" in line]
+    age = float(header.split("age=")[1].split("s ")[0])
+    assert 0.2 <= age < 5
+    assert "coro=sleep" in header
+
+
+def test_loop_lag_reports_a_stall(profiling):
+    status, _, body = asyncio.run(serve(
+        lambda base: while_profiling(base, "/admin/profile/loop-lag?seconds=0.5", lambda: block_loop(0.2))
+    ))
+    lag = json.loads(body)
+    assert status == 200
+    assert lag["max_ms"] >= 150
+    assert lag["p50_ms"] < 50
+
+
+def test_only_one_profile_runs_at_a_time(profiling):
+    async def scenario(base):
+        async with aiohttp.ClientSession() as http:
+            first = asyncio.create_task(http.get(f"{base}/admin/profile/cpu?seconds=0.3", headers=AUTH))
+            await asyncio.sleep(0.1)
+            second = await http.get(f"{base}/admin/profile/memory?seconds=0.1", headers=AUTH)
+            return (await first).status, second.status
+
+    assert asyncio.run(serve(scenario)) == (200, 409)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Snippet Resource Tests
+
+Covers src/resource_subscriptions.py and the resources/* methods: snippets
+listed and read as snippet:// resources, subscriptions per session, update
+notifications coalesced per window, and changes shared between replicas
+through the storage change feed.
+
+Usage:
+    python -m pytest tests/test_resources.py
+"""
+
+import asyncio
+
+import pytest
+
+import mcp_server
+from mcp_client import MCPClient, MCPError
+from resilience import ResilientBackend
+from resource_subscriptions import (
+    CHANGE_FEED_PREFIX,
+    ChangeFeed,
+    SubscriptionRegistry,
+    fan_out,
+    snippet_name_from_uri,
+    snippet_uri,
+)
+from snippet_index import SnippetNameIndex
+from storage import FaultInjectingBackend, MemoryStorageBackend
+
+
+def test_uris_and_registry():
+    uri = snippet_uri("deploy/aks notes")
+    assert uri == "snippet://deploy%2Faks%20notes"
+    assert snippet_name_from_uri(uri) == "deploy/aks notes"
+    assert snippet_name_from_uri("file:///etc/passwd") is None
+    assert snippet_name_from_uri("snippet://") is None
+
+    registry = SubscriptionRegistry()
+    registry.subscribe("a", "snippet://x")
+    registry.subscribe("b", "snippet://x")
+    registry.subscribe("a", "snippet://y")
+    registry.unsubscribe("b", "snippet://x")
+    assert registry.subscribers("snippet://x") == {"a"}
+    registry.drop_session("a")
+    assert registry.by_uri == {} and registry.by_session == {}
+
+    registry.subscribe("live", "snippet://x")
+    registry.subscribe("gone", "snippet://x")
+    published = []
+
+    def publish(session_id, message):
+        published.append((session_id, message["params"]["uri"]))
+        return session_id == "live"
+
+    assert fan_out(["snippet://x"], registry, publish) == 1
+    assert ("live", "snippet://x") in published
+    # Sessions that no longer exist are unsubscribed
+    assert registry.subscribers("snippet://x") == {"live"}
+
+
+def test_rapid_changes_are_coalesced():
+    delivered = []
+
+    async def run():
+        feed = ChangeFeed(delivered.append, coalesce_seconds=0.05)
+        for _ in range(20):
+            feed.changed("snippet://hot")
+        feed.changed("snippet://other")
+        await feed.flush()
+        feed.changed("snippet://hot")
+        await feed.flush()
+
+    asyncio.run(run())
+    assert delivered == [{"snippet://hot", "snippet://other"}, {"snippet://hot"}]
+
+
+def test_changes_reach_other_replicas_through_storage():
+    storage = MemoryStorageBackend()
+    now = [1_000_000.0]
+    a_seen, b_seen = [], []
+
+    async def run():
+        a = ChangeFeed(a_seen.append, storage, coalesce_seconds=0.01, retention_seconds=120,
+                       replica_id="a", clock=lambda: now[0])
+        b = ChangeFeed(b_seen.append, storage, coalesce_seconds=0.01, retention_seconds=120,
+                       replica_id="b", clock=lambda: now[0])
+        # Records written before a replica's first poll are not replayed
+        a.changed("snippet://old")
+        await a.flush()
+        await b.poll()
+        await a.poll()
+
+        a.changed("snippet://x")
+        a.changed("snippet://x")
+        await a.flush()
+        await a.poll()
+        await b.poll()
+        # Nothing new: no repeat delivery
+        await b.poll()
+
+        # Three minutes later the first records fall outside retention and are deleted
+        now[0] += 240
+        await b.poll()
+
+    asyncio.run(run())
+    assert a_seen == [{"snippet://old"}, {"snippet://x"}]
+    assert b_seen == [{"snippet://x"}]
+    assert not [key for key in storage.blobs if key.startswith(CHANGE_FEED_PREFIX)]
+
+
+def test_changes_made_while_a_record_is_written_are_not_lost():
+    memory = MemoryStorageBackend()
+    storage = FaultInjectingBackend(memory, latency=0.2)
+    delivered = []
+
+    async def run():
+        feed = ChangeFeed(delivered.append, storage, coalesce_seconds=0.01)
+        feed.changed("snippet://a")
+        while not delivered:
+            await asyncio.sleep(0.01)
+        # The first record is still being written
+        feed.changed("snippet://b")
+        await feed.flush()
+
+    asyncio.run(run())
+    assert delivered == [{"snippet://a"}, {"snippet://b"}]
+    records = [key for key in memory.blobs if key.startswith(CHANGE_FEED_PREFIX)]
+    assert len(records) == 2
+
+
+def test_resources_require_a_session_to_subscribe(monkeypatch):
+    monkeypatch.setattr(mcp_server, "storage_backend", None)
+    status, response = asyncio.run(mcp_server.dispatch_method(
+        "resources/subscribe", {"uri": snippet_uri("x")}, 1, None
+    ))
+    assert status == 400
+    assert "requires a session" in response["error"]["message"]
+
+    status, response = asyncio.run(mcp_server.dispatch_method("resources/read", {"uri": "http://x"}, 2))
+    assert status == 400
+    assert response["error"]["code"] == -32602
+
+    status, response = asyncio.run(mcp_server.dispatch_method("resources/list", {}, 3))
+    assert response["result"] == {"resources": []}
+
+
+async def serve(scenario):
+    import uvicorn
+
+    config = uvicorn.Config(mcp_server.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        return await scenario(f"http://127.0.0.1:{port}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+async def subscribe_and_edit(base):
+    notifications = []
+    uri = snippet_uri("deploy-aks")
+    async with MCPClient(f"{base}/runtime/webhooks/mcp", on_notification=notifications.append,
+                         request_timeout=5) as watcher, \
+            MCPClient(f"{base}/runtime/webhooks/mcp", streamable=True, request_timeout=5) as editor:
+        listed = await watcher.list_resources()
+        contents = await watcher.read_resource(uri)
+        with pytest.raises(MCPError) as missing:
+            await watcher.read_resource(snippet_uri("nope"))
+
+        await watcher.subscribe_resource(uri)
+        for i in range(5):
+            await editor.call_tool("save_snippet", {"snippetname": "deploy-aks", "snippet": f"v{i}"})
+        await editor.call_tool("save_snippet", {"snippetname": "unwatched", "snippet": "x"})
+        await mcp_server.resource_changes.flush()
+        for _ in range(100):
+            if notifications:
+                break
+            await asyncio.sleep(0.01)
+        updated = await watcher.read_resource(uri)
+
+        await watcher.unsubscribe_resource(uri)
+        await editor.call_tool("save_snippet", {"snippetname": "deploy-aks", "snippet": "v5"})
+        await mcp_server.resource_changes.flush()
+        await asyncio.sleep(0.05)
+    return listed, contents, missing.value, notifications, updated
+
+
+def test_subscribed_session_is_notified_once_per_window(monkeypatch):
+    memory = MemoryStorageBackend()
+    memory.blobs["deploy-aks.json"] = b"az aks create"
+    index = SnippetNameIndex()
+    index.finish_reconcile(["deploy-aks"])
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    monkeypatch.setattr(mcp_server, "storage_backend", ResilientBackend(memory))
+    monkeypatch.setattr(mcp_server, "snippet_index", index)
+    monkeypatch.setattr(mcp_server, "subscriptions", SubscriptionRegistry())
+    monkeypatch.setattr(mcp_server, "resource_changes", ChangeFeed(
+        mcp_server.notify_resources_updated, coalesce_seconds=0.2
+    ))
+    monkeypatch.setattr(mcp_server, "SSE_RESPONSES_ON_STREAM", True)
+
+    listed, contents, missing, notifications, updated = asyncio.run(serve(subscribe_and_edit))
+
+    assert listed["resources"] == [{"uri": "snippet://deploy-aks", "name": "deploy-aks", "mimeType": "text/plain"}]
+    assert contents[0]["text"] == "az aks create"
+    assert missing.code == mcp_server.RESOURCE_NOT_FOUND
+    assert notifications == [{
+        "jsonrpc": "2.0", "method": "notifications/resources/updated", "params": {"uri": "snippet://deploy-aks"}
+    }]
+    assert updated[0]["text"] == "v4"
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Response Compression Tests
+
+Covers Accept-Encoding negotiation, the size threshold, per-event flushing of
+compressed SSE streams in src/compression.py, and ETag revalidation of
+cacheable JSON-RPC results.
+
+Usage:
+    python -m pytest tests/test_response_compression.py
+"""
+
+import asyncio
+import zlib
+
+import brotli
+import pytest
+import zstandard
+from fastapi.testclient import TestClient
+
+import mcp_server
+from compression import CompressionMiddleware, negotiate_encoding
+
+SUPPORTED = ["zstd", "br", "gzip"]
+
+
+def test_negotiation_prefers_server_order_and_respects_q():
+    assert negotiate_encoding("gzip, deflate, br", SUPPORTED) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", SUPPORTED) == "gzip"
+    assert negotiate_encoding("zstd;q=0, gzip", SUPPORTED) == "gzip"
+    assert negotiate_encoding("*", SUPPORTED) == "zstd"
+    assert negotiate_encoding("identity", SUPPORTED) is None
+    assert negotiate_encoding("deflate", SUPPORTED) is None
+
+
+def rpc(client, method, headers=None):
+    return client.post(
+        "/runtime/webhooks/mcp/message",
+        json={"jsonrpc": "2.0", "id": 1, "method": method},
+        headers=headers or {},
+    )
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_large_json_responses_are_compressed(encoding):
+    client = TestClient(mcp_server.app)
+    response = rpc(client, "tools/list", {"Accept-Encoding": encoding})
+    assert response.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    # httpx transparently decodes all three encodings
+    assert len(response.json()["result"]["tools"]) == len(mcp_server.TOOLS)
+    assert int(response.headers["content-length"]) < len(response.content)
+
+
+def test_small_responses_and_identity_clients_are_not_compressed():
+    client = TestClient(mcp_server.app)
+    assert "content-encoding" not in client.get("/health", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in rpc(client, "tools/list", {"Accept-Encoding": "identity"}).headers
+
+
+def test_tools_list_etag_revalidation():
+    client = TestClient(mcp_server.app)
+    first = rpc(client, "tools/list")
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+
+    # The tag depends only on the result, not on the request id or encoding
+    again = client.post(
+        "/runtime/webhooks/mcp/message",
+        json={"jsonrpc": "2.0", "id": 99, "method": "tools/list"},
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert again.headers["etag"] == etag
+
+    cached = rpc(client, "tools/list", {"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    stale = rpc(client, "tools/list", {"If-None-Match": 'W/"outdated"'})
+    assert stale.status_code == 200
+
+
+async def stream_through_middleware(encoding: str, events: list) -> list:
+    """Run a streaming SSE app through the middleware and capture each send"""
+
+    async def sse_app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream")],
+        })
+        for event in events:
+            await send({"type": "http.response.body", "body": event, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", encoding.encode())]}
+    await CompressionMiddleware(sse_app, minimum_size=1024)(scope, None, send)
+    return sent
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_sse_events_are_flushed_individually(encoding):
+    events = [b"data: message?sessionId=abc\n\n", b": keepalive\n\n", b'data: {"jsonrpc": "2.0"}\n\n']
+    sent = asyncio.run(stream_through_middleware(encoding, events))
+
+    start = sent[0]
+    assert (b"content-encoding", encoding.encode()) in start["headers"]
+    assert not any(name == b"content-length" for name, _ in start["headers"])
+
+    if encoding == "gzip":
+        decoder = zlib.decompressobj(31)
+        decode = decoder.decompress
+    elif encoding == "br":
+        decoder = brotli.Decompressor()
+        decode = decoder.process
+    else:
+        decoder = zstandard.ZstdDecompressor().decompressobj()
+        decode = decoder.decompress
+
+    # Each event must be fully decodable as soon as its chunk arrives
+    for event, message in zip(events, sent[1:]):
+        assert message["more_body"] is True
+        assert decode(message["body"]) == event
+    assert sent[-1]["more_body"] is False
+
+
+def test_sse_passthrough_when_stream_compression_disabled():
+    async def run():
+        async def sse_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/event-stream")]})
+            await send({"type": "http.response.body", "body": b"data: x\n\n", "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = CompressionMiddleware(sse_app, compress_streams=False)
+        await middleware({"type": "http", "headers": [(b"accept-encoding", b"gzip")]}, None, send)
+        return sent
+
+    sent = asyncio.run(run())
+    assert sent[1]["body"] == b"data: x\n\n"
+
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Autoscaling Signal Tests
+
+Covers src/scaling.py and the /scaling endpoint: under synthetic load the
+reported sessions, in-flight tool calls by class, pool queue wait and shed
+rate match what is actually happening, and drop back once the load is gone.
+
+Usage:
+    python -m pytest tests/test_scaling.py
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import mcp_server
+from drain import DrainController
+from mcp_server import MCPTool
+from scaling import CounterWindow
+from tool_executor import INLINE, THREAD, ToolExecutor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_counter_window_uses_newest_baseline_older_than_window():
+    clock = FakeClock()
+    window = CounterWindow(window_seconds=60, clock=clock)
+    assert window.deltas({"shed": 5}) == ({"shed": 0}, 0.0)
+    clock.now = 30
+    assert window.deltas({"shed": 35}) == ({"shed": 30}, 30.0)
+    clock.now = 90
+    # The t=30 snapshot is now a full window old and becomes the baseline
+    assert window.deltas({"shed": 95}) == ({"shed": 60}, 60.0)
+    assert len(window.snapshots) == 2
+
+
+release = threading.Event()
+
+
+def blocking_handler(arguments):
+    release.wait(5)
+    return {"content": [{"type": "text", "text": "done"}]}
+
+
+@pytest.fixture
+def loaded_server(monkeypatch):
+    executor = ToolExecutor(process_workers=1, thread_workers=2)
+    clock = FakeClock()
+    monkeypatch.setattr(mcp_server, "tool_executor", executor)
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    monkeypatch.setattr(mcp_server, "scaling_window", CounterWindow(60, clock=clock))
+    monkeypatch.setattr(mcp_server, "requests_shed", 0)
+    monkeypatch.setitem(mcp_server.TOOLS_BY_NAME, "blocking_io", MCPTool(
+        name="blocking_io", description="", inputSchema={}, execution=THREAD, handler=blocking_handler
+    ))
+    release.clear()
+    yield clock
+    release.set()
+    executor.shutdown()
+
+
+def test_signals_track_synthetic_load(loaded_server, monkeypatch):
+    clock = loaded_server
+    run_tool = mcp_server.run_tool
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def slow_inline(tool, tool_name, arguments):
+            if tool_name == "slow_inline":
+                await gate.wait()
+            return await run_tool(tool, tool_name, arguments)
+
+        monkeypatch.setattr(mcp_server, "run_tool", slow_inline)
+        for _ in range(7):
+            mcp_server.create_session("sse")
+        for session in list(mcp_server.sessions.values())[:3]:
+            session.streams = 1
+
+        baseline = mcp_server.current_scaling_signals()
+        calls = [asyncio.create_task(mcp_server.execute_tool("blocking_io", {})) for _ in range(5)]
+        calls += [asyncio.create_task(mcp_server.execute_tool("slow_inline", {})) for _ in range(4)]
+        await asyncio.sleep(0.2)
+        loaded = mcp_server.current_scaling_signals()
+
+        await asyncio.sleep(0.1)
+        release.set()
+        gate.set()
+        await asyncio.gather(*calls)
+        clock.now = 10
+        drained = mcp_server.current_scaling_signals()
+        return baseline, loaded, drained
+
+    baseline, loaded, drained = asyncio.run(run())
+
+    assert baseline["in_flight_tool_calls"]["total"] == 0
+    assert (loaded["active_sessions"], loaded["open_streams"]) == (7, 3)
+    assert loaded["in_flight_tool_calls"] == {INLINE: 4, THREAD: 5, "process": 0, "total": 9}
+    # Two thread workers: three of the five blocking calls are waiting for one
+    assert loaded["queued_tool_calls"] == 3
+
+    assert drained["in_flight_tool_calls"]["total"] == 0
+    assert drained["queued_tool_calls"] == 0
+    # The queued calls waited at least the 0.3s the first two held the workers
+    assert drained["queue_wait_ms"] >= 0.3 * 1000 * 3 / 5 * 0.9
+    assert drained["window_seconds"] == 10
+
+
+def test_shed_rate_and_endpoints(loaded_server, monkeypatch):
+    clock = loaded_server
+    draining = DrainController()
+    draining.begin()
+    monkeypatch.setattr(mcp_server, "drain", draining)
+    client = TestClient(mcp_server.app)
+
+    assert client.get("/scaling").json()["shed_per_second"] == 0.0
+    initialize = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}
+    for _ in range(30):
+        assert client.post("/runtime/webhooks/mcp", json=initialize).status_code == 503
+    clock.now = 10
+
+    signals = client.get("/scaling").json()
+    assert signals["shed_per_second"] == 3.0
+    assert signals["active_sessions"] == 0
+
+    metrics = client.get("/metrics").text
+    assert "mcp_scaling_active_sessions 0" in metrics
+    assert 'mcp_scaling_in_flight_tool_calls{execution="thread"} 0' in metrics
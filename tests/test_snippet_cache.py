@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Snippet Cache and Pre-warming Tests
+
+Covers src/snippet_cache.py and its use by get_snippet: the byte-bounded
+LRU and its invalidation, and the hot set one replica persists so that a
+fresh replica's first requests are served warm, within a warm-up budget.
+
+Usage:
+    python -m pytest tests/test_snippet_cache.py
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import mcp_server
+from resilience import ResilientBackend
+from resource_subscriptions import ChangeFeed, snippet_uri
+from snippet_cache import SnippetCache
+from storage import FaultInjectingBackend, MemoryStorageBackend
+
+STORAGE_LATENCY = 0.05
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_is_bounded_by_bytes_and_ttl():
+    clock = FakeClock()
+    cache = SnippetCache(max_bytes=1600, ttl_seconds=60, clock=clock)
+    for i in range(20):
+        cache.put(f"s{i}", "x" * 100)
+    assert len(cache) == 16 and cache.bytes == 1600
+    assert cache.get("s0") is None and cache.get("s19") is not None
+    # Larger than a sixteenth of the cache: never cached
+    cache.put("huge", "x" * 101)
+    assert "huge" not in cache.entries
+    clock.now = 61
+    assert cache.get("s19") is None and cache.bytes == 1500
+
+
+def test_read_racing_an_invalidation_is_not_cached():
+    cache = SnippetCache(max_bytes=1 << 20)
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def fetch(name):
+            await gate.wait()
+            return "old contents"
+
+        read = asyncio.create_task(cache.load("s", fetch))
+        await asyncio.sleep(0)
+        cache.invalidate("s")
+        gate.set()
+        return await read
+
+    assert asyncio.run(run()) == "old contents"
+    assert "s" not in cache.entries and not cache.invalidated
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Storage with 50ms latency shared by every 'replica'; call the fixture's result to start a fresh one"""
+    memory = MemoryStorageBackend()
+    for i in range(40):
+        memory.blobs[f"s{i}.json"] = f"snippet {i}".encode()
+    storage = ResilientBackend(FaultInjectingBackend(memory, latency=STORAGE_LATENCY))
+    monkeypatch.setattr(mcp_server, "storage_backend", storage)
+
+    def fresh():
+        monkeypatch.setattr(mcp_server, "snippet_cache", SnippetCache(1 << 20))
+        monkeypatch.setattr(mcp_server, "resource_changes", ChangeFeed(
+            mcp_server.notify_resources_updated, storage=storage, coalesce_seconds=0.01
+        ))
+
+    fresh.memory = memory
+    fresh.storage = storage
+    return fresh
+
+
+async def first_request_latency(name):
+    started = time.perf_counter()
+    result = await mcp_server.execute_tool("get_snippet", {"snippetname": name})
+    assert not result.isError
+    return time.perf_counter() - started
+
+
+@pytest.mark.parametrize("content_max_bytes", [1 << 20, 0])
+def test_fresh_replica_is_warm_after_prewarming(replica, monkeypatch, content_max_bytes):
+    monkeypatch.setattr(mcp_server, "HOT_SET_CONTENT_MAX_BYTES", content_max_bytes)
+
+    async def run():
+        # A serving replica: s0..s19 are hot, and its hot set is persisted
+        replica()
+        for _ in range(3):
+            for i in range(20):
+                await mcp_server.execute_tool("get_snippet", {"snippetname": f"s{i}"})
+        await mcp_server.persist_hot_set()
+
+        # Another replica changes s1 after the snapshot was written
+        replica.memory.blobs["s1.json"] = b"changed"
+        other = ChangeFeed(lambda uris: None, storage=replica.storage, coalesce_seconds=0.01, replica_id="other")
+        other.changed(snippet_uri("s1"))
+        await other.flush()
+
+        replica()
+        cold = await first_request_latency("s5")
+
+        replica()
+        started = time.perf_counter()
+        await mcp_server.prewarm_snippet_cache()
+        warmup = time.perf_counter() - started
+        warm = await first_request_latency("s6")
+        changed = await mcp_server.execute_tool("get_snippet", {"snippetname": "s1"})
+        return cold, warmup, warm, changed.content[0]["text"]
+
+    cold, warmup, warm, changed = asyncio.run(run())
+    assert cold >= STORAGE_LATENCY
+    assert warm < STORAGE_LATENCY / 5
+    assert changed == "changed"
+    assert len(mcp_server.snippet_cache) == 20
+    # Twenty reads 16 at a time (or none, with contents in the snapshot), not one after another
+    assert warmup < 8 * STORAGE_LATENCY
+
+
+def test_prewarming_stops_at_its_budget(replica, monkeypatch):
+    monkeypatch.setattr(mcp_server, "HOT_SET_CONTENT_MAX_BYTES", 0)
+    monkeypatch.setattr(mcp_server, "PREWARM_TIMEOUT_SECONDS", 0.3)
+    monkeypatch.setattr(mcp_server, "PREWARM_CONCURRENCY", 1)
+    monkeypatch.setattr(mcp_server, "cache_prewarmed", False)
+
+    async def run():
+        replica()
+        for i in range(40):
+            await mcp_server.execute_tool("get_snippet", {"snippetname": f"s{i}"})
+        await mcp_server.persist_hot_set()
+        replica()
+        started = time.perf_counter()
+        await mcp_server.prewarm_snippet_cache()
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+    assert elapsed < 0.3 + 4 * STORAGE_LATENCY
+    assert 0 < len(mcp_server.snippet_cache) < 40
+    assert mcp_server.cache_prewarmed
+
+
+def test_not_ready_while_warming(replica, monkeypatch):
+    monkeypatch.setattr(mcp_server, "cache_prewarmed", False)
+    client = TestClient(mcp_server.app)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["cache"] == "warming"
+    monkeypatch.setattr(mcp_server, "cache_prewarmed", True)
+    assert client.get("/ready").status_code == 200
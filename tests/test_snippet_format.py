@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Snippet Storage Format Tests
+
+Covers compression, the small-payload bypass, content-addressed
+deduplication and reading legacy blobs in src/snippet_format.py.
+
+Usage:
+    python -m pytest tests/test_snippet_format.py
+"""
+
+import asyncio
+import os
+
+import pytest
+
+import mcp_server
+from content_index import SnippetContentIndex
+from resilience import ResilientBackend
+from snippet_format import (
+    CONTENT_PREFIX,
+    FORMAT_COMPRESSED,
+    FORMAT_DEDUP,
+    FORMAT_RAW,
+    FRAME_MAGIC,
+    REFERENCE_MAGIC,
+    SnippetCodec,
+)
+from snippet_index import SnippetNameIndex
+from storage import MemoryStorageBackend, SnippetNotFoundError, StorageError
+
+LARGE = ("resource storageAccount 'Microsoft.Storage/storageAccounts@2023-01-01' = {\n" * 200).encode()
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compressed_round_trip(compression):
+    memory = MemoryStorageBackend()
+    codec = SnippetCodec(FORMAT_COMPRESSED, compression=compression)
+
+    asyncio.run(codec.write(memory, "big.json", LARGE))
+    stored = memory.blobs["big.json"]
+    assert stored.startswith(FRAME_MAGIC)
+    assert len(stored) < len(LARGE) / 10
+    assert asyncio.run(codec.read(memory, "big.json")) == LARGE
+
+
+def test_small_payloads_bypass_compression():
+    memory = MemoryStorageBackend()
+    codec = SnippetCodec(FORMAT_DEDUP, min_size=1024)
+    asyncio.run(codec.write(memory, "tiny.json", b"hello"))
+    assert memory.blobs == {"tiny.json": b"hello"}
+
+
+def test_incompressible_payload_is_not_grown():
+    memory = MemoryStorageBackend()
+    codec = SnippetCodec(FORMAT_COMPRESSED, compression="gzip", min_size=16)
+    payload = os.urandom(4096)
+    asyncio.run(codec.write(memory, "noise.json", payload))
+    assert len(memory.blobs["noise.json"]) == len(FRAME_MAGIC) + 1 + len(payload)
+    assert asyncio.run(codec.read(memory, "noise.json")) == payload
+
+
+def test_duplicate_content_is_stored_and_uploaded_once():
+    memory = MemoryStorageBackend()
+    codec = SnippetCodec(FORMAT_DEDUP)
+
+    async def save_copies():
+        for i in range(5):
+            await codec.write(memory, f"copy-{i}.json", LARGE)
+
+    asyncio.run(save_copies())
+    content_keys = [key for key in memory.blobs if key.startswith(CONTENT_PREFIX)]
+    assert len(content_keys) == 1
+    assert codec.uploads_skipped == 4
+    for i in range(5):
+        assert memory.blobs[f"copy-{i}.json"].startswith(REFERENCE_MAGIC)
+        assert asyncio.run(codec.read(memory, f"copy-{i}.json")) == LARGE
+
+
+def test_dedup_checks_storage_for_content_written_by_other_replicas():
+    memory = MemoryStorageBackend()
+    asyncio.run(SnippetCodec(FORMAT_DEDUP).write(memory, "a.json", LARGE))
+
+    other_replica = SnippetCodec(FORMAT_DEDUP)
+    asyncio.run(other_replica.write(memory, "b.json", LARGE))
+    assert other_replica.uploads_skipped == 1
+
+
+def test_every_format_reads_legacy_and_other_formats():
+    memory = MemoryStorageBackend()
+    memory.blobs["legacy.json"] = LARGE
+    asyncio.run(SnippetCodec(FORMAT_COMPRESSED).write(memory, "compressed.json", LARGE))
+    asyncio.run(SnippetCodec(FORMAT_DEDUP).write(memory, "dedup.json", LARGE))
+
+    for storage_format in (FORMAT_RAW, FORMAT_COMPRESSED, FORMAT_DEDUP):
+        codec = SnippetCodec(storage_format)
+        for key in ("legacy.json", "compressed.json", "dedup.json"):
+            assert asyncio.run(codec.read(memory, key)) == LARGE
+
+
+@pytest.mark.parametrize("storage_format", [FORMAT_RAW, FORMAT_COMPRESSED, FORMAT_DEDUP])
+@pytest.mark.parametrize("payload", [
+    REFERENCE_MAGIC + b"_index/secret.bin",
+    REFERENCE_MAGIC + (CONTENT_PREFIX + "0" * 64).encode(),
+    FRAME_MAGIC + b"\x07not a frame",
+    b"\x00",
+])
+def test_payloads_that_look_like_markers_round_trip(storage_format, payload):
+    memory = MemoryStorageBackend()
+    memory.blobs["_index/secret.bin"] = b"not for snippet readers"
+    memory.blobs[CONTENT_PREFIX + "0" * 64] = b"someone else's content"
+    codec = SnippetCodec(storage_format, min_size=1024)
+
+    asyncio.run(codec.write(memory, "tricky.json", payload))
+    assert memory.blobs["tricky.json"].startswith(FRAME_MAGIC)
+    assert asyncio.run(codec.read(memory, "tricky.json")) == payload
+
+
+def test_missing_or_corrupt_referenced_content_is_an_error():
+    memory = MemoryStorageBackend()
+    codec = SnippetCodec(FORMAT_DEDUP)
+    asyncio.run(codec.write(memory, "lost.json", LARGE))
+    asyncio.run(codec.write(memory, "corrupt.json", LARGE.upper()))
+    lost, corrupt = (memory.blobs[f"{name}.json"][len(REFERENCE_MAGIC):].decode() for name in ("lost", "corrupt"))
+    del memory.blobs[lost]
+    memory.blobs[corrupt] = FRAME_MAGIC + bytes([0]) + b"bit rot"
+    memory.blobs["outside.json"] = REFERENCE_MAGIC + b"_index/secret.bin"
+
+    with pytest.raises(SnippetNotFoundError):
+        asyncio.run(codec.read(memory, "lost.json"))
+    with pytest.raises(StorageError, match="does not match its hash"):
+        asyncio.run(codec.read(memory, "corrupt.json"))
+    with pytest.raises(StorageError, match="malformed"):
+        asyncio.run(codec.read(memory, "outside.json"))
+
+
+def test_get_snippet_is_transparent(monkeypatch):
+    memory = MemoryStorageBackend()
+    memory.blobs["legacy.json"] = b"legacy content"
+    monkeypatch.setattr(mcp_server, "storage_backend", ResilientBackend(memory))
+    monkeypatch.setattr(mcp_server, "snippet_codec", SnippetCodec(FORMAT_DEDUP, min_size=64))
+    monkeypatch.setattr(mcp_server, "snippet_index", SnippetNameIndex())
+    monkeypatch.setattr(mcp_server, "content_index", SnippetContentIndex())
+
+    content = LARGE.decode()
+    saved = asyncio.run(mcp_server.execute_tool("save_snippet", {"snippetname": "bicep", "snippet": content}))
+    assert not saved.isError
+    assert memory.blobs["bicep.json"].startswith(REFERENCE_MAGIC)
+
+    result = asyncio.run(mcp_server.execute_tool("get_snippet", {"snippetname": "bicep"}))
+    assert result.content[0]["text"] == content
+    legacy = asyncio.run(mcp_server.execute_tool("get_snippet", {"snippetname": "legacy"}))
+    assert legacy.content[0]["text"] == "legacy content"
+
+    # Content blobs are not snippets and stay out of the name index
+    assert mcp_server.snippet_names_from_keys(memory.blobs) == ["legacy", "bicep"]
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Snippet Name Index Tests
+
+Covers prefix queries and pagination in src/snippet_index.py and the
+list_snippets / search_snippets tools backed by it.
+
+Usage:
+    python -m pytest tests/test_snippet_index.py
+"""
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import mcp_server
+from resilience import ResilientBackend
+from snippet_index import SnippetNameIndex
+from storage import MemoryStorageBackend
+
+
+def test_prefix_query_and_pagination():
+    index = SnippetNameIndex(["beta", "alpha-2", "alpha-1", "alphabet", "gamma"])
+
+    page, cursor = index.prefix("alpha", limit=2)
+    assert page == ["alpha-1", "alpha-2"]
+    assert cursor == "alpha-2"
+
+    page, cursor = index.prefix("alpha", cursor=cursor, limit=2)
+    assert page == ["alphabet"]
+    assert cursor is None
+
+    assert index.prefix("zeta") == ([], None)
+
+
+def test_full_listing_pages_cover_every_name_once():
+    names = [f"snippet-{i:04d}" for i in range(237)]
+    index = SnippetNameIndex(reversed(names))
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = index.prefix("", cursor=cursor, limit=50)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert seen == names
+
+
+def test_cursor_stays_valid_across_inserts():
+    index = SnippetNameIndex(["a1", "a2", "a3", "a4"])
+    page, cursor = index.prefix("a", limit=2)
+    index.add("a0")  # sorts before the cursor, must not shift the next page
+    index.add("a25")
+    page, _ = index.prefix("a", cursor=cursor, limit=10)
+    assert page == ["a25", "a3", "a4"]
+
+
+def test_add_is_idempotent():
+    index = SnippetNameIndex()
+    index.add("x")
+    index.add("x")
+    assert len(index) == 1
+    assert "x" in index
+
+
+def test_reconcile_keeps_names_added_during_listing():
+    index = SnippetNameIndex(["stale", "kept"])
+    index.begin_reconcile()
+    index.add("saved-while-listing")
+    added, removed = index.finish_reconcile(["kept", "new-from-listing"])
+    assert index.prefix("")[0] == ["kept", "new-from-listing", "saved-while-listing"]
+    assert (added, removed) == (1, 1)
+    assert index.loaded
+
+
+def test_tools_use_bootstrapped_index(monkeypatch):
+    memory = MemoryStorageBackend()
+    for name in ("deploy-aks", "deploy-apim", "notes"):
+        memory.blobs[f"{name}.json"] = b"x"
+    memory.blobs["not-a-snippet.txt"] = b"x"
+    monkeypatch.setattr(mcp_server, "storage_backend", ResilientBackend(memory))
+    monkeypatch.setattr(mcp_server, "snippet_index", SnippetNameIndex())
+
+    with TestClient(mcp_server.app):
+        # The startup listing runs as a background task
+        for _ in range(50):
+            if mcp_server.snippet_index.loaded:
+                break
+            asyncio.run(asyncio.sleep(0.01))
+        assert mcp_server.snippet_index.loaded
+
+        asyncio.run(mcp_server.execute_tool("save_snippet", {"snippetname": "deploy-kaito", "snippet": "y"}))
+
+        listed = asyncio.run(mcp_server.execute_tool("list_snippets", {}))
+        assert json.loads(listed.content[0]["text"]) == {
+            "snippets": ["deploy-aks", "deploy-apim", "deploy-kaito", "notes"],
+            "nextCursor": None,
+        }
+
+        found = asyncio.run(mcp_server.execute_tool("search_snippets", {"prefix": "deploy-", "limit": 2}))
+        body = json.loads(found.content[0]["text"])
+        assert body == {"snippets": ["deploy-aks", "deploy-apim"], "nextCursor": "deploy-apim"}
+
+        rest = asyncio.run(mcp_server.execute_tool(
+            "search_snippets", {"prefix": "deploy-", "cursor": body["nextCursor"]}
+        ))
+        assert json.loads(rest.content[0]["text"])["snippets"] == ["deploy-kaito"]
+
+    assert mcp_server.background_tasks == []
+
+
+def test_listing_before_index_loaded_is_reported(monkeypatch):
+    monkeypatch.setattr(mcp_server, "storage_backend", ResilientBackend(MemoryStorageBackend()))
+    monkeypatch.setattr(mcp_server, "snippet_index", SnippetNameIndex())
+    result = asyncio.run(mcp_server.execute_tool("list_snippets", {}))
+    assert result.isError
+    assert "loading" in result.content[0]["text"]
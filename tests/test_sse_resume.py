@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+SSE Resumability Tests
+
+Covers the compact session state and bounded replay buffer in
+src/session_events.py, resuming an SSE session with Last-Event-ID after a
+mid-stream disconnect so only missed events are replayed, and expiry of
+disconnected sessions after the grace period.
+
+Usage:
+    python -m pytest tests/test_sse_resume.py
+"""
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+import mcp_server
+from mcp_client import MCPClient, SSEParser
+from session_events import Session, SessionEventLog, parse_event_id
+
+SSE_URL = "/runtime/webhooks/mcp/sse"
+
+
+def test_event_log_replays_only_retained_events():
+    log = SessionEventLog(max_events=3)
+    for i in range(5):
+        log.publish({"n": i})
+
+    assert [seq for seq, _ in log.since(3)] == [4, 5]
+    assert [seq for seq, _ in log.since(2)] == [3, 4, 5]
+    assert log.since(5) == []
+    # Event 2 was evicted, so resuming from 1 would silently skip it
+    assert log.since(1) is None
+    assert log.since(9) is None
+
+    assert parse_event_id("abc-123:7") == ("abc-123", 7)
+    assert parse_event_id("garbage") is None
+
+
+def test_disconnected_sessions_expire_after_grace(monkeypatch):
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    monkeypatch.setattr(mcp_server, "SSE_RESUME_GRACE_SECONDS", 60.0)
+    idle = mcp_server.create_session("sse")
+    streaming = mcp_server.create_session("sse")
+    mcp_server.sessions[streaming].streams = 1
+
+    assert mcp_server.expire_sessions(time.monotonic() + 30) == 0
+    assert mcp_server.expire_sessions(time.monotonic() + 61) == 1
+    assert list(mcp_server.sessions) == [streaming]
+    assert idle not in mcp_server.sessions
+
+
+async def read_events(response, parser, count):
+    events = []
+    async with asyncio.timeout(5):
+        while len(events) < count:
+            events.extend(parser.feed(await response.content.readany()))
+    return events
+
+
+async def serve(scenario):
+    import uvicorn
+
+    config = uvicorn.Config(mcp_server.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        return await scenario(f"http://127.0.0.1:{port}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+async def disconnect_and_resume(base):
+    def call(request_id):
+        return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": "hello_mcp"}}
+
+    async with aiohttp.ClientSession() as http:
+        first = await http.get(base + SSE_URL)
+        parser = SSEParser()
+        (endpoint,) = await read_events(first, parser, 1)
+        session_id, seq = parse_event_id(endpoint.id)
+        assert seq == 0
+        message_url = f"{base}/runtime/webhooks/mcp/{endpoint.data}"
+
+        posted = await http.post(message_url, json=call(1))
+        assert posted.status == 202
+        (response_1,) = await read_events(first, parser, 1)
+
+        # Drop the stream mid-session, then produce a response while disconnected
+        first.close()
+        assert (await http.post(message_url, json=call(2))).status == 202
+
+        resumed = await http.get(base + SSE_URL, headers={"Last-Event-ID": response_1.id})
+        replay_parser = SSEParser()
+        endpoint_again, replayed = await read_events(resumed, replay_parser, 2)
+        resumed.close()
+
+        # An unknown id falls back to a brand new session
+        fresh = await http.get(base + SSE_URL, headers={"Last-Event-ID": "unknown:4"})
+        (fresh_endpoint,) = await read_events(fresh, SSEParser(), 1)
+        fresh.close()
+
+    return session_id, response_1, endpoint_again, replayed, fresh_endpoint
+
+
+def test_resume_replays_only_missed_events(monkeypatch):
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    monkeypatch.setattr(mcp_server, "SSE_RESPONSES_ON_STREAM", True)
+    session_id, response_1, endpoint_again, replayed, fresh_endpoint = asyncio.run(serve(disconnect_and_resume))
+
+    assert response_1.id == f"{session_id}:1"
+    assert endpoint_again.data == f"message?sessionId={session_id}"
+    assert replayed.id == f"{session_id}:2"
+    assert '"id": 2' in replayed.data
+    assert parse_event_id(fresh_endpoint.id)[0] != session_id
+
+
+async def client_survives_drops(base):
+    # An idle timeout far below the keepalive interval makes the client treat
+    # its stream as dead and reconnect every few hundred milliseconds
+    async with MCPClient(f"{base}/runtime/webhooks/mcp", stream_idle_timeout=0.2, reconnect_delay=0.01,
+                         request_timeout=5) as client:
+        url = client._message_url
+        results = []
+        for _ in range(5):
+            results.append(await client.call_tool("hello_mcp"))
+            await asyncio.sleep(0.3)
+        return results, client.reconnects, url, client._message_url
+
+
+def test_client_resumes_same_session_after_drops(monkeypatch):
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    monkeypatch.setattr(mcp_server, "SSE_RESPONSES_ON_STREAM", True)
+    results, reconnects, url_before, url_after = asyncio.run(serve(client_survives_drops))
+    assert all(r["content"][0]["text"].startswith("Hello") for r in results)
+    assert reconnects >= 1
+    assert url_before == url_after
+    assert len(mcp_server.sessions) == 1
+
+
+@pytest.mark.parametrize("resume_from", [0, 1])
+def test_event_log_wait_wakes_on_publish(resume_from):
+    async def run():
+        log = SessionEventLog(max_events=8)
+        if resume_from:
+            log.publish({"n": 0})
+        waiter = asyncio.create_task(log.wait(resume_from, timeout=5))
+        await asyncio.sleep(0)
+        log.publish({"n": 1})
+        return await waiter, await log.wait(log.last_seq, timeout=0.01)
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_idle_sessions_allocate_no_ring_or_waiters():
+    async def run():
+        session = Session("sse", max_events=8)
+        log = session.events
+        assert log._events is None and log.since(0) == []
+        assert not hasattr(session, "__dict__")
+        waiter = asyncio.create_task(log.wait(0, timeout=5))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert log._waiters == [] and log._events is None
+        log.close()
+        return await log.wait(0, timeout=5)
+
+    assert asyncio.run(run()) is True
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Storage Resilience Tests
+
+Exercises the retry, hedged read and circuit breaker layer in src/resilience.py
+against the fault-injecting in-memory storage stand-in. No Azure access needed.
+
+Usage:
+    python -m pytest tests/test_storage_resilience.py
+"""
+
+import asyncio
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import mcp_server
+from resilience import CircuitBreaker, ResilientBackend, RetryPolicy
+from snippet_cache import SnippetCache
+from storage import (
+    CircuitOpenError,
+    FaultInjectingBackend,
+    MemoryStorageBackend,
+    SnippetNotFoundError,
+    TransientStorageError,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_backend(faulty: FaultInjectingBackend, **kwargs) -> ResilientBackend:
+    sleeps = []
+
+    async def record_sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    backend = ResilientBackend(faulty, rng=random.Random(7), sleep=record_sleep, **kwargs)
+    backend.sleeps = sleeps
+    return backend
+
+
+def test_retries_transient_errors_then_succeeds():
+    memory = MemoryStorageBackend()
+    memory.blobs["a.json"] = b"hello"
+    faulty = FaultInjectingBackend(memory)
+    faulty.fail_next = [TransientStorageError("503"), TransientStorageError("429")]
+    backend = make_backend(faulty, retry=RetryPolicy(max_attempts=4, base_delay=0.1, max_delay=1.0))
+
+    assert asyncio.run(backend.get("a.json")) == b"hello"
+    assert faulty.calls == 3
+    assert len(backend.sleeps) == 2
+    # Full jitter keeps each delay within the exponential envelope
+    assert 0 <= backend.sleeps[0] <= 0.1
+    assert 0 <= backend.sleeps[1] <= 0.2
+
+
+def test_retry_after_is_honored():
+    memory = MemoryStorageBackend()
+    memory.blobs["a.json"] = b"hello"
+    faulty = FaultInjectingBackend(memory)
+    faulty.fail_next = [TransientStorageError("429", retry_after=0.75)]
+    backend = make_backend(faulty, retry=RetryPolicy(max_attempts=3, base_delay=0.05, max_delay=2.0))
+
+    asyncio.run(backend.get("a.json"))
+    assert 0.75 <= backend.sleeps[0] <= 0.8
+
+
+def test_retry_after_beyond_budget_gives_up():
+    faulty = FaultInjectingBackend(MemoryStorageBackend())
+    faulty.fail_next = [TransientStorageError("429", retry_after=60)]
+    backend = make_backend(faulty, retry=RetryPolicy(max_attempts=5, max_delay=2.0))
+
+    with pytest.raises(TransientStorageError):
+        asyncio.run(backend.get("a.json"))
+    assert faulty.calls == 1
+    assert backend.sleeps == []
+
+
+def test_retries_are_bounded():
+    faulty = FaultInjectingBackend(MemoryStorageBackend(), failure_rate=1.0)
+    backend = make_backend(faulty, retry=RetryPolicy(max_attempts=3), breaker=CircuitBreaker(failure_threshold=100))
+
+    with pytest.raises(TransientStorageError):
+        asyncio.run(backend.put("a.json", b"x"))
+    assert faulty.calls == 3
+
+
+def test_not_found_is_not_retried_and_keeps_circuit_closed():
+    faulty = FaultInjectingBackend(MemoryStorageBackend())
+    backend = make_backend(faulty, breaker=CircuitBreaker(failure_threshold=1))
+
+    with pytest.raises(SnippetNotFoundError):
+        asyncio.run(backend.get("missing.json"))
+    assert faulty.calls == 1
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_opens_fails_fast_and_recovers():
+    clock = FakeClock()
+    memory = MemoryStorageBackend()
+    memory.blobs["a.json"] = b"hello"
+    faulty = FaultInjectingBackend(memory, failure_rate=1.0)
+    backend = make_backend(
+        faulty,
+        retry=RetryPolicy(max_attempts=2),
+        breaker=CircuitBreaker(failure_threshold=4, reset_timeout=10, clock=clock),
+    )
+
+    for _ in range(2):
+        with pytest.raises(TransientStorageError):
+            asyncio.run(backend.get("a.json"))
+    assert backend.breaker.state == CircuitBreaker.OPEN
+    assert not backend.healthy
+
+    calls_before = faulty.calls
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(backend.get("a.json"))
+    assert faulty.calls == calls_before
+
+    # After the reset timeout a single probe is let through; a failed probe re-opens
+    clock.now = 10
+    assert backend.breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(backend.get("a.json"))
+    assert faulty.calls == calls_before + 1
+    assert backend.breaker.state == CircuitBreaker.OPEN
+
+    # A successful probe closes the circuit again
+    clock.now = 20
+    faulty.failure_rate = 0.0
+    assert asyncio.run(backend.get("a.json")) == b"hello"
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_hedged_read_cuts_tail_latency():
+    memory = MemoryStorageBackend()
+    memory.blobs["a.json"] = b"hello"
+    faulty = FaultInjectingBackend(memory)
+    faulty.slow_next = [1.0]  # the primary read stalls, the hedge does not
+    backend = ResilientBackend(faulty, hedged_reads=True, hedge_delay=0.02)
+
+    async def timed_get():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        data = await backend.get("a.json")
+        return data, loop.time() - started
+
+    data, elapsed = asyncio.run(timed_get())
+    assert data == b"hello"
+    assert elapsed < 0.5
+    assert backend.hedges_launched == 1
+    assert faulty.calls == 2
+
+
+def test_hedge_delay_tracks_observed_p95():
+    backend = ResilientBackend(MemoryStorageBackend(), hedged_reads=True, hedge_delay=0.5)
+    assert backend._current_hedge_delay() == 0.5
+    for i in range(100):
+        backend.read_latency.record(0.001 * (i + 1))
+    assert backend._current_hedge_delay() == pytest.approx(0.096)
+
+
+def test_tools_and_readiness_reflect_open_circuit(monkeypatch):
+    clock = FakeClock()
+    faulty = FaultInjectingBackend(MemoryStorageBackend(), failure_rate=1.0)
+    backend = make_backend(
+        faulty,
+        retry=RetryPolicy(max_attempts=1),
+        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock),
+    )
+    monkeypatch.setattr(mcp_server, "storage_backend", backend)
+    # Nothing cached, so the read below has to reach the failing storage
+    monkeypatch.setattr(mcp_server, "snippet_cache", SnippetCache(1 << 20))
+    client = TestClient(mcp_server.app)
+
+    assert client.get("/ready").status_code == 200
+
+    save = asyncio.run(mcp_server.execute_tool("save_snippet", {"snippetname": "a", "snippet": "x"}))
+    assert save.isError
+    get = asyncio.run(mcp_server.execute_tool("get_snippet", {"snippetname": "a"}))
+    assert get.isError
+    assert "temporarily unavailable" in get.content[0]["text"]
+
+    ready = client.get("/ready")
+    assert ready.status_code == 503
+    assert ready.json()["checks"]["storage"] == CircuitBreaker.OPEN
+    # Liveness is unaffected so the pod is not restarted for a storage outage
+    assert client.get("/health").status_code == 200
+
+
+def test_save_then_get_round_trip(monkeypatch):
+    monkeypatch.setattr(mcp_server, "storage_backend", ResilientBackend(MemoryStorageBackend()))
+
+    saved = asyncio.run(mcp_server.execute_tool("save_snippet", {"snippetname": "greet", "snippet": "hi"}))
+    assert not saved.isError
+    result = asyncio.run(mcp_server.execute_tool("get_snippet", {"snippetname": "greet"}))
+    assert result.content[0]["text"] == "hi"
+    missing = asyncio.run(mcp_server.execute_tool("get_snippet", {"snippetname": "nope"}))
+    assert missing.isError
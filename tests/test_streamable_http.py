@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Streamable HTTP Transport Tests
+
+Covers the single-endpoint Streamable HTTP transport: session lifecycle via
+Mcp-Session-Id, the stateless mode, upgrading slow requests to an SSE stream,
+and the client's streamable mode.
+
+Usage:
+    python -m pytest tests/test_streamable_http.py
+"""
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import mcp_server
+from mcp_client import MCPClient
+from mcp_server import MCPToolResult
+
+URL = "/runtime/webhooks/mcp"
+ACCEPT_BOTH = {"Accept": "application/json, text/event-stream"}
+
+
+def rpc(method, request_id=1, params=None):
+    message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        message["params"] = params
+    return message
+
+
+def test_stateful_session_lifecycle(monkeypatch):
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    client = TestClient(mcp_server.app)
+
+    init = client.post(URL, json=rpc("initialize", params={"protocolVersion": "2025-03-26"}), headers=ACCEPT_BOTH)
+    assert init.status_code == 200
+    assert init.json()["result"]["protocolVersion"] == "2025-03-26"
+    session_id = init.headers["mcp-session-id"]
+    assert mcp_server.sessions[session_id].transport == "streamable-http"
+
+    assert client.post(URL, json=rpc("tools/list")).status_code == 400
+    assert client.post(URL, json=rpc("tools/list"), headers={"Mcp-Session-Id": "unknown"}).status_code == 404
+
+    headers = {**ACCEPT_BOTH, "Mcp-Session-Id": session_id}
+    tools = client.post(URL, json=rpc("tools/list", 2), headers=headers)
+    assert tools.headers["content-type"] == "application/json"
+    assert len(tools.json()["result"]["tools"]) == len(mcp_server.TOOLS)
+
+    notification = client.post(URL, json={"jsonrpc": "2.0", "method": "notifications/initialized"}, headers=headers)
+    assert notification.status_code == 202
+
+    batch = client.post(URL, json=[rpc("tools/list", 3), rpc("tools/call", 4, {"name": "hello_mcp"})], headers=headers)
+    assert [r["id"] for r in batch.json()] == [3, 4]
+
+    assert client.delete(URL, headers={"Mcp-Session-Id": session_id}).status_code == 204
+    assert session_id not in mcp_server.sessions
+    assert client.post(URL, json=rpc("tools/list"), headers=headers).status_code == 404
+
+
+def test_stateless_mode_keeps_no_sessions(monkeypatch):
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    monkeypatch.setattr(mcp_server, "STREAMABLE_HTTP_STATELESS", True)
+    client = TestClient(mcp_server.app)
+
+    init = client.post(URL, json=rpc("initialize"), headers=ACCEPT_BOTH)
+    assert init.status_code == 200
+    assert "mcp-session-id" not in init.headers
+    # Any replica can serve the next call without a session header
+    call = client.post(URL, json=rpc("tools/call", 2, {"name": "hello_mcp"}), headers=ACCEPT_BOTH)
+    assert call.json()["result"]["content"][0]["text"].startswith("Hello")
+    assert mcp_server.sessions == {}
+    assert client.get(URL).status_code == 405
+
+
+def test_slow_requests_upgrade_to_sse(monkeypatch):
+    async def slow_tool(tool_name, arguments):
+        await asyncio.sleep(0.2)
+        return MCPToolResult(content=[{"type": "text", "text": "done"}])
+
+    monkeypatch.setattr(mcp_server, "STREAMABLE_HTTP_STATELESS", True)
+    monkeypatch.setattr(mcp_server, "STREAMABLE_HTTP_JSON_WAIT_SECONDS", 0.01)
+    monkeypatch.setattr(mcp_server, "execute_tool", slow_tool)
+    client = TestClient(mcp_server.app)
+    call = rpc("tools/call", 7, {"name": "slow"})
+
+    streamed = client.post(URL, json=call, headers=ACCEPT_BOTH)
+    assert streamed.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("data: "):] for line in streamed.text.splitlines() if line.startswith("data: ")]
+    assert [json.loads(e)["id"] for e in events] == [7]
+
+    # Clients that only accept JSON wait for the direct response instead
+    direct = client.post(URL, json=call, headers={"Accept": "application/json"})
+    assert direct.headers["content-type"] == "application/json"
+    assert direct.json()["result"]["content"][0]["text"] == "done"
+
+
+async def run_streamable_client():
+    import uvicorn
+
+    config = uvicorn.Config(mcp_server.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        client = MCPClient(f"http://127.0.0.1:{port}{URL}", streamable=True)
+        await client.connect()
+        session_id = client.session_id
+        results = await asyncio.gather(*(client.call_tool("hello_mcp") for _ in range(10)))
+        active = session_id in mcp_server.sessions
+        await client.close()
+        return session_id, active, results
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def test_client_streamable_mode(monkeypatch):
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    session_id, active, results = asyncio.run(run_streamable_client())
+    assert session_id and active
+    assert all(r["content"][0]["text"].startswith("Hello") for r in results)
+    assert session_id not in mcp_server.sessions
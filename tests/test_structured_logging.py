@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Structured Logging Tests
+
+Covers the queue-backed pipeline in src/structured_logging.py: JSON records
+carry the bound request context, sampling keeps a fixed fraction of
+high-volume records without formatting the dropped ones, and a full queue
+drops records instead of blocking the caller.
+
+Usage:
+    python -m pytest tests/test_structured_logging.py
+"""
+
+import asyncio
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+import mcp_server
+from structured_logging import (
+    ContextFilter,
+    DeferredQueueHandler,
+    JsonFormatter,
+    SamplingFilter,
+    bind_log_context,
+    configure_logging,
+    parse_sample_rates,
+    stop_logging,
+)
+
+
+class Expensive:
+    """Argument whose formatting is counted"""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "expensive"
+
+
+def make_record(name="mcp_server.requests", level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("mcp_server.requests=0.1, storage=1") == {"mcp_server.requests": 0.1, "storage": 1.0}
+    assert parse_sample_rates("") == {}
+    with pytest.raises(ValueError):
+        parse_sample_rates("mcp_server=2")
+
+
+def test_sampling_keeps_every_nth_record_but_never_warnings():
+    sampler = SamplingFilter({"mcp_server.requests": 0.25, "noisy": 0.0})
+    kept = [sampler.filter(make_record()) for _ in range(12)]
+    assert kept.count(True) == 3 and kept[0]
+    assert all(sampler.filter(make_record(level=logging.WARNING)) for _ in range(4))
+    # Child loggers inherit the rate; unrelated loggers are untouched
+    assert not sampler.filter(make_record(name="noisy.child"))
+    assert all(sampler.filter(make_record(name="mcp_server")) for _ in range(4))
+
+
+def test_json_record_carries_bound_context():
+    async def log_in_task():
+        bind_log_context(session_id="abc")
+        record = make_record(request_id=7, latency_ms=1.5)
+        ContextFilter().filter(record)
+        return record
+
+    record = asyncio.run(log_in_task())
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "hello world"
+    assert entry["session_id"] == "abc"
+    assert entry["request_id"] == 7 and entry["latency_ms"] == 1.5
+    assert "tool" not in entry
+    # The context does not leak out of the task that bound it
+    assert not hasattr(make_record(), "session_id") and ContextFilter().filter(make_record())
+
+
+def test_sampled_out_records_are_never_formatted():
+    records = queue.Queue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(SamplingFilter({"mcp_server.requests": 0.1}))
+    argument = Expensive()
+    for _ in range(20):
+        handler.handle(make_record(args=(argument,)))
+    assert records.qsize() == 2
+    assert argument.formatted == 2
+    assert records.get().msg == "hello expensive"
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DeferredQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(make_record())
+    assert handler.dropped == 3
+
+
+def test_listener_writes_json_off_the_calling_thread():
+    stream = io.StringIO()
+    root = logging.getLogger()
+    level = root.level
+    listener = configure_logging("INFO", "json", stream=stream)
+    handler = root.handlers[-1]
+    try:
+        logging.getLogger("structured.test").info("saved %s", "snippet", extra={"tool": "save_snippet"})
+    finally:
+        stop_logging(listener)
+        root.removeHandler(handler)
+        root.setLevel(level)
+    (entry,) = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert entry["logger"] == "structured.test"
+    assert entry["message"] == "saved snippet"
+    assert entry["tool"] == "save_snippet"
+
+
+def test_requests_are_logged_with_structured_fields(caplog):
+    body = {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {"name": "hello_mcp"}}
+    with caplog.at_level(logging.INFO, logger="mcp_server.requests"):
+        status, _ = asyncio.run(mcp_server.handle_jsonrpc(body))
+    (record,) = [r for r in caplog.records if r.name == "mcp_server.requests"]
+    assert status == 200
+    assert (record.request_id, record.method, record.tool, record.status) == (3, "tools/call", "hello_mcp", 200)
+    assert record.latency_ms >= 0
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Bearer Token Validation Tests
+
+Covers src/token_auth.py and its use on the MCP endpoints: tokens signed with
+locally generated RSA keys are checked against a cached JWKS, repeat calls hit
+the validated-token cache, unknown kids trigger a rate-limited refetch, and
+tool handlers can read the caller's claims.
+
+Usage:
+    python -m pytest tests/test_token_auth.py
+"""
+
+import asyncio
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.testclient import TestClient
+
+import mcp_server
+from token_auth import JwksCache, JwksUnavailableError, TokenError, TokenValidator, current_claims
+
+ISSUER = "https://login.example.test/tenant/v2.0"
+AUDIENCE = "api://mcp-server"
+MCP_URL = "/runtime/webhooks/mcp"
+
+
+def signing_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def jwk(key, kid):
+    entry = jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key(), as_dict=True)
+    return {**entry, "kid": kid, "use": "sig", "alg": "RS256"}
+
+
+def make_token(key, kid, **claims):
+    now = int(time.time())
+    payload = {"iss": ISSUER, "aud": AUDIENCE, "sub": "agent-1", "iat": now, "exp": now + 300, **claims}
+    return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeJwks:
+    """JWKS endpoint whose key set the test controls"""
+
+    def __init__(self, *entries):
+        self.entries = list(entries)
+        self.requests = 0
+
+    def __call__(self, url):
+        self.requests += 1
+        return {"keys": list(self.entries)}
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return signing_key(), signing_key()
+
+
+def validator_for(fetch, clock=time.monotonic):
+    jwks = JwksCache("https://keys.example.test", min_refetch_seconds=30, fetch=fetch, clock=clock)
+    return TokenValidator(jwks, issuer=ISSUER, audience=AUDIENCE)
+
+
+def test_valid_tokens_are_cached_and_bad_ones_rejected(keys):
+    current, other = keys
+    fetch = FakeJwks(jwk(current, "k1"))
+    validator = validator_for(fetch)
+    token = make_token(current, "k1")
+
+    async def run():
+        claims = await validator.validate(token)
+        again = await validator.validate(token)
+        rejected = []
+        for bad in (
+            make_token(other, "k1"),
+            make_token(current, "k1", aud="api://someone-else"),
+            make_token(current, "k1", iss="https://evil.example.test"),
+            make_token(current, "k1", exp=int(time.time()) - 3600),
+            jwt.encode({"sub": "x"}, "s" * 32, algorithm="HS256", headers={"kid": "k1"}),
+            "not-a-jwt",
+        ):
+            with pytest.raises(TokenError) as error:
+                await validator.validate(bad)
+            rejected.append(str(error.value))
+        return claims, again, rejected
+
+    claims, again, rejected = asyncio.run(run())
+    assert claims["sub"] == again["sub"] == "agent-1"
+    assert (validator.hits, fetch.requests) == (1, 1)
+    assert len(rejected) == 6
+    assert "algorithm not allowed" in rejected[4]
+
+
+def test_cache_hits_recheck_not_before(keys):
+    current, _ = keys
+    validator = validator_for(FakeJwks(jwk(current, "k1")))
+    now = time.time()
+    token = make_token(current, "k1", nbf=int(now) + 30)
+
+    async def run():
+        # Within the 60s leeway, so jwt.decode accepts it and it is cached
+        await validator.validate(token)
+        validator.clock = lambda: now - 60
+        with pytest.raises(TokenError, match="not yet valid"):
+            await validator.validate(token)
+        validator.clock = lambda: now
+        return await validator.validate(token)
+
+    claims = asyncio.run(run())
+    assert claims["sub"] == "agent-1"
+    assert (validator.hits, validator.misses) == (1, 1)
+
+
+def test_unknown_kid_refetch_is_rate_limited(keys):
+    current, rotated = keys
+    fetch = FakeJwks(jwk(current, "k1"))
+    now = [0.0]
+    validator = validator_for(fetch, clock=lambda: now[0])
+
+    async def run():
+        await validator.validate(make_token(current, "k1"))
+        # A kid nobody publishes: many concurrent requests, one refetch
+        unknown = [make_token(current, "k-unknown", jti=str(i)) for i in range(10)]
+        results = await asyncio.gather(*(validator.validate(t) for t in unknown), return_exceptions=True)
+        assert all(isinstance(r, TokenError) for r in results)
+        assert fetch.requests == 1
+
+        # The signer rotates to a new key; once the rate limit allows, it is picked up
+        fetch.entries = [jwk(rotated, "k2")]
+        with pytest.raises(TokenError):
+            await validator.validate(make_token(rotated, "k2"))
+        now[0] += 31
+        claims = await validator.validate(make_token(rotated, "k2"))
+        return claims
+
+    claims = asyncio.run(run())
+    assert claims["sub"] == "agent-1"
+    assert fetch.requests == 2
+    # k1 left the key set, so tokens it signed are no longer served from the cache
+    assert len(validator.cache) == 1
+
+
+def test_unreachable_jwks_is_reported_separately(keys):
+    def unreachable(url):
+        raise OSError("connection refused")
+
+    validator = validator_for(unreachable)
+    with pytest.raises(JwksUnavailableError):
+        asyncio.run(validator.validate(make_token(keys[0], "k1")))
+
+
+def test_mcp_endpoints_require_a_valid_token(keys, monkeypatch):
+    current, _ = keys
+    validator = validator_for(FakeJwks(jwk(current, "k1")))
+    monkeypatch.setattr(mcp_server, "token_validator", validator)
+    monkeypatch.setattr(mcp_server, "STREAMABLE_HTTP_STATELESS", True)
+    seen = []
+    original = mcp_server.execute_tool
+
+    async def recording_execute_tool(tool_name, arguments):
+        seen.append(current_claims())
+        return await original(tool_name, arguments)
+
+    monkeypatch.setattr(mcp_server, "execute_tool", recording_execute_tool)
+    client = TestClient(mcp_server.app)
+    call = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "hello_mcp"}}
+
+    missing = client.post(MCP_URL, json=call)
+    assert missing.status_code == 401
+    assert missing.headers["www-authenticate"] == "Bearer"
+
+    forged = client.post(MCP_URL, json=call, headers={"Authorization": f"Bearer {make_token(keys[1], 'k1')}"})
+    assert forged.status_code == 401
+    assert forged.headers["www-authenticate"] == 'Bearer error="invalid_token"'
+    assert seen == []
+
+    token = make_token(current, "k1", roles=["snippets.write"])
+    for _ in range(3):
+        ok = client.post(MCP_URL, json=call, headers={"Authorization": f"Bearer {token}"})
+        assert ok.status_code == 200
+        assert "Hello" in ok.json()["result"]["content"][0]["text"]
+    assert [claims["roles"] for claims in seen] == [["snippets.write"]] * 3
+    assert validator.hits == 2
+
+    assert client.get("/health").json()["auth"]["cached_tokens"] == 1
+    assert client.post(f"{MCP_URL}/message?sessionId=x", json=call).status_code == 401
+    assert client.get(f"{MCP_URL}/sse").status_code == 401
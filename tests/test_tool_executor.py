@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tool Execution Pool Tests
+
+Covers src/tool_executor.py: tools declare an execution class, CPU-bound
+handlers run on the process pool without stalling inline tools, large
+arguments travel through shared memory that is released afterwards, and
+per-pool metrics are kept.
+
+Usage:
+    python -m pytest tests/test_tool_executor.py
+"""
+
+import asyncio
+import threading
+import time
+from multiprocessing import shared_memory
+
+import pytest
+
+import mcp_server
+import tool_executor
+from mcp_server import MCPTool
+from tool_executor import PROCESS, THREAD, ToolExecutor, cpu_quota, parse_execution_classes
+
+
+def large_texts(lines):
+    original = "".join(f"line {i}\n" for i in range(lines))
+    modified = "".join(f"line {i}\n" if i % 7 else f"changed {i}\n" for i in range(lines))
+    return original, modified
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = ToolExecutor(process_workers=1, thread_workers=2, shared_memory_min_bytes=1024)
+    monkeypatch.setattr(mcp_server, "tool_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+def test_execution_classes_and_quota():
+    assert parse_execution_classes("diff_snippets=thread, x=inline") == {"diff_snippets": "thread", "x": "inline"}
+    with pytest.raises(ValueError):
+        parse_execution_classes("diff_snippets=gpu")
+    assert cpu_quota() >= 1
+    assert mcp_server.TOOLS_BY_NAME["diff_snippets"].execution == PROCESS
+    listed = asyncio.run(mcp_server.dispatch_method("tools/list", {}, 1))[1]["result"]["tools"]
+    assert all(set(tool) == {"name", "description", "inputSchema"} for tool in listed)
+
+
+def test_process_pool_diff_uses_shared_memory(executor, monkeypatch):
+    segments = []
+    share = tool_executor.share_large_values
+
+    def recording_share(arguments, min_bytes):
+        shared, created = share(arguments, min_bytes)
+        segments.extend(segment.name for segment in created)
+        return shared, created
+
+    monkeypatch.setattr(tool_executor, "share_large_values", recording_share)
+    original, modified = large_texts(2000)
+    result = asyncio.run(mcp_server.execute_tool("diff_snippets", {"original": original, "modified": modified}))
+
+    assert not result.isError
+    diff = result.content[0]["text"]
+    assert diff.startswith("--- original\n+++ modified\n")
+    assert "-line 7\n+changed 7\n" in diff
+    assert len(segments) == 2
+    for name in segments:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+    status = executor.status()[PROCESS]
+    assert (status["completed"], status["failed"], status["in_flight"]) == (1, 0, 0)
+    assert status["run_seconds"] > 0
+
+
+def test_inline_tools_stay_responsive_while_the_pool_is_busy(executor):
+    original, modified = large_texts(3000)
+
+    async def run():
+        # Warm the pool so worker start-up is not part of the measurement
+        await mcp_server.execute_tool("diff_snippets", {"original": "a", "modified": "b"})
+        heavy = [
+            asyncio.create_task(mcp_server.execute_tool("diff_snippets", {"original": original, "modified": modified}))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        queued = executor.metrics[PROCESS].queued
+        latencies = []
+        while not all(task.done() for task in heavy):
+            started = time.perf_counter()
+            await mcp_server.execute_tool("hello_mcp", {})
+            await asyncio.sleep(0.01)
+            latencies.append(time.perf_counter() - started - 0.01)
+        return queued, latencies, await asyncio.gather(*heavy)
+
+    queued, latencies, results = asyncio.run(run())
+    assert queued == 2
+    assert all(not result.isError for result in results)
+    assert len(latencies) > 5
+    assert max(latencies) < 0.1
+    assert executor.metrics[PROCESS].max_queued >= 2
+
+
+def test_thread_pool_tools_and_failures_are_counted(executor, monkeypatch):
+    threads = []
+
+    def blocking_lookup(arguments):
+        threads.append(threading.current_thread().name)
+        if arguments.get("fail"):
+            raise RuntimeError("lookup failed")
+        return {"content": [{"type": "text", "text": "found"}]}
+
+    tool = MCPTool(name="blocking_lookup", description="", inputSchema={}, execution=THREAD, handler=blocking_lookup)
+    monkeypatch.setitem(mcp_server.TOOLS_BY_NAME, tool.name, tool)
+
+    ok = asyncio.run(mcp_server.execute_tool("blocking_lookup", {}))
+    failed = asyncio.run(mcp_server.execute_tool("blocking_lookup", {"fail": True}))
+
+    assert ok.content[0]["text"] == "found" and not ok.isError
+    assert failed.isError and "lookup failed" in failed.content[0]["text"]
+    assert all(name.startswith("tool") for name in threads)
+    status = executor.status()[THREAD]
+    assert (status["completed"], status["failed"]) == (1, 1)
+    assert 'mcp_tool_pool_failed_total{pool="thread"} 1' in executor.prometheus()
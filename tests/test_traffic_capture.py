@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Traffic Capture and Replay Tests
+
+Covers src/traffic_capture.py and its use on the message endpoint and SSE
+streams: requests are recorded with timing, sessions are sampled whole,
+caller data is redacted to same-length keyed hashes, and a capture replays
+against the fake-backend server through benchmarks/replay.py.
+
+Usage:
+    python -m pytest tests/test_traffic_capture.py
+"""
+
+import asyncio
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+import mcp_server
+from traffic_capture import TrafficRecorder, read_capture
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+import replay  # noqa: E402
+
+MESSAGE_URL = "/runtime/webhooks/mcp/message"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def call(request_id, tool, **arguments):
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+            "params": {"name": tool, "arguments": arguments}}
+
+
+def test_message_endpoint_requests_are_recorded_redacted(monkeypatch, tmp_path):
+    path = str(tmp_path / "capture.ndjson.gz")
+    recorder = TrafficRecorder(path, salt="test")
+    monkeypatch.setattr(mcp_server, "traffic_recorder", recorder)
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    session_id = mcp_server.create_session("sse")
+    client = TestClient(mcp_server.app)
+
+    for i, name in enumerate(["customer-secret", "customer-secret", "other"]):
+        response = client.post(f"{MESSAGE_URL}?sessionId={session_id}", json=call(i, "get_snippet", snippetname=name))
+        assert response.status_code == 200
+    client.post(f"{MESSAGE_URL}?sessionId={session_id}", json={"jsonrpc": "2.0", "id": 9, "method": "tools/list"})
+    asyncio.run(recorder.close())
+
+    header, records = read_capture(path)
+    assert header["redact"] == "hash" and header["sample_rate"] == 1.0
+    assert [r["e"] for r in records] == ["rpc"] * 4
+    names = [r["b"]["params"]["arguments"]["snippetname"] for r in records[:3]]
+    # Same-length pseudonyms; repeats of a name stay equal
+    assert names[0] == names[1] != names[2]
+    assert len(names[0]) == len("customer-secret") and "customer" not in names[0]
+    assert all(r["b"]["params"]["name"] == "get_snippet" for r in records[:3])
+    assert records[3]["b"]["method"] == "tools/list"
+    assert {r["s"] for r in records} == {recorder.pseudonym(session_id)}
+    assert all(r["st"] == 200 and r["us"] > 0 for r in records)
+    assert [r["t"] for r in records] == sorted(r["t"] for r in records)
+
+
+def test_stream_lifecycle_and_whole_session_sampling(monkeypatch, tmp_path):
+    clock = Clock()
+    recorder = TrafficRecorder(str(tmp_path / "capture.ndjson"), sample_rate=0.5, redact="none", clock=clock)
+    monkeypatch.setattr(mcp_server, "traffic_recorder", recorder)
+    monkeypatch.setattr(mcp_server, "sessions", {})
+    session_ids = [mcp_server.create_session("sse") for _ in range(200)]
+    kept = [session_id for session_id in session_ids if recorder.sampled(session_id)]
+    assert 60 < len(kept) < 140
+
+    async def run():
+        for session_id in session_ids:
+            clock.now += 0.25
+            stream = mcp_server.session_events(session_id, 0, opening="data: endpoint\n\n")
+            await anext(stream)
+            clock.now += 1
+            recorder.request(session_id, call(1, "hello_mcp"), clock.now - 0.002, 200)
+            await stream.aclose()
+        await recorder.close()
+
+    asyncio.run(run())
+    _, records = read_capture(recorder.path)
+    assert {r["s"] for r in records} == set(kept)
+    first = [r for r in records if r["s"] == kept[0]]
+    assert [r["e"] for r in first] == ["open", "rpc", "close"]
+    assert first[0]["x"] == "sse" and "r" not in first[0]
+    assert first[1]["us"] == 2000 and first[1]["t"] - first[0]["t"] == 998000
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path / "capture.ndjson"), max_pending=3, max_bytes=300)
+    for i in range(5):
+        recorder.request("session", call(i, "hello_mcp"), recorder.clock(), 200)
+    assert recorder.dropped == 2
+    asyncio.run(recorder.close())
+    # Only what fits in max_bytes is written; recording then stops
+    assert recorder.recorded == 2 and recorder.dropped == 3 and not recorder.recording
+    assert recorder.status()["bytes_written"] <= 300
+
+
+def test_replay_preserves_sessions_and_reports_latency(tmp_path):
+    clock = Clock()
+    recorder = TrafficRecorder(str(tmp_path / "capture.ndjson.gz"), salt="test", clock=clock)
+    for s in range(3):
+        clock.now += 0.05
+        recorder.session_opened(f"session-{s}", "sse", resumed=False)
+    for i in range(30):
+        clock.now += 0.02
+        session_id = f"session-{i % 3}"
+        body = call(i, "get_snippet", snippetname=f"kept-{i % 5}") if i % 2 else call(i, "hello_mcp")
+        recorder.request(session_id, body, clock.now, 200)
+    recorder.request("session-0", call(99, "save_snippet", snippetname="new", snippet="text"), clock.now, 200)
+    recorder.request("session-0", call(100, "get_snippet", snippetname="new"), clock.now + 0.01, 200)
+    for s in range(3):
+        recorder.session_closed(f"session-{s}")
+    asyncio.run(recorder.close())
+
+    _, records = read_capture(recorder.path)
+    # Only names read before the capture saves them need to exist beforehand
+    assert len(replay.names_to_seed(records)) == 5
+
+    args = replay.build_parser().parse_args([recorder.path, "--speed", "4", "--snippets", "0"])
+    result = asyncio.run(replay.run_replay(args))
+
+    assert result["errors"] == 0
+    assert result["overall"]["count"] == 32 and result["overall"]["captured"]["count"] == 32
+    assert result["operations"]["call:get_snippet"]["count"] == 16
+    assert result["sessions"] == {"captured_peak": 3, "replayed_peak": 3, "failures": 0}
+    assert result["seconds"] < result["captured_seconds"]
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Vector Similarity Index Tests
+
+Covers src/vector_index.py and the similar_snippets tool: embedders, exact
+batched top-k over the float16 matrix (in memory and memory-mapped), IVF
+partitions, snapshots, snippets embedded as they are saved, and saves or
+deletions on other replicas reaching this replica's vectors.
+
+Usage:
+    python -m pytest tests/test_vector_index.py
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import mcp_server
+import vector_index
+from content_index import SnippetContentIndex
+from resilience import ResilientBackend
+from resource_subscriptions import ChangeFeed, snippet_uri
+from snippet_index import SnippetNameIndex
+from storage import MemoryStorageBackend
+from vector_index import HashingEmbedder, HttpEmbedder, SearchBatcher, VectorIndex, VectorIndexer, normalize
+
+
+def random_vectors(count, dimensions=32, seed=0):
+    return normalize(np.random.default_rng(seed).standard_normal((count, dimensions)))
+
+
+def exact_top(vectors, query, k):
+    scores = vectors.astype(np.float16).astype(np.float32) @ query
+    return list(np.argsort(-scores, kind="stable")[:k])
+
+
+def test_hashing_embedder_ranks_shared_code_higher():
+    embedder = HashingEmbedder(256)
+    base, edited, unrelated = embedder.embed_sync([
+        "kubectl apply -f k8s/mcp-server-deployment.yaml --namespace mcp-server",
+        "kubectl apply -f k8s/mcp-server-scaledobject.yaml --namespace mcp-server",
+        "def fibonacci(n): return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)",
+    ])
+    assert base.shape == (256,)
+    assert np.isclose(np.linalg.norm(base), 1.0)
+    assert base @ edited > 0.5 > base @ unrelated
+    assert np.array_equal(embedder.embed_sync(["same text"]), embedder.embed_sync(["same text"]))
+    assert not embedder.embed_sync([""]).any()
+
+
+def test_http_embedder_batches_and_checks_dimensions():
+    calls = []
+
+    def post(url, body, timeout):
+        calls.append(body["input"])
+        # Responses may come back out of order; "index" is authoritative
+        data = [{"index": i, "embedding": [float(len(text)), 1.0, 0.0]} for i, text in enumerate(body["input"])]
+        return {"data": list(reversed(data))}
+
+    embedder = HttpEmbedder("http://kaito-embedding/v1/embeddings", "bge-small", 3, batch_size=2, post=post)
+    vectors = asyncio.run(embedder.embed(["a", "bbb", "cc"]))
+    assert calls == [["a", "bbb"], ["cc"]]
+    assert np.allclose(vectors[1], normalize([[3.0, 1.0, 0.0]])[0])
+
+    with pytest.raises(ValueError):
+        HttpEmbedder("http://x", "m", 4, post=post).embed_sync(["a"])
+
+
+@pytest.mark.parametrize("memory_mapped", [False, True])
+def test_batched_search_is_exact(monkeypatch, tmp_path, memory_mapped):
+    # Small blocks so results from several blocks have to be merged
+    monkeypatch.setattr(vector_index, "SEARCH_BLOCK_ROWS", 700)
+    vectors = random_vectors(5000)
+    index = VectorIndex(32, str(tmp_path) if memory_mapped else None, capacity=16)
+    for start in range(0, len(vectors), 1000):
+        index.add_many([f"s{i}" for i in range(start, start + 1000)], vectors[start:start + 1000])
+    assert len(index) == 5000 and index.capacity >= 5000
+    assert isinstance(index.vectors, np.memmap) == memory_mapped
+
+    queries = random_vectors(4, seed=1)
+    results = index.search(queries, k=10)
+    for query, found in zip(queries, results):
+        assert [name for name, _ in found] == [f"s{i}" for i in exact_top(vectors, query, 10)]
+        assert [score for _, score in found] == sorted((score for _, score in found), reverse=True)
+
+    # Replacing keeps one row per name; removed rows are never returned
+    index.add("s0", -vectors[0])
+    index.remove("s1")
+    names = [name for name, _ in index.search(vectors[1], k=5)[0]]
+    assert "s1" not in names
+    assert index.search(-vectors[0], k=1)[0][0][0] == "s0"
+
+    restored = VectorIndex.from_snapshot(index.snapshot_body())
+    assert len(restored) == len(index) == 4999
+    assert restored.search(queries, k=10) == index.search(queries, k=10)
+
+
+def test_ivf_partitions_keep_recall_while_scanning_less():
+    rng = np.random.default_rng(3)
+    centers = random_vectors(40, seed=2)
+    vectors = normalize(centers[rng.integers(0, 40, 8000)] + 0.15 * rng.standard_normal((8000, 32)))
+    index = VectorIndex(32)
+    index.add_many([f"s{i}" for i in range(8000)], vectors)
+    exact = index.search(vectors[:50], k=10)
+
+    centroids, assignments = index.fit_partitions(40)
+    # Rows saved while partitions were being fitted are assigned on install
+    index.add("late", vectors[0])
+    index.use_partitions(centroids, assignments)
+    assert index.assignments[index.ids["late"]] >= 0
+
+    approximate = index.search(vectors[:50], k=10, probes=4)
+    recall = np.mean([len({n for n, _ in a} & {n for n, _ in e}) / 10 for a, e in zip(approximate, exact)])
+    assert recall > 0.9
+    assert "late" in {name for name, _ in index.search(vectors[0], k=3, probes=4)[0]}
+
+
+def test_concurrent_searches_share_a_pass():
+    index = VectorIndex(32)
+    vectors = random_vectors(500)
+    index.add_many([f"s{i}" for i in range(500)], vectors)
+    batches = []
+
+    def search(queries, k):
+        batches.append(len(queries))
+        return index.search(queries, k)
+
+    batcher = SearchBatcher(search, max_batch=4)
+
+    async def run():
+        return await asyncio.gather(*(batcher.search(vectors[i], 1 + i % 3) for i in range(9)))
+
+    results = asyncio.run(run())
+    # All nine are queued before the first pass starts, which takes at most four
+    assert batches == [4, 4, 1]
+    for i, found in enumerate(results):
+        assert len(found) == 1 + i % 3 and found[0][0] == f"s{i}"
+
+
+def test_indexer_embeds_saves_in_batches():
+    batches = []
+
+    class RecordingEmbedder(HashingEmbedder):
+        async def embed(self, texts):
+            batches.append(len(texts))
+            return self.embed_sync(texts)
+
+    index = VectorIndex(64)
+    indexer = VectorIndexer(RecordingEmbedder(64), index, batch_size=4)
+
+    async def run():
+        for i in range(10):
+            indexer.submit(f"s{i}", f"snippet number {i}")
+        indexer.submit("s0", "replaced before it was embedded")
+        await indexer.flush()
+
+    asyncio.run(run())
+    assert batches == [4, 4, 2]
+    assert len(index) == 10 and indexer.embedded == 10
+
+
+def test_similar_snippets_tool(monkeypatch):
+    monkeypatch.setattr(mcp_server, "storage_backend", ResilientBackend(MemoryStorageBackend()))
+    index = VectorIndex(256)
+    index.loaded = True
+    monkeypatch.setattr(mcp_server, "vector_index", index)
+    monkeypatch.setattr(mcp_server, "vector_indexer", VectorIndexer(mcp_server.embedder, index))
+    snippets = {
+        "deploy-aks": "az aks create --resource-group rg --name cluster --node-count 3",
+        "deploy-aks-gpu": "az aks create --resource-group rg --name gpu-cluster --node-count 1 --node-vm-size gpu",
+        "fib": "def fib(n): return n if n < 2 else fib(n - 1) + fib(n - 2)",
+    }
+
+    async def run():
+        for name, text in snippets.items():
+            await mcp_server.execute_tool("save_snippet", {"snippetname": name, "snippet": text})
+        await mcp_server.vector_indexer.flush()
+        by_text = await mcp_server.execute_tool("similar_snippets", {"text": "az aks create --name demo", "limit": 2})
+        by_name = await mcp_server.execute_tool("similar_snippets", {"snippetname": "deploy-aks", "limit": 1})
+        missing = await mcp_server.execute_tool("similar_snippets", {"snippetname": "nope"})
+        return by_text, by_name, missing
+
+    by_text, by_name, missing = asyncio.run(run())
+    ranked = [r["snippetname"] for r in json.loads(by_text.content[0]["text"])["results"]]
+    assert set(ranked) == {"deploy-aks", "deploy-aks-gpu"}
+    assert json.loads(by_name.content[0]["text"])["results"][0]["snippetname"] == "deploy-aks-gpu"
+    assert missing.isError
+
+
+def test_sync_embeds_existing_snippets_and_shares_the_snapshot(monkeypatch):
+    memory = MemoryStorageBackend()
+    for name in ("a", "b", "c"):
+        memory.blobs[f"{name}.json"] = f"snippet {name} content".encode()
+    names = mcp_server.SnippetNameIndex()
+    names.finish_reconcile(["a", "b", "c"])
+    monkeypatch.setattr(mcp_server, "storage_backend", ResilientBackend(memory))
+    monkeypatch.setattr(mcp_server, "snippet_index", names)
+
+    def fresh_index():
+        index = VectorIndex(mcp_server.embedder.dimensions)
+        monkeypatch.setattr(mcp_server, "vector_index", index)
+        monkeypatch.setattr(mcp_server, "vector_indexer", VectorIndexer(mcp_server.embedder, index))
+
+    fresh_index()
+    asyncio.run(mcp_server.sync_vector_index())
+    assert len(mcp_server.vector_index) == 3
+    assert mcp_server.VECTOR_INDEX_SNAPSHOT_KEY in memory.blobs
+
+    # Another replica starts from the snapshot without re-embedding
+    fresh_index()
+    asyncio.run(mcp_server.load_vector_index())
+    assert mcp_server.vector_index.loaded
+    assert sorted(mcp_server.vector_index.ids) == ["a", "b", "c"]
+    assert mcp_server.vector_indexer.embedded == 0
+
+
+def test_remote_saves_are_re_embedded_and_deleted_snippets_dropped(monkeypatch):
+    memory = MemoryStorageBackend()
+    backend = ResilientBackend(memory)
+    memory.blobs.update({f"{name}.json": f"snippet {name} original".encode() for name in "abc"})
+    monkeypatch.setattr(mcp_server, "storage_backend", backend)
+
+    def replica(replica_id):
+        index = VectorIndex(mcp_server.embedder.dimensions)
+        monkeypatch.setattr(mcp_server, "snippet_index", SnippetNameIndex())
+        monkeypatch.setattr(mcp_server, "content_index", SnippetContentIndex())
+        monkeypatch.setattr(mcp_server, "vector_index", index)
+        monkeypatch.setattr(mcp_server, "vector_indexer", VectorIndexer(mcp_server.embedder, index))
+        feed = ChangeFeed(mcp_server.notify_resources_updated, storage=backend, coalesce_seconds=0.01,
+                          replica_id=replica_id, remote=mcp_server.reindex_remote_changes)
+        monkeypatch.setattr(mcp_server, "resource_changes", feed)
+        return feed
+
+    async def save_elsewhere(*names):
+        other = ChangeFeed(lambda uris: None, storage=backend, coalesce_seconds=0.01, replica_id="elsewhere")
+        for name in names:
+            other.changed(snippet_uri(name))
+        await other.flush()
+
+    async def sync():
+        await mcp_server.reconcile_snippet_index()
+        await mcp_server.sync_content_index()
+        await mcp_server.sync_vector_index()
+
+    def embedded_current(name):
+        expected = mcp_server.embedder.embed_sync([memory.blobs[f"{name}.json"].decode()])[0]
+        return np.array_equal(mcp_server.vector_index.vector(name), expected.astype(np.float16))
+
+    async def run():
+        feed = replica("local")
+        await sync()
+        await feed.poll()
+        memory.blobs["a.json"] = b"snippet a rewritten elsewhere"
+        del memory.blobs["b.json"]
+        await save_elsewhere("a", "b")
+        await feed.poll()
+        await mcp_server.remote_reindex_task
+        await mcp_server.vector_indexer.flush()
+        remote = embedded_current("a"), sorted(mcp_server.vector_index.ids)
+
+        del memory.blobs["c.json"]
+        await sync()
+        reconciled = sorted(mcp_server.vector_index.ids)
+
+        # A snapshot written before another replica's save is caught up on load
+        memory.blobs["d.json"] = b"snippet d"
+        await mcp_server.persist_vector_index()
+        memory.blobs["a.json"] = b"snippet a rewritten again"
+        await save_elsewhere("a")
+        replica("reader")
+        await sync()
+        return remote, reconciled, embedded_current("a")
+
+    (rewritten, names), reconciled, caught_up = asyncio.run(run())
+    assert rewritten and names == ["a", "c"]
+    assert reconciled == ["a"]
+    assert caught_up